@@ -0,0 +1,74 @@
+"""
+用户名片批量加载
+
+评论、通知、课程列表等处嵌套的用户只需要 id、用户名、显示名、头像、用户类型和职称。
+名片通过请求级的批量加载器（edu_platform.dataloader）取出：同一页引用到的用户合并为一次查询（连同教师资料），
+并可按用户ID短时缓存，用户或教师资料保存时由 accounts.models 中的信号使缓存失效。
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from edu_platform.upload.cas import is_blob_name
+from edu_platform.upload.images import load_variants, variant_urls
+
+# 名片字段变化时递增版本号，旧缓存自然失效
+CARD_VERSION = 2
+AVATAR_VARIANTS = ('avatar', 'avatar@2x')
+CACHE_KEY = 'user_card:v{version}:{user_id}'
+# 为 0 或 None 时不使用缓存
+CACHE_TIMEOUT = getattr(settings, 'USER_CARD_CACHE_TIMEOUT', 60)
+
+
+def _cache_key(user_id):
+    return CACHE_KEY.format(version=CARD_VERSION, user_id=user_id)
+
+
+def build_card(user, avatar_variants=None):
+    """由用户对象生成名片，头像及其尺寸变体保存为存储中的相对地址"""
+    title = None
+    if user.user_type == 'teacher':
+        profile = getattr(user, 'teacher_profile', None)
+        title = profile.title if profile else None
+    return {
+        'id': user.pk,
+        'username': user.username,
+        'display_name': user.get_full_name() or user.username,
+        'avatar': user.avatar.url if user.avatar else None,
+        'avatar_variants': variant_urls(avatar_variants, only=AVATAR_VARIANTS),
+        'user_type': user.user_type,
+        'title': title,
+    }
+
+
+def load_cards(user_ids):
+    """批量加载用户名片：先查缓存，未命中的合并为一次数据库查询，返回 {用户ID: 名片}"""
+    missing = {user_id for user_id in user_ids if user_id is not None}
+    cards = {}
+    if CACHE_TIMEOUT and missing:
+        keys = {_cache_key(user_id): user_id for user_id in missing}
+        for key, card in cache.get_many(keys.keys()).items():
+            cards[keys[key]] = card
+        missing -= cards.keys()
+    if not missing:
+        return cards
+
+    User = get_user_model()
+    users = User.objects.filter(pk__in=missing).select_related('teacher_profile').only(
+        'id', 'username', 'first_name', 'last_name', 'avatar', 'user_type',
+        'teacher_profile__title',
+    )
+    users = list(users)
+    # 头像变体在上传后由后台生成，生成前缓存的名片最多在 CACHE_TIMEOUT 内没有变体
+    avatars = [user.avatar.name for user in users if is_blob_name(user.avatar.name)]
+    variants = load_variants(avatars) if avatars else {}
+    loaded = {user.pk: build_card(user, variants.get(user.avatar.name)) for user in users}
+    if CACHE_TIMEOUT and loaded:
+        cache.set_many({_cache_key(user_id): card for user_id, card in loaded.items()}, CACHE_TIMEOUT)
+    cards.update(loaded)
+    return cards
+
+
+def invalidate_card(user_id):
+    """使用户名片缓存失效"""
+    cache.delete(_cache_key(user_id))
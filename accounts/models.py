@@ -1,7 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from .cards import invalidate_card
 
 class User(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -64,3 +65,14 @@ def save_user_profile(sender, instance, **kwargs):
         instance.student_profile.save()
     elif instance.user_type == 'teacher' and hasattr(instance, 'teacher_profile'):
         instance.teacher_profile.save()
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_card(sender, instance, **kwargs):
+    """用户信息变化时使名片缓存失效"""
+    invalidate_card(instance.pk)
+
+@receiver(post_save, sender=TeacherProfile)
+def invalidate_teacher_card(sender, instance, **kwargs):
+    """教师资料（职称）变化时使名片缓存失效"""
+    invalidate_card(instance.user_id)
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from edu_platform.dataloader import batch_load
 from .models import StudentProfile, TeacherProfile
+from .cards import load_cards
 
 User = get_user_model()
 
@@ -39,6 +41,45 @@ class UserSerializer(serializers.ModelSerializer):
             instance.set_password(password)
         return super().update(instance, validated_data)
 
+class UserCardSerializer(serializers.Serializer):
+    """用户名片，嵌套在列表、评论、通知等处代替完整的用户信息"""
+    id = serializers.IntegerField(read_only=True)
+    username = serializers.CharField(read_only=True)
+    display_name = serializers.CharField(read_only=True)
+    avatar = serializers.CharField(read_only=True, allow_null=True)
+    avatar_variants = serializers.DictField(child=serializers.CharField(), read_only=True, allow_null=True)
+    user_type = serializers.CharField(read_only=True)
+    title = serializers.CharField(read_only=True, allow_null=True)
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('read_only', True)
+        super().__init__(*args, **kwargs)
+
+    def get_attribute(self, instance):
+        # 外键直接取用户ID，不加载用户对象
+        if len(self.source_attrs) == 1:
+            attname = self.source_attrs[0] + '_id'
+            if hasattr(instance, attname):
+                return getattr(instance, attname)
+        return super().get_attribute(instance)
+
+    def to_representation(self, value):
+        user_id = getattr(value, 'pk', value)
+        return batch_load(self, 'accounts.user_card', load_cards, user_id, then=self._with_absolute_avatar)
+
+    def _with_absolute_avatar(self, card):
+        if card is None:
+            return None
+        request = self.context.get('request')
+        if card['avatar'] and request is not None:
+            card = dict(card, avatar=request.build_absolute_uri(card['avatar']))
+            if card['avatar_variants']:
+                card['avatar_variants'] = {
+                    variant: request.build_absolute_uri(url) for variant, url in card['avatar_variants'].items()
+                }
+        return card
+
+
 class StudentProfileUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = StudentProfile
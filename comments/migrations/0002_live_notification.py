@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-19 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('comment', '评论'), ('reply', '回复'), ('like', '点赞'), ('course', '课程更新'), ('live', '直播提醒'), ('system', '系统通知')], max_length=10, verbose_name='通知类型'),
+        ),
+    ]
@@ -51,6 +51,7 @@ class Notification(models.Model):
         ('reply', '回复'),
         ('like', '点赞'),
         ('course', '课程更新'),
+        ('live', '直播提醒'),
         ('system', '系统通知'),
     )
     
@@ -1,31 +1,52 @@
 from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count
 from .models import Comment, CommentLike, Notification
-from accounts.serializers import UserSerializer
+from accounts.serializers import UserCardSerializer
+from edu_platform.dataloader import BatchListSerializer, batch_load
+
+def _reply_counts(comment_ids):
+    """按父评论分组统计公开回复数"""
+    return dict(
+        Comment.objects.filter(parent_id__in=comment_ids, is_public=True, is_removed=False)
+        .values('parent').annotate(count=Count('id')).values_list('parent', 'count')
+    )
+
+def _like_counts(comment_ids):
+    """按评论分组统计点赞数"""
+    return dict(
+        CommentLike.objects.filter(comment_id__in=comment_ids)
+        .values('comment').annotate(count=Count('id')).values_list('comment', 'count')
+    )
 
 class CommentSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserCardSerializer()
     reply_count = serializers.SerializerMethodField()
     like_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
+        list_serializer_class = BatchListSerializer
         fields = ['id', 'user', 'content', 'content_type', 'object_id', 
                  'parent', 'is_public', 'is_removed', 'created_at', 
                  'updated_at', 'reply_count', 'like_count', 'is_liked']
         read_only_fields = ['user', 'created_at', 'updated_at']
     
     def get_reply_count(self, obj):
-        return obj.replies.filter(is_public=True, is_removed=False).count()
+        return batch_load(self, 'comments.reply_count', _reply_counts, obj.pk, default=0)
     
     def get_like_count(self, obj):
-        return obj.likes.count()
+        return batch_load(self, 'comments.like_count', _like_counts, obj.pk, default=0)
     
     def get_is_liked(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.likes.filter(user=request.user).exists()
+            user = request.user
+            def liked(comment_ids):
+                ids = CommentLike.objects.filter(user=user, comment_id__in=comment_ids).values_list('comment_id', flat=True)
+                return {comment_id: True for comment_id in ids}
+            return batch_load(self, 'comments.is_liked', liked, obj.pk, default=False)
         return False
 
 class CommentCreateSerializer(serializers.ModelSerializer):
@@ -51,10 +72,11 @@ class CommentCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 class CommentLikeSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserCardSerializer()
     
     class Meta:
         model = CommentLike
+        list_serializer_class = BatchListSerializer
         fields = ['id', 'user', 'comment', 'created_at']
         read_only_fields = ['user', 'created_at']
     
@@ -63,11 +85,12 @@ class CommentLikeSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 class NotificationSerializer(serializers.ModelSerializer):
-    recipient = UserSerializer(read_only=True)
-    sender = UserSerializer(read_only=True)
+    recipient = UserCardSerializer()
+    sender = UserCardSerializer()
     
     class Meta:
         model = Notification
+        list_serializer_class = BatchListSerializer
         fields = ['id', 'recipient', 'sender', 'notification_type', 
                  'content_type', 'object_id', 'message', 'is_read',
                  'created_at']
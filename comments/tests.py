@@ -1,3 +1,58 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from courses.models import Course
+from edu_platform.testing import QueryBudgetTestMixin
+
+from .models import Comment, CommentLike, Notification
+
+User = get_user_model()
+
+
+class CommentQueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    """评论列表和通知列表的查询数不随评论、回复和通知数量增长"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com')
+        self.course = Course.objects.create(
+            title='课程', slug='course', instructor=self.owner, description='简介', price=0, is_free=True,
+        )
+        self.content_type = ContentType.objects.get_for_model(Course)
+
+    def create_user(self, name):
+        return User.objects.create_user(name, f'{name}@example.com')
+
+    def test_comment_list(self):
+        def grow(size):
+            comments = Comment.objects.filter(parent__isnull=True)
+            for index in range(comments.count(), size):
+                author = self.create_user(f'author{index}')
+                comment = Comment.objects.create(
+                    user=author, content=f'评论 {index}', content_type=self.content_type, object_id=self.course.pk,
+                )
+                Comment.objects.create(
+                    user=self.owner, content='回复', content_type=self.content_type, object_id=self.course.pk,
+                    parent=comment,
+                )
+                CommentLike.objects.create(user=self.owner, comment=comment)
+
+        self.client.force_authenticate(self.owner)
+        responses = self.assertQueryCountFlat('comment-list', grow, lambda: self.client.get('/api/comments/comments/', {
+            'content_type': 'courses.course', 'object_id': self.course.pk, 'parent': 'null',
+        }))
+        self.assertEqual([response.data['count'] for response in responses], [2, 20])
+
+    def test_notification_list(self):
+        def grow(size):
+            for index in range(Notification.objects.count(), size):
+                Notification.objects.create(
+                    recipient=self.owner, sender=self.create_user(f'sender{index}'), notification_type='comment',
+                    content_type=self.content_type, object_id=self.course.pk, message=f'通知 {index}',
+                )
+
+        self.client.force_authenticate(self.owner)
+        responses = self.assertQueryCountFlat(
+            'notification-list', grow, lambda: self.client.get('/api/comments/notifications/'),
+        )
+        self.assertEqual([response.data['count'] for response in responses], [2, 20])
@@ -0,0 +1,35 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from courses.ownership import OWNED_MODELS, find_inconsistent, repair_ownership
+
+
+class Command(BaseCommand):
+    help = '检查 Lesson / Quiz / Question / Video 冗余的 course_id、owner_id 是否与实际归属一致'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='按实际归属修复不一致的记录')
+        parser.add_argument('--verbose-rows', type=int, default=20, help='每个模型最多输出的不一致记录数')
+
+    def handle(self, *args, **options):
+        total = 0
+        # 按依赖顺序检查：问题的规范值依赖测验，测验和视频依赖课时
+        for label in OWNED_MODELS:
+            model = apps.get_model(label)
+            mismatched = list(find_inconsistent(model))
+            total += len(mismatched)
+
+            if not mismatched:
+                self.stdout.write(self.style.SUCCESS(f'{label}: 一致'))
+                continue
+
+            self.stdout.write(self.style.WARNING(f'{label}: {len(mismatched)} 条记录不一致'))
+            for pk, stored, expected in mismatched[:options['verbose_rows']]:
+                self.stdout.write(f'  id={pk} 当前(course, owner)={stored} 应为={expected}')
+
+            if options['fix']:
+                updated = repair_ownership(model, [pk for pk, _, _ in mismatched])
+                self.stdout.write(self.style.SUCCESS(f'  已修复 {updated} 条记录'))
+
+        if total and not options['fix']:
+            self.stdout.write('使用 --fix 修复以上记录')
@@ -0,0 +1,105 @@
+"""
+课程报名关系缓存
+
+把每个用户的报名记录缓存为 {course_id: (enrollment_id, status)}，
+“是否已报名”之类的判断变成内存中的集合查找。
+Enrollment 创建、删除或状态变化时由 courses.models 中的信号使缓存失效。
+
+失效必须对所有进程可见，因此只在所有进程共用缓存（CACHE_URL 为 Redis）时跨请求缓存；
+缓存只在进程内有效时每个请求查一次数据库。缓存中没有某门课时，拒绝访问之前再回查一次数据库，
+避免并发报名时写回的旧结果让刚报名的学生在缓存过期前被拒绝。
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from edu_platform.caches import is_shared
+
+CACHE_KEY = 'enrollment:courses:{user_id}'
+CACHE_TIMEOUT = getattr(settings, 'ENROLLMENT_CACHE_TIMEOUT', 300)
+
+# 同一请求内把结果挂在用户对象上，避免重复访问缓存
+USER_ATTR = '_enrollment_map'
+RECHECKED_ATTR = '_enrollment_rechecked'
+
+
+def _cache_key(user_id):
+    return CACHE_KEY.format(user_id=user_id)
+
+
+def load_enrollments(user_ids):
+    """批量加载多个用户的报名关系，缓存未命中的用户合并为一次查询"""
+    from .models import Enrollment
+
+    user_ids = set(user_ids)
+    shared = is_shared()
+    keys = {_cache_key(user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(keys.keys()) if shared else {}
+    result = {keys[key]: value for key, value in cached.items()}
+
+    missing = user_ids - result.keys()
+    if missing:
+        loaded = {user_id: {} for user_id in missing}
+        rows = Enrollment.objects.filter(student_id__in=missing).values_list('student_id', 'course_id', 'id', 'status')
+        for student_id, course_id, enrollment_id, status in rows:
+            loaded[student_id][course_id] = (enrollment_id, status)
+        if shared:
+            cache.set_many({_cache_key(user_id): value for user_id, value in loaded.items()}, CACHE_TIMEOUT)
+        result.update(loaded)
+    return result
+
+
+def get_enrollment_map(user):
+    """返回用户的 {course_id: (enrollment_id, status)}，未登录用户为空"""
+    if not user or not user.is_authenticated:
+        return {}
+    enrollment_map = getattr(user, USER_ATTR, None)
+    if enrollment_map is None:
+        enrollment_map = dict(load_enrollments([user.pk])[user.pk])
+        setattr(user, USER_ATTR, enrollment_map)
+    return enrollment_map
+
+
+def _find_enrollment(user, course):
+    """
+    返回 (enrollment_id, status)，未报名时返回 None；报名关系来自跨请求的缓存而其中没有这门课时回查数据库，
+    本请求内每门课只回查一次
+    """
+    from .models import Enrollment
+
+    course_id = getattr(course, 'pk', course)
+    enrollment_map = get_enrollment_map(user)
+    if course_id in enrollment_map or not user or not user.is_authenticated or not is_shared():
+        return enrollment_map.get(course_id)
+    rechecked = user.__dict__.setdefault(RECHECKED_ATTR, set())
+    if course_id not in rechecked:
+        rechecked.add(course_id)
+        row = Enrollment.objects.filter(student_id=user.pk, course_id=course_id).values_list('id', 'status').first()
+        if row is not None:
+            # 缓存中的结果已过期
+            cache.delete(_cache_key(user.pk))
+            enrollment_map[course_id] = row
+    return enrollment_map.get(course_id)
+
+
+def enrolled_course_ids(user):
+    """用户已报名的课程ID集合，列表接口可一次取出后逐行判断"""
+    return frozenset(get_enrollment_map(user))
+
+
+def is_enrolled(user, course):
+    """判断用户是否已报名课程，course 可以是课程对象或课程ID"""
+    return _find_enrollment(user, course) is not None
+
+
+def get_enrollment_id(user, course):
+    """返回用户在该课程的报名记录ID，未报名时返回 None"""
+    entry = _find_enrollment(user, course)
+    return entry[0] if entry else None
+
+
+def invalidate_enrollments(user_id, user=None):
+    """使用户的报名关系缓存失效；传入用户对象时一并清除请求内的结果"""
+    cache.delete(_cache_key(user_id))
+    if user is not None:
+        user.__dict__.pop(USER_ATTR, None)
+        user.__dict__.pop(RECHECKED_ATTR, None)
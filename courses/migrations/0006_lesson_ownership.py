@@ -0,0 +1,39 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_lesson_ownership(apps, schema_editor):
+    """根据章节回填课时的课程与讲师"""
+    Lesson = apps.get_model('courses', 'Lesson')
+    Section = apps.get_model('courses', 'Section')
+    section = Section.objects.filter(pk=OuterRef('section_id'))
+    Lesson.objects.update(
+        course_id=Subquery(section.values('course_id')[:1]),
+        owner_id=Subquery(section.values('course__instructor_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courses', '0005_alter_course_video_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='course',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='courses.course', verbose_name='所属课程'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='owner',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='课程讲师'),
+        ),
+        migrations.RunPython(backfill_lesson_ownership, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from accounts.models import User
+from .ownership import OwnedContentMixin, sync_course_owner, sync_section_course, sync_lesson_children
+from .membership import invalidate_enrollments
 
 class Category(models.Model):
     """课程分类"""
@@ -69,7 +73,7 @@ class Section(models.Model):
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
-class Lesson(models.Model):
+class Lesson(OwnedContentMixin, models.Model):
     """课程课时"""
     LESSON_TYPE_CHOICES = (
         ('video', '视频'),
@@ -85,6 +89,14 @@ class Lesson(models.Model):
     order = models.PositiveIntegerField(default=0, verbose_name='排序')
     is_free_preview = models.BooleanField(default=False, verbose_name='是否免费预览')
     
+    # 冗余字段，由 save() 自动维护，用于权限判断
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, editable=False, 
+                               related_name='+', verbose_name='所属课程')
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, editable=False, 
+                              related_name='+', verbose_name='课程讲师')
+    
+    ownership_source_fields = ('section',)
+    
     class Meta:
         verbose_name = '课程课时'
         verbose_name_plural = '课程课时'
@@ -92,6 +104,15 @@ class Lesson(models.Model):
     
     def __str__(self):
         return f"{self.section.course.title} - {self.section.title} - {self.title}"
+    
+    def resolve_ownership(self):
+        """根据章节计算 (course_id, owner_id)"""
+        row = Section.objects.filter(pk=self.section_id).values_list('course_id', 'course__instructor_id').first()
+        return row or (None, None)
+    
+    def ownership_changed(self):
+        """课时换章节后同步关联的测验、问题和视频"""
+        sync_lesson_children([self.pk], self.course_id, self.owner_id)
 
 class Enrollment(models.Model):
     """课程报名"""
@@ -161,3 +182,22 @@ class CourseRating(models.Model):
         
     def __str__(self):
         return f"{self.user.username}对{self.course.title}的评分：{self.score}分"
+
+@receiver(post_save, sender=Course)
+def sync_course_ownership(sender, instance, created, **kwargs):
+    """课程更换讲师时同步下级内容的归属讲师"""
+    if not created:
+        sync_course_owner(instance)
+
+@receiver(post_save, sender=Section)
+def sync_section_ownership(sender, instance, created, **kwargs):
+    """章节调整所属课程时同步下级内容的冗余字段"""
+    if not created:
+        sync_section_course(instance)
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_enrollment_cache(sender, instance, **kwargs):
+    """报名记录创建、删除或状态变化时使该学生的报名缓存失效"""
+    student = instance.student if Enrollment.student.is_cached(instance) else None
+    invalidate_enrollments(instance.student_id, student)
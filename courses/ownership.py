@@ -0,0 +1,181 @@
+"""
+课程内容归属解析
+
+Lesson、Quiz、Question、Video 上冗余保存了所属课程 (course_id) 和归属讲师 (owner_id)，
+权限判断直接读取这两列，不再沿 obj.lesson.section.course.instructor 逐级懒加载。
+冗余字段在各模型 save() 时自动维护，课程换讲师、章节换课程时由信号批量同步。
+"""
+from django.apps import apps
+from django.db.models import OuterRef, Subquery, F, BigIntegerField
+from django.db.models.functions import Coalesce
+
+# 冗余了 course_id / owner_id 的模型
+OWNED_MODELS = ('courses.Lesson', 'exercises.Quiz', 'exercises.Question', 'videos.Video')
+
+# 没有冗余字段的模型：通过父对象的一次查询得到归属讲师
+# 模型 -> (父模型, 外键字段, 父模型上的讲师字段)
+PARENT_OWNER_LOOKUPS = {
+    'courses.section': ('courses.Course', 'course', 'instructor_id'),
+    'exercises.choice': ('exercises.Question', 'question', 'owner_id'),
+}
+
+
+def get_owner_id(obj):
+    """返回对象归属讲师的用户ID，最多一次查询"""
+    if obj is None:
+        return None
+
+    label = obj._meta.label_lower
+    if label in PARENT_OWNER_LOOKUPS:
+        parent_label, field_name, owner_field = PARENT_OWNER_LOOKUPS[label]
+        field = obj._meta.get_field(field_name)
+        # 父对象已加载时直接读取，不再查询
+        if field.is_cached(obj):
+            return getattr(getattr(obj, field_name), owner_field)
+        parent_model = apps.get_model(parent_label)
+        return parent_model.objects.filter(
+            pk=getattr(obj, field.attname)
+        ).values_list(owner_field, flat=True).first()
+
+    if hasattr(obj, 'owner_id'):
+        return obj.owner_id
+    # 课程、直播活动等直接带有讲师字段
+    if hasattr(obj, 'instructor_id'):
+        return obj.instructor_id
+    return None
+
+
+def is_owner(user, obj):
+    """判断用户是否为对象的归属讲师（管理员视为拥有全部权限）"""
+    if not user or not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    return get_owner_id(obj) == user.id
+
+
+class OwnedContentMixin:
+    """在 save() 时维护冗余 course / owner 字段的模型混入"""
+    # 决定归属的字段，save(update_fields=...) 未涉及这些字段时不重新计算
+    ownership_source_fields = ()
+
+    def resolve_ownership(self):
+        """返回 (course_id, owner_id)"""
+        raise NotImplementedError
+
+    def ownership_changed(self):
+        """已有对象的归属变化后调用，用于同步下级对象"""
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        changed = False
+        if update_fields is None or set(update_fields) & set(self.ownership_source_fields):
+            course_id, owner_id = self.resolve_ownership()
+            changed = (self.course_id, self.owner_id) != (course_id, owner_id)
+            self.course_id, self.owner_id = course_id, owner_id
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'course', 'owner'}
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if changed and not adding:
+            self.ownership_changed()
+
+
+def canonical_ownership(model):
+    """返回某个冗余模型 course_id / owner_id 的规范取值表达式"""
+    Section = apps.get_model('courses', 'Section')
+    Lesson = apps.get_model('courses', 'Lesson')
+    Quiz = apps.get_model('exercises', 'Quiz')
+    label = model._meta.label
+
+    if label == 'courses.Lesson':
+        section = Section.objects.filter(pk=OuterRef('section_id'))
+        return (
+            Subquery(section.values('course_id')[:1]),
+            Subquery(section.values('course__instructor_id')[:1]),
+        )
+    if label in ('exercises.Quiz', 'videos.Video'):
+        lesson = Lesson.objects.filter(pk=OuterRef('lesson_id'))
+        course = Subquery(lesson.values('section__course_id')[:1])
+        owner = Subquery(lesson.values('section__course__instructor_id')[:1])
+        if label == 'exercises.Quiz':
+            owner = Coalesce(owner, F('instructor_id'), output_field=BigIntegerField())
+        return course, owner
+    if label == 'exercises.Question':
+        # 问题的规范值按测验的规范值计算，不依赖测验上可能已过期的冗余列
+        lesson = Lesson.objects.filter(pk=OuterRef('lesson_id'))
+        quiz = Quiz.objects.filter(pk=OuterRef('quiz_id')).annotate(
+            canonical_course=Subquery(lesson.values('section__course_id')[:1]),
+            canonical_owner=Coalesce(
+                Subquery(lesson.values('section__course__instructor_id')[:1]),
+                F('instructor_id'),
+                output_field=BigIntegerField(),
+            ),
+        )
+        return (
+            Subquery(quiz.values('canonical_course')[:1]),
+            Subquery(quiz.values('canonical_owner')[:1]),
+        )
+    raise ValueError(f"{label} 没有冗余的归属字段")
+
+
+def find_inconsistent(model):
+    """逐行比对冗余字段与规范值，生成 (pk, 当前值, 规范值)"""
+    course_expr, owner_expr = canonical_ownership(model)
+    rows = model.objects.annotate(
+        canonical_course=course_expr,
+        canonical_owner=owner_expr,
+    ).values_list('pk', 'course_id', 'owner_id', 'canonical_course', 'canonical_owner')
+    for pk, course_id, owner_id, canonical_course, canonical_owner in rows.iterator():
+        if (course_id, owner_id) != (canonical_course, canonical_owner):
+            yield pk, (course_id, owner_id), (canonical_course, canonical_owner)
+
+
+def repair_ownership(model, pks=None):
+    """按规范值批量重写冗余字段，返回更新行数"""
+    course_expr, owner_expr = canonical_ownership(model)
+    queryset = model.objects.all()
+    if pks is not None:
+        queryset = queryset.filter(pk__in=pks)
+    return queryset.update(course_id=course_expr, owner_id=owner_expr)
+
+
+def sync_course_owner(course):
+    """课程更换讲师后，同步该课程下所有冗余的 owner_id"""
+    Lesson = apps.get_model('courses', 'Lesson')
+    # 课时的归属未变时，其下的测验、问题、视频也无需同步
+    if not Lesson.objects.filter(course_id=course.pk).exclude(owner_id=course.instructor_id).exists():
+        return
+    for label in OWNED_MODELS:
+        model = apps.get_model(label)
+        model.objects.filter(course_id=course.pk).exclude(
+            owner_id=course.instructor_id
+        ).update(owner_id=course.instructor_id)
+
+
+def sync_section_course(section):
+    """章节调整所属课程后，同步章节下课时、测验、问题和视频的冗余字段"""
+    Lesson = apps.get_model('courses', 'Lesson')
+    Course = apps.get_model('courses', 'Course')
+    lesson_ids = list(
+        Lesson.objects.filter(section_id=section.pk).exclude(
+            course_id=section.course_id
+        ).values_list('pk', flat=True)
+    )
+    if not lesson_ids:
+        return
+    instructor_id = Course.objects.filter(pk=section.course_id).values_list('instructor_id', flat=True).first()
+    values = {'course_id': section.course_id, 'owner_id': instructor_id}
+    Lesson.objects.filter(pk__in=lesson_ids).update(**values)
+    sync_lesson_children(lesson_ids, **values)
+
+
+def sync_lesson_children(lesson_ids, course_id, owner_id):
+    """课时归属变化后，同步关联测验、问题和视频"""
+    Quiz = apps.get_model('exercises', 'Quiz')
+    Question = apps.get_model('exercises', 'Question')
+    Video = apps.get_model('videos', 'Video')
+    values = {'course_id': course_id, 'owner_id': owner_id}
+    Quiz.objects.filter(lesson_id__in=lesson_ids).update(**values)
+    Question.objects.filter(quiz__lesson_id__in=lesson_ids).update(**values)
+    Video.objects.filter(lesson_id__in=lesson_ids).update(**values)
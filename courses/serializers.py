@@ -1,9 +1,14 @@
 from rest_framework import serializers
+from django.db.models import Count
 from .models import Category, Course, Section, Lesson, Enrollment, LessonProgress, CourseRating
-from accounts.serializers import UserSerializer
+from accounts.serializers import UserCardSerializer
+from edu_platform.dataloader import BatchListSerializer, batch_load
+from edu_platform.upload.images import ImageVariantsField
 from django.contrib.contenttypes.models import ContentType
 from comments.models import Comment
 from comments.serializers import CommentSerializer
+from .ownership import is_owner
+from .membership import is_enrolled
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -28,31 +33,42 @@ class LessonProgressSerializer(serializers.ModelSerializer):
         fields = ['id', 'enrollment', 'lesson', 'status', 'progress_percent', 'last_position', 'last_accessed']
 
 class EnrollmentSerializer(serializers.ModelSerializer):
-    student = UserSerializer(read_only=True)
+    student = UserCardSerializer()
     
     class Meta:
         model = Enrollment
+        list_serializer_class = BatchListSerializer
         fields = ['id', 'student', 'course', 'status', 'enrolled_at', 'completed_at']
         read_only_fields = ['enrolled_at', 'completed_at']
 
+def _students_counts(course_ids):
+    """按课程分组统计报名学生数"""
+    return dict(
+        Enrollment.objects.filter(course_id__in=course_ids)
+        .values('course').annotate(count=Count('id')).values_list('course', 'count')
+    )
+
 class CourseListSerializer(serializers.ModelSerializer):
-    instructor = UserSerializer(read_only=True)
+    instructor = UserCardSerializer()
     category = CategorySerializer(read_only=True)
     students_count = serializers.SerializerMethodField()
+    cover_image_variants = ImageVariantsField(source='cover_image')
     
     class Meta:
         model = Course
-        fields = ['id', 'title', 'slug', 'instructor', 'category', 'cover_image', 
+        list_serializer_class = BatchListSerializer
+        fields = ['id', 'title', 'slug', 'instructor', 'category', 'cover_image', 'cover_image_variants',
                   'description', 'price', 'is_free', 'status', 'created_at', 'students_count']
     
     def get_students_count(self, obj):
-        return obj.students.count()
+        return batch_load(self, 'courses.students_count', _students_counts, obj.pk, default=0)
 
 class CourseRatingSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserCardSerializer()
     
     class Meta:
         model = CourseRating
+        list_serializer_class = BatchListSerializer
         fields = ['id', 'user', 'course', 'score', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
     
@@ -72,7 +88,7 @@ class CourseRatingSerializer(serializers.ModelSerializer):
             return super().create(validated_data)
 
 class CourseDetailSerializer(serializers.ModelSerializer):
-    instructor = UserSerializer(read_only=True)
+    instructor = UserCardSerializer()
     category = CategorySerializer(read_only=True)
     sections = SectionSerializer(many=True, read_only=True)
     students_count = serializers.SerializerMethodField()
@@ -81,10 +97,12 @@ class CourseDetailSerializer(serializers.ModelSerializer):
     ratings_count = serializers.SerializerMethodField()
     user_rating = serializers.SerializerMethodField()
     comments = serializers.SerializerMethodField()
+    cover_image_variants = ImageVariantsField(source='cover_image')
     
     class Meta:
         model = Course
-        fields = ['id', 'title', 'slug', 'instructor', 'category', 'cover_image', 
+        list_serializer_class = BatchListSerializer
+        fields = ['id', 'title', 'slug', 'instructor', 'category', 'cover_image', 'cover_image_variants',
                   'video_url', 'description', 'learning_objectives', 'prerequisites', 
                   'price', 'is_free', 'status', 'created_at', 'updated_at',
                   'sections', 'students_count', 'is_enrolled', 'average_rating',
@@ -96,7 +114,7 @@ class CourseDetailSerializer(serializers.ModelSerializer):
     def get_is_enrolled(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.enrollments.filter(student=request.user).exists()
+            return is_enrolled(request.user, obj)
         return False
     
     def get_ratings_count(self, obj):
@@ -191,7 +209,7 @@ class SectionCreateUpdateSerializer(serializers.ModelSerializer):
     def validate_course(self, value):
         """确保用户是课程的创建者"""
         user = self.context['request'].user
-        if value.instructor != user and not user.is_staff:
+        if not is_owner(user, value):
             raise serializers.ValidationError("您没有权限为此课程添加章节")
         return value
 
@@ -203,6 +221,6 @@ class LessonCreateUpdateSerializer(serializers.ModelSerializer):
     def validate_section(self, value):
         """确保用户是课程的创建者"""
         user = self.context['request'].user
-        if value.course.instructor != user and not user.is_staff:
+        if not is_owner(user, value):
             raise serializers.ValidationError("您没有权限为此章节添加课时")
         return value 
\ No newline at end of file
@@ -1,3 +1,106 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APITestCase
+
+from comments.models import Comment
+from edu_platform.testing import QueryBudgetTestMixin
+
+from .membership import _cache_key, get_enrollment_id, is_enrolled, load_enrollments
+from .models import Category, Course, CourseRating, Enrollment, Lesson, Section
+
+User = get_user_model()
+
+
+class CourseQueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    """课程列表和详情的查询数不随课程、章节和评论数量增长"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user('teacher', 'teacher@example.com')
+        self.student = User.objects.create_user('student', 'student@example.com')
+
+    def create_course(self, index):
+        return Course.objects.create(
+            title=f'课程 {index}', slug=f'course-{index}', instructor=self.instructor,
+            category=Category.objects.create(name=f'分类 {index}'),
+            description='简介', status='published', price=0, is_free=True,
+        )
+
+    def grow_courses(self, size):
+        for index in range(Course.objects.count(), size):
+            course = self.create_course(index)
+            Enrollment.objects.create(course=course, student=self.student)
+
+    def test_list(self):
+        responses = self.assertQueryCountFlat(
+            'course-list', self.grow_courses, lambda: self.client.get('/api/courses/courses/'),
+        )
+        self.assertEqual([response.data['count'] for response in responses], [2, 20])
+
+    def test_list_authenticated(self):
+        self.client.force_authenticate(self.student)
+        self.assertQueryCountFlat(
+            'course-list', self.grow_courses, lambda: self.client.get('/api/courses/courses/'),
+        )
+
+    def test_detail(self):
+        course = self.create_course(0)
+        content_type = ContentType.objects.get_for_model(Course)
+
+        def grow(size):
+            for order in range(course.sections.count(), size):
+                section = Section.objects.create(course=course, title=f'第 {order} 章', order=order)
+                for lesson_order in range(2):
+                    Lesson.objects.create(section=section, title=f'第 {lesson_order} 节', order=lesson_order)
+                user = User.objects.create_user(f'user{order}', f'user{order}@example.com')
+                CourseRating.objects.create(course=course, user=user, score=5)
+                Comment.objects.create(user=user, content='评论', content_type=content_type, object_id=course.pk)
+
+        self.client.force_authenticate(self.student)
+        responses = self.assertQueryCountFlat(
+            'course-detail', grow, lambda: self.client.get(f'/api/courses/courses/{course.pk}/'),
+        )
+        self.assertEqual(len(responses[-1].data['sections']), 20)
+
+
+class MembershipCacheTests(TestCase):
+    """报名关系缓存只在共用缓存时跨请求保存，缓存中没有的课程在拒绝前回查数据库"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.student = User.objects.create_user('student', 'student@example.com')
+        instructor = User.objects.create_user('teacher', 'teacher@example.com')
+        self.course = Course.objects.create(
+            title='课程', slug='course', instructor=instructor, description='简介', price=99,
+        )
+
+    def request_user(self):
+        # 每个请求重新加载用户对象，请求内的结果不会带到下一个请求
+        return User.objects.get(pk=self.student.pk)
+
+    def test_process_local_cache_not_used(self):
+        load_enrollments([self.student.pk])
+        self.assertIsNone(cache.get(_cache_key(self.student.pk)))
+
+    @mock.patch('courses.membership.is_shared', return_value=True)
+    def test_stale_negative_rechecked(self, is_shared):
+        self.assertFalse(is_enrolled(self.request_user(), self.course))
+        self.assertEqual(cache.get(_cache_key(self.student.pk)), {})
+
+        # 绕过信号写入，相当于缓存写回了并发报名之前的旧结果
+        enrollment = Enrollment.objects.bulk_create([Enrollment(student=self.student, course=self.course)])[0]
+        user = self.request_user()
+        self.assertTrue(is_enrolled(user, self.course))
+        self.assertEqual(get_enrollment_id(user, self.course), enrollment.pk)
+        self.assertIsNone(cache.get(_cache_key(self.student.pk)))
 
-# Create your tests here.
+    @mock.patch('courses.membership.is_shared', return_value=True)
+    def test_negative_rechecked_once_per_request(self, is_shared):
+        user = self.request_user()
+        self.assertFalse(is_enrolled(user, self.course))
+        with self.assertNumQueries(0):
+            self.assertFalse(is_enrolled(user, self.course))
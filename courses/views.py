@@ -22,6 +22,8 @@ from .serializers import (
 )
 from comments.models import Comment
 from comments.serializers import CommentSerializer, CommentCreateSerializer
+from .ownership import is_owner
+from .membership import is_enrolled, get_enrollment_id
 
 class IsInstructorOrReadOnly(permissions.BasePermission):
     """自定义权限：只允许课程创建者编辑"""
@@ -29,14 +31,8 @@ class IsInstructorOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         
-        # 课程创建者或管理员可以编辑
-        if hasattr(obj, 'instructor'):
-            return obj.instructor == request.user or request.user.is_staff
-        elif hasattr(obj, 'course'):
-            return obj.course.instructor == request.user or request.user.is_staff
-        elif hasattr(obj, 'section') and hasattr(obj.section, 'course'):
-            return obj.section.course.instructor == request.user or request.user.is_staff
-        return False
+        # 课程创建者或管理员可以编辑，归属讲师由冗余字段直接得到
+        return is_owner(request.user, obj)
 
 class CategoryViewSet(viewsets.ModelViewSet):
     """课程分类视图集"""
@@ -59,7 +55,11 @@ class CourseViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        queryset = Course.objects.all()
+        # 列表卡片嵌套分类，联表一次取出
+        queryset = Course.objects.select_related('category')
+        if self.action == 'retrieve':
+            # 详情嵌套章节和课时，一次预取
+            queryset = queryset.prefetch_related('sections__lessons')
         user = self.request.user
         
         # 判断是否是详情页面的请求（通过URL中是否有pk参数判断）
@@ -71,9 +71,9 @@ class CourseViewSet(viewsets.ModelViewSet):
                 # 如果是获取单个课程详情，允许教师查看任何状态的自己的课程
                 course_id = self.kwargs.get('pk')
                 # 先尝试看是否是教师自己的课程
-                teacher_course = queryset.filter(instructor=user, id=course_id).first()
+                teacher_course = queryset.filter(instructor=user, id=course_id).exists()
                 if teacher_course:
-                    return Course.objects.filter(id=course_id)
+                    return queryset.filter(id=course_id)
                 # 如果不是自己的课程，则只能看已发布的
                 return queryset.filter(status='published')
             else:
@@ -134,7 +134,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # 检查是否已报名
-        if Enrollment.objects.filter(student=user, course=course).exists():
+        if is_enrolled(user, course):
             return Response({"detail": "您已经报名了此课程"}, status=status.HTTP_400_BAD_REQUEST)
         
         # 如果是付费课程，这里应该有支付逻辑
@@ -166,7 +166,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         progress_list = LessonProgress.objects.filter(enrollment=enrollment)
         
         # 计算总进度
-        total_lessons = Lesson.objects.filter(section__course=course).count()
+        total_lessons = Lesson.objects.filter(course=course).count()
         completed_lessons = progress_list.filter(status='completed').count()
         
         if total_lessons > 0:
@@ -240,7 +240,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # 检查用户是否已报名此课程
-        if not Enrollment.objects.filter(student=user, course=course).exists():
+        if not is_enrolled(user, course):
             return Response({"detail": "您需要先报名此课程才能评分"}, 
                             status=status.HTTP_400_BAD_REQUEST)
         
@@ -290,7 +290,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         
         elif request.method == 'POST':
             # 检查用户是否已报名此课程
-            if not Enrollment.objects.filter(student=request.user, course=course).exists() and not course.instructor == request.user:
+            if not is_enrolled(request.user, course) and not course.instructor_id == request.user.id:
                 return Response({"detail": "您需要先报名此课程才能评论"}, 
                                 status=status.HTTP_400_BAD_REQUEST)
             
@@ -350,15 +350,14 @@ class LessonViewSet(viewsets.ModelViewSet):
         lesson = self.get_object()
         user = request.user
         
-        # 检查是否已报名课程
-        try:
-            enrollment = Enrollment.objects.get(student=user, course=lesson.section.course)
-        except Enrollment.DoesNotExist:
+        # 检查是否已报名课程（从报名缓存中取出报名记录ID）
+        enrollment_id = get_enrollment_id(user, lesson.course_id)
+        if enrollment_id is None:
             return Response({"detail": "您还未报名此课程"}, status=status.HTTP_400_BAD_REQUEST)
         
         # 获取或创建进度记录
         progress, created = LessonProgress.objects.get_or_create(
-            enrollment=enrollment,
+            enrollment_id=enrollment_id,
             lesson=lesson,
             defaults={
                 'status': 'not_started',
@@ -383,16 +382,18 @@ class LessonViewSet(viewsets.ModelViewSet):
         progress.save()
         
         # 检查是否所有课时都已完成，如果是，则更新报名状态为已完成
-        total_lessons = Lesson.objects.filter(section__course=lesson.section.course).count()
+        total_lessons = Lesson.objects.filter(course_id=lesson.course_id).count()
         completed_lessons = LessonProgress.objects.filter(
-            enrollment=enrollment,
+            enrollment_id=enrollment_id,
             status='completed'
         ).count()
         
         if total_lessons > 0 and completed_lessons == total_lessons:
-            enrollment.status = 'completed'
-            enrollment.completed_at = timezone.now()
-            enrollment.save()
+            enrollment = Enrollment.objects.get(pk=enrollment_id)
+            if enrollment.status != 'completed':
+                enrollment.status = 'completed'
+                enrollment.completed_at = timezone.now()
+                enrollment.save()
         
         return Response(LessonProgressSerializer(progress).data)
 
@@ -9,17 +9,25 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-import videos.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'edu_platform.settings')
 
+# 先初始化 Django，再导入会加载模型的路由和消费者
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import AllowedHostsOriginValidator
+from edu_platform.channels_auth import JWTAuthMiddlewareStack
+import live.routing
+import videos.routing
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
-        URLRouter(
-            videos.routing.websocket_urlpatterns
+    "http": django_asgi_app,
+    "websocket": AllowedHostsOriginValidator(
+        JWTAuthMiddlewareStack(
+            URLRouter(
+                live.routing.websocket_urlpatterns + videos.routing.websocket_urlpatterns
+            )
         )
     ),
 })
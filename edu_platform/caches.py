@@ -0,0 +1,35 @@
+"""
+缓存配置
+
+CACHE_URL 选择默认缓存：
+
+- 为空或 locmem://：Django 自带的进程内内存缓存，只在单个进程内有效，用于开发、测试和单进程部署；
+- redis://host:6379/1（或 rediss://）：Django 自带的 RedisCache，多进程、多节点部署使用。
+
+直播聊天的最近消息缓冲（live.chat_buffer）和报名关系缓存（courses.membership）需要所有进程看到同一份数据和失效，
+缓存只在进程内有效时不启用，改为查数据库。
+RedisCache 需要安装 redis。
+本模块在 settings 中导入，cache_config 不能依赖 Django 的其他部分。
+"""
+from urllib.parse import urlsplit
+
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+REDIS_BACKEND = 'django.core.cache.backends.redis.RedisCache'
+# 只在本进程内有效的缓存后端
+LOCAL_BACKENDS = (LOCMEM_BACKEND, 'django.core.cache.backends.dummy.DummyCache')
+
+
+def cache_config(url=''):
+    """把缓存地址转换为一项 CACHES 配置"""
+    scheme = urlsplit(url).scheme or 'locmem'
+    if scheme == 'locmem':
+        return {'BACKEND': LOCMEM_BACKEND, 'LOCATION': 'edu-platform'}
+    if scheme in ('redis', 'rediss'):
+        return {'BACKEND': REDIS_BACKEND, 'LOCATION': url}
+    raise ValueError(f'不支持的缓存地址：{url}')
+
+
+def is_shared(alias='default'):
+    """缓存是否由所有进程共用（本进程写入或删除的键其他进程立即可见）"""
+    from django.conf import settings
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_BACKENDS
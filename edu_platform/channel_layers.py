@@ -0,0 +1,53 @@
+"""
+通道层配置
+
+CHANNEL_LAYER_URL 选择 WebSocket 广播使用的通道层：
+
+- 为空或 memory://：channels 自带的进程内内存通道层，只在单个进程内有效，用于开发、测试和单进程部署；
+- redis://host:6379/0（或 rediss://）：channels_redis 的 RedisChannelLayer，多进程、多节点部署使用，
+  群发时按成员逐个写入各自的队列；
+- redis+pubsub://host:6379/0：channels_redis 的 RedisPubSubChannelLayer，群发只需一次 PUBLISH，
+  由各进程自己分发给本地连接，大直播间的群发开销与人数无关。
+
+各进程的直播间中继通道（live.relay，名称以 relay 开头）汇总了本进程所有直播间的帧，积压上限为普通连接的 RELAY_CAPACITY_FACTOR 倍。
+
+Redis 通道层需要安装 channels-redis。各后端在不同直播间人数下的群发延迟和吞吐量可用
+bench_channel_layer 命令测量。本模块在 settings 中导入，不能依赖 Django 的其他部分。
+"""
+from urllib.parse import urlsplit, urlunsplit
+
+MEMORY_BACKEND = 'channels.layers.InMemoryChannelLayer'
+REDIS_BACKEND = 'channels_redis.core.RedisChannelLayer'
+REDIS_PUBSUB_BACKEND = 'channels_redis.pubsub.RedisPubSubChannelLayer'
+RELAY_CHANNELS = 'relay*'
+RELAY_CAPACITY_FACTOR = 10
+
+
+def layer_config(url='', capacity=100, expiry=60):
+    """把通道层地址转换为一项 CHANNEL_LAYERS 配置；capacity 为每个连接最多积压的消息数，expiry 为消息过期秒数"""
+    parts = urlsplit(url)
+    scheme = parts.scheme or 'memory'
+    capacities = {'capacity': capacity, 'channel_capacity': {RELAY_CHANNELS: capacity * RELAY_CAPACITY_FACTOR}}
+    if scheme == 'memory':
+        return {'BACKEND': MEMORY_BACKEND, 'CONFIG': {**capacities, 'expiry': expiry}}
+    if scheme in ('redis', 'rediss'):
+        return {
+            'BACKEND': REDIS_BACKEND,
+            'CONFIG': {'hosts': [url], **capacities, 'expiry': expiry},
+        }
+    if scheme == 'redis+pubsub':
+        return {
+            'BACKEND': REDIS_PUBSUB_BACKEND,
+            'CONFIG': {'hosts': [urlunsplit(parts._replace(scheme='redis'))]},
+        }
+    raise ValueError(f'不支持的通道层地址：{url}')
+
+
+def describe(config):
+    """配置的简短说明（不含密码），用于日志和测量结果"""
+    hosts = config.get('CONFIG', {}).get('hosts')
+    name = config['BACKEND'].rsplit('.', 1)[-1]
+    if not hosts:
+        return name
+    parts = urlsplit(hosts[0])
+    return f'{name}({parts.hostname}:{parts.port or 6379})'
@@ -0,0 +1,52 @@
+"""
+WebSocket 的 JWT 认证
+
+浏览器的 WebSocket 无法设置 Authorization 头，前端把访问令牌放在查询参数中：
+    ws://host/ws/live/1/?token=<access token>
+令牌无效或缺失时退回会话认证（管理后台等已登录的页面），仍未登录则 scope['user'] 为 AnonymousUser。
+"""
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return None
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if user_id is None:
+        return None
+    User = get_user_model()
+    user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """从查询参数 token 中读取 simplejwt 访问令牌，设置 scope['user']"""
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        raw_token = (query.get('token') or [None])[0]
+        user = await get_user_for_token(raw_token) if raw_token else None
+        if user is not None:
+            scope = dict(scope, user=user)
+        elif 'user' not in scope:
+            scope = dict(scope, user=AnonymousUser())
+        return await super().__call__(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    """JWT 优先，其次会话认证"""
+    return AuthMiddlewareStack(JWTAuthMiddleware(inner))
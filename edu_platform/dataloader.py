@@ -0,0 +1,129 @@
+"""
+请求级批量加载（DataLoader）
+
+列表序列化时，SerializerMethodField 不再逐行查询，而是通过 batch_load() 登记需要的键并返回占位对象；
+整页渲染完成后由 BatchListSerializer 统一解析，同一个加载器登记的所有键合并为一次分组查询。
+单个对象序列化（不在批量列表中）时 batch_load() 立即查询，响应结构不变。
+
+用法：
+    def get_like_count(self, obj):
+        return batch_load(self, 'comments.like_count', like_counts, obj.pk, default=0)
+
+批量函数接收键的集合，返回 {键: 值}，缺失的键取 default。
+"""
+from rest_framework import serializers
+
+# 加载器挂在请求对象上（没有请求时挂在序列化器上下文中），同一请求内共享
+REGISTRY_ATTR = '_dataloaders'
+
+
+class Deferred:
+    """尚未解析的值"""
+    __slots__ = ('loader', 'key', 'then')
+
+    def __init__(self, loader, key, then=None):
+        self.loader = loader
+        self.key = key
+        self.then = then
+
+    def resolve(self):
+        value = self.loader.result(self.key)
+        if self.then is not None:
+            value = self.then(value)
+        return value
+
+
+class DataLoader:
+    """按键登记、批量取值并缓存结果的加载器"""
+
+    def __init__(self, batch_fn, default=None):
+        self.batch_fn = batch_fn
+        self.default = default
+        self._pending = set()
+        self._results = {}
+
+    def load(self, key, then=None):
+        """登记一个键，返回占位对象"""
+        if key not in self._results:
+            self._pending.add(key)
+        return Deferred(self, key, then)
+
+    def prime(self, keys):
+        """批量登记多个键"""
+        self._pending.update(key for key in keys if key not in self._results)
+
+    def dispatch(self):
+        """把登记的键合并为一次批量查询"""
+        keys, self._pending = self._pending, set()
+        if not keys:
+            return
+        results = self.batch_fn(keys)
+        for key in keys:
+            self._results[key] = results.get(key, self.default)
+
+    def result(self, key):
+        if key not in self._results:
+            self._pending.add(key)
+            self.dispatch()
+        return self._results[key]
+
+
+def get_loader(context, name, batch_fn, default=None):
+    """返回请求内指定名称的加载器，不存在时创建"""
+    request = context.get('request')
+    if request is not None:
+        registry = getattr(request, REGISTRY_ATTR, None)
+        if registry is None:
+            registry = {}
+            setattr(request, REGISTRY_ATTR, registry)
+    else:
+        registry = context.setdefault(REGISTRY_ATTR, {})
+    loader = registry.get(name)
+    if loader is None:
+        loader = registry[name] = DataLoader(batch_fn, default)
+    return loader
+
+
+def in_batch(serializer):
+    """序列化器是否处于批量列表中（其结果会由列表统一解析）"""
+    node = serializer
+    while node is not None:
+        if isinstance(node, BatchListSerializer):
+            return True
+        node = node.parent
+    return False
+
+
+def batch_load(serializer, name, batch_fn, key, default=None, then=None):
+    """在序列化器中按键取值：批量列表中返回占位对象，否则立即查询"""
+    deferred = get_loader(serializer.context, name, batch_fn, default).load(key, then)
+    if in_batch(serializer):
+        return deferred
+    return deferred.resolve()
+
+
+def resolve_deferred(data):
+    """遍历序列化结果，把占位对象原地替换为实际值"""
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, list):
+        items = enumerate(data)
+    else:
+        return data
+    for key, value in items:
+        if isinstance(value, Deferred):
+            data[key] = value.resolve()
+        elif isinstance(value, (dict, list)):
+            resolve_deferred(value)
+    return data
+
+
+class BatchListSerializer(serializers.ListSerializer):
+    """整页渲染完成后统一解析占位对象的列表序列化器，通过 Meta.list_serializer_class 启用"""
+
+    def to_representation(self, data):
+        ret = super().to_representation(data)
+        # 嵌套在外层批量列表中时交给最外层统一解析
+        if self.parent is not None and in_batch(self.parent):
+            return ret
+        return resolve_deferred(ret)
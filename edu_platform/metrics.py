@@ -0,0 +1,223 @@
+"""
+请求性能指标
+
+MetricsMiddleware 按解析后的 URL 名称记录每个请求的 SQL 查询数、数据库耗时、序列化耗时、
+总耗时和响应大小，写入进程内直方图，并通过仅管理员可访问的 /api/metrics/ 以 Prometheus 文本格式导出。
+指标保存在各进程内存中，多进程部署时由 Prometheus 分别抓取各实例。
+
+QUERY_BUDGETS 设置声明各接口的查询数上限，超出时记录警告；测试中可用 edu_platform.testing 断言。
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from rest_framework import serializers
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+logger = logging.getLogger(__name__)
+
+# 各直方图的桶上界
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# 未匹配到 URL 的请求（404 等）统一记在这个名称下，避免标签无限增长
+UNRESOLVED = 'unresolved'
+
+
+class Histogram:
+    """累积直方图"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """按指标名和接口名保存直方图和计数器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, name, help_text, buckets):
+        self._metrics[name] = (help_text, buckets, {})
+
+    def register_counter(self, name, help_text):
+        """计数器没有桶，series 中直接保存累计值"""
+        self._metrics[name] = (help_text, None, {})
+
+    def increment(self, name, endpoint, amount=1):
+        series = self._metrics[name][2]
+        with self._lock:
+            series[endpoint] = series.get(endpoint, 0) + amount
+
+    def observe(self, name, endpoint, value):
+        help_text, buckets, series = self._metrics[name]
+        with self._lock:
+            histogram = series.get(endpoint)
+            if histogram is None:
+                histogram = series[endpoint] = Histogram(buckets)
+            histogram.observe(value)
+
+    def get(self, name, endpoint):
+        return self._metrics[name][2].get(endpoint)
+
+    def reset(self):
+        with self._lock:
+            for help_text, buckets, series in self._metrics.values():
+                series.clear()
+
+    def render(self):
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            for name, (help_text, buckets, series) in self._metrics.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {"histogram" if buckets else "counter"}')
+                for endpoint in sorted(series):
+                    label = endpoint.replace('\\', '\\\\').replace('"', '\\"')
+                    if buckets is None:
+                        lines.append(f'{name}{{endpoint="{label}"}} {series[endpoint]}')
+                        continue
+                    histogram = series[endpoint]
+                    for upper, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{endpoint="{label}",le="{upper}"}} {count}')
+                    lines.append(f'{name}_bucket{{endpoint="{label}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{endpoint="{label}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{endpoint="{label}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+registry.register('edu_request_queries', '每个请求执行的 SQL 查询数', QUERY_BUCKETS)
+registry.register('edu_request_db_seconds', '每个请求的数据库耗时（秒）', SECONDS_BUCKETS)
+registry.register('edu_request_serializer_seconds', '每个请求的序列化耗时（秒，含其中的查询）', SECONDS_BUCKETS)
+registry.register('edu_request_duration_seconds', '每个请求的总耗时（秒）', SECONDS_BUCKETS)
+registry.register('edu_response_size_bytes', '响应体大小（字节）', BYTES_BUCKETS)
+
+
+class RequestStats:
+    """单个请求的统计数据"""
+    __slots__ = ('queries', 'db_time', 'serializer_time', 'serializer_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+
+_current_stats = contextvars.ContextVar('edu_request_stats', default=None)
+
+
+def current_stats():
+    """返回当前请求的统计数据，不在请求中时返回 None"""
+    return _current_stats.get()
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    stats = _current_stats.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - start
+
+
+def _timed_data(prop):
+    """包装序列化器的 data 属性，只统计最外层序列化器的耗时"""
+    def data(self):
+        stats = _current_stats.get()
+        if stats is None:
+            return prop.fget(self)
+        stats.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            stats.serializer_depth -= 1
+            if stats.serializer_depth == 0:
+                stats.serializer_time += time.perf_counter() - start
+    data._metrics_wrapped = True
+    return property(data)
+
+
+def install_serializer_timing():
+    """给 DRF 序列化器的 data 属性加上计时，重复调用无副作用"""
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        prop = cls.__dict__['data']
+        if not getattr(prop.fget, '_metrics_wrapped', False):
+            cls.data = _timed_data(prop)
+
+
+def endpoint_name(request):
+    """请求对应的接口名称：带命名空间的 URL 名称"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return UNRESOLVED
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """记录每个请求的查询数、耗时和响应大小"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+        self.budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        if self.enabled:
+            install_serializer_timing()
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_query_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        duration = time.perf_counter() - start
+
+        endpoint = endpoint_name(request)
+        registry.observe('edu_request_queries', endpoint, stats.queries)
+        registry.observe('edu_request_db_seconds', endpoint, stats.db_time)
+        registry.observe('edu_request_serializer_seconds', endpoint, stats.serializer_time)
+        registry.observe('edu_request_duration_seconds', endpoint, duration)
+        if not response.streaming:
+            registry.observe('edu_response_size_bytes', endpoint, len(response.content))
+
+        budget = self.budgets.get(endpoint)
+        if budget is not None and stats.queries > budget:
+            logger.warning('%s 执行了 %d 次查询，超出预算 %d：%s', endpoint, stats.queries, budget, request.path)
+        return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """导出 Prometheus 格式的请求指标（仅管理员）"""
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
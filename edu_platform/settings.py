@@ -14,6 +14,9 @@ from pathlib import Path
 import os
 from datetime import timedelta
 
+from edu_platform.caches import cache_config
+from edu_platform.channel_layers import layer_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +48,7 @@ INSTALLED_APPS = [
     'corsheaders',
     'drf_yasg',
     'rest_framework.authtoken',
+    'channels',
     
     # 自定义应用
     'accounts',
@@ -57,6 +61,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'edu_platform.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -86,6 +91,18 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'edu_platform.wsgi.application'
+# WebSocket（直播聊天）只能通过 ASGI 服务器提供，部署时使用 daphne -b 0.0.0.0 -p 8000 edu_platform.asgi:application（见 README）
+ASGI_APPLICATION = 'edu_platform.asgi.application'
+
+# 通道层：默认为进程内的内存通道层，只在单个进程内有效；多进程、多节点部署设置为
+# redis://host:6379/0 或 redis+pubsub://host:6379/0（需要安装 channels-redis），见 edu_platform.channel_layers
+CHANNEL_LAYER_URL = os.environ.get('CHANNEL_LAYER_URL', '')
+# 每个连接最多积压的消息数和消息过期秒数（发布订阅通道层不使用）
+CHANNEL_LAYER_CAPACITY = int(os.environ.get('CHANNEL_LAYER_CAPACITY', 100))
+CHANNEL_LAYER_EXPIRY = int(os.environ.get('CHANNEL_LAYER_EXPIRY', 60))
+CHANNEL_LAYERS = {
+    'default': layer_config(CHANNEL_LAYER_URL, CHANNEL_LAYER_CAPACITY, CHANNEL_LAYER_EXPIRY),
+}
 
 
 # Database
@@ -99,6 +116,32 @@ DATABASES = {
 }
 
 
+# 缓存：默认为进程内的内存缓存，只在单个进程内有效；多进程、多节点部署设置为 redis://host:6379/1
+# （需要安装 redis），否则聊天消息缓冲和报名关系缓存不启用，见 edu_platform.caches
+CACHE_URL = os.environ.get('CACHE_URL', '')
+CACHES = {
+    'default': cache_config(CACHE_URL),
+}
+
+# 报名关系缓存有效期（秒），只在共用缓存时生效
+ENROLLMENT_CACHE_TIMEOUT = 300
+
+# 用户名片缓存有效期（秒），设为 0 关闭缓存
+USER_CARD_CACHE_TIMEOUT = 60
+
+# 请求指标（查询数、耗时、响应大小），通过 /api/metrics/ 导出
+METRICS_ENABLED = True
+
+# 各接口（URL 名称）的 SQL 查询数上限，超出时记录警告，测试中用 edu_platform.testing 断言
+QUERY_BUDGETS = {
+    'course-list': 10,
+    'course-detail': 20,
+    'comment-list': 10,
+    'notification-list': 10,
+    'live-events-list': 10,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -139,6 +182,87 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# 分片上传：分片暂存目录（不对外提供访问）、默认/最小/最大分片大小、未完成会话的保留时间
+UPLOAD_SESSION_DIR = os.path.join(BASE_DIR, 'upload_sessions')
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+UPLOAD_PART_MIN_SIZE = 1024 * 1024
+UPLOAD_PART_MAX_SIZE = 64 * 1024 * 1024
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+
+# 无引用的媒体文件（cas/ 下按内容寻址保存）在删除前保留的宽限期
+MEDIA_BLOB_GC_GRACE = timedelta(hours=24)
+
+# 视频后台处理（run_media_worker）：媒体工具实现，没有安装 ffmpeg 时可设为 videos.media_tools.FakeMediaTool
+MEDIA_TOOL = os.environ.get('MEDIA_TOOL', 'videos.media_tools.FFmpegTool')
+MEDIA_WORKER_CONCURRENCY = 2
+MEDIA_JOB_MAX_ATTEMPTS = 3
+MEDIA_JOB_RETRY_DELAY = 30  # 秒，第 n 次重试等待 RETRY_DELAY * 2^(n-1)
+
+# 视频文件和 HLS 分片的发送方式：django（FileResponse，支持 Range）、nginx（X-Accel-Redirect）、xsendfile（X-Sendfile）
+# nginx 方式需要配置 internal location，例如 location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+MEDIA_SERVE_BACKEND = os.environ.get('MEDIA_SERVE_BACKEND', 'django')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+PLAYBACK_TOKEN_MAX_AGE = 6 * 3600  # 播放地址有效期（秒）
+
+# 上传图片的 WebP 尺寸变体 {变体名: (宽, 高, 裁剪方式)}，由 run_media_worker 生成，见 edu_platform.upload.images
+IMAGE_VARIANTS = {
+    'card': (480, 270, 'cover'),
+    'card@2x': (960, 540, 'cover'),
+    'detail': (1280, 720, 'fit'),
+    'avatar': (96, 96, 'cover'),
+    'avatar@2x': (192, 192, 'cover'),
+}
+
+# 观看覆盖位图每一位对应的秒数（修改后已有位图需重新上报才能对齐），见 videos.coverage
+WATCH_COVERAGE_BUCKET_SECONDS = 10
+# 观看心跳区间结束点的上限（秒），未探测出时长的视频据此限制位图大小
+MAX_VIDEO_DURATION = 24 * 3600
+
+# 直播聊天：单条消息最大长度、补齐接口单次返回的消息数
+LIVE_CHAT_MAX_LENGTH = 500
+LIVE_CHAT_CATCHUP_LIMIT = 100
+# 每个直播间缓存的最近消息数（应大于 LIVE_CHAT_CATCHUP_LIMIT），设为 0 关闭缓冲
+LIVE_CHAT_BUFFER_SIZE = 200
+LIVE_CHAT_BUFFER_TIMEOUT = 6 * 3600
+# WebSocket 聊天消息批量写入：攒够条数或等待时间（秒）后写入一次；队列上限及队列满时发送方最多等待的秒数
+LIVE_CHAT_WRITE_BATCH_SIZE = 200
+LIVE_CHAT_WRITE_INTERVAL = 0.2
+LIVE_CHAT_WRITE_MAX_PENDING = 2000
+LIVE_CHAT_WRITE_TIMEOUT = 2
+# 聊天归档（archive_live_chat）：直播结束多久（秒）后归档，以及归档文件中每个压缩段的消息数
+LIVE_CHAT_ARCHIVE_AFTER = 7 * 24 * 3600
+LIVE_CHAT_ARCHIVE_CHUNK = 500
+# 直播间广播 tick（秒）：tick 内的聊天消息和进出变化合并为一帧
+LIVE_BROADCAST_INTERVAL = 0.15
+# 直播间分片数：每个直播间的帧经这么多个分片组中继到各进程（见 live.relay），多节点 Redis 部署时可适当调大
+LIVE_ROOM_SHARDS = 4
+# 直播间在线状态：回写观看人数、向讲师推送快照的周期（秒），以及心跳超时（秒）
+LIVE_PRESENCE_INTERVAL = 5
+LIVE_PRESENCE_TIMEOUT = 75
+# 发言限流：每秒补充的令牌数和最多积攒的令牌数
+LIVE_CHAT_RATE = 1.0
+LIVE_CHAT_BURST = 5
+# 客户端单帧上限（字节）；每个连接最多积压的下发帧数，以及积压满时的处理：drop_oldest 或 disconnect
+LIVE_WS_MAX_FRAME_BYTES = 4096
+LIVE_WS_SEND_QUEUE = 64
+LIVE_WS_SLOW_POLICY = 'drop_oldest'
+# 直播定时任务（run_live_scheduler）：开播前多久发送提醒、是否到点自动开始、计划结束后多久自动结束（秒）
+LIVE_REMINDER_LEAD = 15 * 60
+LIVE_AUTO_START = True
+LIVE_AUTO_END_GRACE = 30 * 60
+# 定时表每次从数据库装入未来多长时间（秒）内最多多少场直播，以及重新装入的间隔（秒）
+LIVE_SCHEDULER_HORIZON = 3600
+LIVE_SCHEDULER_BATCH_SIZE = 500
+LIVE_SCHEDULER_REFRESH = 60
+
+# HLS 分片打包：分片时长（秒）和码率版本 (名称, 高度, 视频码率 kbps)，高于源视频分辨率的版本会被跳过
+HLS_SEGMENT_SECONDS = 6
+HLS_RENDITIONS = (
+    ('360p', 360, 800),
+    ('720p', 720, 2800),
+    ('1080p', 1080, 5000),
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,74 @@
+"""
+测试辅助工具
+
+按 settings.QUERY_BUDGETS 中声明的各接口查询数上限断言请求的查询次数：
+
+    class CourseApiTests(QueryBudgetTestMixin, APITestCase):
+        def test_list(self):
+            with self.assertQueryBudget('course-list'):
+                self.client.get('/api/courses/courses/')
+
+WebSocket 测试使用进程内通道层，部署时配置的 Redis 通道层（CHANNEL_LAYER_URL）不影响测试：
+
+    @override_settings(CHANNEL_LAYERS=TEST_CHANNEL_LAYERS)
+    class LiveChatTests(TransactionTestCase): ...
+"""
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from edu_platform.channel_layers import layer_config
+
+TEST_CHANNEL_LAYERS = {'default': layer_config()}
+
+
+def get_query_budget(endpoint):
+    """返回接口声明的查询数上限，未声明时抛出 KeyError"""
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    if endpoint not in budgets:
+        raise KeyError(f"QUERY_BUDGETS 中没有声明 {endpoint} 的查询预算")
+    return budgets[endpoint]
+
+
+@contextmanager
+def assert_query_budget(endpoint, budget=None, using=connection):
+    """断言代码块内的查询次数不超过接口的查询预算"""
+    if budget is None:
+        budget = get_query_budget(endpoint)
+    with CaptureQueriesContext(using) as context:
+        yield context
+    executed = len(context.captured_queries)
+    if executed > budget:
+        queries = '\n'.join(
+            f'{index}. {query["sql"]}' for index, query in enumerate(context.captured_queries, start=1)
+        )
+        raise AssertionError(f"{endpoint} 执行了 {executed} 次查询，超出预算 {budget}：\n{queries}")
+
+
+class QueryBudgetTestMixin:
+    """TestCase 混入，提供 assertQueryBudget"""
+
+    def assertQueryBudget(self, endpoint, budget=None, using=connection):
+        return assert_query_budget(endpoint, budget, using)
+
+    def assertQueryCountFlat(self, endpoint, grow, request, sizes=(2, 20)):
+        """
+        依次用 grow(规模) 把数据补到 sizes 中的各个规模并执行 request()，断言每次的查询次数都在接口的预算之内，
+        且不随数据量变化；返回各次的响应。先执行一次预热进程内的缓存（如 ContentType），
+        之后每次执行前清空缓存，各规模都从冷缓存开始
+        """
+        grow(sizes[0])
+        request()
+        counts, responses = [], []
+        for size in sizes:
+            grow(size)
+            cache.clear()
+            with self.assertQueryBudget(endpoint) as context:
+                responses.append(request())
+            counts.append(len(context.captured_queries))
+        if len(set(counts)) > 1:
+            raise AssertionError(f"{endpoint} 的查询次数随数据量变化：{dict(zip(sizes, counts))}")
+        return responses
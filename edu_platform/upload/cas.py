@@ -0,0 +1,198 @@
+"""
+按内容寻址的媒体存储
+
+上传的文件以 SHA-256 命名保存在 cas/<前两位>/<三四位>/<sha256><扩展名>，同样内容只存一份，
+重复上传直接返回已有地址。上传只读取一次：先流式写入临时名称 uploads/tmp/ 并同时计算 SHA-256，
+再移动到按内容寻址的名称；内容已存在时删除临时文件。文件名由内容决定、永不改变，可以配置长期的 CDN / 浏览器缓存。
+
+课程封面、视频文件、视频缩略图、用户头像，以及保存了上传地址的课程视频和直播预录视频引用这些文件时，
+由 upload.models 中的信号维护 MediaBlob.ref_count；引用次数为 0 且超过宽限期的文件由 gc_media_blobs 命令删除。
+"""
+import os
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .streaming import save_streaming
+
+CAS_PREFIX = 'cas/'
+# 计算出 SHA-256 之前上传写入的临时位置
+TEMP_PREFIX = 'uploads/tmp/'
+VARIANT_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+
+# 引用媒体文件的模型字段：文件字段保存存储路径，地址字段保存上传接口返回的完整地址（见 reference_name）
+REFERENCE_FIELDS = {
+    'courses.Course': ('cover_image', 'video_url'),
+    'videos.Video': ('file', 'thumbnail', 'sprite'),
+    'accounts.User': ('avatar',),
+    'live.LiveEvent': ('pre_recorded_video_url',),
+}
+# 引用字段所在模型上表示归属用户的字段
+REFERENCE_OWNERS = {
+    'courses.Course': 'instructor',
+    'videos.Video': 'owner',
+    'accounts.User': 'pk',
+    'live.LiveEvent': 'instructor',
+}
+# 只能通过带播放令牌的地址访问的字段（课时视频），被引用的文件不公开发送
+PROTECTED_FIELDS = {
+    'videos.Video': ('file',),
+}
+
+
+def blob_name(sha256, ext):
+    return f'{CAS_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}{ext.lower()}'
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(CAS_PREFIX)
+
+
+def reference_name(value):
+    """
+    字段值引用的存储路径：文件字段取 name；地址字段保存的是 <MEDIA_URL>cas/... 的完整地址（可带域名和查询参数），
+    取出其中的存储路径
+    """
+    name = getattr(value, 'name', value) or ''
+    marker = settings.MEDIA_URL + CAS_PREFIX
+    if marker in name:
+        name = CAS_PREFIX + name.split(marker, 1)[1].split('?', 1)[0].split('#', 1)[0]
+    return name
+
+
+def find_blob(sha256):
+    from .models import MediaBlob
+    return MediaBlob.objects.filter(sha256=sha256.lower()).first()
+
+
+def store_upload(upload, storage=None):
+    """保存上传文件，返回 (MediaBlob, 是否新写入)；内容已存在时不保留本次写入的文件"""
+    storage = storage or default_storage
+    ext = os.path.splitext(upload.name)[1].lower()
+    saved = save_streaming(upload, f'{TEMP_PREFIX}{uuid.uuid4().hex}{ext}', storage=storage)
+    try:
+        blob = find_blob(saved.sha256)
+        if blob is not None:
+            storage.delete(saved.path)
+            return blob, False
+        name = move_file(saved.path, blob_name(saved.sha256, ext), storage)
+    except BaseException:
+        if storage.exists(saved.path):
+            storage.delete(saved.path)
+        raise
+    return register_blob(saved.sha256, name, saved.size, getattr(upload, 'content_type', '') or '', storage)
+
+
+def move_file(source, name, storage=None):
+    """
+    把存储中的文件移动到 name，返回最终的文件名。存储为本地文件系统时直接重命名（同名文件为同样内容，直接覆盖），
+    否则重新写入后删除原文件
+    """
+    storage = storage or default_storage
+    try:
+        source_path, dest_path = storage.path(source), storage.path(name)
+    except NotImplementedError:
+        source_path = dest_path = None
+
+    if dest_path is not None:
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        os.replace(source_path, dest_path)
+        return name
+
+    # 上次写入后、登记前中断时留下的同名文件
+    if storage.exists(name):
+        storage.delete(name)
+    with storage.open(source, 'rb') as f:
+        saved = storage.save(name, File(f, name=name))
+    storage.delete(source)
+    return saved
+
+
+def register_blob(sha256, name, size, content_type, storage=None):
+    """登记已写入存储的文件；并发上传同样内容时保留先登记的一份，删除本次写入的文件"""
+    from .models import MediaBlob
+
+    storage = storage or default_storage
+    try:
+        with transaction.atomic():
+            blob = MediaBlob.objects.create(
+                sha256=sha256,
+                path=name,
+                size=size,
+                content_type=content_type,
+                unreferenced_since=timezone.now(),
+                # 上传的图片由 run_media_worker 生成尺寸变体
+                variants_status='pending' if content_type in VARIANT_CONTENT_TYPES else 'none',
+            )
+        return blob, True
+    except IntegrityError:
+        storage.delete(name)
+        return MediaBlob.objects.get(sha256=sha256), False
+
+
+def add_reference(name, delta):
+    """调整媒体文件的引用次数"""
+    from .models import MediaBlob
+
+    if not is_blob_name(name):
+        return
+    blobs = MediaBlob.objects.filter(path=name)
+    if delta > 0:
+        blobs.update(ref_count=F('ref_count') + delta, unreferenced_since=None)
+    else:
+        blobs.filter(ref_count__gte=-delta).update(ref_count=F('ref_count') + delta)
+        blobs.filter(ref_count=0, unreferenced_since__isnull=True).update(unreferenced_since=timezone.now())
+
+
+def is_protected(name):
+    """文件是否被受保护的字段引用"""
+    for label, fields in PROTECTED_FIELDS.items():
+        model = apps.get_model(label)
+        for field in fields:
+            if model._base_manager.filter(**{field: name}).exists():
+                return True
+    return False
+
+
+def has_reference(user, name):
+    """
+    用户是否已经持有该文件：自己的课程、视频、头像或直播引用了它，或者自己上传并校验过同样的内容。
+    只知道 SHA-256 不能证明持有文件，其他用户不能据此拿到文件地址（管理员除外）
+    """
+    from .models import UploadSession
+
+    if not user or not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    if UploadSession.objects.filter(user=user, status='completed', path=name).exists():
+        return True
+    for label, fields in REFERENCE_FIELDS.items():
+        model = apps.get_model(label)
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{field: name}) | Q(**{f'{field}__contains': settings.MEDIA_URL + name})
+        if model._base_manager.filter(condition, **{REFERENCE_OWNERS[label]: user.pk}).exists():
+            return True
+    return False
+
+
+def count_references():
+    """扫描所有引用字段，返回 {存储路径: 引用次数}"""
+    counts = {}
+    for label, fields in REFERENCE_FIELDS.items():
+        model = apps.get_model(label)
+        for field in fields:
+            values = model._base_manager.filter(
+                Q(**{f'{field}__startswith': CAS_PREFIX}) | Q(**{f'{field}__contains': settings.MEDIA_URL + CAS_PREFIX})
+            ).values_list(field, flat=True)
+            for value in values.iterator():
+                name = reference_name(value)
+                counts[name] = counts.get(name, 0) + 1
+    return counts
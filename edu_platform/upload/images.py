@@ -0,0 +1,168 @@
+"""
+图片尺寸变体
+
+通过 upload_image 上传的图片登记为 MediaBlob 后 variants_status 置为 pending，
+由 run_media_worker 的进程池领取，用 Pillow 生成各尺寸的 WebP 变体：
+    variants/<sha256>/<变体名>.webp
+
+变体由原图内容决定，路径以原图 SHA-256 命名，内容不会改变，可以长期缓存；同样的图片重复上传时直接复用。
+序列化器通过 ImageVariantsField 输出 {变体名: 地址}，变体尚未生成时为 None，前端退回原图。
+"""
+import time
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.utils import timezone
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from edu_platform.dataloader import batch_load
+from .cas import is_blob_name
+
+VARIANT_PREFIX = 'variants/'
+
+# 变体名: (宽, 高, 裁剪方式)；cover 按比例裁剪填满，fit 等比缩放到框内。@2x 供高分屏使用
+DEFAULT_VARIANTS = {
+    'card': (480, 270, 'cover'),
+    'card@2x': (960, 540, 'cover'),
+    'detail': (1280, 720, 'fit'),
+    'avatar': (96, 96, 'cover'),
+    'avatar@2x': (192, 192, 'cover'),
+}
+VARIANTS = getattr(settings, 'IMAGE_VARIANTS', DEFAULT_VARIANTS)
+WEBP_QUALITY = getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)
+
+
+def variant_name(sha256, variant):
+    return f'{VARIANT_PREFIX}{sha256}/{variant}.webp'
+
+
+def render_variant(image, width, height, mode):
+    """返回缩放后的图片；不放大小于目标尺寸的原图"""
+    if mode == 'cover':
+        scale = min(1.0, image.width / width, image.height / height)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return ImageOps.fit(image, size, Image.LANCZOS)
+    result = image.copy()
+    result.thumbnail((width, height), Image.LANCZOS)
+    return result
+
+
+def generate_variants(source, sha256, storage=None):
+    """为原图生成所有变体并写入存储，返回 {变体名: 存储路径}"""
+    storage = storage or default_storage
+    with Image.open(source) as original:
+        # GIF 取第一帧；按 EXIF 方向摆正手机照片
+        original.seek(0)
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+        variants = {}
+        for variant, (width, height, mode) in VARIANTS.items():
+            name = variant_name(sha256, variant)
+            if not storage.exists(name):
+                content = ContentFile(b'')
+                render_variant(image, width, height, mode).save(content, 'WEBP', quality=WEBP_QUALITY, method=4)
+                saved = storage.save(name, content)
+                if saved != name:
+                    storage.delete(saved)
+            variants[variant] = name
+    return variants
+
+
+def claim_pending(limit):
+    """领取最多 limit 张等待生成变体的图片，条件更新保证不会重复领取"""
+    from .models import MediaBlob
+
+    claimed = []
+    candidates = MediaBlob.objects.filter(variants_status='pending').order_by('id')
+    for blob_id in candidates.values_list('id', flat=True)[:limit * 2]:
+        if MediaBlob.objects.filter(pk=blob_id, variants_status='pending').update(variants_status='running'):
+            claimed.append(blob_id)
+            if len(claimed) >= limit:
+                break
+    return claimed
+
+
+def release_stale():
+    """工作进程崩溃时遗留的 running 状态（worker 启动时调用）重新放回队列"""
+    from .models import MediaBlob
+    return MediaBlob.objects.filter(variants_status='running').update(variants_status='pending')
+
+
+def process_blob(blob_id):
+    """生成一张图片的变体（在工作进程中调用），返回结果摘要"""
+    from .models import MediaBlob
+
+    close_old_connections()
+    blob = MediaBlob.objects.get(pk=blob_id)
+    start = time.perf_counter()
+    try:
+        with default_storage.open(blob.path, 'rb') as source:
+            variants = generate_variants(source, blob.sha256)
+    except Exception as e:
+        return fail_blob(blob_id, e)
+    finally:
+        close_old_connections()
+    MediaBlob.objects.filter(pk=blob_id).update(
+        variants=variants, variants_status='ready', variants_generated_at=timezone.now(),
+    )
+    return {'job': f'图片 {blob.sha256[:12]}', 'status': 'succeeded',
+            'timings': {'variants': round(time.perf_counter() - start, 3)}}
+
+
+def fail_blob(blob_id, error):
+    """图片损坏等无法生成变体时不再重试，序列化时退回原图"""
+    from .models import MediaBlob
+    MediaBlob.objects.filter(pk=blob_id).update(variants_status='failed')
+    return {'job': f'图片 {blob_id}', 'status': 'failed', 'error': str(error) or error.__class__.__name__}
+
+
+def delete_variants(sha256, storage=None):
+    storage = storage or default_storage
+    prefix = f'{VARIANT_PREFIX}{sha256}/'
+    try:
+        dirs, files = storage.listdir(prefix)
+    except (FileNotFoundError, NotADirectoryError):
+        return 0
+    for name in files:
+        storage.delete(prefix + name)
+    return len(files)
+
+
+def load_variants(names):
+    """批量查询已生成的变体，返回 {原图存储路径: {变体名: 存储路径}}"""
+    from .models import MediaBlob
+    return dict(
+        MediaBlob.objects.filter(path__in=names, variants_status='ready').values_list('path', 'variants')
+    )
+
+
+def variant_urls(variants, request=None, only=None):
+    """把 {变体名: 存储路径} 转为地址；only 限定输出的变体"""
+    if not variants:
+        return None
+    urls = {variant: default_storage.url(name) for variant, name in variants.items() if not only or variant in only}
+    if request is not None:
+        urls = {variant: request.build_absolute_uri(url) for variant, url in urls.items()}
+    return urls
+
+
+class ImageVariantsField(serializers.Field):
+    """输出图片字段的 {变体名: 地址}；在 BatchListSerializer 中整页合并为一次查询"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        name = value.name if value else ''
+        if not is_blob_name(name):
+            return None
+        request = self.context.get('request')
+        return batch_load(
+            self.parent, 'upload.image_variants', load_variants, name,
+            then=lambda variants: variant_urls(variants, request),
+        )
@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.management.base import BaseCommand
+
+from edu_platform.upload.streaming import save_streaming, throughput
+
+MB = 1024 * 1024
+
+
+def _peak_rss_mb():
+    # Linux 上 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_case(mode, source_path, target_dir, queue):
+    """在独立子进程中保存一次文件，回传耗时与峰值内存"""
+    storage = FileSystemStorage(location=target_dir)
+    baseline = _peak_rss_mb()
+    with open(source_path, 'rb') as source:
+        upload = UploadedFile(source, name='bench.mp4', content_type='video/mp4', size=os.path.getsize(source_path))
+        start = time.perf_counter()
+        if mode == 'streaming':
+            saved = save_streaming(upload, 'bench.mp4', storage=storage)
+            mb_s = throughput(saved)
+        else:
+            storage.save('bench.mp4', ContentFile(upload.read()))
+            seconds = time.perf_counter() - start
+            mb_s = upload.size / seconds / MB if seconds > 0 else 0.0
+    queue.put((mb_s, baseline, _peak_rss_mb()))
+
+
+class Command(BaseCommand):
+    help = '对比流式保存与整体读入两种方式在不同文件大小下的吞吐量和峰值内存'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='16,64,256', help='测试文件大小（MB），逗号分隔')
+        parser.add_argument('--modes', default='streaming,read', help='保存方式：streaming（按块）、read（file.read() 整体读入）')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        modes = options['modes'].split(',')
+        # 每个用例在新进程中运行，峰值内存互不影响
+        context = multiprocessing.get_context('fork')
+        work_dir = tempfile.mkdtemp(prefix='bench_upload_')
+        try:
+            self.stdout.write(f'{"方式":<10}{"大小(MB)":>10}{"吞吐(MB/s)":>14}{"峰值RSS增量(MB)":>18}')
+            for size in sizes:
+                source_path = os.path.join(work_dir, f'source_{size}.bin')
+                with open(source_path, 'wb') as source:
+                    block = os.urandom(MB)
+                    for _ in range(size):
+                        source.write(block)
+
+                for mode in modes:
+                    target_dir = tempfile.mkdtemp(dir=work_dir)
+                    queue = context.Queue()
+                    process = context.Process(target=_run_case, args=(mode, source_path, target_dir, queue))
+                    process.start()
+                    mb_s, baseline, peak = queue.get()
+                    process.join()
+                    shutil.rmtree(target_dir)
+                    self.stdout.write(f'{mode:<10}{size:>10}{mb_s:>14.1f}{peak - baseline:>18.1f}')
+                os.remove(source_path)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from edu_platform.upload.cas import count_references
+from edu_platform.upload.models import MediaBlob
+
+
+class Command(BaseCommand):
+    help = '删除无引用且超过宽限期的媒体文件；--recount 按实际引用重新计算引用次数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, help='无引用文件的宽限期（小时），默认取 MEDIA_BLOB_GC_GRACE')
+        parser.add_argument('--recount', action='store_true', help='先扫描引用字段重新计算引用次数（修复绕过信号的批量更新）')
+        parser.add_argument('--dry-run', action='store_true', help='只列出将被删除的文件，不删除')
+
+    def handle(self, *args, **options):
+        grace = settings.MEDIA_BLOB_GC_GRACE
+        if options['hours'] is not None:
+            grace = timedelta(hours=options['hours'])
+        dry_run = options['dry_run']
+        now = timezone.now()
+
+        if options['recount']:
+            self.recount(now, dry_run)
+
+        cutoff = now - grace
+        candidates = MediaBlob.objects.filter(ref_count=0).filter(
+            Q(unreferenced_since__lt=cutoff) | Q(unreferenced_since__isnull=True, created_at__lt=cutoff)
+        )
+        # 删除前再次确认没有字段引用，防止计数偏差误删
+        referenced = count_references() if candidates.exists() else {}
+        removed = freed = 0
+        for blob in candidates.iterator():
+            if blob.path in referenced:
+                self.stdout.write(self.style.WARNING(f'{blob.path} 仍被引用 {referenced[blob.path]} 次，跳过'))
+                continue
+            removed += 1
+            freed += blob.size
+            self.stdout.write(f'{blob.path} {blob.size} 字节')
+            if not dry_run:
+                default_storage.delete(blob.path)
+                blob.delete()
+
+        action = '将删除' if dry_run else '已删除'
+        self.stdout.write(self.style.SUCCESS(f'{action} {removed} 个文件，共 {freed / (1024 * 1024):.1f} MB'))
+
+    def recount(self, now, dry_run):
+        counts = count_references()
+        changed = 0
+        for blob in MediaBlob.objects.iterator():
+            actual = counts.get(blob.path, 0)
+            if actual == blob.ref_count:
+                continue
+            changed += 1
+            self.stdout.write(f'{blob.path} 引用次数 {blob.ref_count} -> {actual}')
+            if not dry_run:
+                MediaBlob.objects.filter(pk=blob.pk).update(
+                    ref_count=actual,
+                    unreferenced_since=(blob.unreferenced_since or now) if actual == 0 else None,
+                )
+        self.stdout.write(f'重新计算引用次数：{changed} 个文件有变化')
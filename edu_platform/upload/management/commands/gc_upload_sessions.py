@@ -0,0 +1,58 @@
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from edu_platform.upload.models import UploadSession
+from edu_platform.upload.resumable import discard_parts
+
+
+class Command(BaseCommand):
+    help = '清理长时间无进展的分片上传会话，以及磁盘上没有对应会话的分片目录'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, help='未完成会话的保留时间（小时），默认取 UPLOAD_SESSION_TTL')
+        parser.add_argument('--dry-run', action='store_true', help='只列出将被清理的会话，不删除')
+
+    def handle(self, *args, **options):
+        ttl = settings.UPLOAD_SESSION_TTL
+        if options['hours'] is not None:
+            ttl = timedelta(hours=options['hours'])
+        cutoff = timezone.now() - ttl
+        dry_run = options['dry_run']
+
+        # 已完成会话的分片在合并后就已删除，这里只清理过期未完成的会话
+        stale = UploadSession.objects.exclude(status='completed').filter(updated_at__lt=cutoff)
+        count = 0
+        for session in stale.iterator():
+            count += 1
+            self.stdout.write(f'{session.id} {session.filename} {session.get_status_display()} 最后活动 {timezone.localtime(session.updated_at):%Y-%m-%d %H:%M}')
+            if not dry_run:
+                discard_parts(session)
+                session.delete()
+
+        # 会话记录已不存在的分片目录（例如删除会话时进程中断）
+        orphans = 0
+        if os.path.isdir(settings.UPLOAD_SESSION_DIR):
+            names = os.listdir(settings.UPLOAD_SESSION_DIR)
+            ids = []
+            for name in names:
+                try:
+                    ids.append(uuid.UUID(name))
+                except ValueError:
+                    continue
+            existing = {str(pk) for pk in UploadSession.objects.filter(pk__in=ids).values_list('pk', flat=True)}
+            for session_id in ids:
+                path = os.path.join(settings.UPLOAD_SESSION_DIR, str(session_id))
+                if str(session_id) in existing or os.path.getmtime(path) > cutoff.timestamp():
+                    continue
+                orphans += 1
+                if not dry_run:
+                    shutil.rmtree(path, ignore_errors=True)
+
+        action = '将清理' if dry_run else '已清理'
+        self.stdout.write(self.style.SUCCESS(f'{action} {count} 个过期会话，{orphans} 个孤立分片目录'))
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='原始文件名')),
+                ('content_type', models.CharField(max_length=100, verbose_name='文件类型')),
+                ('total_size', models.BigIntegerField(verbose_name='文件大小')),
+                ('part_size', models.PositiveIntegerField(verbose_name='分片大小')),
+                ('part_count', models.PositiveIntegerField(verbose_name='分片数量')),
+                ('sha256', models.CharField(max_length=64, verbose_name='文件SHA-256')),
+                ('status', models.CharField(choices=[('uploading', '上传中'), ('assembling', '合并中'), ('completed', '已完成'), ('failed', '失败')], default='uploading', max_length=20, verbose_name='状态')),
+                ('path', models.CharField(blank=True, max_length=255, verbose_name='存储路径')),
+                ('error', models.CharField(blank=True, max_length=255, verbose_name='失败原因')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '分片上传会话',
+                'verbose_name_plural': '分片上传会话',
+            },
+        ),
+        migrations.CreateModel(
+            name='UploadPart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='分片序号')),
+                ('size', models.PositiveIntegerField(verbose_name='分片大小')),
+                ('sha256', models.CharField(max_length=64, verbose_name='分片SHA-256')),
+                ('received_at', models.DateTimeField(auto_now=True, verbose_name='接收时间')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='upload.uploadsession', verbose_name='上传会话')),
+            ],
+            options={
+                'verbose_name': '上传分片',
+                'verbose_name_plural': '上传分片',
+                'ordering': ['number'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='uploadsession',
+            index=models.Index(fields=['status', 'updated_at'], name='upload_uplo_status_a1a0bc_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='uploadpart',
+            unique_together={('session', 'number')},
+        ),
+    ]
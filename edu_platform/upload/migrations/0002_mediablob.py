@@ -0,0 +1,31 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('upload', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='存储路径')),
+                ('size', models.BigIntegerField(verbose_name='文件大小')),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='文件类型')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='引用次数')),
+                ('unreferenced_since', models.DateTimeField(blank=True, null=True, verbose_name='无引用起始时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '媒体文件',
+                'verbose_name_plural': '媒体文件',
+                'indexes': [models.Index(fields=['ref_count', 'unreferenced_since'], name='upload_medi_ref_cou_0789d1_idx')],
+            },
+        ),
+    ]
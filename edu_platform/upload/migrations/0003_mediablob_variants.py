@@ -0,0 +1,32 @@
+# Generated by Django 4.2.6 on 2026-10-19 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('upload', '0002_mediablob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='图片变体'),
+        ),
+        migrations.AddField(
+            model_name='mediablob',
+            name='variants_generated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='变体生成时间'),
+        ),
+        migrations.AddField(
+            model_name='mediablob',
+            name='variants_status',
+            field=models.CharField(choices=[('none', '无需生成'), ('pending', '等待生成'), ('running', '生成中'), ('ready', '已生成'), ('failed', '生成失败')], default='none', max_length=10, verbose_name='变体状态'),
+        ),
+        migrations.AddIndex(
+            model_name='mediablob',
+            index=models.Index(fields=['variants_status'], name='upload_medi_variant_c3ef7d_idx'),
+        ),
+    ]
@@ -0,0 +1,156 @@
+import os
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .cas import REFERENCE_FIELDS, add_reference, is_blob_name, reference_name
+from .images import delete_variants
+
+
+class UploadSession(models.Model):
+    """可续传的分片上传会话"""
+    STATUS_CHOICES = (
+        ('uploading', '上传中'),
+        ('assembling', '合并中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions', verbose_name='用户')
+    filename = models.CharField(max_length=255, verbose_name='原始文件名')
+    content_type = models.CharField(max_length=100, verbose_name='文件类型')
+    total_size = models.BigIntegerField(verbose_name='文件大小')
+    part_size = models.PositiveIntegerField(verbose_name='分片大小')
+    part_count = models.PositiveIntegerField(verbose_name='分片数量')
+    sha256 = models.CharField(max_length=64, verbose_name='文件SHA-256')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading', verbose_name='状态')
+    path = models.CharField(max_length=255, blank=True, verbose_name='存储路径')
+    error = models.CharField(max_length=255, blank=True, verbose_name='失败原因')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
+    class Meta:
+        verbose_name = '分片上传会话'
+        verbose_name_plural = '分片上传会话'
+        indexes = [models.Index(fields=['status', 'updated_at'])]
+
+    def __str__(self):
+        return f"{self.filename} ({self.get_status_display()})"
+
+    @property
+    def part_dir(self):
+        """分片在本地磁盘上的目录"""
+        return os.path.join(settings.UPLOAD_SESSION_DIR, str(self.id))
+
+    def part_path(self, number):
+        return os.path.join(self.part_dir, f'{number:05d}.part')
+
+    def expected_part_size(self, number):
+        """第 number 片（从 1 开始）应有的大小，最后一片为余下的字节数"""
+        if number < self.part_count:
+            return self.part_size
+        return self.total_size - self.part_size * (self.part_count - 1)
+
+
+class UploadPart(models.Model):
+    """已接收的分片"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='parts', verbose_name='上传会话')
+    number = models.PositiveIntegerField(verbose_name='分片序号')
+    size = models.PositiveIntegerField(verbose_name='分片大小')
+    sha256 = models.CharField(max_length=64, verbose_name='分片SHA-256')
+    received_at = models.DateTimeField(auto_now=True, verbose_name='接收时间')
+
+    class Meta:
+        verbose_name = '上传分片'
+        verbose_name_plural = '上传分片'
+        unique_together = ('session', 'number')
+        ordering = ['number']
+
+    def __str__(self):
+        return f"{self.session_id} #{self.number}"
+
+
+class MediaBlob(models.Model):
+    """按内容寻址的媒体文件：同样内容只存一份，由课程封面、视频、缩略图、头像等字段引用计数"""
+    VARIANTS_STATUS_CHOICES = (
+        ('none', '无需生成'),
+        ('pending', '等待生成'),
+        ('running', '生成中'),
+        ('ready', '已生成'),
+        ('failed', '生成失败'),
+    )
+
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name='SHA-256')
+    path = models.CharField(max_length=255, unique=True, verbose_name='存储路径')
+    size = models.BigIntegerField(verbose_name='文件大小')
+    content_type = models.CharField(max_length=100, blank=True, verbose_name='文件类型')
+    ref_count = models.PositiveIntegerField(default=0, verbose_name='引用次数')
+    # 引用次数降为 0 的时间，清理时据此保留一段宽限期
+    unreferenced_since = models.DateTimeField(null=True, blank=True, verbose_name='无引用起始时间')
+    # 上传图片的尺寸变体 {变体名: 存储路径}，见 upload.images
+    variants = models.JSONField(default=dict, blank=True, verbose_name='图片变体')
+    variants_status = models.CharField(max_length=10, choices=VARIANTS_STATUS_CHOICES, default='none', verbose_name='变体状态')
+    variants_generated_at = models.DateTimeField(null=True, blank=True, verbose_name='变体生成时间')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    class Meta:
+        verbose_name = '媒体文件'
+        verbose_name_plural = '媒体文件'
+        indexes = [
+            models.Index(fields=['ref_count', 'unreferenced_since']),
+            models.Index(fields=['variants_status']),
+        ]
+
+    def __str__(self):
+        return self.path
+
+
+def _reference_names(instance, fields):
+    return [reference_name(getattr(instance, field)) for field in fields]
+
+
+def _remember_references(sender, instance, update_fields=None, **kwargs):
+    """保存前记下原来引用的媒体文件，保存后据此调整引用次数"""
+    fields = REFERENCE_FIELDS[sender._meta.label]
+    if update_fields is not None and not set(update_fields) & set(fields):
+        instance._media_references = None
+        return
+    old = None
+    if not instance._state.adding and instance.pk is not None:
+        old = sender._base_manager.filter(pk=instance.pk).values_list(*fields).first()
+    instance._media_references = [reference_name(value) for value in old] if old else [''] * len(fields)
+
+
+def _update_references(sender, instance, **kwargs):
+    old = getattr(instance, '_media_references', None)
+    if old is None:
+        return
+    new = _reference_names(instance, REFERENCE_FIELDS[sender._meta.label])
+    for old_name, new_name in zip(old, new):
+        if old_name != new_name:
+            add_reference(new_name, 1)
+            add_reference(old_name, -1)
+    instance._media_references = None
+
+
+def _release_references(sender, instance, **kwargs):
+    for name in _reference_names(instance, REFERENCE_FIELDS[sender._meta.label]):
+        if is_blob_name(name):
+            add_reference(name, -1)
+
+
+for label in REFERENCE_FIELDS:
+    pre_save.connect(_remember_references, sender=label, dispatch_uid=f'media_refs_pre_{label}')
+    post_save.connect(_update_references, sender=label, dispatch_uid=f'media_refs_post_{label}')
+    post_delete.connect(_release_references, sender=label, dispatch_uid=f'media_refs_delete_{label}')
+
+
+@receiver(post_delete, sender=MediaBlob)
+def delete_image_variants(sender, instance, **kwargs):
+    """原图被回收后删除其尺寸变体"""
+    if instance.variants:
+        delete_variants(instance.sha256)
@@ -0,0 +1,179 @@
+"""
+可续传的分片上传
+
+协议：
+    1. POST   /api/upload/sessions/                       创建会话，声明文件大小、分片大小和整个文件的 SHA-256
+    2. PUT    /api/upload/sessions/<id>/parts/<n>/        上传第 n 片（请求体为原始字节，X-Part-SHA256 头为分片校验值），
+                                                           可乱序、并行、重复上传
+    3. GET    /api/upload/sessions/<id>/                  查询已接收和缺失的分片，断线后据此续传
+    4. POST   /api/upload/sessions/<id>/complete/         合并分片并校验整个文件
+
+分片保存在 UPLOAD_SESSION_DIR 下的本地磁盘上，合并时优先使用 os.copy_file_range / os.sendfile
+在内核中拼接，不经过用户态缓冲。长时间无进展的会话由 gc_upload_sessions 命令清理。
+"""
+import hashlib
+import os
+import shutil
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .streaming import CHUNK_SIZE
+
+
+class PartError(Exception):
+    """分片不符合会话声明（大小或校验值不匹配）"""
+
+
+def write_part(session, number, stream, expected_sha256):
+    """把请求体按块写入分片文件，边写边计算 SHA-256，校验通过后原子地替换旧分片"""
+    expected_size = session.expected_part_size(number)
+    os.makedirs(session.part_dir, exist_ok=True)
+    final_path = session.part_path(number)
+    temp_path = f'{final_path}.{uuid.uuid4().hex}.tmp'
+
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, 'wb') as part:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > expected_size:
+                    raise PartError(f"第 {number} 片超出应有大小 {expected_size} 字节")
+                hasher.update(chunk)
+                part.write(chunk)
+        if size != expected_size:
+            raise PartError(f"第 {number} 片大小为 {size} 字节，应为 {expected_size} 字节")
+        digest = hasher.hexdigest()
+        if digest != expected_sha256.lower():
+            raise PartError(f"第 {number} 片校验失败")
+        os.replace(temp_path, final_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return size, digest
+
+
+def _copy_range(src_fd, dest_fd, count):
+    """把 src_fd 当前位置起的 count 字节追加到 dest_fd，依次尝试 copy_file_range、sendfile 和普通读写"""
+    if hasattr(os, 'copy_file_range'):
+        started = False
+        try:
+            while count > 0:
+                copied = os.copy_file_range(src_fd, dest_fd, count)
+                if copied == 0:
+                    break
+                started = True
+                count -= copied
+            return
+        except OSError:
+            # 跨文件系统或内核不支持时退回 sendfile；已拷贝了部分数据则不能再退回
+            if started:
+                raise
+
+    if hasattr(os, 'sendfile'):
+        offset = os.lseek(src_fd, 0, os.SEEK_CUR)
+        start = offset
+        try:
+            while count > 0:
+                sent = os.sendfile(dest_fd, src_fd, offset, count)
+                if sent == 0:
+                    break
+                offset += sent
+                count -= sent
+            return
+        except OSError:
+            if offset != start:
+                raise
+
+    while count > 0:
+        chunk = os.read(src_fd, min(CHUNK_SIZE, count))
+        if not chunk:
+            break
+        os.write(dest_fd, chunk)
+        count -= len(chunk)
+
+
+def concat_parts(part_paths, dest_path):
+    """按顺序拼接分片文件"""
+    with open(dest_path, 'wb') as dest:
+        for part_path in part_paths:
+            with open(part_path, 'rb') as src:
+                size = os.fstat(src.fileno()).st_size
+                _copy_range(src.fileno(), dest.fileno(), size)
+
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def verify_parts(session):
+    """不写入存储，按顺序读取全部分片校验整个文件的 SHA-256"""
+    hasher = hashlib.sha256()
+    for number in range(1, session.part_count + 1):
+        with open(session.part_path(number), 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+    if hasher.hexdigest() != session.sha256:
+        raise PartError("合并后的文件校验失败")
+
+
+def assemble(session, name, storage=None):
+    """合并会话的全部分片并校验整个文件，写入存储中的 name（按内容寻址的名称，不改名），返回文件名
+
+    存储为本地文件系统时在目标目录拼接到临时文件，校验通过后重命名为 name（同名文件为同样内容，直接覆盖）；
+    否则先在分片目录拼接，再流式写入存储。
+    """
+    storage = storage or default_storage
+    part_paths = [session.part_path(number) for number in range(1, session.part_count + 1)]
+    try:
+        dest_path = storage.path(name)
+    except NotImplementedError:
+        dest_path = None
+
+    if dest_path is not None:
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        temp_path = f'{dest_path}.{uuid.uuid4().hex}.tmp'
+        try:
+            concat_parts(part_paths, temp_path)
+            if file_sha256(temp_path) != session.sha256:
+                raise PartError("合并后的文件校验失败")
+            os.replace(temp_path, dest_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+    assembled_path = os.path.join(session.part_dir, 'assembled')
+    concat_parts(part_paths, assembled_path)
+    if file_sha256(assembled_path) != session.sha256:
+        os.remove(assembled_path)
+        raise PartError("合并后的文件校验失败")
+    # 上次写入后、登记前中断时留下的同名文件
+    if storage.exists(name):
+        storage.delete(name)
+    with open(assembled_path, 'rb') as assembled:
+        return storage.save(name, File(assembled, name=name))
+
+
+def lost_parts(session):
+    """已登记但分片文件不在磁盘上的分片序号"""
+    return [
+        number for number in session.parts.values_list('number', flat=True)
+        if not os.path.exists(session.part_path(number))
+    ]
+
+
+def discard_parts(session):
+    """删除会话在本地磁盘上的全部分片"""
+    shutil.rmtree(session.part_dir, ignore_errors=True)
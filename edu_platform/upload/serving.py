@@ -0,0 +1,172 @@
+"""
+支持 Range 的媒体文件响应
+
+serve_file() 按 MEDIA_SERVE_BACKEND 设置选择发送方式：
+    django     由 Django 返回 FileResponse，WSGI 服务器提供 wsgi.file_wrapper 时（如 gunicorn）用 sendfile 零拷贝发送
+    nginx      只返回 X-Accel-Redirect 头，由 nginx 的 internal location 发送文件（Range 由 nginx 处理）
+    xsendfile  只返回 X-Sendfile 头，适用于 Apache mod_xsendfile / lighttpd
+
+django 方式支持单段 Range、If-Range、If-None-Match / ETag；多段 Range 按完整文件响应。
+调用方负责权限检查，这里只负责高效地发送文件。
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, HttpResponseRedirect
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+BACKEND = getattr(settings, 'MEDIA_SERVE_BACKEND', 'django')
+ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+# mimetypes 在部分系统上不认识这些扩展名
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4',
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class FileRange:
+    """文件中的一段：read() 不会越过范围；保留 fileno()，wsgi.file_wrapper 按 Content-Length 用 sendfile 发送"""
+
+    def __init__(self, f, start, length):
+        f.seek(start)
+        self.file = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def guess_content_type(name):
+    ext = os.path.splitext(name)[1].lower()
+    return CONTENT_TYPES.get(ext) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def parse_range(header, size):
+    """解析单段 Range，返回 (start, end)（end 包含在内）；无法解析或多段时返回 None"""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N：最后 N 个字节
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def _if_range_matches(value, etag, last_modified):
+    value = value.strip()
+    if value.startswith(('"', 'W/')):
+        # If-Range 只接受强比较
+        return value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and int(last_modified) <= date
+
+
+def _accel_response(name, path, content_type, cache_control):
+    response = HttpResponse(content_type=content_type)
+    if BACKEND == 'nginx':
+        response['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX + quote(name)
+    else:
+        response['X-Sendfile'] = path
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def serve_file(request, name, content_type=None, immutable=False, storage=None):
+    """发送存储中的文件 name；immutable 表示文件内容不会改变，允许客户端长期缓存"""
+    storage = storage or default_storage
+    content_type = content_type or guess_content_type(name)
+    cache_control = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        # 对象存储：交给存储自身的（通常是带签名的）地址
+        return HttpResponseRedirect(storage.url(name))
+
+    if BACKEND in ('nginx', 'xsendfile'):
+        return _accel_response(name, path, content_type, cache_control)
+
+    try:
+        f = open(path, 'rb')
+    except (FileNotFoundError, IsADirectoryError):
+        return HttpResponse(status=404)
+    stat = os.fstat(f.fileno())
+    size = stat.st_size
+    etag = quote_etag(f'{size:x}-{stat.st_mtime_ns:x}')
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': cache_control,
+    }
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+        f.close()
+        response = HttpResponseNotModified()
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    start, end, status = 0, size - 1, 200
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and size and (not if_range or _if_range_matches(if_range, etag, stat.st_mtime)):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            f.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            response['Accept-Ranges'] = 'bytes'
+            return response
+        if byte_range:
+            (start, end), status = byte_range, 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    length = end - start + 1 if size else 0
+    if request.method == 'HEAD':
+        f.close()
+        response = HttpResponse(status=status, content_type=content_type)
+    else:
+        response = FileResponse(FileRange(f, start, length), status=status, content_type=content_type)
+    response['Content-Length'] = length
+    for key, value in headers.items():
+        response[key] = value
+    return response
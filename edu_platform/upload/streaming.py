@@ -0,0 +1,65 @@
+"""
+流式保存上传文件
+
+上传文件按块直接写入存储，不再 file.read() 整体读入内存；写入的同时增量计算 SHA-256，
+并统计大小、耗时和吞吐量。内存占用只与块大小有关，与文件大小无关。
+"""
+import hashlib
+import logging
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+# 每次写入存储的块大小
+CHUNK_SIZE = getattr(settings, 'UPLOAD_CHUNK_SIZE', 1024 * 1024)
+
+SavedUpload = namedtuple('SavedUpload', ['path', 'size', 'sha256', 'seconds'])
+
+
+class HashingFile(File):
+    """按块读取时同步计算 SHA-256 的文件包装"""
+
+    def __init__(self, file, name=None, chunk_size=CHUNK_SIZE):
+        super().__init__(file, name or getattr(file, 'name', None))
+        self.chunk_size = chunk_size
+        self.hasher = hashlib.sha256()
+        self.bytes_read = 0
+
+    def chunks(self, chunk_size=None):
+        # 优先使用上传文件自身的 chunks()，临时文件和内存文件都按块读取
+        source = self.file.chunks if hasattr(self.file, 'chunks') else super().chunks
+        for chunk in source(chunk_size or self.chunk_size):
+            self.hasher.update(chunk)
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def multiple_chunks(self, chunk_size=None):
+        return True
+
+    @property
+    def sha256(self):
+        return self.hasher.hexdigest()
+
+
+def save_streaming(upload, path, storage=None, chunk_size=CHUNK_SIZE):
+    """把上传文件按块写入存储，返回 SavedUpload(path, size, sha256, seconds)"""
+    storage = storage or default_storage
+    content = HashingFile(upload, chunk_size=chunk_size)
+    start = time.perf_counter()
+    saved_path = storage.save(path, content)
+    seconds = time.perf_counter() - start
+    result = SavedUpload(saved_path, content.bytes_read, content.sha256, seconds)
+    logger.info('上传已保存 %s：%d 字节，%.1f MB/s', saved_path, result.size, throughput(result))
+    return result
+
+
+def throughput(result):
+    """写入吞吐量（MB/s）"""
+    if result.seconds <= 0:
+        return 0.0
+    return result.size / result.seconds / (1024 * 1024)
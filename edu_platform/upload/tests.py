@@ -0,0 +1,435 @@
+import datetime
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from courses.models import Course
+from live.models import LiveEvent
+
+from .cas import blob_name, count_references, reference_name, store_upload
+from .models import MediaBlob, UploadSession
+
+User = get_user_model()
+
+
+class MediaStorageTestCase(APITestCase):
+    """使用临时 MEDIA_ROOT 的测试基类"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root,
+            UPLOAD_SESSION_DIR=os.path.join(media_root, 'upload_sessions'),
+            UPLOAD_PART_MIN_SIZE=16,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, content, name='video.mp4', content_type='video/mp4'):
+        blob, _ = store_upload(SimpleUploadedFile(name, content, content_type=content_type))
+        return blob
+
+    def gc(self, *args):
+        call_command('gc_media_blobs', '--hours', '0', *args, stdout=io.StringIO())
+
+    def create_session(self, content, part_size=64, name='video.mp4'):
+        return self.client.post('/api/upload/sessions/', {
+            'filename': name,
+            'content_type': 'video/mp4',
+            'size': len(content),
+            'part_size': part_size,
+            'sha256': hashlib.sha256(content).hexdigest(),
+        }, format='json')
+
+    def put_part(self, session_id, number, data, sha256=None):
+        return self.client.put(
+            f'/api/upload/sessions/{session_id}/parts/{number}/', data,
+            content_type='application/octet-stream',
+            HTTP_X_PART_SHA256=sha256 or hashlib.sha256(data).hexdigest(),
+        )
+
+    def upload_parts(self, session_id, content, part_size=64):
+        for number, start in enumerate(range(0, len(content), part_size), start=1):
+            response = self.put_part(session_id, number, content[start:start + part_size])
+            self.assertEqual(response.status_code, 200, response.data)
+
+    def complete(self, session_id):
+        return self.client.post(f'/api/upload/sessions/{session_id}/complete/')
+
+
+class UrlReferenceTests(MediaStorageTestCase):
+    """保存了上传地址（而非存储路径）的字段同样计入引用，清理时不会删除仍在使用的文件"""
+
+    def setUp(self):
+        super().setUp()
+        self.instructor = User.objects.create_user('teacher', 'teacher@example.com')
+        self.blob = self.upload(b'promo' * 100)
+        self.url = f'http://localhost:8000{default_storage.url(self.blob.path)}'
+
+    def create_course(self, **kwargs):
+        return Course.objects.create(
+            title='课程', slug='course', instructor=self.instructor, description='简介', price=0, is_free=True,
+            **kwargs,
+        )
+
+    def test_reference_name(self):
+        self.assertEqual(reference_name(self.url), self.blob.path)
+        self.assertEqual(reference_name(f'{self.url}?t=1'), self.blob.path)
+        self.assertEqual(reference_name('https://example.com/video.mp4'), 'https://example.com/video.mp4')
+        self.assertEqual(reference_name(None), '')
+
+    def test_course_video_url(self):
+        course = self.create_course(video_url=self.url)
+        self.blob.refresh_from_db()
+        self.assertEqual(self.blob.ref_count, 1)
+        self.assertEqual(count_references(), {self.blob.path: 1})
+
+        self.gc()
+        self.assertTrue(MediaBlob.objects.filter(pk=self.blob.pk).exists())
+        self.assertTrue(default_storage.exists(self.blob.path))
+
+        course.video_url = ''
+        course.save()
+        self.blob.refresh_from_db()
+        self.assertEqual(self.blob.ref_count, 0)
+        self.gc()
+        self.assertFalse(MediaBlob.objects.filter(pk=self.blob.pk).exists())
+        self.assertFalse(default_storage.exists(self.blob.path))
+
+    def test_live_event_pre_recorded_video_url(self):
+        start = timezone.now()
+        LiveEvent.objects.create(
+            title='直播', course=self.create_course(), instructor=self.instructor, description='简介',
+            scheduled_start_time=start, scheduled_end_time=start + datetime.timedelta(hours=1),
+            pre_recorded_video_url=self.url,
+        )
+        self.blob.refresh_from_db()
+        self.assertEqual(self.blob.ref_count, 1)
+
+    def test_gc_rechecks_url_references(self):
+        # 绕过信号的批量更新不会增加引用次数，清理前的复查仍能发现引用
+        course = self.create_course()
+        Course.objects.filter(pk=course.pk).update(video_url=self.url)
+        self.gc()
+        self.assertTrue(MediaBlob.objects.filter(pk=self.blob.pk).exists())
+        self.gc('--recount')
+        self.blob.refresh_from_db()
+        self.assertEqual(self.blob.ref_count, 1)
+
+
+class BlobDisclosureTests(MediaStorageTestCase):
+    """只知道 SHA-256 不能拿到其他用户上传的文件"""
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user('owner', 'owner@example.com')
+        self.other = User.objects.create_user('other', 'other@example.com')
+        self.content = b'paid lesson' * 20
+        self.sha256 = hashlib.sha256(self.content).hexdigest()
+        self.client.force_authenticate(self.owner)
+        response = self.create_session(self.content)
+        self.upload_parts(response.data['id'], self.content)
+        self.assertEqual(self.complete(response.data['id']).status_code, 200)
+        self.blob = MediaBlob.objects.get(sha256=self.sha256)
+
+    def test_blob_detail_hides_path_from_other_users(self):
+        response = self.client.get(f'/api/upload/blobs/{self.sha256}/')
+        self.assertEqual(response.data['path'], self.blob.path)
+
+        self.client.force_authenticate(self.other)
+        response = self.client.get(f'/api/upload/blobs/{self.sha256}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'sha256': self.sha256, 'exists': True})
+
+    def test_create_session_requires_upload_from_other_users(self):
+        response = self.create_session(self.content)
+        self.assertEqual(response.data['path'], self.blob.path)
+
+        self.client.force_authenticate(self.other)
+        response = self.create_session(self.content)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('path', response.data)
+
+    def test_existing_blob_reused_after_verified_upload(self):
+        self.client.force_authenticate(self.other)
+        session_id = self.create_session(self.content).data['id']
+        self.upload_parts(session_id, self.content)
+        response = self.complete(session_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['path'], self.blob.path)
+        self.assertTrue(response.data['deduplicated'])
+        self.assertEqual(MediaBlob.objects.count(), 1)
+
+    def test_existing_blob_not_reused_for_wrong_content(self):
+        # 分片各自的校验值正确，但拼起来不是声明的内容
+        self.client.force_authenticate(self.other)
+        session_id = self.create_session(self.content).data['id']
+        self.upload_parts(session_id, b'x' * len(self.content))
+        response = self.complete(session_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('path', response.data)
+        self.assertEqual(response.data['status'], 'uploading')
+
+
+class CompleteUploadSessionTests(MediaStorageTestCase):
+    """合并分片"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('teacher', 'teacher@example.com')
+        self.client.force_authenticate(self.user)
+        self.content = b'lesson video' * 20
+        self.sha256 = hashlib.sha256(self.content).hexdigest()
+        self.session_id = self.create_session(self.content).data['id']
+        self.upload_parts(self.session_id, self.content)
+
+    def test_writes_content_addressed_name(self):
+        # 上次合并后、登记前中断时留下的同名文件被覆盖，不会另存为其他名称
+        name = blob_name(self.sha256, '.mp4')
+        default_storage.save(name, ContentFile(b'partial'))
+
+        response = self.complete(self.session_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['path'], name)
+        with default_storage.open(name, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(os.listdir(os.path.dirname(default_storage.path(name))), [os.path.basename(name)])
+
+    def test_storage_error_returns_to_uploading(self):
+        with mock.patch('edu_platform.upload.views.assemble', side_effect=OSError('磁盘空间不足')), \
+                self.assertLogs('edu_platform.upload.views', 'ERROR'):
+            response = self.complete(self.session_id)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data['status'], 'uploading')
+        self.assertEqual(response.data['missing_parts'], [])
+
+        response = self.complete(self.session_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'completed')
+
+    def test_lost_parts_uploaded_again(self):
+        session = UploadSession.objects.get(pk=self.session_id)
+        os.remove(session.part_path(2))
+        with self.assertLogs('edu_platform.upload.views', 'ERROR'):
+            response = self.complete(self.session_id)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data['missing_parts'], [2])
+
+        self.assertEqual(self.put_part(self.session_id, 2, self.content[64:128]).status_code, 200)
+        self.assertEqual(self.complete(self.session_id).status_code, 200)
+
+
+class UploadPartTests(MediaStorageTestCase):
+    """分片上传与续传"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('teacher', 'teacher@example.com')
+        self.client.force_authenticate(self.user)
+        self.content = bytes(range(256)) * 2
+        self.session_id = self.create_session(self.content, part_size=200).data['id']
+
+    def test_create_session(self):
+        response = self.client.get(f'/api/upload/sessions/{self.session_id}/')
+        self.assertEqual(response.data['part_count'], 3)
+        self.assertEqual(response.data['missing_parts'], [1, 2, 3])
+
+    def test_resume_out_of_order(self):
+        self.assertEqual(self.put_part(self.session_id, 3, self.content[400:]).status_code, 200)
+        self.assertEqual(self.put_part(self.session_id, 1, self.content[:200]).status_code, 200)
+        response = self.client.get(f'/api/upload/sessions/{self.session_id}/')
+        self.assertEqual(response.data['missing_parts'], [2])
+        self.assertEqual(self.complete(self.session_id).status_code, 409)
+
+        self.assertEqual(self.put_part(self.session_id, 2, self.content[200:400]).status_code, 200)
+        # 重复上传同一分片不影响结果
+        self.assertEqual(self.put_part(self.session_id, 2, self.content[200:400]).status_code, 200)
+        response = self.complete(self.session_id)
+        self.assertEqual(response.status_code, 200)
+        with default_storage.open(response.data['path'], 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_part_checksum_mismatch(self):
+        response = self.put_part(self.session_id, 1, self.content[:200], sha256='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        session = UploadSession.objects.get(pk=self.session_id)
+        self.assertFalse(session.parts.exists())
+        self.assertEqual(os.listdir(session.part_dir), [])
+
+    def test_part_size_mismatch(self):
+        self.assertEqual(self.put_part(self.session_id, 1, self.content[:100]).status_code, 400)
+        self.assertEqual(self.put_part(self.session_id, 3, self.content[300:]).status_code, 400)
+        self.assertEqual(self.put_part(self.session_id, 4, self.content[:10]).status_code, 400)
+
+    def test_whole_file_checksum_mismatch(self):
+        # 各分片本身完整，但拼起来与声明的 SHA-256 不符：丢弃全部分片重新上传
+        self.upload_parts(self.session_id, self.content[::-1], part_size=200)
+        response = self.complete(self.session_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['status'], 'uploading')
+        self.assertEqual(response.data['missing_parts'], [1, 2, 3])
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_other_users_session(self):
+        other = User.objects.create_user('other', 'other@example.com')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/upload/sessions/{self.session_id}/').status_code, 404)
+        self.assertEqual(self.put_part(self.session_id, 1, self.content[:200]).status_code, 404)
+
+
+class ContentAddressedStorageTests(MediaStorageTestCase):
+    """按内容寻址保存、引用计数和清理"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('teacher', 'teacher@example.com')
+
+    def test_duplicate_upload_stored_once(self):
+        first, created = store_upload(SimpleUploadedFile('a.jpg', b'image', content_type='image/jpeg'))
+        second, duplicate = store_upload(SimpleUploadedFile('b.JPG', b'image', content_type='image/jpeg'))
+        self.assertTrue(created)
+        self.assertFalse(duplicate)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(first.path, blob_name(hashlib.sha256(b'image').hexdigest(), '.jpg'))
+        # 临时文件都已移走或删除
+        self.assertEqual(os.listdir(default_storage.path('uploads/tmp')), [])
+
+    def test_reference_count_follows_fields(self):
+        blob = self.upload(b'avatar', name='avatar.png', content_type='image/png')
+        other = self.upload(b'other', name='other.png', content_type='image/png')
+        student = User.objects.create_user('student', 'student@example.com', avatar=blob.path)
+        course = Course.objects.create(
+            title='课程', slug='course', instructor=self.user, description='简介', cover_image=blob.path,
+        )
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertIsNone(blob.unreferenced_since)
+
+        course.cover_image = other.path
+        course.save()
+        student.delete()
+        blob.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+        self.assertIsNotNone(blob.unreferenced_since)
+        self.assertEqual(other.ref_count, 1)
+
+    def test_gc_keeps_blobs_within_grace_period(self):
+        blob = self.upload(b'fresh')
+        self.gc('--hours', '1')
+        self.assertTrue(MediaBlob.objects.filter(pk=blob.pk).exists())
+
+    def test_gc_dry_run(self):
+        blob = self.upload(b'unused')
+        self.gc('--dry-run')
+        self.assertTrue(MediaBlob.objects.filter(pk=blob.pk).exists())
+        self.assertTrue(default_storage.exists(blob.path))
+        self.gc()
+        self.assertFalse(MediaBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(default_storage.exists(blob.path))
+
+    def test_recount_repairs_drift(self):
+        referenced = self.upload(b'cover', name='cover.png', content_type='image/png')
+        orphan = self.upload(b'orphan', name='orphan.png', content_type='image/png')
+        Course.objects.create(
+            title='课程', slug='course', instructor=self.user, description='简介', cover_image=referenced.path,
+        )
+        # 计数偏差：被引用的文件计数为 0，无引用的文件计数为 1
+        MediaBlob.objects.filter(pk=referenced.pk).update(ref_count=0)
+        MediaBlob.objects.filter(pk=orphan.pk).update(ref_count=1, unreferenced_since=None)
+
+        self.gc('--recount')
+        referenced.refresh_from_db()
+        orphan.refresh_from_db()
+        self.assertEqual(referenced.ref_count, 1)
+        self.assertEqual(orphan.ref_count, 0)
+        # 宽限期从重新计数时开始
+        self.assertIsNotNone(orphan.unreferenced_since)
+        self.gc()
+        self.assertTrue(default_storage.exists(referenced.path))
+        self.assertFalse(MediaBlob.objects.filter(pk=orphan.pk).exists())
+
+
+class MediaServingTests(MediaStorageTestCase):
+    """公开文件的 Range、If-Range 与条件请求"""
+
+    def setUp(self):
+        super().setUp()
+        self.content = bytes(range(100))
+        self.blob = self.upload(self.content, name='cover.png', content_type='image/png')
+        self.url = default_storage.url(self.blob.path)
+
+    def get(self, **headers):
+        return self.client.get(self.url, **{f'HTTP_{key.upper().replace("-", "_")}': value for key, value in headers.items()})
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_range(self):
+        for header, start, end in (('bytes=10-19', 10, 19), ('bytes=90-', 90, 99), ('bytes=-5', 95, 99),
+                                   ('bytes=95-200', 95, 99)):
+            response = self.get(range=header)
+            self.assertEqual(response.status_code, 206, header)
+            self.assertEqual(self.body(response), self.content[start:end + 1], header)
+            self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/100', header)
+            self.assertEqual(response['Content-Length'], str(end - start + 1), header)
+
+    def test_range_not_satisfiable(self):
+        response = self.get(range='bytes=100-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_multiple_ranges_served_in_full(self):
+        response = self.get(range='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+    def test_if_range(self):
+        full = self.get()
+        etag, last_modified = full['ETag'], full['Last-Modified']
+
+        self.assertEqual(self.get(range='bytes=0-9', if_range=etag).status_code, 206)
+        self.assertEqual(self.get(range='bytes=0-9', if_range=last_modified).status_code, 206)
+        # 客户端持有的版本已过期：返回完整文件
+        response = self.get(range='bytes=0-9', if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(self.get(range='bytes=0-9', if_range='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200)
+
+    def test_if_none_match(self):
+        etag = self.get()['ETag']
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_head(self):
+        response = self.client.head(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response.content, b'')
+
+    def test_path_traversal(self):
+        self.assertEqual(self.client.get('/media/cas/../db.sqlite3').status_code, 404)
+        self.assertEqual(self.client.get('/media/cas/aa/../../settings.py').status_code, 404)
@@ -4,4 +4,9 @@ from . import views
 urlpatterns = [
     path('image/', views.upload_image, name='upload_image'),
     path('video/', views.upload_video, name='upload_video'),
+    path('blobs/<str:sha256>/', views.blob_detail, name='upload_blob_detail'),
+    path('sessions/', views.create_upload_session, name='upload_session_create'),
+    path('sessions/<uuid:session_id>/', views.upload_session_detail, name='upload_session_detail'),
+    path('sessions/<uuid:session_id>/parts/<int:number>/', views.upload_session_part, name='upload_session_part'),
+    path('sessions/<uuid:session_id>/complete/', views.complete_upload_session, name='upload_session_complete'),
 ] 
\ No newline at end of file
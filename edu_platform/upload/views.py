@@ -3,11 +3,64 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, parser_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
+import io
+import logging
 import os
 from django.conf import settings
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-import uuid
+import math
+import time
+from django.db import IntegrityError
+from django.http import Http404
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+from .cas import CAS_PREFIX, blob_name, find_blob, has_reference, is_protected, register_blob, store_upload
+from .models import UploadSession, UploadPart
+from .resumable import PartError, write_part, assemble, discard_parts, lost_parts, verify_parts
+from .serving import serve_file
+from .streaming import SavedUpload, throughput
+
+logger = logging.getLogger(__name__)
+
+# 允许上传的视频类型和大小上限
+VIDEO_CONTENT_TYPES = ['video/mp4', 'video/quicktime', 'video/x-msvideo']
+VIDEO_MAX_SIZE = 500 * 1024 * 1024  # 500MB
+
+def _blob_data(blob, created):
+    """媒体文件的返回数据：path 为存储路径，可直接写入封面、视频等字段"""
+    return {
+        'url': default_storage.url(blob.path),
+        'path': blob.path,
+        'size': blob.size,
+        'sha256': blob.sha256,
+        'deduplicated': not created,
+    }
+
+@require_http_methods(['GET', 'HEAD'])
+def blob_media(request, name):
+    """
+    公开发送按内容寻址的文件（封面、头像、缩略图、宣传视频等），支持 Range；
+    课时视频引用的文件只能通过带播放令牌的 /api/videos/media/ 访问
+    """
+    storage_name = CAS_PREFIX + name
+    if '..' in name.split('/') or is_protected(storage_name):
+        raise Http404
+    # 文件名由内容决定，内容永不改变
+    return serve_file(request, storage_name, immutable=True)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def blob_detail(request, sha256):
+    """
+    按 SHA-256 查询已存在的媒体文件，客户端可在上传前先查询；
+    只有已经持有该文件的用户拿到地址，其他用户只得知文件已存在，仍需上传内容（上传时直接复用已有文件）
+    """
+    blob = find_blob(sha256)
+    if blob is None:
+        return Response({'error': '文件不存在'}, status=status.HTTP_404_NOT_FOUND)
+    if not has_reference(request.user, blob.path):
+        return Response({'sha256': blob.sha256, 'exists': True})
+    return Response(_blob_data(blob, False))
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -31,20 +84,10 @@ def upload_image(request):
     if file.size > max_size:
         return Response({'error': '图片大小不能超过10MB'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # 生成唯一文件名
-    ext = os.path.splitext(file.name)[1]
-    file_name = f"{uuid.uuid4().hex}{ext}"
-    
-    # 构建保存路径
-    upload_path = os.path.join('upload', 'images', file_name)
-    
-    # 保存文件
-    path = default_storage.save(upload_path, ContentFile(file.read()))
-    
-    # 构建URL
-    url = default_storage.url(path)
+    # 按内容寻址保存，同样的图片只存一份
+    blob, created = store_upload(file)
     
-    return Response({'url': url}, status=status.HTTP_201_CREATED)
+    return Response(_blob_data(blob, created), status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -59,26 +102,208 @@ def upload_video(request):
     file = request.FILES['file']
     
     # 验证文件类型
-    allowed_types = ['video/mp4', 'video/quicktime', 'video/x-msvideo']
-    if file.content_type not in allowed_types:
+    if file.content_type not in VIDEO_CONTENT_TYPES:
         return Response({'error': '只允许上传MP4、MOV或AVI视频'}, status=status.HTTP_400_BAD_REQUEST)
     
     # 限制文件大小
-    max_size = 500 * 1024 * 1024  # 500MB
-    if file.size > max_size:
+    if file.size > VIDEO_MAX_SIZE:
         return Response({'error': '视频大小不能超过500MB'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # 生成唯一文件名
-    ext = os.path.splitext(file.name)[1]
-    file_name = f"{uuid.uuid4().hex}{ext}"
+    # 按内容寻址、按块写入存储，内存占用与视频大小无关；同样的视频只存一份
+    start = time.perf_counter()
+    blob, created = store_upload(file)
+    
+    data = _blob_data(blob, created)
+    # 重复内容没有写入新文件，耗时和吞吐量没有意义，由 deduplicated 标明
+    if created:
+        saved = SavedUpload(blob.path, blob.size, blob.sha256, time.perf_counter() - start)
+        data['elapsed'] = round(saved.seconds, 3)
+        data['throughput_mb_s'] = round(throughput(saved), 2)
+    return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+def _session_status(session):
+    """会话状态：已接收的分片与缺失的分片序号"""
+    parts = list(session.parts.values('number', 'size', 'sha256'))
+    received = {part['number'] for part in parts}
+    data = {
+        'id': str(session.id),
+        'filename': session.filename,
+        'status': session.status,
+        'total_size': session.total_size,
+        'part_size': session.part_size,
+        'part_count': session.part_count,
+        'received_parts': parts,
+        'missing_parts': [number for number in range(1, session.part_count + 1) if number not in received],
+    }
+    if session.status == 'completed':
+        data['url'] = default_storage.url(session.path)
+    if session.error:
+        data['error'] = session.error
+    return data
+
+def _get_session(request, session_id):
+    try:
+        return UploadSession.objects.get(pk=session_id, user=request.user)
+    except UploadSession.DoesNotExist:
+        return None
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_upload_session(request):
+    """
+    创建分片上传会话
+    """
+    filename = request.data.get('filename')
+    content_type = request.data.get('content_type')
+    sha256 = str(request.data.get('sha256', '')).lower()
+    try:
+        total_size = int(request.data.get('size'))
+        part_size = int(request.data.get('part_size', settings.UPLOAD_PART_SIZE))
+    except (TypeError, ValueError):
+        return Response({'error': '文件大小和分片大小必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not filename:
+        return Response({'error': '没有提供文件名'}, status=status.HTTP_400_BAD_REQUEST)
+    if content_type not in VIDEO_CONTENT_TYPES:
+        return Response({'error': '只允许上传MP4、MOV或AVI视频'}, status=status.HTTP_400_BAD_REQUEST)
+    if total_size <= 0 or total_size > VIDEO_MAX_SIZE:
+        return Response({'error': '视频大小不能超过500MB'}, status=status.HTTP_400_BAD_REQUEST)
+    if not settings.UPLOAD_PART_MIN_SIZE <= part_size <= settings.UPLOAD_PART_MAX_SIZE:
+        return Response({'error': f'分片大小须在 {settings.UPLOAD_PART_MIN_SIZE} 到 {settings.UPLOAD_PART_MAX_SIZE} 字节之间'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256):
+        return Response({'error': '需要提供整个文件的 SHA-256'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # 同样内容已经存在且用户已持有时直接返回，无需上传；否则仍需上传并校验内容后才能引用
+    blob = find_blob(sha256)
+    if blob is not None and has_reference(request.user, blob.path):
+        return Response(_blob_data(blob, False))
+    
+    session = UploadSession.objects.create(
+        user=request.user,
+        filename=filename,
+        content_type=content_type,
+        total_size=total_size,
+        part_size=part_size,
+        part_count=math.ceil(total_size / part_size),
+        sha256=sha256,
+    )
+    return Response(_session_status(session), status=status.HTTP_201_CREATED)
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_session_detail(request, session_id):
+    """
+    查询分片上传进度；DELETE 放弃上传
+    """
+    session = _get_session(request, session_id)
+    if session is None:
+        return Response({'error': '上传会话不存在'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if request.method == 'DELETE':
+        discard_parts(session)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    return Response(_session_status(session))
+
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+def upload_session_part(request, session_id, number):
+    """
+    上传一个分片，请求体为分片原始字节，X-Part-SHA256 头为分片的 SHA-256
+    """
+    session = _get_session(request, session_id)
+    if session is None:
+        return Response({'error': '上传会话不存在'}, status=status.HTTP_404_NOT_FOUND)
+    if session.status != 'uploading':
+        return Response({'error': '上传会话已结束'}, status=status.HTTP_409_CONFLICT)
+    if not 1 <= number <= session.part_count:
+        return Response({'error': f'分片序号须在 1 到 {session.part_count} 之间'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    part_sha256 = request.headers.get('X-Part-SHA256')
+    if not part_sha256:
+        return Response({'error': '缺少 X-Part-SHA256 头'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # 直接从请求流按块写入磁盘，不经过 request.data 解析
+    try:
+        size, digest = write_part(session, number, request.stream or io.BytesIO(), part_sha256)
+    except PartError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        UploadPart.objects.update_or_create(
+            session=session, number=number,
+            defaults={'size': size, 'sha256': digest},
+        )
+    except IntegrityError:
+        # 同一分片被并发重复上传，文件内容一致，保留已有记录
+        pass
+    # 刷新会话活跃时间，避免被清理
+    UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+    
+    return Response({'number': number, 'size': size, 'sha256': digest})
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_upload_session(request, session_id):
+    """
+    合并分片并校验整个文件
+    """
+    session = _get_session(request, session_id)
+    if session is None:
+        return Response({'error': '上传会话不存在'}, status=status.HTTP_404_NOT_FOUND)
+    if session.status == 'completed':
+        return Response(_session_status(session))
+    
+    received = session.parts.count()
+    if received != session.part_count:
+        return Response(_session_status(session), status=status.HTTP_409_CONFLICT)
     
-    # 构建保存路径
-    upload_path = os.path.join('upload', 'videos', file_name)
+    # 用条件更新抢占合并，避免重复提交时并发合并
+    if not UploadSession.objects.filter(pk=session.pk, status='uploading').update(status='assembling'):
+        return Response({'error': '上传会话正在合并或已结束'}, status=status.HTTP_409_CONFLICT)
     
-    # 保存文件
-    path = default_storage.save(upload_path, ContentFile(file.read()))
+    # 同样内容已经存在时不再写入，但仍要校验上传的分片确实是这份内容，才能引用已有文件
+    blob = find_blob(session.sha256)
+    if blob is None:
+        ext = os.path.splitext(session.filename)[1]
+        upload_path = blob_name(session.sha256, ext)
+    try:
+        if blob is None:
+            name = assemble(session, upload_path)
+            blob, created = register_blob(session.sha256, name, session.total_size, session.content_type)
+        else:
+            verify_parts(session)
+        session.path = blob.path
+    except PartError as e:
+        # 整体校验失败：分片已不可信，需要重新上传
+        session.parts.all().delete()
+        discard_parts(session)
+        session.status = 'uploading'
+        session.error = str(e)
+        session.save(update_fields=['status', 'error', 'updated_at'])
+        return Response(_session_status(session), status=status.HTTP_400_BAD_REQUEST)
+    except OSError:
+        # 磁盘空间不足、存储暂时不可用等：已收到的分片仍然有效，回到上传中，客户端补传丢失的分片后重新提交
+        logger.exception('上传会话 %s 合并分片失败', session.pk)
+        session.parts.filter(number__in=lost_parts(session)).delete()
+        session.status = 'uploading'
+        session.error = '合并分片失败，请稍后重新提交'
+        session.save(update_fields=['status', 'error', 'updated_at'])
+        return Response(_session_status(session), status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception:
+        session.status = 'failed'
+        session.error = '合并分片失败'
+        session.save(update_fields=['status', 'error', 'updated_at'])
+        raise
     
-    # 构建URL
-    url = default_storage.url(path)
+    discard_parts(session)
+    session.status = 'completed'
+    session.error = ''
+    session.save(update_fields=['path', 'status', 'error', 'updated_at'])
     
-    return Response({'url': url}, status=status.HTTP_201_CREATED) 
\ No newline at end of file
+    data = _session_status(session)
+    data.update(_blob_data(blob, False))
+    return Response(data)
@@ -14,13 +14,23 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from django.views.static import serve
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework import permissions
+from .metrics import metrics_view
+from .upload.cas import CAS_PREFIX
+from .upload.views import blob_media
+from videos.packaging import HLS_PREFIX
+
+# 不由静态文件服务直接发送的媒体目录
+PROTECTED_MEDIA_PREFIXES = (CAS_PREFIX, HLS_PREFIX, 'videos/')
 
 schema_view = get_schema_view(
    openapi.Info(
@@ -44,12 +54,23 @@ urlpatterns = [
     path('api/comments/', include('comments.urls')),
     path('api/live/', include('live.urls')),
     path('api/upload/', include('edu_platform.upload.urls')),
+    path('api/metrics/', metrics_view, name='metrics'),
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
 
-# 在开发环境中提供媒体文件服务
+# 按内容寻址的文件经过权限检查后发送，课时视频只能通过播放令牌访问
+urlpatterns += [
+    path(f'{settings.MEDIA_URL.lstrip("/")}{CAS_PREFIX}<path:name>', blob_media, name='blob-media'),
+]
+
+# 在开发环境中提供媒体文件服务；cas/、hls/ 和旧的视频文件目录不直接公开
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += [
+        re_path(
+            rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?!{"|".join(map(re.escape, PROTECTED_MEDIA_PREFIXES))})(?P<path>.*)$',
+            serve, {'document_root': settings.MEDIA_ROOT},
+        ),
+    ]
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
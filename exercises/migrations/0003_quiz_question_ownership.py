@@ -0,0 +1,59 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import BigIntegerField, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def backfill_quiz_ownership(apps, schema_editor):
+    """根据课时回填测验与问题的课程与讲师，未关联课时的测验归属其创建者"""
+    Lesson = apps.get_model('courses', 'Lesson')
+    Quiz = apps.get_model('exercises', 'Quiz')
+    Question = apps.get_model('exercises', 'Question')
+    lesson = Lesson.objects.filter(pk=OuterRef('lesson_id'))
+    Quiz.objects.update(
+        course_id=Subquery(lesson.values('course_id')[:1]),
+        owner_id=Coalesce(
+            Subquery(lesson.values('owner_id')[:1]), F('instructor_id'), output_field=BigIntegerField()
+        ),
+    )
+    quiz = Quiz.objects.filter(pk=OuterRef('quiz_id'))
+    Question.objects.update(
+        course_id=Subquery(quiz.values('course_id')[:1]),
+        owner_id=Subquery(quiz.values('owner_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courses', '0006_lesson_ownership'),
+        ('exercises', '0002_quiz_instructor_alter_quiz_lesson'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='course',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='courses.course', verbose_name='所属课程'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='owner',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='归属讲师'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='course',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='courses.course', verbose_name='所属课程'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='owner',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='归属讲师'),
+        ),
+        migrations.RunPython(backfill_quiz_ownership, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,10 @@
 from django.db import models
-from courses.models import Lesson
+from courses.models import Course, Lesson
+from courses.ownership import OwnedContentMixin
 from accounts.models import User
 from django.conf import settings
 
-class Quiz(models.Model):
+class Quiz(OwnedContentMixin, models.Model):
     """测验"""
     lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, related_name='quiz', 
                                null=True, blank=True, verbose_name='关联课时')
@@ -20,14 +21,33 @@ class Quiz(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     
+    # 冗余字段，由 save() 自动维护；未关联课时的测验归属其创建者
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, editable=False, 
+                               related_name='+', verbose_name='所属课程')
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, editable=False, 
+                              related_name='+', verbose_name='归属讲师')
+    
+    ownership_source_fields = ('lesson', 'instructor')
+    
     class Meta:
         verbose_name = '测验'
         verbose_name_plural = '测验'
     
     def __str__(self):
         return self.title
+    
+    def resolve_ownership(self):
+        """根据关联课时计算 (course_id, owner_id)"""
+        if self.lesson_id is None:
+            return None, self.instructor_id
+        row = Lesson.objects.filter(pk=self.lesson_id).values_list('course_id', 'owner_id').first()
+        return row or (None, self.instructor_id)
+    
+    def ownership_changed(self):
+        """同步测验下问题的冗余字段"""
+        self.questions.update(course_id=self.course_id, owner_id=self.owner_id)
 
-class Question(models.Model):
+class Question(OwnedContentMixin, models.Model):
     """问题"""
     QUESTION_TYPE_CHOICES = (
         ('single_choice', '单选题'),
@@ -43,6 +63,14 @@ class Question(models.Model):
     explanation = models.TextField(blank=True, null=True, verbose_name='解释')
     order = models.PositiveIntegerField(default=0, verbose_name='排序')
     
+    # 冗余字段，由 save() 自动维护
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, editable=False, 
+                               related_name='+', verbose_name='所属课程')
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, editable=False, 
+                              related_name='+', verbose_name='归属讲师')
+    
+    ownership_source_fields = ('quiz',)
+    
     class Meta:
         verbose_name = '问题'
         verbose_name_plural = '问题'
@@ -50,6 +78,11 @@ class Question(models.Model):
     
     def __str__(self):
         return f"{self.quiz.title} - {self.question_text[:50]}"
+    
+    def resolve_ownership(self):
+        """根据所属测验计算 (course_id, owner_id)"""
+        row = Quiz.objects.filter(pk=self.quiz_id).values_list('course_id', 'owner_id').first()
+        return row or (None, None)
 
 class Choice(models.Model):
     """选项"""
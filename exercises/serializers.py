@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from .models import Quiz, Question, Choice, QuizAttempt, Answer
 from courses.serializers import LessonSerializer
-from accounts.serializers import UserSerializer
+from accounts.serializers import UserCardSerializer
+from edu_platform.dataloader import BatchListSerializer
+from courses.ownership import is_owner
+from courses.membership import is_enrolled
 
 class ChoiceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -65,7 +68,7 @@ class QuizCreateUpdateSerializer(serializers.ModelSerializer):
             return value
             
         user = self.context['request'].user
-        if value.section.course.instructor != user and not user.is_staff:
+        if not is_owner(user, value):
             raise serializers.ValidationError("您没有权限为此课时创建测验")
         return value
         
@@ -139,14 +142,8 @@ class QuestionCreateUpdateSerializer(serializers.ModelSerializer):
         """确保用户是课程的创建者"""
         user = self.context['request'].user
         
-        # 如果Quiz没有关联课时，则检查Quiz的创建者是否是当前用户
-        if value.lesson is None:
-            if value.instructor != user and not user.is_staff:
-                raise serializers.ValidationError("您没有权限为此测验添加问题")
-            return value
-            
-        # 如果Quiz关联了课时，则检查课时所属课程的创建者是否是当前用户
-        if value.lesson.section.course.instructor != user and not user.is_staff:
+        # 测验的归属讲师：关联课时时为课程讲师，否则为测验创建者
+        if not is_owner(user, value):
             raise serializers.ValidationError("您没有权限为此测验添加问题")
         return value
 
@@ -159,15 +156,8 @@ class ChoiceCreateUpdateSerializer(serializers.ModelSerializer):
         """确保用户是课程的创建者"""
         user = self.context['request'].user
         
-        # 处理quiz.lesson为None的情况
-        if value.quiz.lesson is None:
-            # 如果测验没有关联课时，则检查测验创建者是否是当前用户
-            if value.quiz.instructor != user and not user.is_staff:
-                raise serializers.ValidationError("您没有权限为此问题添加选项")
-            return value
-        
-        # 正常检查课时所属课程的创建者
-        if value.quiz.lesson.section.course.instructor != user and not user.is_staff:
+        # 问题上冗余了归属讲师，无需再经 quiz.lesson.section.course 逐级查询
+        if not is_owner(user, value):
             raise serializers.ValidationError("您没有权限为此问题添加选项")
         return value
 
@@ -260,12 +250,13 @@ class AnswerCreateUpdateSerializer(serializers.ModelSerializer):
         return answer
 
 class QuizAttemptSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserCardSerializer()
     quiz = QuizSerializer(read_only=True)
     answers = AnswerSerializer(many=True, read_only=True)
     
     class Meta:
         model = QuizAttempt
+        list_serializer_class = BatchListSerializer
         fields = ['id', 'user', 'quiz', 'start_time', 'end_time', 'status',
                  'score', 'passed', 'attempt_number', 'answers']
 
@@ -289,9 +280,8 @@ class QuizAttemptCreateSerializer(serializers.ModelSerializer):
                 # 这里默认任何用户都可以参加无课时关联的测验（可根据需求调整）
                 pass
         else:
-            # 验证用户是否有权限参加测验（关联了课时的情况）
-            course = quiz.lesson.section.course
-            if not course.is_free and not course.enrollments.filter(student=user).exists():
+            # 验证用户是否有权限参加测验（关联了课时的情况），已报名时无需再加载课程
+            if not is_enrolled(user, quiz.course_id) and not quiz.course.is_free:
                 raise serializers.ValidationError("您需要先报名课程才能参加测验")
         
         # 检查测验次数限制
@@ -4,7 +4,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
 from django.db.models import Sum, Avg, Count, Q
-from courses.views import IsInstructorOrReadOnly
+from courses.ownership import is_owner
+from courses.membership import enrolled_course_ids
 from .models import Quiz, Question, Choice, QuizAttempt, Answer
 from .serializers import (
     QuizSerializer,
@@ -28,23 +29,9 @@ class IsInstructorOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         
-        # 处理Quiz对象
-        if hasattr(obj, 'lesson'):
-            if obj.lesson is None:
-                # 如果测验没有关联课时，检查创建者权限
-                return obj.instructor == request.user or request.user.is_staff
-            # 有关联课时，检查课时所属课程创建者权限
-            return obj.lesson.section.course.instructor == request.user or request.user.is_staff
-        
-        # 处理Question或Choice对象
-        elif hasattr(obj, 'quiz') and hasattr(obj.quiz, 'lesson'):
-            if obj.quiz.lesson is None:
-                # 如果测验没有关联课时，检查创建者权限
-                return obj.quiz.instructor == request.user or request.user.is_staff
-            # 有关联课时，检查课时所属课程创建者权限
-            return obj.quiz.lesson.section.course.instructor == request.user or request.user.is_staff
-        
-        return False
+        # Quiz / Question 直接读取冗余的归属讲师，Choice 通过所属问题查询一次；
+        # 未关联课时的测验归属其创建者
+        return is_owner(request.user, obj)
 
 class QuizViewSet(viewsets.ModelViewSet):
     """测验视图集"""
@@ -66,16 +53,10 @@ class QuizViewSet(viewsets.ModelViewSet):
             
         if user.user_type == 'teacher':
             # 返回教师创建的测验或与教师相关课程关联的测验
-            return Quiz.objects.filter(
-                Q(instructor=user) | 
-                Q(lesson__section__course__instructor=user)
-            ).distinct()
+            return Quiz.objects.filter(Q(instructor=user) | Q(owner=user))
             
-        # 学生只能看到已报名课程的测验
-        enrolled_courses = user.enrolled_courses.all()
-        return Quiz.objects.filter(
-            Q(lesson__section__course__in=enrolled_courses)
-        ).distinct()
+        # 学生只能看到已报名课程的测验，报名课程ID从缓存取出，不再使用子查询
+        return Quiz.objects.filter(course_id__in=enrolled_course_ids(user))
     
     def get_serializer_class(self):
         user = self.request.user
@@ -288,10 +269,8 @@ class QuizAttemptViewSet(viewsets.ModelViewSet):
             return QuizAttempt.objects.filter(user=user)
         # 教师可以查看自己课程的测验尝试以及自己创建的不关联课时的测验
         elif user.user_type == 'teacher':
-            return QuizAttempt.objects.filter(
-                Q(quiz__lesson__section__course__instructor=user) |  # 关联课时的测验
-                Q(quiz__instructor=user, quiz__lesson__isnull=True)   # 不关联课时的测验
-            )
+            # 测验的归属讲师已涵盖关联课时与不关联课时两种情况
+            return QuizAttempt.objects.filter(quiz__owner=user)
         # 管理员可以查看所有记录
         return QuizAttempt.objects.all()
     
@@ -334,18 +313,18 @@ class QuizAttemptViewSet(viewsets.ModelViewSet):
         from django.db.models import Count, Avg
         
         course_stats = attempts.values(
-            'quiz__lesson__section__course__id',
-            'quiz__lesson__section__course__title'
+            'quiz__course__id',
+            'quiz__course__title'
         ).annotate(
             total=Count('id'),
             avg_score=Avg('score'),
-            passed=Count('id', filter=models.Q(passed=True))
-        ).order_by('quiz__lesson__section__course__id')
+            passed=Count('id', filter=Q(passed=True))
+        ).order_by('quiz__course__id')
         
         for stat in course_stats:
             courses_performance.append({
-                'course_id': stat['quiz__lesson__section__course__id'],
-                'course_title': stat['quiz__lesson__section__course__title'],
+                'course_id': stat['quiz__course__id'],
+                'course_title': stat['quiz__course__title'],
                 'total_attempts': stat['total'],
                 'average_score': round(stat['avg_score'], 2),
                 'passed_attempts': stat['passed'],
@@ -403,7 +382,7 @@ class AnswerViewSet(viewsets.ModelViewSet):
             return Answer.objects.filter(quiz_attempt__user=user)
         # 教师可以查看自己课程的答案
         elif user.user_type == 'teacher':
-            return Answer.objects.filter(quiz_attempt__quiz__lesson__section__course__instructor=user)
+            return Answer.objects.filter(question__owner=user, question__course__isnull=False)
         # 管理员可以查看所有记录
         return Answer.objects.all()
     
@@ -452,13 +431,13 @@ class AnswerViewSet(viewsets.ModelViewSet):
             return Response({"detail": "需要提供answer_id和score"}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            answer = Answer.objects.get(id=answer_id)
+            answer = Answer.objects.select_related('question', 'quiz_attempt__quiz').get(id=answer_id)
         except Answer.DoesNotExist:
             return Response({"detail": "找不到指定的答案"}, status=status.HTTP_404_NOT_FOUND)
         
         # 验证权限
         user = request.user
-        if answer.quiz_attempt.quiz.lesson.section.course.instructor != user and not user.is_staff:
+        if not is_owner(user, answer.question):
             return Response({"detail": "您无权为此答案评分"}, status=status.HTTP_403_FORBIDDEN)
         
         # 仅简答题需要手动评分
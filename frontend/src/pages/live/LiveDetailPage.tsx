@@ -10,9 +10,10 @@ import {
 } from '@ant-design/icons';
 import { useAppDispatch, useAppSelector } from '../../hooks/redux';
 import { 
-  fetchLiveEventDetail, enrollLiveEvent, fetchChatMessages,
-  sendChatMessage, startLiveEvent, endLiveEvent
+  fetchLiveEventDetail, enrollLiveEvent, fetchChatMessages, catchUpChatMessages,
+  chatMessageReceived, presenceSnapshotReceived, sendChatMessage, startLiveEvent, endLiveEvent
 } from '../../redux/slices/liveSlice';
+import { LiveChatSocket } from '../../services/liveSocket';
 import { LiveChatMessage } from '../../types';
 
 const { Title, Paragraph, Text } = Typography;
@@ -56,7 +57,7 @@ const LiveDetailPage: React.FC = () => {
   const dispatch = useAppDispatch();
   const navigate = useNavigate();
   
-  const { currentLiveEvent, chatMessages, loading, error } = useAppSelector((state) => state.live);
+  const { currentLiveEvent, chatMessages, onlineViewers, loading, error } = useAppSelector((state) => state.live);
   const { isAuthenticated, user } = useAppSelector((state) => state.auth);
   
   const [messageContent, setMessageContent] = useState('');
@@ -66,6 +67,10 @@ const LiveDetailPage: React.FC = () => {
   const [enrolling, setEnrolling] = useState(false);
   
   const chatContainerRef = useRef<HTMLDivElement>(null);
+  const chatSocketRef = useRef<LiveChatSocket | null>(null);
+  // 重连时按已有的最后一条消息补齐
+  const lastMessageIdRef = useRef(0);
+  lastMessageIdRef.current = chatMessages.length > 0 ? chatMessages[chatMessages.length - 1].id : 0;
   
   // 获取直播详情
   useEffect(() => {
@@ -74,19 +79,31 @@ const LiveDetailPage: React.FC = () => {
     }
   }, [dispatch, eventId]);
   
-  // 获取聊天记录
+  // 获取聊天记录，之后通过 WebSocket 接收新消息
   useEffect(() => {
     if (eventId && currentLiveEvent?.status === 'live') {
       dispatch(fetchChatMessages(Number(eventId)));
       
-      // 实际项目中可能需要使用WebSocket等实时通信技术来接收新消息
-      const chatInterval = setInterval(() => {
-        dispatch(fetchChatMessages(Number(eventId)));
-      }, 10000); // 每10秒轮询一次新消息
+      if (!isAuthenticated) return;
+      const socket = new LiveChatSocket(Number(eventId), {
+        onOpen: () => {
+          // 断线期间可能错过消息，连上后按最后一条补齐
+          if (lastMessageIdRef.current) {
+            dispatch(catchUpChatMessages({ eventId: Number(eventId), sinceId: lastMessageIdRef.current }));
+          }
+        },
+        onMessage: (chat) => dispatch(chatMessageReceived(chat)),
+        onSnapshot: (snapshot) => dispatch(presenceSnapshotReceived(snapshot)),
+        onError: (detail) => message.error(detail),
+      });
+      chatSocketRef.current = socket;
       
-      return () => clearInterval(chatInterval);
+      return () => {
+        socket.close();
+        chatSocketRef.current = null;
+      };
     }
-  }, [dispatch, eventId, currentLiveEvent?.status]);
+  }, [dispatch, eventId, currentLiveEvent?.status, isAuthenticated]);
   
   // 滚动到最新消息
   useEffect(() => {
@@ -120,6 +137,12 @@ const LiveDetailPage: React.FC = () => {
       return;
     }
     
+    // 优先走 WebSocket，消息会随广播回到本页面
+    if (chatSocketRef.current?.send(messageContent.trim())) {
+      setMessageContent('');
+      return;
+    }
+    
     setSendingMessage(true);
     try {
       await dispatch(sendChatMessage({ 
@@ -416,6 +439,18 @@ const LiveDetailPage: React.FC = () => {
                     <Link to={`/live/${eventId}/edit`}>编辑直播</Link>
                   </Button>
                 </Space>
+                {currentLiveEvent.status === 'live' && (
+                  <div style={{ marginTop: 16 }}>
+                    <Text strong>
+                      在线观众 {currentLiveEvent.viewer_count} 人（最高 {currentLiveEvent.max_viewer_count} 人）
+                    </Text>
+                    <Avatar.Group maxCount={20} style={{ display: 'flex', marginTop: 8 }}>
+                      {onlineViewers.map((viewer) => (
+                        <Avatar key={viewer.id} src={viewer.avatar} icon={<UserOutlined />} title={viewer.display_name} />
+                      ))}
+                    </Avatar.Group>
+                  </div>
+                )}
                 {currentLiveEvent.status === 'scheduled' && (
                   <Descriptions column={1} style={{ marginTop: 16 }}>
                     <Descriptions.Item label="RTMP推流地址">
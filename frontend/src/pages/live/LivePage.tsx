@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { useParams } from 'react-router-dom';
 import { 
   Typography, Card, Button, Row, Col, Tabs, 
@@ -12,8 +12,10 @@ import {
 import { useAppDispatch, useAppSelector } from '../../hooks/redux';
 import { 
   fetchLiveStreamDetail, startLiveStream, endLiveStream,
-  joinLiveStream, leaveLiveStream, fetchLiveAttendances
+  joinLiveStream, leaveLiveStream
 } from '../../redux/slices/videoSlice';
+import { LiveChatSocket, LivePresenceSnapshot } from '../../services/liveSocket';
+import { LiveChatMessage } from '../../types';
 
 const { Title, Paragraph, Text } = Typography;
 const { TabPane } = Tabs;
@@ -51,15 +53,16 @@ interface ChatMessage {
 const LivePage: React.FC = () => {
   const { liveId } = useParams<{ liveId: string }>();
   const dispatch = useAppDispatch();
-  const { currentLiveStream, liveAttendances, loading } = useAppSelector((state) => state.video);
+  const { currentLiveStream, loading } = useAppSelector((state) => state.video);
   const { user } = useAppSelector((state) => state.auth);
   
   const [chatMessages, setChatMessages] = useState<ChatMessage[]>([]);
   const [messageContent, setMessageContent] = useState('');
   const [isJoined, setIsJoined] = useState(false);
   const [submitting, setSubmitting] = useState(false);
-  const [socket, setSocket] = useState<WebSocket | null>(null);
-  const [socketConnected, setSocketConnected] = useState(false);
+  const socketRef = useRef<LiveChatSocket | null>(null);
+  // 讲师端的在线状态快照，由服务端定期推送，无需轮询出席记录
+  const [presence, setPresence] = useState<LivePresenceSnapshot | null>(null);
 
   // 获取直播详情
   useEffect(() => {
@@ -68,20 +71,6 @@ const LivePage: React.FC = () => {
     }
   }, [dispatch, liveId]);
   
-  // 获取出席记录（仅限教师）
-  useEffect(() => {
-    if (liveId && user?.user_type === 'teacher' && currentLiveStream?.status === 'live') {
-      dispatch(fetchLiveAttendances(Number(liveId)));
-      
-      // 每60秒刷新一次出席记录
-      const interval = setInterval(() => {
-        dispatch(fetchLiveAttendances(Number(liveId)));
-      }, 60000);
-      
-      return () => clearInterval(interval);
-    }
-  }, [dispatch, liveId, user, currentLiveStream]);
-  
   // 页面加载时自动加入直播
   useEffect(() => {
     if (liveId && currentLiveStream?.status === 'live' && !isJoined && user?.user_type === 'student') {
@@ -98,60 +87,43 @@ const LivePage: React.FC = () => {
     };
   }, [dispatch, liveId, isJoined, user]);
   
-  // 建立WebSocket连接
+  // 连接直播间：聊天、进出通知和在线状态都通过 services/liveSocket，断线自动重连
   useEffect(() => {
-    if (liveId && isJoined && currentLiveStream?.status === 'live') {
-      // 获取WebSocket URL
-      const token = localStorage.getItem('token');
-      const wsUrl = `ws://localhost:8000/ws/live/${liveId}/?token=${token}`;
-      
-      // 创建WebSocket连接
-      const newSocket = new WebSocket(wsUrl);
-      
-      // 设置WebSocket事件处理函数
-      newSocket.onopen = () => {
-        setSocketConnected(true);
-        message.success('聊天室连接成功');
-      };
-      
-      newSocket.onmessage = (event) => {
-        const data = JSON.parse(event.data);
-        
-        if (data.type === 'chat_message') {
-          // 接收到聊天消息
-          const newMessage: ChatMessage = {
-            id: Date.now(),
-            user: data.user,
-            avatar: data.avatar,
-            content: data.message,
-            time: data.time || new Date().toLocaleTimeString()
-          };
-          
-          setChatMessages(prev => [...prev, newMessage]);
-        } else if (data.type === 'user_join' || data.type === 'user_leave' || data.type === 'system_message') {
-          // 系统消息
-          message.info(data.message);
-        }
-      };
-      
-      newSocket.onclose = () => {
-        setSocketConnected(false);
-        message.warning('聊天室连接已断开');
-      };
-      
-      newSocket.onerror = (error) => {
-        console.error('WebSocket错误:', error);
-        message.error('聊天室连接错误');
-      };
-      
-      setSocket(newSocket);
-      
-      // 清理函数
-      return () => {
-        newSocket.close();
-      };
+    if (!liveId || currentLiveStream?.status !== 'live') {
+      return;
     }
-  }, [liveId, isJoined, currentLiveStream]);
+    // 学生加入后连接，讲师直接连接以接收在线状态快照
+    if (user?.user_type === 'student' && !isJoined) {
+      return;
+    }
+    
+    const toChatMessage = (item: LiveChatMessage): ChatMessage => ({
+      id: item.id,
+      user: item.user.display_name || item.user.username,
+      avatar: item.user.avatar || undefined,
+      content: item.message,
+      time: new Date(item.created_at).toLocaleTimeString()
+    });
+    
+    const liveSocket = new LiveChatSocket(Number(liveId), {
+      onMessage: (item) => {
+        setChatMessages(prev => (prev.some(m => m.id === item.id) ? prev : [...prev, toChatMessage(item)]));
+      },
+      onPresence: (roomPresence) => {
+        (roomPresence.joined || []).forEach((card) => {
+          message.info(`${card.display_name || card.username} 加入了直播间`);
+        });
+      },
+      onSnapshot: setPresence,
+      onError: (detail) => message.error(detail)
+    });
+    socketRef.current = liveSocket;
+    
+    return () => {
+      liveSocket.close();
+      socketRef.current = null;
+    };
+  }, [liveId, isJoined, currentLiveStream?.status, user?.user_type]);
   
   // 开始直播
   const handleStartLive = async () => {
@@ -222,15 +194,7 @@ const LivePage: React.FC = () => {
       return;
     }
     
-    if (socket && socketConnected) {
-      // 通过WebSocket发送消息
-      const messageData = {
-        type: 'chat_message',
-        message: messageContent,
-        time: new Date().toLocaleTimeString()
-      };
-      
-      socket.send(JSON.stringify(messageData));
+    if (socketRef.current?.send(messageContent.trim())) {
       setMessageContent('');
     } else {
       message.error('聊天室未连接，无法发送消息');
@@ -434,25 +398,28 @@ const LivePage: React.FC = () => {
     </Card>
   );
   
-  // 渲染出席记录（仅对教师显示）
-  const renderAttendanceList = () => {
+  // 渲染在线观众（仅对教师显示）
+  const renderOnlineViewers = () => {
     if (user?.user_type !== 'teacher') return null;
     
     return (
-      <Card title="出席记录" style={{ marginTop: 16 }}>
+      <Card
+        title={`在线观众 (${presence?.viewer_count ?? 0})`}
+        extra={presence ? <Text type="secondary">最高 {presence.max_viewer_count} 人</Text> : null}
+        style={{ marginTop: 16 }}
+      >
         <List
           itemLayout="horizontal"
-          dataSource={Array.isArray(liveAttendances) ? liveAttendances : []}
-          renderItem={attendance => (
+          dataSource={presence?.viewers || []}
+          renderItem={card => (
             <List.Item>
               <List.Item.Meta
-                avatar={<Avatar icon={<UserOutlined />} src={attendance.student?.avatar} />}
-                title={attendance.student?.username || '未知用户'}
-                description={`加入时间: ${new Date(attendance.join_time).toLocaleString()}`}
+                avatar={<Avatar icon={<UserOutlined />} src={card.avatar} />}
+                title={card.display_name || card.username}
               />
             </List.Item>
           )}
-          locale={{ emptyText: '暂无学生加入直播' }}
+          locale={{ emptyText: '暂无学生在线' }}
         />
       </Card>
     );
@@ -481,7 +448,7 @@ const LivePage: React.FC = () => {
         </Col>
       </Row>
       
-      {user?.user_type === 'teacher' && renderAttendanceList()}
+      {user?.user_type === 'teacher' && renderOnlineViewers()}
     </div>
   );
 };
@@ -2,7 +2,7 @@ import React, { useEffect } from 'react';
 import { Typography, List, Avatar, Card, Button, Badge, Spin, Empty, Space } from 'antd';
 import { 
   UserOutlined, MessageOutlined, LikeOutlined, 
-  BellOutlined, CheckOutlined, ReadOutlined
+  BellOutlined, CheckOutlined, ReadOutlined, VideoCameraOutlined
 } from '@ant-design/icons';
 import { useAppDispatch, useAppSelector } from '../../hooks/redux';
 import { 
@@ -57,6 +57,8 @@ const NotificationsPage: React.FC = () => {
         return <LikeOutlined style={{ color: '#eb2f96' }} />;
       case 'course':
         return <ReadOutlined style={{ color: '#faad14' }} />;
+      case 'live':
+        return <VideoCameraOutlined style={{ color: '#f5222d' }} />;
       case 'system':
         return <BellOutlined style={{ color: '#722ed1' }} />;
       default:
@@ -74,6 +76,9 @@ const NotificationsPage: React.FC = () => {
     } else if (notification_type === 'course') {
       // 跳转到课程页面
       return '/courses';
+    } else if (notification_type === 'live' && notification.object_id) {
+      // 开播提醒跳转到直播详情
+      return `/live/${notification.object_id}`;
     }
     
     return '#';
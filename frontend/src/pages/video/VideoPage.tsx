@@ -166,7 +166,7 @@ const VideoPage: React.FC = () => {
           <div style={{ position: 'relative', backgroundColor: '#000' }}>
             <video
               ref={videoRef}
-              src={currentVideo.file}
+              src={currentVideo.stream_url || undefined}
               style={{ width: '100%', maxHeight: '70vh' }}
               onTimeUpdate={handleTimeUpdate}
               onLoadedMetadata={handleVideoLoaded}
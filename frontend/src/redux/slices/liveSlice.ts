@@ -1,12 +1,14 @@
 import { createSlice, createAsyncThunk, PayloadAction } from '@reduxjs/toolkit';
 import * as liveService from '../../services/liveService';
-import { LiveEvent, LiveChatMessage } from '../../types';
+import { LiveEvent, LiveChatMessage, UserCard } from '../../types';
 
 // 定义直播状态类型
 interface LiveState {
   liveEvents: LiveEvent[];
   currentLiveEvent: LiveEvent | null;
   chatMessages: LiveChatMessage[];
+  // 讲师端由 WebSocket 在线状态快照更新
+  onlineViewers: UserCard[];
   loading: boolean;
   error: string | null;
   totalEvents: number;
@@ -19,6 +21,7 @@ const initialState: LiveState = {
   liveEvents: [],
   currentLiveEvent: null,
   chatMessages: [],
+  onlineViewers: [],
   loading: false,
   error: null,
   totalEvents: 0,
@@ -26,6 +29,15 @@ const initialState: LiveState = {
   currentPage: 1
 };
 
+// 按 id 合并消息：WebSocket 推送和 REST 补齐可能返回同一条消息
+const mergeChatMessages = (state: LiveState, messages: LiveChatMessage[]) => {
+  const known = new Set(state.chatMessages.map((item) => item.id));
+  const added = messages.filter((item) => !known.has(item.id));
+  if (added.length > 0) {
+    state.chatMessages = [...state.chatMessages, ...added].sort((a, b) => a.id - b.id);
+  }
+};
+
 // 异步 Thunks
 // 获取直播列表
 export const fetchLiveEvents = createAsyncThunk(
@@ -153,6 +165,19 @@ export const fetchChatMessages = createAsyncThunk(
   }
 );
 
+// 补齐断线期间错过的聊天消息
+export const catchUpChatMessages = createAsyncThunk(
+  'live/catchUpChatMessages',
+  async ({ eventId, sinceId }: { eventId: number, sinceId: number }, { rejectWithValue }) => {
+    try {
+      const response = await liveService.getLiveChatMessages(eventId, sinceId);
+      return response.results || [];
+    } catch (error: any) {
+      return rejectWithValue(error.response?.data?.detail || '获取聊天消息失败');
+    }
+  }
+);
+
 // 发送聊天消息
 export const sendChatMessage = createAsyncThunk(
   'live/sendChatMessage',
@@ -266,6 +291,21 @@ const liveSlice = createSlice({
     },
     clearChatMessages: (state) => {
       state.chatMessages = [];
+    },
+    // WebSocket 推送的新消息
+    chatMessageReceived: (state, action: PayloadAction<LiveChatMessage>) => {
+      mergeChatMessages(state, [action.payload]);
+    },
+    // 在线状态快照（仅讲师端收到）
+    presenceSnapshotReceived: (
+      state,
+      action: PayloadAction<{ viewer_count: number; max_viewer_count: number; viewers: UserCard[] }>
+    ) => {
+      state.onlineViewers = action.payload.viewers;
+      if (state.currentLiveEvent) {
+        state.currentLiveEvent.viewer_count = action.payload.viewer_count;
+        state.currentLiveEvent.max_viewer_count = action.payload.max_viewer_count;
+      }
     }
   },
   extraReducers: (builder) => {
@@ -364,8 +404,11 @@ const liveSlice = createSlice({
       })
       
       // 发送聊天消息
+      .addCase(catchUpChatMessages.fulfilled, (state, action: PayloadAction<LiveChatMessage[]>) => {
+        mergeChatMessages(state, action.payload);
+      })
       .addCase(sendChatMessage.fulfilled, (state, action: PayloadAction<LiveChatMessage>) => {
-        state.chatMessages.push(action.payload);
+        mergeChatMessages(state, [action.payload]);
       })
       
       // 开始直播
@@ -410,7 +453,9 @@ const liveSlice = createSlice({
 });
 
 // 导出 actions
-export const { clearLiveEventDetail, clearLiveEvents, clearChatMessages } = liveSlice.actions;
+export const {
+  clearLiveEventDetail, clearLiveEvents, clearChatMessages, chatMessageReceived, presenceSnapshotReceived
+} = liveSlice.actions;
 
 // 导出 reducer
 export default liveSlice.reducer; 
\ No newline at end of file
@@ -121,11 +121,12 @@ export const enrollLiveEvent = async (eventId: number) => {
   }
 };
 
-// 获取直播聊天记录
-export const getLiveChatMessages = async (eventId: number) => {
+// 获取直播聊天记录；传入 sinceId 时只返回该消息之后的消息（断线重连后补齐）
+export const getLiveChatMessages = async (eventId: number, sinceId?: number) => {
   try {
-    console.log(`API调用: 获取直播聊天记录 ID=${eventId}`);
-    const response = await api.get(`/live/events/${eventId}/chat_messages/`);
+    console.log(`API调用: 获取直播聊天记录 ID=${eventId}`, sinceId);
+    const params = sinceId ? { since_id: sinceId } : undefined;
+    const response = await api.get(`/live/events/${eventId}/chat_messages/`, { params });
     console.log(`API响应: 聊天记录获取成功 ID=${eventId}`, response.status);
     return response.data;
   } catch (error: any) {
@@ -0,0 +1,123 @@
+import api from './api';
+import { LiveChatMessage, UserCard } from '../types';
+
+// WebSocket 地址与 API 同域：http://host/api -> ws://host/ws/...
+const wsBaseUrl = () => {
+  const base = (api.defaults.baseURL || window.location.origin).replace(/\/api\/?$/, '');
+  return base.replace(/^http/, 'ws');
+};
+
+// 断线重连的等待时间（毫秒），逐次加倍
+const RECONNECT_MIN_DELAY = 1000;
+const RECONNECT_MAX_DELAY = 30000;
+// 应用自定义关闭码：未登录、无权观看、直播不存在时不再重连
+const FATAL_CLOSE_CODES = [4401, 4403, 4404];
+// 心跳间隔（毫秒），服务端超过 75 秒未收到任何消息会关闭连接
+const HEARTBEAT_INTERVAL = 30000;
+
+// 服务端按 tick 合并推送的一帧
+export interface LiveRoomPresence {
+  joined?: UserCard[];
+  left?: number[];
+}
+
+// 讲师端定期收到的在线状态快照
+export interface LivePresenceSnapshot {
+  viewer_count: number;
+  max_viewer_count: number;
+  viewers: UserCard[];
+}
+
+interface LiveChatSocketHandlers {
+  // 每次连上（包括重连）后调用，用于通过 REST 补齐错过的消息
+  onOpen?: () => void;
+  onMessage: (message: LiveChatMessage) => void;
+  onPresence?: (presence: LiveRoomPresence) => void;
+  onSnapshot?: (snapshot: LivePresenceSnapshot) => void;
+  onError?: (detail: string) => void;
+}
+
+// 直播间聊天连接：自动重连，close() 后停止
+export class LiveChatSocket {
+  private socket: WebSocket | null = null;
+  private closed = false;
+  private delay = RECONNECT_MIN_DELAY;
+  private timer: ReturnType<typeof setTimeout> | null = null;
+  private heartbeat: ReturnType<typeof setInterval> | null = null;
+
+  constructor(private eventId: number, private handlers: LiveChatSocketHandlers) {
+    this.connect();
+  }
+
+  get isOpen() {
+    return this.socket?.readyState === WebSocket.OPEN;
+  }
+
+  send(message: string) {
+    if (!this.isOpen) {
+      return false;
+    }
+    this.socket!.send(JSON.stringify({ type: 'chat_message', message }));
+    return true;
+  }
+
+  close() {
+    this.closed = true;
+    if (this.timer) {
+      clearTimeout(this.timer);
+    }
+    this.stopHeartbeat();
+    this.socket?.close();
+  }
+
+  private stopHeartbeat() {
+    if (this.heartbeat) {
+      clearInterval(this.heartbeat);
+      this.heartbeat = null;
+    }
+  }
+
+  private connect() {
+    const token = localStorage.getItem('token') || '';
+    const url = `${wsBaseUrl()}/ws/live/${this.eventId}/?token=${encodeURIComponent(token)}`;
+    const socket = new WebSocket(url);
+    this.socket = socket;
+
+    socket.onopen = () => {
+      this.delay = RECONNECT_MIN_DELAY;
+      this.stopHeartbeat();
+      this.heartbeat = setInterval(() => {
+        if (this.isOpen) {
+          this.socket!.send(JSON.stringify({ type: 'ping' }));
+        }
+      }, HEARTBEAT_INTERVAL);
+      this.handlers.onOpen?.();
+    };
+    socket.onmessage = (event) => {
+      let data: any;
+      try {
+        data = JSON.parse(event.data);
+      } catch {
+        return;
+      }
+      if (data.type === 'batch') {
+        (data.messages || []).forEach((item: LiveChatMessage) => this.handlers.onMessage(item));
+        if (data.presence) {
+          this.handlers.onPresence?.(data.presence);
+        }
+      } else if (data.type === 'presence') {
+        this.handlers.onSnapshot?.(data);
+      } else if (data.type === 'error') {
+        this.handlers.onError?.(data.detail);
+      }
+    };
+    socket.onclose = (event) => {
+      this.stopHeartbeat();
+      if (this.closed || FATAL_CLOSE_CODES.includes(event.code)) {
+        return;
+      }
+      this.timer = setTimeout(() => this.connect(), this.delay);
+      this.delay = Math.min(this.delay * 2, RECONNECT_MAX_DELAY);
+    };
+  }
+}
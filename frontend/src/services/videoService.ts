@@ -7,8 +7,11 @@ export const getVideoDetail = async (videoId: number) => {
   return response.data;
 };
 
-// 观看视频并更新进度
-export const watchVideo = async (videoId: number, watchData?: { watched_duration: number, last_position: number, completed: boolean }) => {
+// 观看视频并更新进度；ranges 为本次心跳期间播放过的区间 [[开始秒, 结束秒], ...]
+export const watchVideo = async (
+  videoId: number,
+  watchData?: { watched_duration?: number, last_position: number, completed: boolean, ranges?: [number, number][] }
+) => {
   if (watchData) {
     const response = await api.post(`/videos/videos/${videoId}/watch/`, watchData);
     return response.data;
@@ -58,15 +61,15 @@ export const endLiveStreaming = async (liveId: number) => {
   }
 };
 
-// 加入直播（学生操作）
+// 加入直播（学生操作）：记录出席，未报名时自动报名
 export const joinLiveStreaming = async (liveId: number) => {
   try {
-    console.log(`API调用: 报名直播 ID=${liveId} (使用live API)`);
-    const response = await api.post(`/live/events/${liveId}/enroll/`);
-    console.log(`API响应: 直播报名成功 ID=${liveId}`, response.status);
+    console.log(`API调用: 加入直播 ID=${liveId} (使用live API)`);
+    const response = await api.post(`/live/events/${liveId}/join/`);
+    console.log(`API响应: 加入直播成功 ID=${liveId}`, response.status);
     return response.data;
   } catch (error: any) {
-    console.error(`API错误: 报名直播失败 ID=${liveId}`, error.response?.status);
+    console.error(`API错误: 加入直播失败 ID=${liveId}`, error.response?.status);
     throw error;
   }
 };
@@ -75,7 +78,6 @@ export const joinLiveStreaming = async (liveId: number) => {
 export const leaveLiveStreaming = async (liveId: number) => {
   try {
     console.log(`API调用: 离开直播 ID=${liveId} (使用live API)`);
-    // 注意：后端可能尚未实现该接口，可能需要创建
     const response = await api.post(`/live/events/${liveId}/leave/`);
     console.log(`API响应: 离开直播成功 ID=${liveId}`, response.status);
     return response.data;
@@ -89,7 +91,6 @@ export const leaveLiveStreaming = async (liveId: number) => {
 export const getLiveStreamingAttendances = async (liveId: number) => {
   try {
     console.log(`API调用: 获取直播出席记录 ID=${liveId} (使用live API)`);
-    // 注意：后端可能尚未实现该接口，可能需要创建
     const response = await api.get(`/live/events/${liveId}/attendances/`);
     console.log(`API响应: 获取出席记录成功 ID=${liveId}`, response.status);
     return response.data;
@@ -99,6 +100,12 @@ export const getLiveStreamingAttendances = async (liveId: number) => {
   }
 };
 
+// 获取视频观看热力图（课程讲师）
+export const getVideoHeatmap = async (videoId: number) => {
+  const response = await api.get(`/videos/videos/${videoId}/heatmap/`);
+  return response.data;
+};
+
 // 获取视频观看历史
 export const getVideoWatchHistory = async () => {
   const response = await api.get('/videos/watch-history/');
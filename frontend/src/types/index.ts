@@ -14,6 +14,20 @@ export interface User {
   teacher_profile?: TeacherProfile;
 }
 
+// 嵌套在课程、评论、通知等数据中的用户名片
+export interface UserCard {
+  id: number;
+  username: string;
+  display_name: string;
+  avatar?: string | null;
+  avatar_variants?: ImageVariants | null;
+  user_type: 'student' | 'teacher' | 'admin';
+  title?: string | null;
+}
+
+// 图片的 WebP 尺寸变体 {变体名: 地址}，如 card、card@2x、detail；尚未生成时为 null，使用原图
+export type ImageVariants = Record<string, string>;
+
 export interface StudentProfile {
   student_id?: string;
 }
@@ -67,9 +81,10 @@ export interface Course {
   id: number;
   title: string;
   slug: string;
-  instructor: User;
+  instructor: UserCard;
   category: Category;
   cover_image?: string;
+  cover_image_variants?: ImageVariants | null;
   video_url?: string;
   description: string;
   learning_objectives?: string;
@@ -110,7 +125,7 @@ export interface Lesson {
 
 export interface Enrollment {
   id: number;
-  student: User;
+  student: UserCard;
   course: number;
   status: 'active' | 'completed' | 'expired';
   enrolled_at: string;
@@ -132,8 +147,13 @@ export interface Video {
   id: number;
   lesson: Lesson;
   title: string;
-  file: string;
+  // 只返回给课程讲师和管理员，播放使用 stream_url / manifest_url
+  file?: string;
   thumbnail?: string;
+  sprite?: string | null;
+  sprite_interval: number;
+  stream_url: string | null;
+  manifest_url: string | null;
   duration: number;
   status: 'processing' | 'ready' | 'error';
   is_downloadable: boolean;
@@ -153,9 +173,18 @@ export interface LiveStreaming {
   stream_url?: string;
 }
 
+// 视频观看热力图：counts[i] 为第 i 段（bucket_seconds 秒）被多少名学生看过
+export interface VideoHeatmap {
+  video: number;
+  bucket_seconds: number;
+  counts: number[];
+  viewers: number;
+  updated_at: string | null;
+}
+
 export interface VideoWatchHistory {
   id: number;
-  user: User;
+  user: UserCard;
   video: Video;
   watched_duration: number;
   last_position: number;
@@ -203,7 +232,7 @@ export interface Choice {
 
 export interface QuizAttempt {
   id: number;
-  user: User;
+  user: UserCard;
   quiz: Quiz;
   start_time: string;
   end_time?: string;
@@ -228,7 +257,7 @@ export interface Answer {
 // 评论相关类型
 export interface Comment {
   id: number;
-  user: User;
+  user: UserCard;
   content: string;
   content_type: string;
   object_id: number;
@@ -244,9 +273,10 @@ export interface Comment {
 
 export interface Notification {
   id: number;
-  recipient: User;
-  sender?: User;
-  notification_type: 'comment' | 'reply' | 'like' | 'course' | 'system';
+  recipient: UserCard;
+  sender?: UserCard;
+  notification_type: 'comment' | 'reply' | 'like' | 'course' | 'live' | 'system';
+  object_id?: number | null;
   message: string;
   is_read: boolean;
   created_at: string;
@@ -255,7 +285,7 @@ export interface Notification {
 // 评分相关类型
 export interface CourseRating {
   id: number;
-  user: User;
+  user: UserCard;
   course: number;
   score: number;
   created_at: string;
@@ -267,7 +297,7 @@ export interface LiveEvent {
   id: number;
   title: string;
   description: string;
-  instructor: User;
+  instructor: UserCard;
   course: number;
   scheduled_start_time: string;
   scheduled_end_time: string;
@@ -288,7 +318,7 @@ export interface LiveEvent {
 
 export interface LiveEnrollment {
   id: number;
-  user: User;
+  user: UserCard;
   live_event: number;
   enrolled_at: string;
   attended: boolean;
@@ -297,7 +327,7 @@ export interface LiveEnrollment {
 export interface LiveChatMessage {
   id: number;
   live_event: number;
-  user: User;
+  user: UserCard;
   message: string;
   created_at: string;
 } 
\ No newline at end of file
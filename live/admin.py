@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import LiveEvent, LiveEnrollment, LiveChat
+from .models import LiveEvent, LiveEnrollment, LiveChat, LiveChatArchive, LiveAttendance, LiveSessionSummary
 
 @admin.register(LiveEvent)
 class LiveEventAdmin(admin.ModelAdmin):
@@ -11,7 +11,7 @@ class LiveEventAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('基本信息', {
-            'fields': ('title', 'description', 'instructor', 'course')
+            'fields': ('title', 'description', 'instructor', 'course', 'lesson')
         }),
         ('时间信息', {
             'fields': ('scheduled_start_time', 'scheduled_end_time', 'actual_start_time', 'actual_end_time')
@@ -37,3 +37,26 @@ class LiveChatAdmin(admin.ModelAdmin):
     list_filter = ('live_event',)
     search_fields = ('user__username', 'message', 'live_event__title')
     readonly_fields = ('created_at',)
+
+@admin.register(LiveChatArchive)
+class LiveChatArchiveAdmin(admin.ModelAdmin):
+    list_display = ('live_event', 'message_count', 'size', 'path', 'created_at')
+    search_fields = ('live_event__title',)
+    # 归档文件由 archive_live_chat 生成，只能查看或删除
+    readonly_fields = ('live_event', 'path', 'message_count', 'first_id', 'last_id', 'size', 'chunk_size', 'chunks', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(LiveAttendance)
+class LiveAttendanceAdmin(admin.ModelAdmin):
+    list_display = ('user', 'live_event', 'join_time', 'leave_time', 'duration')
+    list_filter = ('join_time',)
+    search_fields = ('user__username', 'live_event__title')
+    date_hierarchy = 'join_time'
+
+@admin.register(LiveSessionSummary)
+class LiveSessionSummaryAdmin(admin.ModelAdmin):
+    list_display = ('live_event', 'unique_attendees', 'peak_attendees', 'average_minutes', 'generated_at')
+    search_fields = ('live_event__title',)
+    date_hierarchy = 'generated_at'
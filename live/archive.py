@@ -0,0 +1,237 @@
+"""
+直播聊天归档
+
+LiveChat 只增不减，已结束的直播的消息一直留在表和 (live_event, id) 索引中。archive_live_chat 命令把结束超过
+LIVE_CHAT_ARCHIVE_AFTER 秒的直播的消息压缩写入存储，并从 LiveChat 中删除：
+
+    live/chat/<直播ID>/<最后一条消息ID>.jsonl.gz
+
+每行一条消息 {"id", "user", "message", "created_at"}（user 为用户ID，created_at 与 REST 接口格式相同），按 id 升序；
+每 LIVE_CHAT_ARCHIVE_CHUNK 条压缩为一个独立的 gzip 段（多段首尾相接仍是合法的 gzip 文件），
+LiveChatArchive.chunks 记录各段的第一条消息ID和文件内偏移。
+
+chat_messages 对已归档的直播透明地读取归档（history_page）：按 since_id / before_id 定位到所需的段，
+从该段开始流式解压，只解压一页所需的几段；用户名片在读取时批量加载，与未归档的消息格式相同，
+已删除用户的消息不返回（与删除用户时级联删除消息一致）。
+
+归档后通过 REST 新增的消息仍写入 LiveChat，读取时接在归档之后；再次运行归档时与原归档合并为新文件，
+新归档提交后删除旧文件。
+"""
+import bisect
+import collections
+import datetime
+import gzip
+import itertools
+import json
+import math
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from accounts.cards import load_cards
+
+from .chat_buffer import clear as clear_buffer
+from .models import LiveChat, LiveChatArchive, LiveEvent
+
+ARCHIVE_AFTER = datetime.timedelta(seconds=getattr(settings, 'LIVE_CHAT_ARCHIVE_AFTER', 7 * 24 * 3600))
+CHUNK_SIZE = getattr(settings, 'LIVE_CHAT_ARCHIVE_CHUNK', 500)
+ARCHIVE_PREFIX = 'live/chat/'
+# 从数据库分批读取消息的条数
+READ_BATCH = 2000
+
+_datetime_field = serializers.DateTimeField()
+
+
+def archive_name(live_event_id, last_id):
+    return f'{ARCHIVE_PREFIX}{live_event_id}/{last_id}.jsonl.gz'
+
+
+def pending_events(now=None, limit=None):
+    """需要归档的直播ID：已结束超过 ARCHIVE_AFTER 且 LiveChat 中还有消息"""
+    now = now or timezone.now()
+    ids = LiveEvent.objects.filter(
+        status='ended', actual_end_time__lte=now - ARCHIVE_AFTER, chat_messages__isnull=False,
+    ).values_list('id', flat=True).distinct().order_by('id')
+    return list(ids[:limit] if limit else ids)
+
+
+def _row(chat):
+    return {
+        'id': chat['id'],
+        'user': chat['user_id'],
+        'message': chat['message'],
+        'created_at': _datetime_field.to_representation(chat['created_at']),
+    }
+
+
+def _database_rows(live_event_id, after_id=None):
+    rows = LiveChat.objects.filter(live_event_id=live_event_id)
+    if after_id is not None:
+        rows = rows.filter(id__gt=after_id)
+    # values() 加 iterator() 逐批读取，不为每条消息建立模型实例
+    for chat in rows.order_by('id').values('id', 'user_id', 'message', 'created_at').iterator(READ_BATCH):
+        yield _row(chat)
+
+
+def _write_chunks(rows, out, chunk_size):
+    """把消息按段压缩写入 out，返回 (消息数, 第一条ID, 最后一条ID, 分段索引)"""
+    count, first_id, last_id, chunks = 0, None, None, []
+    batch = []
+
+    def flush():
+        chunks.append([batch[0]['id'], out.tell()])
+        data = ''.join(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n' for row in batch)
+        # mtime 固定为 0，同样的消息生成同样的文件
+        out.write(gzip.compress(data.encode(), mtime=0))
+        batch.clear()
+
+    for row in rows:
+        if first_id is None:
+            first_id = row['id']
+        last_id = row['id']
+        count += 1
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            flush()
+    if batch:
+        flush()
+    return count, first_id, last_id, chunks
+
+
+def archive_event(live_event_id, storage=None, chunk_size=CHUNK_SIZE):
+    """
+    归档一场直播的聊天消息并从 LiveChat 删除，返回 LiveChatArchive；没有需要归档的消息时返回 None。
+    已有归档时与之合并，生成新的归档文件
+    """
+    storage = storage or default_storage
+    previous = LiveChatArchive.objects.filter(live_event_id=live_event_id).first()
+    rows = _database_rows(live_event_id, previous.last_id if previous else None)
+    if previous is not None:
+        rows = itertools.chain(read_rows(previous, storage=storage), rows)
+
+    with tempfile.TemporaryFile() as temp:
+        count, first_id, last_id, chunks = _write_chunks(rows, temp, chunk_size)
+        if previous is not None and last_id == previous.last_id:
+            return None
+        if count == 0:
+            return None
+        size = temp.tell()
+        temp.seek(0)
+        name = archive_name(live_event_id, last_id)
+        # 上次归档在写入文件后、提交前中断时留下的同名文件
+        if storage.exists(name):
+            storage.delete(name)
+        saved = storage.save(name, File(temp))
+    if saved != name:
+        storage.delete(saved)
+        raise RuntimeError(f'无法写入 {name}')
+
+    try:
+        with transaction.atomic():
+            archive, _ = LiveChatArchive.objects.update_or_create(live_event_id=live_event_id, defaults={
+                'path': name, 'message_count': count, 'first_id': first_id, 'last_id': last_id,
+                'size': size, 'chunk_size': chunk_size, 'chunks': chunks,
+            })
+            # 直接执行一条 DELETE，不为每条消息发送 post_delete 信号；缓冲在下面统一清空
+            archived = LiveChat.objects.filter(live_event_id=live_event_id, id__lte=last_id)
+            archived._raw_delete(archived.db)
+            if previous is not None and previous.path != name:
+                transaction.on_commit(lambda: storage.delete(previous.path))
+    except Exception:
+        storage.delete(name)
+        raise
+    clear_buffer(live_event_id)
+    return archive
+
+
+def read_rows(archive, start_chunk=0, storage=None):
+    """从第 start_chunk 段开始流式解压归档，逐条返回消息（用户为ID）"""
+    storage = storage or default_storage
+    if not archive.chunks or start_chunk >= len(archive.chunks):
+        return
+    with storage.open(archive.path, 'rb') as f:
+        f.seek(archive.chunks[start_chunk][1])
+        with gzip.GzipFile(fileobj=f, mode='rb') as lines:
+            for line in lines:
+                yield json.loads(line)
+
+
+def _chunk_for(archive, message_id):
+    """包含 message_id（或其之前最近一条消息）的段"""
+    first_ids = [chunk[0] for chunk in archive.chunks]
+    return max(bisect.bisect_right(first_ids, message_id) - 1, 0)
+
+
+def rows_after(archive, since_id, count, storage=None):
+    """归档中 id > since_id 的前 count 条"""
+    page = []
+    for row in read_rows(archive, _chunk_for(archive, since_id), storage):
+        if row['id'] <= since_id:
+            continue
+        page.append(row)
+        if len(page) >= count:
+            break
+    return page
+
+
+def rows_before(archive, before_id, count, storage=None):
+    """归档中 id < before_id 的最后 count 条，按 id 升序"""
+    # 从往前足够 count 条消息的段开始解压（除最后一段外每段都是 chunk_size 条）
+    start = max(_chunk_for(archive, before_id - 1) - math.ceil(count / archive.chunk_size), 0)
+    page = collections.deque(maxlen=count)
+    for row in read_rows(archive, start, storage):
+        if row['id'] >= before_id:
+            break
+        page.append(row)
+    return list(page)
+
+
+def hydrate(live_event_id, rows):
+    """把归档中的消息转换为与 LiveChatSerializer 相同的格式（头像为相对地址），跳过已删除的用户"""
+    cards = load_cards({row['user'] for row in rows})
+    return [
+        {
+            'id': row['id'], 'live_event': live_event_id, 'user': cards[row['user']],
+            'message': row['message'], 'created_at': row['created_at'],
+        }
+        for row in rows if row['user'] in cards
+    ]
+
+
+def history_page(archive, since_id=None, before_id=None, limit=100, storage=None):
+    """
+    已归档直播的消息分页，语义与 chat_messages 相同：归档中的消息之后接归档后新增到 LiveChat 的消息，
+    返回 (与 LiveChatSerializer 相同格式的消息列表, has_more)
+    """
+    from .serializers import LiveChatSerializer
+
+    live_event_id = archive.live_event_id
+    newer = LiveChat.objects.filter(live_event_id=live_event_id, id__gt=archive.last_id)
+    if since_id is not None:
+        archived = rows_after(archive, since_id, limit + 1, storage) if since_id < archive.last_id else []
+        chats = []
+        if len(archived) <= limit:
+            chats = list(newer.filter(id__gt=since_id).order_by('id')[:limit + 1 - len(archived)])
+        has_more = len(archived) + len(chats) > limit
+        archived = archived[:limit]
+        chats = chats[:limit - len(archived)]
+    else:
+        if before_id is not None:
+            newer = newer.filter(id__lt=before_id)
+        chats = list(newer.order_by('-id')[:limit + 1])[::-1]
+        archived = []
+        if len(chats) <= limit:
+            before = archive.last_id + 1 if before_id is None else min(before_id, archive.last_id + 1)
+            archived = rows_before(archive, before, limit + 1 - len(chats), storage)
+        has_more = len(archived) + len(chats) > limit
+        # 多取的一条是最早的一条
+        if has_more and archived:
+            archived = archived[1:]
+        elif has_more:
+            chats = chats[1:]
+    return hydrate(live_event_id, archived) + list(LiveChatSerializer(chats, many=True).data), has_more
@@ -0,0 +1,92 @@
+"""
+直播出席记录的批量处理
+
+结束直播时用一条 UPDATE 关闭所有未离开的出席记录：离开时间统一为结束时刻，
+本次在线时长（分钟）由数据库按 结束时刻 - 加入时间 计算并累加到 duration，不再逐行加载和保存。
+随后生成 LiveSessionSummary（出席人数、最高同时在线人数、平均在线时长），供报表使用。
+
+出席记录每人一条，重新加入时覆盖加入时间，更早的在线区间不再保留，只凭出席记录会低估最高同时在线人数；
+因此加入时（live.sessions.join）和在线状态（live.presence）都把当时的在线人数计入 LiveEvent.max_viewer_count，
+汇总取两者中较大的值。
+"""
+from django.db.models import Avg, Count, DateTimeField, F, FloatField, Func, IntegerField, Sum, Value
+from django.db.models.functions import Cast, Floor
+from django.utils import timezone
+
+from .models import LiveAttendance, LiveEvent, LiveSessionSummary
+
+
+class SecondsBetween(Func):
+    """end - start 的秒数；各数据库计算时间差的写法不同"""
+    output_field = FloatField()
+
+    def __init__(self, start, end):
+        super().__init__(start, end)
+
+    def compile_args(self, compiler):
+        (start, start_params), (end, end_params) = (compiler.compile(e) for e in self.source_expressions)
+        return start, tuple(start_params), end, tuple(end_params)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        start, start_params, end, end_params = self.compile_args(compiler)
+        return f'EXTRACT(EPOCH FROM ({end} - {start}))', end_params + start_params
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        start, start_params, end, end_params = self.compile_args(compiler)
+        return f'((julianday({end}) - julianday({start})) * 86400.0)', end_params + start_params
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        start, start_params, end, end_params = self.compile_args(compiler)
+        return f'(TIMESTAMPDIFF(MICROSECOND, {start}, {end}) / 1000000.0)', start_params + end_params
+
+
+def minutes_since(field, moment):
+    """从 field 到 moment 经过的整分钟数（向下取整）"""
+    seconds = SecondsBetween(F(field), Value(moment, output_field=DateTimeField()))
+    return Cast(Floor(seconds / 60), IntegerField())
+
+
+def close_open_attendances(attendances, now=None):
+    """把 attendances 中仍在线的记录统一标记为在 now 离开并累加在线时长，返回关闭的记录数"""
+    now = now or timezone.now()
+    return attendances.filter(leave_time__isnull=True).update(
+        leave_time=now, duration=F('duration') + minutes_since('join_time', now),
+    )
+
+
+def peak_concurrency(intervals):
+    """[(加入时间, 离开时间)] 中最多同时在线的人数；离开时间为空视为仍在线（每人只有最近一个区间时为下限）"""
+    events = []
+    for join_time, leave_time in intervals:
+        events.append((join_time, 1))
+        if leave_time is not None:
+            events.append((leave_time, -1))
+    # 同一时刻先算离开再算加入
+    events.sort()
+    peak = current = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def summarize_session(live_event, now=None):
+    """生成（或重新生成）直播的出席汇总，live_event 可以是直播活动或其ID"""
+    live_event_id = getattr(live_event, 'pk', live_event)
+    attendances = LiveAttendance.objects.filter(live_event_id=live_event_id)
+    stats = attendances.aggregate(attendees=Count('id'), total=Sum('duration'), average=Avg('duration'))
+    peak = peak_concurrency(attendances.values_list('join_time', 'leave_time').iterator(chunk_size=5000))
+    # 出席记录只保留每人最近一次的在线区间，与记录下来的在线人数最大值取较大者
+    recorded = LiveEvent.objects.filter(pk=live_event_id).values_list('max_viewer_count', flat=True).first() or 0
+    peak = max(peak, recorded)
+    summary, created = LiveSessionSummary.objects.update_or_create(
+        live_event_id=live_event_id,
+        defaults={
+            'unique_attendees': stats['attendees'],
+            'peak_attendees': peak,
+            'average_minutes': round(stats['average'] or 0, 1),
+            'total_minutes': stats['total'] or 0,
+            'generated_at': now or timezone.now(),
+        },
+    )
+    return summary
@@ -0,0 +1,129 @@
+"""
+直播间按 tick 合并广播
+
+每条消息单独 group_send 时，每条消息都会变成发给每位观众的一帧，并在每个连接上各自编码一次 JSON。
+RoomBroadcaster 是每个进程一个的广播器：在一个 tick（LIVE_BROADCAST_INTERVAL 秒）内收集各直播间的聊天消息
+和进出变化，tick 结束时每个直播间只编码一次、经 live.relay 发送一次（每个分片组一次 group_send），所有连接原样发送同一段文本：
+
+    {"type": "batch", "messages": [...], "presence": {"joined": [名片, ...], "left": [用户ID, ...]}}
+
+没有内容的键省略。进出变化按用户合并：同一用户在本进程的多个连接只在第一个连上、最后一个断开时计入，
+同一 tick 内先进后出（或先出后进）互相抵消。
+"""
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .relay import publish
+
+BROADCAST_INTERVAL = getattr(settings, 'LIVE_BROADCAST_INTERVAL', 0.15)
+
+
+def encode_frame(messages=(), joined=(), left=()):
+    frame = {'type': 'batch'}
+    if messages:
+        frame['messages'] = list(messages)
+    presence = {}
+    if joined:
+        presence['joined'] = list(joined)
+    if left:
+        presence['left'] = list(left)
+    if presence:
+        frame['presence'] = presence
+    return json.dumps(frame, ensure_ascii=False, separators=(',', ':'))
+
+
+class RoomTick:
+    """一个直播间在当前 tick 内待发送的内容"""
+    __slots__ = ('messages', 'joined', 'left')
+
+    def __init__(self):
+        self.messages = []
+        self.joined = {}
+        self.left = set()
+
+    def encode(self):
+        return encode_frame(self.messages, self.joined.values(), sorted(self.left))
+
+
+class RoomBroadcaster:
+    """绑定到一个事件循环的广播器；有待发送内容时才调度下一个 tick，空闲时不占用事件循环"""
+
+    def __init__(self, loop, channel_layer, interval=BROADCAST_INTERVAL):
+        self.loop = loop
+        self.channel_layer = channel_layer
+        self.interval = interval
+        self.rooms = {}
+        # {直播间: {用户ID: 本进程中的连接数}}
+        self.members = {}
+        self.task = None
+
+    def room(self, group):
+        tick = self.rooms.get(group)
+        if tick is None:
+            tick = self.rooms[group] = RoomTick()
+        if self.task is None:
+            self.task = self.loop.create_task(self.tick())
+        return tick
+
+    def add_message(self, group, payload):
+        self.room(group).messages.append(payload)
+
+    def join(self, group, card):
+        members = self.members.setdefault(group, {})
+        members[card['id']] = members.get(card['id'], 0) + 1
+        if members[card['id']] > 1:
+            return
+        tick = self.room(group)
+        if card['id'] in tick.left:
+            tick.left.discard(card['id'])
+        else:
+            tick.joined[card['id']] = card
+
+    def leave(self, group, user_id):
+        members = self.members.get(group, {})
+        if user_id not in members:
+            return
+        members[user_id] -= 1
+        if members[user_id] > 0:
+            return
+        del members[user_id]
+        if not members:
+            del self.members[group]
+        tick = self.room(group)
+        if user_id in tick.joined:
+            del tick.joined[user_id]
+        else:
+            tick.left.add(user_id)
+
+    async def tick(self):
+        await asyncio.sleep(self.interval)
+        rooms, self.rooms = self.rooms, {}
+        # 发送期间新到的内容进入下一个 tick
+        self.task = None
+        for group, tick in rooms.items():
+            if tick.messages or tick.joined or tick.left:
+                await publish(self.channel_layer, group, tick.encode())
+
+
+_broadcaster = None
+
+
+def get_broadcaster():
+    """返回当前事件循环的广播器（须在事件循环中调用）"""
+    global _broadcaster
+    loop = asyncio.get_running_loop()
+    if _broadcaster is None or _broadcaster.loop is not loop:
+        _broadcaster = RoomBroadcaster(loop, get_channel_layer())
+    return _broadcaster
+
+
+def send_now(group, messages):
+    """在同步代码（REST 视图）中立即发送一帧，不经过 tick"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(publish)(channel_layer, group, encode_frame(messages))
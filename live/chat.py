@@ -0,0 +1,91 @@
+"""
+直播聊天
+
+WebSocket（live.consumers.LiveChatConsumer）是收发聊天消息的主通道：消息保存后广播给直播间内的所有连接。
+REST 接口只用于补齐：客户端连接（或断线重连）后用 chat_messages?since_id=<已有的最后一条> 取回错过的消息，
+活跃直播间的补齐由 live.chat_buffer 中的最近消息缓冲直接返回；更早的历史用 before_id 向前翻页，
+已结束的直播的消息归档后从归档文件读取（live.archive）。
+通过 REST 发送的消息同样会写入缓冲并广播到直播间。
+WebSocket 收到的消息经 live.chat_writer 合并后批量写入数据库。
+
+消息先写入缓冲再广播：连接建立后才广播的消息一定能通过 WebSocket 收到，
+在此之前已广播的消息一定已在缓冲（或数据库）中，补齐不会漏掉。
+WebSocket 消息由 live.broadcast 按 tick 合并后推送（{"type": "batch", "messages": [...]}）。
+"""
+from django.conf import settings
+
+from . import chat_buffer
+from .broadcast import send_now
+from .models import LiveChat, LiveEnrollment, LiveEvent
+
+MAX_MESSAGE_LENGTH = getattr(settings, 'LIVE_CHAT_MAX_LENGTH', 500)
+# 补齐接口单次最多返回的消息数
+CATCHUP_LIMIT = getattr(settings, 'LIVE_CHAT_CATCHUP_LIMIT', 100)
+
+
+def room_group(live_event_id):
+    return f'live_event_{live_event_id}'
+
+
+def can_chat(user, live_event):
+    """讲师和已报名的用户可以在直播间发言"""
+    if not user.is_authenticated:
+        return False
+    if live_event.instructor_id == user.pk:
+        return True
+    return LiveEnrollment.objects.filter(user=user, live_event=live_event).exists()
+
+
+def clean_message(text):
+    """去掉首尾空白并检查长度，不合法时抛出 ValueError"""
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError('消息内容不能为空')
+    text = text.strip()
+    if len(text) > MAX_MESSAGE_LENGTH:
+        raise ValueError(f'消息不能超过 {MAX_MESSAGE_LENGTH} 个字符')
+    return text
+
+
+def serialize_message(chat):
+    """与 REST 接口相同的消息格式"""
+    from .serializers import LiveChatSerializer
+    return dict(LiveChatSerializer(chat).data)
+
+
+def for_request(payloads, request):
+    """缓冲中的消息不带请求上下文，头像是相对地址；REST 返回前按请求补全为绝对地址"""
+    from accounts.serializers import UserCardSerializer
+    card_serializer = UserCardSerializer(context={'request': request})
+    return [dict(payload, user=card_serializer._with_absolute_avatar(payload['user'])) for payload in payloads]
+
+
+def write_messages(items):
+    """
+    批量保存消息 [(直播ID, 用户ID, 内容)] 并按顺序写入最近消息缓冲，返回与 items 对应的序列化消息；
+    直播不在进行中的消息不保存，对应位置为 None（需在自动提交模式下调用）
+    """
+    from .serializers import LiveChatSerializer
+
+    live_ids = set(
+        LiveEvent.objects.filter(pk__in={item[0] for item in items}, status='live').values_list('id', flat=True)
+    )
+    chats = [
+        LiveChat(live_event_id=live_event_id, user_id=user_id, message=text)
+        for live_event_id, user_id, text in items if live_event_id in live_ids
+    ]
+    # bulk_create 不发送 post_save 信号，新消息只需写入缓冲，无需额外处理
+    LiveChat.objects.bulk_create(chats)
+    payloads = iter(LiveChatSerializer(chats, many=True).data)
+    results = []
+    for live_event_id, user_id, text in items:
+        payload = dict(next(payloads)) if live_event_id in live_ids else None
+        if payload is not None:
+            chat_buffer.append(live_event_id, payload)
+        results.append(payload)
+    return results
+
+
+def publish_message(live_event_id, payload):
+    """在同步代码（REST 视图）中把已提交的消息写入缓冲并推送到直播间"""
+    chat_buffer.append(live_event_id, payload)
+    send_now(room_group(live_event_id), [payload])
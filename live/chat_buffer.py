@@ -0,0 +1,105 @@
+"""
+直播聊天最近消息的环形缓冲
+
+每个直播间在缓存中保留最近 LIVE_CHAT_BUFFER_SIZE 条序列化后的消息，断线重连的补齐请求（since_id）
+直接从缓冲中返回，不访问数据库；缓冲覆盖不到的更早的消息再按 (live_event, id) 索引查库。
+
+结构：计数器 live:chat:{id}:seq 由 cache.incr 原子递增，第 n 条消息写入槽位 n % 容量，槽位中同时保存 n，
+读取时按计数器取出最近的槽位并逐一核对序号，未写完或已被覆盖的槽位视为缓冲不完整，退回数据库。
+多个进程共用同一个缓存（Redis 等）时无需加锁。缓存只在进程内有效（LocMemCache）时，其他进程写入的消息不在本进程的缓冲中，
+补齐会漏掉消息，此时不启用缓冲，全部查库。
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from edu_platform.caches import is_shared
+
+BUFFER_SIZE = getattr(settings, 'LIVE_CHAT_BUFFER_SIZE', 200)
+# 直播间无新消息多久后缓冲过期（秒）
+BUFFER_TIMEOUT = getattr(settings, 'LIVE_CHAT_BUFFER_TIMEOUT', 6 * 3600)
+
+SEQ_KEY = 'live:chat:{live_event_id}:seq'
+SLOT_KEY = 'live:chat:{live_event_id}:slot:{slot}'
+
+
+def _seq_key(live_event_id):
+    return SEQ_KEY.format(live_event_id=live_event_id)
+
+
+def _slot_key(live_event_id, seq):
+    return SLOT_KEY.format(live_event_id=live_event_id, slot=seq % BUFFER_SIZE)
+
+
+def enabled():
+    return BUFFER_SIZE > 0 and is_shared()
+
+
+def append(live_event_id, payload):
+    """追加一条已提交的消息（serialize_message 的结果）；应在广播之前调用"""
+    if not enabled():
+        return
+    key = _seq_key(live_event_id)
+    # 计数器过期或被清空后从当前微秒数重新开始，保证不会与残留槽位中的旧序号相同
+    cache.add(key, time.time_ns() // 1000, BUFFER_TIMEOUT)
+    try:
+        seq = cache.incr(key)
+    except ValueError:
+        # add 与 incr 之间计数器恰好过期，这条消息不进缓冲，读取时会发现缺口
+        return
+    cache.touch(key, BUFFER_TIMEOUT)
+    cache.set(_slot_key(live_event_id, seq), (seq, payload), BUFFER_TIMEOUT)
+
+
+def recent(live_event_id):
+    """
+    返回缓冲中的全部消息（按 id 正序），缓冲为空或不完整时返回 None
+    """
+    if not enabled():
+        return None
+    seq = cache.get(_seq_key(live_event_id))
+    if seq is None:
+        return None
+    expected = range(seq - BUFFER_SIZE + 1, seq + 1)
+    keys = {_slot_key(live_event_id, n): n for n in expected}
+    slots = cache.get_many(keys.keys())
+    messages = []
+    for key, n in keys.items():
+        slot = slots.get(key)
+        if slot is None or slot[0] != n:
+            # 缓冲未写满时，最早的若干槽位还没有写入：只有它们全都在最前面才算完整
+            if messages:
+                return None
+            continue
+        messages.append(slot[1])
+    if not messages:
+        return None
+    messages.sort(key=lambda message: message['id'])
+    return messages
+
+
+def messages_since(live_event_id, since_id, limit):
+    """
+    从缓冲中取 since_id 之后的消息，返回 (消息列表, has_more)；
+    缓冲不完整或覆盖不到 since_id（更早的消息已被挤出）时返回 None，由调用方查库
+    """
+    # 序号在提交之后分配，并发写入时序号与 id 的先后只在极短的窗口内可能不一致，以缓冲中最小的 id 作为覆盖下界
+    messages = recent(live_event_id)
+    if messages is None or since_id < messages[0]['id']:
+        return None
+    page = [message for message in messages if message['id'] > since_id]
+    return page[:limit], len(page) > limit
+
+
+def latest(live_event_id, limit):
+    """缓冲中最近的 limit 条消息（之前一定还有消息）；缓冲中不超过 limit 条时无法确定是否还有更早的消息，返回 None"""
+    messages = recent(live_event_id)
+    if messages is None or len(messages) <= limit:
+        return None
+    return messages[-limit:]
+
+
+def clear(live_event_id):
+    """消息被删除或修改时丢弃整个缓冲，之后的消息重新开始累积"""
+    cache.delete(_seq_key(live_event_id))
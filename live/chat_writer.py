@@ -0,0 +1,185 @@
+"""
+直播聊天的批量写入
+
+每条 WebSocket 消息单独 LiveChat.objects.create 时，几千人的直播间会把数据库线程池占满。
+ChatWriteBuffer 是每个进程一个的写入队列：消费者把消息放入队列后等待结果，
+后台任务每 LIVE_CHAT_WRITE_INTERVAL 秒或攒够 LIVE_CHAT_WRITE_BATCH_SIZE 条时用一次 bulk_create 写入，
+再把序列化后的消息交还给各个消费者广播。
+
+- 队列有上限（LIVE_CHAT_WRITE_MAX_PENDING），满时发送方最多等待 LIVE_CHAT_WRITE_TIMEOUT 秒，
+  仍放不进去则抛出 ChatBusy，由消费者提示用户稍后再试；
+- 整批写入失败时（例如直播在写入途中被删除、SQLite 数据库被锁）按直播间分组重试，仍失败的组逐条重试，
+  只有最终写不进去的消息以 ChatWriteFailed 通知发送方，不影响同一批中其他直播间的消息；
+- 进程退出时把队列中剩余的消息同步写入数据库；
+- 队列深度、每批条数和写入耗时记录在 /api/metrics/ 中。
+"""
+import asyncio
+import atexit
+import collections
+import logging
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from edu_platform.metrics import SECONDS_BUCKETS, registry
+
+from .chat import write_messages
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'LIVE_CHAT_WRITE_BATCH_SIZE', 200)
+FLUSH_INTERVAL = getattr(settings, 'LIVE_CHAT_WRITE_INTERVAL', 0.2)
+MAX_PENDING = getattr(settings, 'LIVE_CHAT_WRITE_MAX_PENDING', 2000)
+PUT_TIMEOUT = getattr(settings, 'LIVE_CHAT_WRITE_TIMEOUT', 2)
+
+METRIC_LABEL = 'live_chat'
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 500, 1000, 2000, 5000)
+registry.register('edu_chat_queue_depth', '消息入队后聊天写入队列中的消息数', COUNT_BUCKETS)
+registry.register('edu_chat_flush_size', '每次批量写入的聊天消息数', COUNT_BUCKETS)
+registry.register('edu_chat_flush_seconds', '每次批量写入聊天消息的耗时（秒）', SECONDS_BUCKETS)
+registry.register('edu_chat_enqueue_wait_seconds', '聊天消息等待入队的时间（秒，队列满时的背压）', SECONDS_BUCKETS)
+
+
+class ChatBusy(Exception):
+    """写入队列已满"""
+
+
+class ChatWriteFailed(Exception):
+    """消息写入数据库失败"""
+
+
+def write_with_fallback(items):
+    """
+    批量写入 [(直播ID, 用户ID, 内容)]，返回与 items 对应的结果（见 write_messages）；
+    整批失败时按直播间分组重试，组内仍失败时逐条重试，最终失败的位置为 ChatWriteFailed 实例
+    """
+    try:
+        return write_messages(items)
+    except Exception:
+        logger.exception('批量写入 %d 条聊天消息失败，按直播间重试', len(items))
+
+    results = [None] * len(items)
+    rooms = collections.defaultdict(list)
+    for index, item in enumerate(items):
+        rooms[item[0]].append(index)
+    for live_event_id, indexes in rooms.items():
+        if len(indexes) > 1:
+            try:
+                for index, result in zip(indexes, write_messages([items[index] for index in indexes])):
+                    results[index] = result
+                continue
+            except Exception:
+                logger.exception('直播 %s 的 %d 条聊天消息写入失败，逐条重试', live_event_id, len(indexes))
+        for index in indexes:
+            try:
+                results[index] = write_messages([items[index]])[0]
+            except Exception as e:
+                results[index] = ChatWriteFailed(str(e) or e.__class__.__name__)
+    return results
+
+
+class ChatWriteBuffer:
+    """绑定到一个事件循环的聊天写入队列"""
+
+    def __init__(self, loop, batch_size=BATCH_SIZE, interval=FLUSH_INTERVAL, max_pending=MAX_PENDING,
+                 put_timeout=PUT_TIMEOUT):
+        self.loop = loop
+        self.batch_size = batch_size
+        self.interval = interval
+        self.put_timeout = put_timeout
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.task = None
+        # 已从队列取出、还没开始写入的一批
+        self.collecting = None
+
+    async def submit(self, live_event_id, user_id, text):
+        """
+        提交一条消息，写入后返回序列化后的消息；直播不在进行中时返回 None，
+        队列满时抛出 ChatBusy，写入数据库失败时抛出 ChatWriteFailed
+        """
+        if self.task is None or self.task.done():
+            self.task = self.loop.create_task(self.run())
+        future = self.loop.create_future()
+        item = (live_event_id, user_id, text, future)
+        started = time.monotonic()
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self.queue.put(item), self.put_timeout)
+            except asyncio.TimeoutError:
+                raise ChatBusy()
+        registry.observe('edu_chat_enqueue_wait_seconds', METRIC_LABEL, time.monotonic() - started)
+        registry.observe('edu_chat_queue_depth', METRIC_LABEL, self.queue.qsize())
+        return await future
+
+    async def run(self):
+        while True:
+            batch = self.collecting = [await self.queue.get()]
+            self.drain(batch)
+            if len(batch) < self.batch_size:
+                # 攒一小段时间，让同一时刻的消息合并为一次写入
+                await asyncio.sleep(self.interval)
+                self.drain(batch)
+            self.collecting = None
+            await self.flush(batch)
+
+    def drain(self, batch):
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return
+
+    async def flush(self, batch):
+        started = time.monotonic()
+        try:
+            results = await database_sync_to_async(write_with_fallback)([item[:3] for item in batch])
+        except Exception as e:
+            logger.exception('批量写入 %d 条聊天消息失败', len(batch))
+            results = [ChatWriteFailed(str(e) or e.__class__.__name__)] * len(batch)
+        finally:
+            registry.observe('edu_chat_flush_seconds', METRIC_LABEL, time.monotonic() - started)
+            registry.observe('edu_chat_flush_size', METRIC_LABEL, len(batch))
+        for item, result in zip(batch, results):
+            # 发送方可能已断开，结果无人等待
+            if item[3].done():
+                continue
+            if isinstance(result, ChatWriteFailed):
+                item[3].set_exception(result)
+            else:
+                item[3].set_result(result)
+
+    def drain_on_exit(self):
+        """进程退出时同步写入队列中剩余的消息（事件循环已停止，不再通知发送方）"""
+        batch = self.collecting or []
+        self.collecting = None
+        while True:
+            self.drain(batch)
+            if not batch:
+                return
+            try:
+                write_with_fallback([item[:3] for item in batch])
+            except Exception:
+                logger.exception('退出时写入 %d 条聊天消息失败', len(batch))
+                return
+            batch = []
+
+
+_buffer = None
+
+
+def get_write_buffer():
+    """返回当前事件循环的写入队列（须在事件循环中调用）"""
+    global _buffer
+    loop = asyncio.get_running_loop()
+    if _buffer is None or _buffer.loop is not loop:
+        _buffer = ChatWriteBuffer(loop)
+    return _buffer
+
+
+@atexit.register
+def _flush_on_exit():
+    if _buffer is not None:
+        _buffer.drain_on_exit()
@@ -0,0 +1,142 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from accounts.cards import load_cards
+
+from .broadcast import get_broadcaster
+from .chat import can_chat, clean_message, room_group
+from .chat_writer import ChatBusy, ChatWriteFailed, get_write_buffer
+from .limits import MAX_FRAME_BYTES, OutboundQueue, chat_limiter, count
+from .models import LiveEvent
+from .presence import get_tracker
+from .relay import get_relay
+from .sessions import can_join
+
+# 关闭码：4000 以上为应用自定义
+CLOSE_UNAUTHENTICATED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+CLOSE_TOO_SLOW = 4408
+
+
+class LiveChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    直播间聊天：ws/live/<直播ID>/?token=<JWT 访问令牌>
+
+    客户端发送 {"type": "chat_message", "message": "..."}；
+    服务端按 tick 推送 {"type": "batch", "messages": [与 REST 相同的消息格式], "presence": {"joined": [名片], "left": [用户ID]}}
+    （见 live.broadcast），出错时推送 {"type": "error", "detail": "..."}。
+    客户端应每 30 秒左右发送一次 {"type": "ping"} 作为心跳，讲师会定期收到在线状态快照（见 live.presence）。
+    发言限流、单帧上限和慢连接的处理见 live.limits。
+    """
+
+    async def connect(self):
+        self.live_event_id = self.scope['url_route']['kwargs']['live_event_id']
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+
+        state = await self.load_state()
+        if state is None:
+            await self.close(code=CLOSE_NOT_FOUND)
+            return
+        joinable, self.can_chat, self.card, self.is_instructor = state
+        if not joinable:
+            # 与 REST 的加入接口相同：课时直播只对已报名课程的学生开放
+            await self.close(code=CLOSE_FORBIDDEN)
+            return
+
+        self.group_name = room_group(self.live_event_id)
+        await self.accept()
+        self.outbound = OutboundQueue(self.send_text)
+        # 连接不直接加入通道层的组，由本进程的中继统一接收直播间的帧（见 live.relay）
+        await get_relay().subscribe(self.group_name, self)
+        get_broadcaster().join(self.group_name, self.card)
+        get_tracker().connect(self.live_event_id, self.channel_name, self.user.pk, self.is_instructor)
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            get_tracker().disconnect(self.live_event_id, self.channel_name)
+            get_broadcaster().leave(self.group_name, self.user.pk)
+            await get_relay().unsubscribe(self.group_name, self)
+        if hasattr(self, 'outbound'):
+            self.outbound.close()
+
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        size = len(text_data.encode()) if text_data is not None else len(bytes_data or b'')
+        if size > MAX_FRAME_BYTES:
+            count(self.group_name, 'oversize')
+            await self.send_json({'type': 'error', 'detail': '消息过大'})
+            return
+        await super().receive(text_data, bytes_data, **kwargs)
+
+    async def receive_json(self, content, **kwargs):
+        get_tracker().heartbeat(self.live_event_id, self.channel_name)
+        message_type = content.get('type') if isinstance(content, dict) else None
+        if message_type == 'ping':
+            await self.send_json({'type': 'pong'})
+        elif message_type == 'chat_message':
+            await self.handle_chat(content.get('message'))
+        else:
+            await self.send_json({'type': 'error', 'detail': '不支持的消息类型'})
+
+    async def handle_chat(self, text):
+        if not self.can_chat:
+            await self.send_json({'type': 'error', 'detail': '请先报名参加直播后再发送消息'})
+            return
+        if not chat_limiter.allow(self.group_name, self.user.pk):
+            count(self.group_name, 'rate_limited')
+            await self.send_json({'type': 'error', 'detail': '发言太频繁，请稍后再试'})
+            return
+        try:
+            text = clean_message(text)
+        except ValueError as e:
+            if isinstance(text, str) and text.strip():
+                count(self.group_name, 'oversize')
+            await self.send_json({'type': 'error', 'detail': str(e)})
+            return
+
+        # 消息进入本进程的写入队列，与同一时刻的其他消息一起批量保存
+        try:
+            payload = await get_write_buffer().submit(self.live_event_id, self.user.pk, text)
+        except ChatBusy:
+            await self.send_json({'type': 'error', 'detail': '聊天消息过多，请稍后再试'})
+            return
+        except ChatWriteFailed:
+            # 已在写入队列中记录日志；连接保持，由客户端决定是否重发
+            await self.send_json({'type': 'error', 'detail': '消息发送失败，请稍后重试'})
+            return
+        if payload is None:
+            await self.send_json({'type': 'error', 'detail': '只能在直播进行中发送消息'})
+            return
+        get_broadcaster().add_message(self.group_name, payload)
+
+    async def room_frame(self, event):
+        # 中继转来的广播器已编码好的帧，放入本连接的发送队列原样发送，发送慢不会阻塞接收直播间的后续消息
+        result = self.outbound.put(event['text'])
+        if result == 'dropped':
+            count(self.group_name, 'dropped')
+        elif result == 'overflow':
+            count(self.group_name, 'slow_disconnects')
+            await self.close(code=CLOSE_TOO_SLOW)
+
+    async def send_text(self, text):
+        await self.send(text_data=text)
+
+    async def presence_expired(self, event):
+        # 长时间没有心跳，连接已失效
+        await self.close()
+
+    @database_sync_to_async
+    def load_state(self):
+        """返回 (当前用户能否观看, 能否发言, 用户名片, 是否讲师)；直播不存在时返回 None"""
+        live_event = LiveEvent.objects.select_related('course').only(
+            'id', 'instructor_id', 'lesson_id', 'course__id', 'course__is_free',
+        ).filter(pk=self.live_event_id).first()
+        if live_event is None:
+            return None
+        if not can_join(self.user, live_event):
+            return False, False, None, False
+        card = load_cards([self.user.pk])[self.user.pk]
+        return True, can_chat(self.user, live_event), card, live_event.instructor_id == self.user.pk
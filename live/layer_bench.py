@@ -0,0 +1,83 @@
+"""
+通道层群发测量
+
+测量通道层本身的群发能力：room_size 个通道加入同一个组，按 rate 帧/秒 group_send messages 帧预编码文本，
+各通道并发接收，统计每帧从发出到被各通道收到的延迟，以及整体的投递吞吐量（投递数 = 帧数 × 人数）。
+接收方与发送方在同一进程内，延迟不含网络到浏览器的部分；通道层积压满时丢弃的帧计入 lost。
+
+直播间广播经过 live.relay 的分片中继，组成员是各进程的中继通道而不是每个连接，
+room_size 取每个分片组中的进程数即可估算直播间的群发开销；包含中继和真实连接的端到端压测见 loadtest_live_room 命令。
+"""
+import asyncio
+import statistics
+import time
+
+from .relay import RELAY_EVENT
+
+GROUP = 'bench_room'
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+async def _receive(layer, channel, expected, latencies, timeout):
+    received = 0
+    while received < expected:
+        try:
+            message = await asyncio.wait_for(layer.receive(channel), timeout)
+        except asyncio.TimeoutError:
+            break
+        sent = float(message['text'].split('|', 1)[0])
+        latencies.append(time.perf_counter() - sent)
+        received += 1
+
+
+async def measure(layer, room_size, messages=100, rate=50.0, payload_bytes=512, timeout=5.0):
+    """
+    在 layer 上测量一个 room_size 人的直播间，返回
+    {room_size, delivered, lost, seconds, throughput, p50_ms, p95_ms, p99_ms, max_ms, mean_ms}
+    """
+    group = f'{GROUP}_{room_size}_{time.monotonic_ns()}'
+    channels = [await layer.new_channel() for _ in range(room_size)]
+    for channel in channels:
+        await layer.group_add(group, channel)
+
+    latencies = []
+    receivers = [
+        asyncio.ensure_future(_receive(layer, channel, messages, latencies, timeout)) for channel in channels
+    ]
+    padding = 'x' * payload_bytes
+    interval = 1 / rate if rate > 0 else 0
+    started = time.perf_counter()
+    try:
+        for index in range(messages):
+            # 帧开头是发送时刻，接收方据此计算延迟
+            await layer.group_send(group, {'type': RELAY_EVENT, 'text': f'{time.perf_counter():.9f}|{padding}'})
+            # 按速率发送，速率为 0 时只让出事件循环
+            await asyncio.sleep(max(0, started + (index + 1) * interval - time.perf_counter()))
+        await asyncio.gather(*receivers)
+    finally:
+        for receiver in receivers:
+            receiver.cancel()
+        for channel in channels:
+            await layer.group_discard(group, channel)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    delivered = len(latencies)
+    return {
+        'room_size': room_size,
+        'delivered': delivered,
+        'lost': room_size * messages - delivered,
+        'seconds': elapsed,
+        'throughput': delivered / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+        'mean_ms': (statistics.fmean(latencies) if latencies else 0.0) * 1000,
+    }
@@ -0,0 +1,154 @@
+"""
+直播间限流和慢连接保护
+
+- 发言限流：每个用户在每个直播间一个令牌桶，每秒补充 LIVE_CHAT_RATE 个令牌，最多积攒 LIVE_CHAT_BURST 个；
+  令牌桶保存在进程内，同一用户连到多个进程时各自限流；
+- 单帧上限：客户端发来的帧超过 LIVE_WS_MAX_FRAME_BYTES 字节时不解析直接拒绝；
+- 发送队列：每个连接的待发送帧最多 LIVE_WS_SEND_QUEUE 个，跟不上的连接按 LIVE_WS_SLOW_POLICY
+  丢弃最旧的帧（drop_oldest，之后可通过 REST 补齐）或直接断开（disconnect），不会拖慢整个直播间；
+- 计数：各直播间被限流、超长、丢弃的帧数和因过慢断开的连接数先在进程内累加，
+  每 COUNTER_FLUSH_INTERVAL 秒合并写入缓存（live:stats:{房间}:{名称}），由 room_stats 接口和讲师快照读取；
+  各进程的总数同时记录在 /api/metrics/ 中。
+"""
+import asyncio
+import collections
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from edu_platform.metrics import registry
+
+CHAT_RATE = getattr(settings, 'LIVE_CHAT_RATE', 1.0)
+CHAT_BURST = getattr(settings, 'LIVE_CHAT_BURST', 5)
+MAX_FRAME_BYTES = getattr(settings, 'LIVE_WS_MAX_FRAME_BYTES', 4096)
+SEND_QUEUE_SIZE = getattr(settings, 'LIVE_WS_SEND_QUEUE', 64)
+SLOW_POLICY = getattr(settings, 'LIVE_WS_SLOW_POLICY', 'drop_oldest')
+
+COUNTER_NAMES = ('rate_limited', 'oversize', 'dropped', 'slow_disconnects')
+COUNTER_FLUSH_INTERVAL = 5
+COUNTER_TIMEOUT = 7 * 24 * 3600
+COUNTER_KEY = 'live:stats:{room}:{name}'
+METRIC_LABEL = 'live_chat'
+
+registry.register_counter('edu_live_rate_limited_total', '因发言过快被拒绝的聊天消息数')
+registry.register_counter('edu_live_oversize_total', '因超长被拒绝的帧数')
+registry.register_counter('edu_live_dropped_total', '因连接过慢被丢弃的下发帧数')
+registry.register_counter('edu_live_slow_disconnects_total', '因过慢被断开的连接数')
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst):
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+
+class RateLimiter:
+    """按 (房间, 用户) 的令牌桶"""
+
+    def __init__(self, rate=CHAT_RATE, burst=CHAT_BURST, max_entries=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self.buckets = {}
+
+    def allow(self, room, user_id):
+        now = time.monotonic()
+        key = (room, user_id)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_entries:
+                self.prune(now)
+            bucket = self.buckets[key] = TokenBucket(self.burst)
+        bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        if bucket.tokens < 1:
+            return False
+        bucket.tokens -= 1
+        return True
+
+    def prune(self, now):
+        # 已经补满的桶与新建的桶没有区别，可以丢弃
+        full = (self.burst - 1) / self.rate if self.rate else 0
+        self.buckets = {key: b for key, b in self.buckets.items() if now - b.updated < full}
+
+
+chat_limiter = RateLimiter()
+
+_pending_counts = collections.defaultdict(collections.Counter)
+_flush_task = None
+
+
+def count(room, name, amount=1):
+    """累加直播间的计数（须在事件循环中调用），稍后批量写入缓存"""
+    global _flush_task
+    _pending_counts[room][name] += amount
+    registry.increment(f'edu_live_{name}_total', METRIC_LABEL, amount)
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.get_running_loop().create_task(_flush_later())
+
+
+async def _flush_later():
+    from channels.db import database_sync_to_async
+
+    await asyncio.sleep(COUNTER_FLUSH_INTERVAL)
+    await database_sync_to_async(flush_counts)()
+
+
+def flush_counts():
+    """把进程内累加的计数写入缓存"""
+    pending = dict(_pending_counts)
+    _pending_counts.clear()
+    for room, counter in pending.items():
+        for name, amount in counter.items():
+            key = COUNTER_KEY.format(room=room, name=name)
+            cache.add(key, 0, COUNTER_TIMEOUT)
+            try:
+                cache.incr(key, amount)
+            except ValueError:
+                cache.set(key, amount, COUNTER_TIMEOUT)
+
+
+def load_counts(room):
+    """直播间的各项计数（缓存中的部分，最近几秒的计数可能尚未写入）"""
+    keys = {COUNTER_KEY.format(room=room, name=name): name for name in COUNTER_NAMES}
+    values = cache.get_many(keys.keys())
+    return {name: values.get(key, 0) for key, name in keys.items()}
+
+
+class OutboundQueue:
+    """
+    一个连接的有界发送队列：由单独的任务逐帧发送，发送慢时帧在队列中积压，
+    put 返回 'queued'、'dropped'（丢弃了最旧的一帧）或 'overflow'（策略为断开且队列已满）
+    """
+
+    def __init__(self, send, maxsize=SEND_QUEUE_SIZE, policy=SLOW_POLICY):
+        self.send = send
+        self.maxsize = maxsize
+        self.policy = policy
+        self.frames = collections.deque()
+        self.ready = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def put(self, text):
+        result = 'queued'
+        if len(self.frames) >= self.maxsize:
+            if self.policy == 'disconnect':
+                return 'overflow'
+            self.frames.popleft()
+            result = 'dropped'
+        self.frames.append(text)
+        self.ready.set()
+        return result
+
+    async def run(self):
+        while True:
+            await self.ready.wait()
+            while self.frames:
+                await self.send(self.frames.popleft())
+            self.ready.clear()
+
+    def close(self):
+        self.task.cancel()
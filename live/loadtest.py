@@ -0,0 +1,243 @@
+"""
+直播间端到端压测
+
+SyntheticClient 不经网络直接调用 ASGI 应用（edu_platform.asgi.application），与 ASGI 服务器为一个浏览器连接做的事相同：
+经过来源检查、JWT 认证、LiveChatConsumer、在线状态、广播器和 live.relay 的分片中继，收到的是真实下发的帧。
+每个压测进程相当于一个 ASGI 工作进程，持有一部分连接；协调进程按 rate 帧/秒向直播间发布 messages 帧（与广播器相同的
+batch 格式，消息中带 loadtest 字段记录发送时刻），统计每帧从发布到被各连接收到的延迟。
+
+多个进程之间只能通过 Redis 通道层通信；使用进程内通道层时所有连接和发布方在同一进程中运行（workers=0）。
+压测客户端与服务端共用 CPU，延迟包含客户端解析帧的开销，不含网络到浏览器的部分；发送队列丢弃的帧计入 lost。
+由 loadtest_live_room 命令运行。
+"""
+import asyncio
+import json
+import queue
+import statistics
+import time
+
+from .broadcast import encode_frame
+from .chat import room_group
+from .layer_bench import percentile
+from .relay import get_relay, publish
+
+# 客户端心跳间隔（秒），应小于 LIVE_PRESENCE_TIMEOUT
+PING_INTERVAL = 30
+# 只解析带有压测消息的帧，跳过进出变化等其他帧
+MARKER = '"loadtest"'
+
+
+def make_scope(live_event_id, token, origin, index):
+    host = origin.split('://', 1)[-1].encode()
+    path = f'/ws/live/{live_event_id}/'
+    return {
+        'type': 'websocket',
+        'asgi': {'version': '3.0'},
+        'scheme': 'ws',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': f'token={token}'.encode(),
+        'root_path': '',
+        'headers': [(b'host', host), (b'origin', origin.encode())],
+        'subprotocols': [],
+        'client': ('127.0.0.1', 10000 + index % 50000),
+        'server': ('127.0.0.1', 80),
+    }
+
+
+class SyntheticClient:
+    """一个模拟的 WebSocket 连接，收到的文本帧交给 on_frame(客户端, 文本)"""
+
+    def __init__(self, application, scope, on_frame):
+        self.application = application
+        self.scope = scope
+        self.on_frame = on_frame
+        self.inbox = asyncio.Queue()
+        self.accepted = None
+        self.opened = asyncio.Event()
+        self.received = 0
+        self.task = None
+
+    async def send(self, message):
+        if message['type'] == 'websocket.accept':
+            self.accepted = True
+            self.opened.set()
+        elif message['type'] == 'websocket.close':
+            self.accepted = False
+            self.opened.set()
+        elif message['type'] == 'websocket.send' and message.get('text') is not None:
+            self.on_frame(self, message['text'])
+
+    async def connect(self, timeout):
+        """建立连接，返回是否被接受"""
+        self.task = asyncio.ensure_future(self.application(self.scope, self.inbox.get, self.send))
+        await self.inbox.put({'type': 'websocket.connect'})
+        try:
+            await asyncio.wait_for(self.opened.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.accepted = False
+        return bool(self.accepted)
+
+    async def ping(self):
+        await self.inbox.put({'type': 'websocket.receive', 'text': '{"type":"ping"}'})
+
+    async def close(self, timeout=5):
+        if self.task is None:
+            return
+        await self.inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        try:
+            await asyncio.wait_for(self.task, timeout)
+        except Exception:
+            # 断开超时或消费者断开时出错不影响统计
+            pass
+
+
+class Collector:
+    """一个压测进程内所有连接收到的压测消息；每个连接都收到 messages 条时 done 被设置"""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.latencies = []
+        self.connected = 0
+        self.complete = 0
+        self.done = asyncio.Event()
+
+    def on_frame(self, client, text):
+        if MARKER not in text:
+            return
+        now = time.time()
+        for message in json.loads(text).get('messages', ()):
+            mark = message.get('loadtest')
+            if mark is None:
+                continue
+            self.latencies.append(now - mark['sent_at'])
+            client.received += 1
+            if client.received == self.messages:
+                self.complete += 1
+                if self.complete >= self.connected:
+                    self.done.set()
+
+
+async def run_clients(application, live_event_id, tokens, messages, ready, stopped, origin='http://localhost',
+                      connect_timeout=30.0):
+    """
+    建立 len(tokens) 个连接，调用 ready(已连接数, 失败数) 后接收压测消息，
+    直到每个连接都收到 messages 条或 stopped（可等待对象）完成，返回本进程的统计
+    """
+    collector = Collector(messages)
+    clients = [
+        SyntheticClient(application, make_scope(live_event_id, token, origin, index), collector.on_frame)
+        for index, token in enumerate(tokens)
+    ]
+    results = await asyncio.gather(*(client.connect(connect_timeout) for client in clients))
+    collector.connected = sum(results)
+    if collector.connected == 0:
+        collector.done.set()
+    relay = get_relay()
+    ready(collector.connected, len(clients) - collector.connected)
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            for client, accepted in zip(clients, results):
+                if accepted:
+                    await client.ping()
+
+    beating = asyncio.ensure_future(heartbeat())
+    stop = asyncio.ensure_future(stopped)
+    done = asyncio.ensure_future(collector.done.wait())
+    try:
+        await asyncio.wait([stop, done], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (beating, stop, done):
+            task.cancel()
+        received = [client.received for client, accepted in zip(clients, results) if accepted]
+        await asyncio.gather(*(client.close() for client in clients))
+    return {
+        'clients': len(clients),
+        'connected': collector.connected,
+        'failed': len(clients) - collector.connected,
+        'complete': collector.complete,
+        'min_received': min(received, default=0),
+        'relay_channel': relay.channel,
+        'shard': relay.shard,
+        'latencies': collector.latencies,
+    }
+
+
+async def publish_frames(channel_layer, live_event_id, messages, rate=20.0, payload_bytes=200):
+    """按 rate 帧/秒向直播间发布 messages 帧，每帧一条压测消息，返回发布用时（秒）"""
+    room = room_group(live_event_id)
+    padding = 'x' * payload_bytes
+    interval = 1 / rate if rate > 0 else 0
+    started = time.perf_counter()
+    for seq in range(messages):
+        payload = {'id': -(seq + 1), 'message': padding, 'loadtest': {'seq': seq, 'sent_at': time.time()}}
+        await publish(channel_layer, room, encode_frame([payload]))
+        await asyncio.sleep(max(0, started + (seq + 1) * interval - time.perf_counter()))
+    return time.perf_counter() - started
+
+
+def summarize(results, messages, seconds):
+    """合并各进程的统计，返回整体结果 {clients, connected, failed, delivered, lost, throughput, p50_ms, ...}"""
+    latencies = sorted(latency for result in results for latency in result['latencies'])
+    connected = sum(result['connected'] for result in results)
+    delivered = len(latencies)
+    return {
+        'workers': len(results),
+        'clients': sum(result['clients'] for result in results),
+        'connected': connected,
+        'failed': sum(result['failed'] for result in results),
+        'shards': sorted({result['shard'] for result in results if result['shard'] is not None}),
+        'delivered': delivered,
+        'lost': connected * messages - delivered,
+        'seconds': seconds,
+        'throughput': delivered / seconds if seconds else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+        'mean_ms': (statistics.fmean(latencies) if latencies else 0.0) * 1000,
+    }
+
+
+async def _wait_event(event, interval=0.1):
+    while not event.is_set():
+        await asyncio.sleep(interval)
+
+
+def worker_main(index, live_event_id, tokens, messages, origin, connect_timeout, reports, stop):
+    """
+    压测子进程（fork 自已初始化 Django 的协调进程）入口：reports 为 multiprocessing 队列，
+    依次放入 ('ready', 序号, 已连接数, 失败数) 和 ('result', 序号, 统计)；stop 为 multiprocessing 事件，协调进程等待超时后设置
+    """
+    from edu_platform.asgi import application
+
+    def ready(connected, failed):
+        reports.put(('ready', index, connected, failed))
+
+    result = asyncio.run(run_clients(
+        application, live_event_id, tokens, messages, ready, _wait_event(stop),
+        origin=origin, connect_timeout=connect_timeout,
+    ))
+    reports.put(('result', index, result))
+
+
+def collect(reports, received, kind, count, timeout, alive=None):
+    """
+    从 reports 中读取报告放入 received（{类型: {序号: 报告内容}}），直到 kind 类型的报告达到 count 个、超时，
+    或 alive() 返回 False（有压测进程已退出），返回 received[kind]
+    """
+    deadline = time.monotonic() + timeout
+    while len(received[kind]) < count:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            report = reports.get(timeout=min(remaining, 1.0))
+        except queue.Empty:
+            if alive is not None and not alive():
+                break
+            continue
+        received[report[0]][report[1]] = report[2:]
+    return received[kind]
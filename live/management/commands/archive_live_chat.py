@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from live.archive import archive_event, pending_events
+
+
+class Command(BaseCommand):
+    help = '把结束超过 LIVE_CHAT_ARCHIVE_AFTER 的直播的聊天消息压缩归档到存储，并从数据库删除'
+
+    def add_arguments(self, parser):
+        parser.add_argument('live_event_ids', nargs='*', type=int, help='只归档这些直播（不检查结束时间）')
+        parser.add_argument('--limit', type=int, help='本次最多归档的直播数')
+        parser.add_argument('--dry-run', action='store_true', help='只列出需要归档的直播，不归档')
+
+    def handle(self, *args, **options):
+        live_event_ids = options['live_event_ids'] or pending_events(limit=options['limit'])
+        if options['dry_run']:
+            self.stdout.write(f'将归档 {len(live_event_ids)} 场直播：{live_event_ids}')
+            return
+
+        archived = messages = size = 0
+        for live_event_id in live_event_ids:
+            archive = archive_event(live_event_id)
+            if archive is None:
+                continue
+            archived += 1
+            messages += archive.message_count
+            size += archive.size
+            self.stdout.write(f'直播 {live_event_id}：{archive.message_count} 条消息 -> {archive.path}（{archive.size} 字节）')
+        self.stdout.write(self.style.SUCCESS(
+            f'已归档 {archived} 场直播，共 {messages} 条消息，{size / (1024 * 1024):.1f} MB'
+        ))
@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from edu_platform.channel_layers import describe, layer_config
+from live.layer_bench import measure
+
+
+class Command(BaseCommand):
+    help = '测量通道层在不同直播间人数下的群发延迟和吞吐量，用于直播容量规划'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--layer', action='append', dest='layers',
+            help='要测量的通道层：CHANNEL_LAYERS 中的别名，或 memory://、redis://host:6379/0、redis+pubsub://host:6379/0；'
+                 '可重复指定，默认为 default',
+        )
+        parser.add_argument('--sizes', default='10,100,1000', help='直播间人数，逗号分隔')
+        parser.add_argument('--messages', type=int, default=100, help='每个直播间群发的帧数')
+        parser.add_argument('--rate', type=float, default=50.0, help='每秒群发的帧数，0 表示不限速')
+        parser.add_argument('--payload-bytes', type=int, default=512, help='每帧的大小（字节）')
+        parser.add_argument('--timeout', type=float, default=5.0, help='接收方等待下一帧的最长秒数，超时的帧计为丢失')
+        parser.add_argument('--json', action='store_true', help='以 JSON 行输出结果')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--sizes 必须是逗号分隔的整数')
+
+        for spec in options['layers'] or ['default']:
+            name, layer = self.load_layer(spec)
+            if not options['json']:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(f"{'人数':>8} {'投递数':>10} {'丢失':>8} {'投递/秒':>12} "
+                                  f"{'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'最大(ms)':>9}")
+            for size in sizes:
+                result = asyncio.run(measure(
+                    layer, size, messages=options['messages'], rate=options['rate'],
+                    payload_bytes=options['payload_bytes'], timeout=options['timeout'],
+                ))
+                if options['json']:
+                    self.stdout.write(json.dumps({'layer': name, **result}))
+                else:
+                    self.stdout.write(
+                        f"{size:>8} {result['delivered']:>10} {result['lost']:>8} {result['throughput']:>12.0f} "
+                        f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['max_ms']:>9.2f}"
+                    )
+
+    def load_layer(self, spec):
+        """返回 (说明, 通道层实例)；每次测量新建实例，不影响进程中已有的通道层"""
+        if spec in settings.CHANNEL_LAYERS:
+            config = settings.CHANNEL_LAYERS[spec]
+        else:
+            try:
+                config = layer_config(spec)
+            except ValueError as e:
+                raise CommandError(str(e))
+        try:
+            backend = import_string(config['BACKEND'])
+        except ImportError as e:
+            raise CommandError(f'无法加载 {config["BACKEND"]}（Redis 通道层需要安装 channels-redis）：{e}')
+        return describe(config), backend(**config.get('CONFIG', {}))
@@ -0,0 +1,153 @@
+import asyncio
+import collections
+import json
+import multiprocessing
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework_simplejwt.tokens import AccessToken
+
+from edu_platform.channel_layers import MEMORY_BACKEND
+from live.loadtest import collect, publish_frames, run_clients, summarize, worker_main
+from live.models import LiveEvent
+
+USERNAME = 'loadtest_{index}'
+
+
+class Command(BaseCommand):
+    help = '直播间端到端压测：多个进程各自持有一部分模拟 WebSocket 连接，统计直播间广播的延迟和吞吐量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('live_event_id', type=int, help='压测使用的直播ID（只建立连接和发布压测帧，不修改直播）')
+        parser.add_argument('--clients', type=int, default=1000, help='连接总数，平均分配到各进程')
+        parser.add_argument(
+            '--workers', type=int,
+            help='压测进程数，每个进程相当于一个 ASGI 工作进程；0 表示在当前进程内运行。'
+                 '默认：Redis 通道层为 CPU 核数，进程内通道层为 0',
+        )
+        parser.add_argument('--users', type=int, default=100, help='连接轮流使用的压测用户数（用户名 loadtest_N，不存在时创建）')
+        parser.add_argument('--messages', type=int, default=50, help='发布的帧数')
+        parser.add_argument('--rate', type=float, default=10.0, help='每秒发布的帧数，0 表示不限速')
+        parser.add_argument('--payload-bytes', type=int, default=200, help='每条压测消息的大小（字节）')
+        parser.add_argument('--origin', default='http://localhost', help='连接的 Origin，须在 ALLOWED_HOSTS 中')
+        parser.add_argument('--connect-timeout', type=float, default=60.0, help='等待全部连接建立的最长秒数')
+        parser.add_argument('--timeout', type=float, default=10.0, help='发布完成后等待各连接收齐的最长秒数，未收到的帧计为丢失')
+        parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+
+    def handle(self, *args, **options):
+        if not LiveEvent.objects.filter(pk=options['live_event_id']).exists():
+            raise CommandError(f'直播 {options["live_event_id"]} 不存在')
+        in_memory = settings.CHANNEL_LAYERS['default']['BACKEND'] == MEMORY_BACKEND
+        workers = options['workers']
+        if workers is None:
+            workers = 0 if in_memory else multiprocessing.cpu_count()
+        if workers > 0 and in_memory:
+            raise CommandError('进程内通道层无法跨进程投递，多进程压测需要把 CHANNEL_LAYER_URL 设置为 Redis；或使用 --workers 0')
+        if options['clients'] < 1 or options['messages'] < 1:
+            raise CommandError('--clients 和 --messages 必须大于 0')
+
+        tokens = self.load_tokens(options['users'])
+        tokens = [tokens[index % len(tokens)] for index in range(options['clients'])]
+        if workers == 0:
+            results, seconds = asyncio.run(self.run_inline(tokens, options))
+        else:
+            results, seconds = self.run_workers(workers, tokens, options)
+
+        summary = summarize(results, options['messages'], seconds)
+        if options['json']:
+            summary['per_worker'] = [{k: v for k, v in result.items() if k != 'latencies'} for result in results]
+            self.stdout.write(json.dumps(summary))
+            return
+        self.stdout.write(
+            f"进程 {summary['workers']}，连接 {summary['connected']}/{summary['clients']}（失败 {summary['failed']}），"
+            f"分片 {summary['shards']}"
+        )
+        for index, result in enumerate(results):
+            self.stdout.write(
+                f"  进程 {index}：连接 {result['connected']}，收齐 {result['complete']}，"
+                f"最少收到 {result['min_received']} 帧，分片 {result['shard']}"
+            )
+        self.stdout.write(
+            f"投递 {summary['delivered']}，丢失 {summary['lost']}，{summary['throughput']:.0f} 投递/秒；"
+            f"延迟 p50 {summary['p50_ms']:.1f}ms，p95 {summary['p95_ms']:.1f}ms，"
+            f"p99 {summary['p99_ms']:.1f}ms，最大 {summary['max_ms']:.1f}ms"
+        )
+
+    def load_tokens(self, count):
+        User = get_user_model()
+        tokens = []
+        for index in range(max(count, 1)):
+            username = USERNAME.format(index=index)
+            user, created = User.objects.get_or_create(
+                username=username, defaults={'email': f'{username}@loadtest.invalid'},
+            )
+            if created:
+                user.set_unusable_password()
+                user.save(update_fields=['password'])
+            tokens.append(str(AccessToken.for_user(user)))
+        return tokens
+
+    async def run_inline(self, tokens, options):
+        from edu_platform.asgi import application
+
+        connected = asyncio.Event()
+        stop = asyncio.Event()
+        clients = asyncio.ensure_future(run_clients(
+            application, options['live_event_id'], tokens, options['messages'],
+            lambda *counts: connected.set(), stop.wait(),
+            origin=options['origin'], connect_timeout=options['connect_timeout'],
+        ))
+        await connected.wait()
+        started = time.perf_counter()
+        await publish_frames(
+            get_channel_layer(), options['live_event_id'], options['messages'],
+            rate=options['rate'], payload_bytes=options['payload_bytes'],
+        )
+        await asyncio.wait([clients], timeout=options['timeout'])
+        stop.set()
+        result = await clients
+        return [result], time.perf_counter() - started
+
+    def run_workers(self, workers, tokens, options):
+        # 子进程直接 fork 已初始化的 Django，各自重新建立数据库连接
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        reports = context.Queue()
+        stop = context.Event()
+        processes = []
+        for index in range(workers):
+            process = context.Process(target=worker_main, args=(
+                index, options['live_event_id'], tokens[index::workers], options['messages'],
+                options['origin'], options['connect_timeout'], reports, stop,
+            ))
+            process.start()
+            processes.append(process)
+
+        received = collections.defaultdict(dict)
+        try:
+            ready = collect(
+                reports, received, 'ready', workers, options['connect_timeout'] + 30,
+                alive=lambda: all(process.is_alive() for process in processes),
+            )
+            if len(ready) < workers:
+                raise CommandError(f'只有 {len(ready)}/{workers} 个压测进程完成连接')
+            started = time.perf_counter()
+            asyncio.run(publish_frames(
+                get_channel_layer(), options['live_event_id'], options['messages'],
+                rate=options['rate'], payload_bytes=options['payload_bytes'],
+            ))
+            collect(reports, received, 'result', workers, options['timeout'])
+            stop.set()
+            results = collect(reports, received, 'result', workers, 30)
+            seconds = time.perf_counter() - started
+        finally:
+            stop.set()
+            for process in processes:
+                process.join(timeout=30)
+                if process.is_alive():
+                    process.terminate()
+        return [results[index][0] for index in sorted(results)], seconds
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from live.scheduler import LiveScheduler
+
+LABELS = {
+    'remind': '发送开播提醒',
+    'expire': '取消未开始的过期直播',
+    'start': '自动开始',
+    'end': '自动结束',
+}
+
+
+class Command(BaseCommand):
+    help = '运行直播定时任务：开播提醒、到时自动开始和结束直播（可以同时运行多个进程，不会重复执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='执行当前到期（包括停机期间错过）的定时项后退出')
+
+    def handle(self, *args, **options):
+        scheduler = LiveScheduler()
+        while True:
+            close_old_connections()
+            for kind, live_event_ids in scheduler.run_pending().items():
+                if live_event_ids:
+                    self.stdout.write(f'{LABELS[kind]} {len(live_event_ids)} 场直播：{live_event_ids}')
+            if options['once']:
+                return
+            time.sleep(max((scheduler.next_wakeup() - timezone.now()).total_seconds(), 0))
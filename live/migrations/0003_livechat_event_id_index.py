@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-19 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0002_liveevent_pre_recorded_video_url'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='livechat',
+            index=models.Index(fields=['live_event', 'id'], name='live_chat_event_id_idx'),
+        ),
+    ]
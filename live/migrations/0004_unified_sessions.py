@@ -0,0 +1,55 @@
+# Generated by Django 4.2.6 on 2026-10-19 10:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courses', '0006_lesson_ownership'),
+        ('live', '0003_livechat_event_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='liveevent',
+            name='lesson',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='live_event', to='courses.lesson', verbose_name='关联课时'),
+        ),
+        migrations.CreateModel(
+            name='LiveSessionSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unique_attendees', models.PositiveIntegerField(default=0, verbose_name='出席人数')),
+                ('peak_attendees', models.PositiveIntegerField(default=0, verbose_name='最高同时在线人数')),
+                ('average_minutes', models.FloatField(default=0, verbose_name='平均在线时长(分钟)')),
+                ('total_minutes', models.PositiveIntegerField(default=0, verbose_name='总在线时长(分钟)')),
+                ('generated_at', models.DateTimeField(verbose_name='生成时间')),
+                ('live_event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='live.liveevent', verbose_name='直播活动')),
+            ],
+            options={
+                'verbose_name': '直播出席汇总',
+                'verbose_name_plural': '直播出席汇总',
+            },
+        ),
+        migrations.CreateModel(
+            name='LiveAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('join_time', models.DateTimeField(default=django.utils.timezone.now, verbose_name='加入时间')),
+                ('leave_time', models.DateTimeField(blank=True, null=True, verbose_name='离开时间')),
+                ('duration', models.PositiveIntegerField(default=0, verbose_name='在线时长(分钟)')),
+                ('live_event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendances', to='live.liveevent', verbose_name='直播活动')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='live_attendances', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '直播出席记录',
+                'verbose_name_plural': '直播出席记录',
+                'unique_together': {('user', 'live_event')},
+            },
+        ),
+    ]
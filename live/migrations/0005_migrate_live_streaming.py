@@ -0,0 +1,73 @@
+from django.db import migrations
+
+
+def copy_live_streaming(apps, schema_editor):
+    """把课时直播（videos.LiveStreaming）及其出席记录、出席汇总复制为关联课时的直播活动"""
+    LiveStreaming = apps.get_model('videos', 'LiveStreaming')
+    LiveStreamingAttendance = apps.get_model('videos', 'LiveStreamingAttendance')
+    OldSummary = apps.get_model('videos', 'LiveSessionSummary')
+    LiveEvent = apps.get_model('live', 'LiveEvent')
+    LiveEnrollment = apps.get_model('live', 'LiveEnrollment')
+    LiveAttendance = apps.get_model('live', 'LiveAttendance')
+    LiveSessionSummary = apps.get_model('live', 'LiveSessionSummary')
+
+    event_ids = {}
+    for stream in LiveStreaming.objects.select_related('lesson__section__course').iterator():
+        course = stream.lesson.section.course
+        summary = OldSummary.objects.filter(live_streaming=stream).first()
+        event = LiveEvent.objects.create(
+            title=stream.title,
+            description=stream.description,
+            instructor_id=course.instructor_id,
+            course=course,
+            lesson_id=stream.lesson_id,
+            scheduled_start_time=stream.scheduled_start_time,
+            scheduled_end_time=stream.scheduled_end_time,
+            actual_start_time=stream.actual_start_time,
+            actual_end_time=stream.actual_end_time,
+            status='canceled' if stream.status == 'cancelled' else stream.status,
+            stream_key=stream.stream_key,
+            play_url=stream.stream_url,
+            max_viewer_count=summary.peak_attendees if summary else 0,
+        )
+        event_ids[stream.pk] = event.pk
+        if summary is not None:
+            LiveSessionSummary.objects.create(
+                live_event=event,
+                unique_attendees=summary.unique_attendees,
+                peak_attendees=summary.peak_attendees,
+                average_minutes=summary.average_minutes,
+                total_minutes=summary.total_minutes,
+                generated_at=summary.generated_at,
+            )
+
+    # 同一用户的多条出席记录合并为一条：时长累加，时间取最后一次
+    merged = {}
+    rows = LiveStreamingAttendance.objects.order_by('join_time').values_list(
+        'user_id', 'live_streaming_id', 'join_time', 'leave_time', 'duration',
+    )
+    for user_id, stream_id, join_time, leave_time, duration in rows.iterator():
+        key = (user_id, event_ids[stream_id])
+        previous = merged.get(key)
+        total = duration + (previous.duration if previous else 0)
+        merged[key] = LiveAttendance(
+            user_id=user_id, live_event_id=key[1], join_time=join_time, leave_time=leave_time, duration=total,
+        )
+    LiveAttendance.objects.bulk_create(merged.values(), batch_size=1000)
+    # 统一后加入直播即报名，聊天权限与独立直播一致
+    LiveEnrollment.objects.bulk_create(
+        [LiveEnrollment(user_id=user_id, live_event_id=event_id, attended=True) for user_id, event_id in merged],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0004_unified_sessions'),
+        ('videos', '0006_live_session_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_live_streaming, migrations.RunPython.noop),
+    ]
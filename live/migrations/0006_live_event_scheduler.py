@@ -0,0 +1,22 @@
+# Generated by Django 4.2.6 on 2026-10-19 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0005_migrate_live_streaming'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='liveevent',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='开播提醒时间'),
+        ),
+        migrations.AddIndex(
+            model_name='liveevent',
+            index=models.Index(fields=['status', 'scheduled_start_time'], name='live_event_status_start_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.6 on 2026-10-19 10:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0006_live_event_scheduler'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveChatArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='存储路径')),
+                ('message_count', models.PositiveIntegerField(verbose_name='消息数')),
+                ('first_id', models.BigIntegerField(verbose_name='第一条消息ID')),
+                ('last_id', models.BigIntegerField(verbose_name='最后一条消息ID')),
+                ('size', models.BigIntegerField(verbose_name='文件大小')),
+                ('chunk_size', models.PositiveIntegerField(verbose_name='每段消息数')),
+                ('chunks', models.JSONField(default=list, verbose_name='分段索引')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='归档时间')),
+                ('live_event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='chat_archive', to='live.liveevent', verbose_name='直播活动')),
+            ],
+            options={
+                'verbose_name': '直播聊天归档',
+                'verbose_name_plural': '直播聊天归档',
+            },
+        ),
+    ]
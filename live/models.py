@@ -1,6 +1,11 @@
-from django.db import models
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from accounts.models import User
-from courses.models import Course
+from courses.models import Course, Lesson
+from .chat_buffer import clear as clear_buffer
 
 class LiveEvent(models.Model):
     """直播活动模型"""
@@ -15,12 +20,17 @@ class LiveEvent(models.Model):
     description = models.TextField(blank=True, null=True, verbose_name='直播描述')
     instructor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='live_events', verbose_name='讲师')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='live_events', verbose_name='关联课程')
+    # 课时直播（原 videos.LiveStreaming）关联到课时，观看权限按课程报名判断；独立直播为空
+    lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, null=True, blank=True,
+                                  related_name='live_event', verbose_name='关联课时')
     
     # 直播时间
     scheduled_start_time = models.DateTimeField(verbose_name='计划开始时间')
     scheduled_end_time = models.DateTimeField(verbose_name='计划结束时间')
     actual_start_time = models.DateTimeField(null=True, blank=True, verbose_name='实际开始时间')
     actual_end_time = models.DateTimeField(null=True, blank=True, verbose_name='实际结束时间')
+    # 开播提醒的发送时间，由 live.scheduler 维护，重启后据此不再重复发送
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='开播提醒时间')
     
     # 直播状态
     status = models.CharField(max_length=20, choices=LIVE_STATUS, default='scheduled', verbose_name='直播状态')
@@ -43,15 +53,17 @@ class LiveEvent(models.Model):
         verbose_name = '直播活动'
         verbose_name_plural = '直播活动'
         ordering = ['-scheduled_start_time']
+        indexes = [
+            # 定时任务和 upcoming 列表按状态取最近开始的直播
+            models.Index(fields=['status', 'scheduled_start_time'], name='live_event_status_start_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
     def is_upcoming(self):
         """是否即将开始"""
-        import datetime
-        now = datetime.datetime.now()
-        return self.status == 'scheduled' and self.scheduled_start_time > now
+        return self.status == 'scheduled' and self.scheduled_start_time > timezone.now()
 
 class LiveEnrollment(models.Model):
     """直播报名记录"""
@@ -68,6 +80,38 @@ class LiveEnrollment(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.live_event.title}"
 
+class LiveAttendance(models.Model):
+    """直播出席记录：每个用户每场直播一条，重新加入时累加在线时长，见 live.sessions"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='live_attendances', verbose_name='用户')
+    live_event = models.ForeignKey(LiveEvent, on_delete=models.CASCADE, related_name='attendances', verbose_name='直播活动')
+    join_time = models.DateTimeField(default=timezone.now, verbose_name='加入时间')
+    leave_time = models.DateTimeField(blank=True, null=True, verbose_name='离开时间')
+    duration = models.PositiveIntegerField(default=0, verbose_name='在线时长(分钟)')
+    
+    class Meta:
+        verbose_name = '直播出席记录'
+        verbose_name_plural = '直播出席记录'
+        unique_together = ['user', 'live_event']
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.live_event.title}"
+
+class LiveSessionSummary(models.Model):
+    """直播结束时生成的出席汇总，供报表使用，见 live.attendance"""
+    live_event = models.OneToOneField(LiveEvent, on_delete=models.CASCADE, related_name='summary', verbose_name='直播活动')
+    unique_attendees = models.PositiveIntegerField(default=0, verbose_name='出席人数')
+    peak_attendees = models.PositiveIntegerField(default=0, verbose_name='最高同时在线人数')
+    average_minutes = models.FloatField(default=0, verbose_name='平均在线时长(分钟)')
+    total_minutes = models.PositiveIntegerField(default=0, verbose_name='总在线时长(分钟)')
+    generated_at = models.DateTimeField(verbose_name='生成时间')
+    
+    class Meta:
+        verbose_name = '直播出席汇总'
+        verbose_name_plural = '直播出席汇总'
+    
+    def __str__(self):
+        return f"{self.live_event} 出席汇总"
+
 class LiveChat(models.Model):
     """直播聊天记录"""
     live_event = models.ForeignKey(LiveEvent, on_delete=models.CASCADE, related_name='chat_messages', verbose_name='直播活动')
@@ -79,6 +123,43 @@ class LiveChat(models.Model):
         verbose_name = '直播聊天'
         verbose_name_plural = '直播聊天'
         ordering = ['created_at']
+        indexes = [
+            # 按 id 补齐和向前翻页
+            models.Index(fields=['live_event', 'id'], name='live_chat_event_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username}: {self.message[:20]}..."
+
+@receiver(post_save, sender=LiveChat)
+@receiver(post_delete, sender=LiveChat)
+def clear_chat_buffer(sender, instance, created=False, **kwargs):
+    """消息被修改或删除后缓冲中的副本已过时，整个丢弃；新消息由 live.chat 写入缓冲"""
+    if not created:
+        clear_buffer(instance.live_event_id)
+
+
+class LiveChatArchive(models.Model):
+    """已结束直播的聊天归档：消息压缩为存储中的一个 gzip JSONL 文件后从 LiveChat 删除，见 live.archive"""
+    live_event = models.OneToOneField(LiveEvent, on_delete=models.CASCADE, related_name='chat_archive', verbose_name='直播活动')
+    path = models.CharField(max_length=255, unique=True, verbose_name='存储路径')
+    message_count = models.PositiveIntegerField(verbose_name='消息数')
+    first_id = models.BigIntegerField(verbose_name='第一条消息ID')
+    last_id = models.BigIntegerField(verbose_name='最后一条消息ID')
+    size = models.BigIntegerField(verbose_name='文件大小')
+    # 每 chunk_size 条消息压缩为一个独立的 gzip 段，chunks 为各段 [第一条消息ID, 文件内偏移]，分页时从所需的段开始解压
+    chunk_size = models.PositiveIntegerField(verbose_name='每段消息数')
+    chunks = models.JSONField(default=list, verbose_name='分段索引')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='归档时间')
+
+    class Meta:
+        verbose_name = '直播聊天归档'
+        verbose_name_plural = '直播聊天归档'
+
+    def __str__(self):
+        return f"{self.live_event.title} 聊天归档（{self.message_count} 条）"
+
+@receiver(post_delete, sender=LiveChatArchive)
+def delete_chat_archive_file(sender, instance, **kwargs):
+    """归档记录删除（包括随直播活动级联删除）后删除归档文件"""
+    transaction.on_commit(lambda: default_storage.delete(instance.path))
@@ -0,0 +1,171 @@
+"""
+直播间在线状态
+
+WebSocket 连接、断开和心跳（客户端定期发送 {"type": "ping"}，任何消息都算心跳）维护每个进程内各直播间的连接表。
+PresenceTracker 每 LIVE_PRESENCE_INTERVAL 秒执行一次：
+
+- 关闭超过 LIVE_PRESENCE_TIMEOUT 秒没有心跳的连接（断网后服务端未收到断开事件的僵尸连接）；
+- 把本进程各直播间的在线用户写入缓存 live:presence:{直播ID}（{进程: (过期时间, [用户ID])}），
+  合并各进程的记录得到去重后的在线人数，回写 LiveEvent.viewer_count 和 max_viewer_count；
+- 向在线的讲师推送快照 {"type": "presence", "viewer_count": N, "max_viewer_count": M, "viewers": [名片], "stats": {...}}
+  （stats 为 live.limits 中的限流、丢帧计数），
+  讲师端无需轮询出席记录。
+
+缓存中的记录由各进程整体覆盖，并发写入时偶尔丢失的一份会在下一个周期补上；进程退出后它的记录按过期时间自动剔除。
+讲师本人不计入观看人数。
+"""
+import asyncio
+import json
+import time
+import uuid
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from accounts.cards import load_cards
+
+from .chat import room_group
+from .limits import load_counts
+from .models import LiveEvent
+
+PRESENCE_INTERVAL = getattr(settings, 'LIVE_PRESENCE_INTERVAL', 5)
+PRESENCE_TIMEOUT = getattr(settings, 'LIVE_PRESENCE_TIMEOUT', 75)
+# 快照中最多附带的观众名片数
+SNAPSHOT_VIEWERS = getattr(settings, 'LIVE_PRESENCE_SNAPSHOT_VIEWERS', 200)
+
+CACHE_KEY = 'live:presence:{live_event_id}'
+# 区分各进程在缓存中的记录
+PROCESS_ID = uuid.uuid4().hex
+
+
+def _cache_key(live_event_id):
+    return CACHE_KEY.format(live_event_id=live_event_id)
+
+
+def sync_viewers(rooms, now=None):
+    """
+    rooms 为本进程 {直播ID: 在线用户ID集合}，写入缓存并合并其他进程的记录，
+    回写人数有变化的直播活动，返回 {直播ID: (观看人数, 最高观看人数, 在线用户ID列表)}
+    """
+    now = now or time.time()
+    expires = now + PRESENCE_TIMEOUT
+    result = {}
+    for live_event_id, user_ids in rooms.items():
+        key = _cache_key(live_event_id)
+        entries = {
+            process: entry for process, entry in (cache.get(key) or {}).items()
+            if entry[0] > now and process != PROCESS_ID
+        }
+        if user_ids:
+            entries[PROCESS_ID] = (expires, sorted(user_ids))
+        if entries:
+            cache.set(key, entries, PRESENCE_TIMEOUT)
+        else:
+            cache.delete(key)
+        viewers = set()
+        for _, ids in entries.values():
+            viewers.update(ids)
+        result[live_event_id] = viewers
+
+    counts = {}
+    events = LiveEvent.objects.filter(pk__in=list(result)).values_list('id', 'viewer_count', 'max_viewer_count')
+    for live_event_id, viewer_count, max_viewer_count in events:
+        total = len(result[live_event_id])
+        if total != viewer_count or total > max_viewer_count:
+            LiveEvent.objects.filter(pk=live_event_id).update(
+                viewer_count=total, max_viewer_count=Greatest(F('max_viewer_count'), Value(total)),
+            )
+            max_viewer_count = max(max_viewer_count, total)
+        counts[live_event_id] = (total, max_viewer_count, sorted(result[live_event_id]))
+    return counts
+
+
+def encode_snapshot(live_event_id, viewer_count, max_viewer_count, user_ids):
+    cards = load_cards(user_ids[:SNAPSHOT_VIEWERS])
+    viewers = [cards[user_id] for user_id in user_ids[:SNAPSHOT_VIEWERS] if cards.get(user_id)]
+    return json.dumps({
+        'type': 'presence', 'viewer_count': viewer_count, 'max_viewer_count': max_viewer_count, 'viewers': viewers,
+        'stats': load_counts(room_group(live_event_id)),
+    }, ensure_ascii=False, separators=(',', ':'))
+
+
+class Connection:
+    __slots__ = ('user_id', 'is_instructor', 'last_seen')
+
+    def __init__(self, user_id, is_instructor):
+        self.user_id = user_id
+        self.is_instructor = is_instructor
+        self.last_seen = time.monotonic()
+
+
+class PresenceTracker:
+    """绑定到一个事件循环的在线状态表；有连接时才运行周期任务"""
+
+    def __init__(self, loop, channel_layer, interval=PRESENCE_INTERVAL, timeout=PRESENCE_TIMEOUT):
+        self.loop = loop
+        self.channel_layer = channel_layer
+        self.interval = interval
+        self.timeout = timeout
+        # {直播ID: {连接的 channel_name: Connection}}
+        self.rooms = {}
+        self.task = None
+
+    def connect(self, live_event_id, channel_name, user_id, is_instructor=False):
+        self.rooms.setdefault(live_event_id, {})[channel_name] = Connection(user_id, is_instructor)
+        if self.task is None or self.task.done():
+            self.task = self.loop.create_task(self.run())
+
+    def heartbeat(self, live_event_id, channel_name):
+        connection = self.rooms.get(live_event_id, {}).get(channel_name)
+        if connection is not None:
+            connection.last_seen = time.monotonic()
+
+    def disconnect(self, live_event_id, channel_name):
+        # 房间清空后保留空表，下个周期把人数回写为 0 后再移除
+        self.rooms.get(live_event_id, {}).pop(channel_name, None)
+
+    def viewers(self, live_event_id):
+        return {c.user_id for c in self.rooms.get(live_event_id, {}).values() if not c.is_instructor}
+
+    async def run(self):
+        while self.rooms:
+            await asyncio.sleep(self.interval)
+            await self.sweep()
+
+    async def sweep(self):
+        deadline = time.monotonic() - self.timeout
+        for live_event_id, connections in list(self.rooms.items()):
+            for channel_name, connection in list(connections.items()):
+                if connection.last_seen < deadline:
+                    del connections[channel_name]
+                    await self.channel_layer.send(channel_name, {'type': 'presence.expired'})
+
+        rooms = {live_event_id: self.viewers(live_event_id) for live_event_id in self.rooms}
+        counts = await database_sync_to_async(sync_viewers)(rooms)
+        for live_event_id, connections in list(self.rooms.items()):
+            if not connections:
+                # 本周期回写的人数已不含本进程的连接时才移除，否则下个周期再回写一次
+                if not rooms.get(live_event_id):
+                    del self.rooms[live_event_id]
+                continue
+            instructors = [name for name, c in connections.items() if c.is_instructor]
+            if instructors and live_event_id in counts:
+                text = await database_sync_to_async(encode_snapshot)(live_event_id, *counts[live_event_id])
+                for channel_name in instructors:
+                    await self.channel_layer.send(channel_name, {'type': 'room.frame', 'text': text})
+
+
+_tracker = None
+
+
+def get_tracker():
+    """返回当前事件循环的在线状态表（须在事件循环中调用）"""
+    global _tracker
+    loop = asyncio.get_running_loop()
+    if _tracker is None or _tracker.loop is not loop:
+        _tracker = PresenceTracker(loop, get_channel_layer())
+    return _tracker
@@ -0,0 +1,148 @@
+"""
+直播间分片中继
+
+大直播间的每个连接都加入同一个组时，每一帧都要在通道层中为每位观众写一次：一万人的直播间每帧一万次写入，
+而且组成员全部落在同一个组（Redis 通道层按组名选择节点，即同一个 Redis 节点）上。
+
+改为两级中继树：
+
+    直播间 live_event_{id}
+      ├─ 分片组 live_event_{id}.shard0 ── 进程 A 的中继通道 ── 进程 A 内该直播间的所有连接
+      ├─ 分片组 live_event_{id}.shard1 ── 进程 B、C 的中继通道 ── ...
+      └─ ...（共 LIVE_ROOM_SHARDS 个分片组）
+
+- 每个进程（事件循环）一个 RoomRelay 和一个中继通道，进程内第一个连接进入某直播间时，中继通道加入该直播间的一个分片组，
+  最后一个连接离开时退出；连接本身不再加入通道层的组；
+- 进程落在哪个分片由中继通道名在一致性哈希环上决定，修改分片数时只有约 1/分片数 的进程换组；
+- 发送一帧时对每个分片组 group_send 一次（publish），每个进程只收到一次，再在进程内直接交给本进程的各连接（room_frame）。
+
+通道层的写入次数从观众数降为分片数 + 持有该直播间连接的进程数；Redis 通道层下各分片组按组名分布到不同节点，
+增加 ASGI 进程（或节点）即可横向扩容同一个直播间。本地多进程压测见 loadtest_live_room 命令。
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+ROOM_SHARDS = getattr(settings, 'LIVE_ROOM_SHARDS', 4)
+# 每个分片在哈希环上的虚拟节点数，越多分布越均匀
+VIRTUAL_NODES = 64
+# 中继通道名前缀，通道层按此前缀给中继通道更大的积压上限（见 edu_platform.channel_layers）
+RELAY_PREFIX = 'relay'
+# 中继通道收到的消息类型
+RELAY_EVENT = 'relay.frame'
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """一致性哈希环，把任意键映射到 0..shards-1 中的一个分片"""
+
+    def __init__(self, shards=ROOM_SHARDS, virtual_nodes=VIRTUAL_NODES):
+        self.shards = shards
+        points = sorted(
+            (_hash(f'shard{shard}#{node}'), shard) for shard in range(shards) for node in range(virtual_nodes)
+        )
+        self.keys = [point for point, _ in points]
+        self.values = [shard for _, shard in points]
+
+    def get(self, key):
+        index = bisect.bisect(self.keys, _hash(key)) % len(self.keys)
+        return self.values[index]
+
+
+ring = HashRing()
+
+
+def shard_group(room, shard):
+    return f'{room}.shard{shard}'
+
+
+def shard_groups(room, shards=ROOM_SHARDS):
+    return [shard_group(room, shard) for shard in range(shards)]
+
+
+async def publish(channel_layer, room, text):
+    """把预编码的一帧发送到直播间的所有分片，每个持有该直播间连接的进程收到一次"""
+    event = {'type': RELAY_EVENT, 'room': room, 'text': text}
+    for group in shard_groups(room, ring.shards):
+        await channel_layer.group_send(group, event)
+
+
+class RoomRelay:
+    """绑定到一个事件循环的中继：维护本进程各直播间的连接，并把中继通道收到的帧分发给它们"""
+
+    def __init__(self, loop, channel_layer, ring=ring):
+        self.loop = loop
+        self.channel_layer = channel_layer
+        self.ring = ring
+        self.channel = None
+        self.shard = None
+        # {直播间: 本进程中的连接（消费者）集合}
+        self.rooms = {}
+        self.task = None
+
+    async def ensure_channel(self):
+        if self.channel is None:
+            self.channel = await self.channel_layer.new_channel(RELAY_PREFIX)
+            self.shard = self.ring.get(self.channel)
+        if self.task is None:
+            self.task = self.loop.create_task(self.run())
+
+    async def subscribe(self, room, consumer):
+        """连接进入直播间；consumer 需提供 room_frame(event) 协程方法"""
+        await self.ensure_channel()
+        subscribers = self.rooms.setdefault(room, set())
+        subscribers.add(consumer)
+        if len(subscribers) == 1:
+            await self.channel_layer.group_add(shard_group(room, self.shard), self.channel)
+
+    async def unsubscribe(self, room, consumer):
+        subscribers = self.rooms.get(room)
+        if subscribers is None or consumer not in subscribers:
+            return
+        subscribers.discard(consumer)
+        if subscribers:
+            return
+        del self.rooms[room]
+        await self.channel_layer.group_discard(shard_group(room, self.shard), self.channel)
+        if room in self.rooms:
+            # 退出分片组期间又有连接进入
+            await self.channel_layer.group_add(shard_group(room, self.shard), self.channel)
+
+    async def run(self):
+        while True:
+            try:
+                message = await self.channel_layer.receive(self.channel)
+            except Exception:
+                logger.exception('直播间中继接收失败')
+                await asyncio.sleep(1)
+                continue
+            await self.dispatch(message)
+
+    async def dispatch(self, message):
+        # 先复制：分发过程中连接可能断开（慢连接被关闭）
+        for consumer in list(self.rooms.get(message.get('room'), ())):
+            try:
+                await consumer.room_frame(message)
+            except Exception:
+                logger.exception('直播间 %s 的帧分发失败', message.get('room'))
+
+
+_relay = None
+
+
+def get_relay():
+    """返回当前事件循环的中继（须在事件循环中调用）"""
+    global _relay
+    loop = asyncio.get_running_loop()
+    if _relay is None or _relay.loop is not loop:
+        _relay = RoomRelay(loop, get_channel_layer())
+    return _relay
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .consumers import LiveChatConsumer
+
+websocket_urlpatterns = [
+    path('ws/live/<int:live_event_id>/', LiveChatConsumer.as_asgi()),
+]
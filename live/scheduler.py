@@ -0,0 +1,172 @@
+"""
+直播定时任务：开播提醒和到时自动切换状态
+
+LiveScheduler 在进程内用一个最小堆保存近期要执行的定时项 (执行时刻, 类型, 直播ID)：
+
+- remind：开播前 LIVE_REMINDER_LEAD 秒向已报名直播的用户（课时直播为课程的有效学员）发送通知；
+- start：到计划开始时间自动开始（LIVE_AUTO_START 为 False 时由讲师手动开始）；
+- expire：计划结束 LIVE_AUTO_END_GRACE 秒后仍未开始的直播标记为已取消；
+- end：计划结束 LIVE_AUTO_END_GRACE 秒后仍在直播的自动结束（关闭出席记录并生成汇总，见 live.sessions）。
+
+堆中只装入未来 LIVE_SCHEDULER_HORIZON 秒内最近的 LIVE_SCHEDULER_BATCH_SIZE 场直播（按 (status, scheduled_start_time) 索引读取），
+每 LIVE_SCHEDULER_REFRESH 秒从数据库重新装入，新建或修改时间的直播由此生效。
+到期的定时项按类型合并，每类一次批量 UPDATE，UPDATE 带有状态和时间条件：
+堆中的过期数据（直播已被手动开始、改期或删除）不会产生错误的切换，多个进程同时运行也不会重复执行。
+
+状态全部保存在数据库中（直播状态和 reminder_sent_at），进程重启后重新装入即可恢复，
+停机期间错过的定时项在装入后立即补做。由 run_live_scheduler 命令运行。
+"""
+import collections
+import datetime
+import heapq
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from comments.models import Notification
+from courses.models import Enrollment
+
+from . import sessions
+from .models import LiveEnrollment, LiveEvent
+
+BATCH_SIZE = getattr(settings, 'LIVE_SCHEDULER_BATCH_SIZE', 500)
+HORIZON = datetime.timedelta(seconds=getattr(settings, 'LIVE_SCHEDULER_HORIZON', 3600))
+REFRESH = datetime.timedelta(seconds=getattr(settings, 'LIVE_SCHEDULER_REFRESH', 60))
+REMINDER_LEAD = datetime.timedelta(seconds=getattr(settings, 'LIVE_REMINDER_LEAD', 15 * 60))
+END_GRACE = datetime.timedelta(seconds=getattr(settings, 'LIVE_AUTO_END_GRACE', 30 * 60))
+AUTO_START = getattr(settings, 'LIVE_AUTO_START', True)
+# 窗口被截断时两次装入的最短间隔
+MIN_RELOAD = datetime.timedelta(seconds=1)
+
+# 同一时刻到期时的执行顺序：先提醒再开始
+KINDS = ('remind', 'expire', 'start', 'end')
+
+
+def send_reminders(live_event_ids, now):
+    """发送开播提醒，返回实际发送的直播ID列表；已发送过的直播跳过"""
+    with transaction.atomic():
+        events = LiveEvent.objects.filter(
+            pk__in=live_event_ids, status='scheduled', reminder_sent_at__isnull=True,
+            scheduled_start_time__lte=now + REMINDER_LEAD,
+        )
+        # 先占用再发送：其他进程的同一批 UPDATE 不会再匹配这些直播
+        rows = list(events.select_for_update().values_list(
+            'id', 'title', 'scheduled_start_time', 'instructor_id', 'lesson_id', 'course_id',
+        ))
+        if not rows:
+            return []
+        LiveEvent.objects.filter(pk__in=[row[0] for row in rows]).update(reminder_sent_at=now)
+
+        recipients = collections.defaultdict(set)
+        for live_event_id, user_id in LiveEnrollment.objects.filter(
+            live_event_id__in=[row[0] for row in rows],
+        ).values_list('live_event_id', 'user_id'):
+            recipients[live_event_id].add(user_id)
+        # 课时直播通知课程的有效学员
+        lesson_courses = {row[5] for row in rows if row[4] is not None}
+        students = collections.defaultdict(set)
+        for course_id, user_id in Enrollment.objects.filter(
+            course_id__in=lesson_courses, status='active',
+        ).values_list('course_id', 'student_id'):
+            students[course_id].add(user_id)
+
+        content_type = ContentType.objects.get_for_model(LiveEvent)
+        notifications = []
+        for live_event_id, title, start, instructor_id, lesson_id, course_id in rows:
+            users = recipients[live_event_id] | (students[course_id] if lesson_id is not None else set())
+            users.discard(instructor_id)
+            message = f"直播《{title}》将于 {timezone.localtime(start):%m-%d %H:%M} 开始"
+            notifications += [
+                Notification(
+                    recipient_id=user_id, sender_id=instructor_id, notification_type='live',
+                    content_type=content_type, object_id=live_event_id, message=message,
+                )
+                for user_id in sorted(users)
+            ]
+        Notification.objects.bulk_create(notifications, batch_size=1000)
+    return [row[0] for row in rows]
+
+
+def run_transitions(action, live_event_ids, now):
+    """批量执行到期的状态切换，只切换确实已到时间的直播"""
+    events = LiveEvent.objects.filter(pk__in=live_event_ids)
+    if action == 'start':
+        events = events.filter(scheduled_start_time__lte=now, scheduled_end_time__gt=now - END_GRACE)
+    else:
+        events = events.filter(scheduled_end_time__lte=now - END_GRACE)
+    return sessions.transition_many(action, events, now)
+
+
+class LiveScheduler:
+    """进程内的定时表；load() 从数据库装入，run_pending() 执行到期的定时项"""
+
+    def __init__(self, batch_size=BATCH_SIZE, horizon=HORIZON, refresh=REFRESH, auto_start=AUTO_START):
+        self.batch_size = batch_size
+        self.horizon = horizon
+        self.refresh = refresh
+        self.auto_start = auto_start
+        self.heap = []
+        self.reload_at = None
+
+    def push(self, when, kind, live_event_id):
+        heapq.heappush(self.heap, (when, KINDS.index(kind), live_event_id))
+
+    def load(self, now=None):
+        """重建定时表，返回装入的定时项数"""
+        now = now or timezone.now()
+        self.heap = []
+        self.reload_at = now + self.refresh
+        until = now + self.horizon
+
+        # 提醒比开始早 REMINDER_LEAD，按开始时间多取这一段
+        scheduled = list(
+            LiveEvent.objects.filter(status='scheduled', scheduled_start_time__lte=until + REMINDER_LEAD)
+            .order_by('scheduled_start_time')
+            .values_list('id', 'scheduled_start_time', 'scheduled_end_time', 'reminder_sent_at')[:self.batch_size]
+        )
+        if len(scheduled) == self.batch_size:
+            # 只装入了窗口的一部分，执行到最后一场之前重新装入
+            self.reload_at = max(min(self.reload_at, scheduled[-1][1] - REMINDER_LEAD), now + MIN_RELOAD)
+        for live_event_id, start, end, reminder_sent_at in scheduled:
+            if end + END_GRACE <= until:
+                self.push(end + END_GRACE, 'expire', live_event_id)
+            if reminder_sent_at is None and start > now:
+                self.push(start - REMINDER_LEAD, 'remind', live_event_id)
+            if self.auto_start:
+                self.push(start, 'start', live_event_id)
+
+        # 直播中的场次很少，不需要额外索引
+        live = LiveEvent.objects.filter(status='live', scheduled_end_time__lte=until - END_GRACE).values_list(
+            'id', 'scheduled_end_time',
+        )
+        for live_event_id, end in live:
+            self.push(end + END_GRACE, 'end', live_event_id)
+        return len(self.heap)
+
+    def next_wakeup(self):
+        """下一次需要执行的时刻（定时项到期或需要重新装入）"""
+        if self.heap:
+            return min(self.heap[0][0], self.reload_at)
+        return self.reload_at
+
+    def run_pending(self, now=None):
+        """执行所有到期的定时项，返回 {类型: 实际处理的直播ID列表}；需要时先重新装入"""
+        now = now or timezone.now()
+        if self.reload_at is None or now >= self.reload_at:
+            self.load(now)
+        due = collections.defaultdict(list)
+        while self.heap and self.heap[0][0] <= now:
+            _, kind, live_event_id = heapq.heappop(self.heap)
+            due[KINDS[kind]].append(live_event_id)
+
+        done = {}
+        for kind in KINDS:
+            if not due[kind]:
+                continue
+            if kind == 'remind':
+                done[kind] = send_reminders(due[kind], now)
+            else:
+                done[kind] = run_transitions(kind, due[kind], now)
+        return done
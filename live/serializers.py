@@ -1,50 +1,82 @@
 from rest_framework import serializers
-from .models import LiveEvent, LiveEnrollment, LiveChat
-from accounts.serializers import UserSerializer
+from django.db.models import Count
+from .models import LiveEvent, LiveEnrollment, LiveChat, LiveAttendance, LiveSessionSummary
+from accounts.serializers import UserCardSerializer
+from edu_platform.dataloader import BatchListSerializer, batch_load
 
 class LiveChatSerializer(serializers.ModelSerializer):
     """直播聊天序列化器"""
-    user = UserSerializer(read_only=True)
+    user = UserCardSerializer()
     
     class Meta:
         model = LiveChat
+        list_serializer_class = BatchListSerializer
         fields = ['id', 'live_event', 'user', 'message', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 class LiveEnrollmentSerializer(serializers.ModelSerializer):
     """直播报名序列化器"""
-    user = UserSerializer(read_only=True)
+    user = UserCardSerializer()
     
     class Meta:
         model = LiveEnrollment
+        list_serializer_class = BatchListSerializer
         fields = ['id', 'user', 'live_event', 'enrolled_at', 'attended']
         read_only_fields = ['id', 'enrolled_at']
 
+class LiveAttendanceSerializer(serializers.ModelSerializer):
+    """直播出席记录序列化器"""
+    user = UserCardSerializer()
+    
+    class Meta:
+        model = LiveAttendance
+        list_serializer_class = BatchListSerializer
+        fields = ['id', 'user', 'live_event', 'join_time', 'leave_time', 'duration']
+        read_only_fields = ['id', 'join_time', 'leave_time', 'duration']
+
+class LiveSessionSummarySerializer(serializers.ModelSerializer):
+    """直播出席汇总序列化器"""
+    class Meta:
+        model = LiveSessionSummary
+        fields = ['live_event', 'unique_attendees', 'peak_attendees', 'average_minutes', 'total_minutes', 'generated_at']
+
+def _enrollment_counts(live_event_ids):
+    """按直播活动分组统计报名人数"""
+    return dict(
+        LiveEnrollment.objects.filter(live_event_id__in=live_event_ids)
+        .values('live_event').annotate(count=Count('id')).values_list('live_event', 'count')
+    )
+
 class LiveEventSerializer(serializers.ModelSerializer):
     """直播活动序列化器"""
-    instructor = UserSerializer(read_only=True)
+    instructor = UserCardSerializer()
     enrollments_count = serializers.SerializerMethodField()
     is_enrolled = serializers.SerializerMethodField()
     
     class Meta:
         model = LiveEvent
+        list_serializer_class = BatchListSerializer
         fields = [
-            'id', 'title', 'description', 'instructor', 'course',
+            'id', 'title', 'description', 'instructor', 'course', 'lesson',
             'scheduled_start_time', 'scheduled_end_time',
             'actual_start_time', 'actual_end_time', 'status',
             'play_url', 'viewer_count', 'max_viewer_count',
             'created_at', 'updated_at', 'enrollments_count', 'is_enrolled',
             'pre_recorded_video_url'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'viewer_count', 'max_viewer_count']
+        read_only_fields = ['id', 'lesson', 'created_at', 'updated_at', 'viewer_count', 'max_viewer_count']
     
     def get_enrollments_count(self, obj):
-        return obj.enrollments.count()
+        return batch_load(self, 'live.enrollments_count', _enrollment_counts, obj.pk, default=0)
     
     def get_is_enrolled(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.enrollments.filter(user=request.user).exists()
+            user = request.user
+            def enrolled(live_event_ids):
+                ids = LiveEnrollment.objects.filter(user=user, live_event_id__in=live_event_ids).values_list('live_event_id', flat=True)
+                return {live_event_id: True for live_event_id in ids}
+            return batch_load(self, 'live.is_enrolled', enrolled, obj.pk, default=False)
         return False
 
 class LiveEventCreateSerializer(serializers.ModelSerializer):
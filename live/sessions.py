@@ -0,0 +1,122 @@
+"""
+直播会话状态机
+
+独立直播和课时直播（原 videos.LiveStreaming，现为关联了课时的 LiveEvent）共用同一套状态、出席记录、
+在线状态（live.presence）和聊天（live.chat）：
+
+    scheduled --start--> live --end--> ended
+        |                  ^
+        +--cancel/expire--> canceled --start--+
+
+状态切换是一条带原状态条件的 UPDATE，同时开始（或结束）同一场直播的两个请求只有一个生效；
+结束时在同一事务中关闭仍在线的出席记录并生成出席汇总（见 live.attendance）。
+到时自动开始、结束和过期（计划结束后仍未开始）由 live.scheduler 批量执行。
+
+观看权限：课时直播要求课程免费或已报名课程，独立直播任何登录用户都可以加入。
+加入时自动报名直播（LiveEnrollment），聊天权限（讲师和已报名用户，见 live.chat.can_chat）因此对两种直播一致。
+"""
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
+
+from courses.membership import is_enrolled
+
+from .attendance import close_open_attendances, summarize_session
+from .models import LiveAttendance, LiveEnrollment, LiveEvent
+
+# 操作 -> (允许的原状态, 新状态, 记录时刻的字段)
+TRANSITIONS = {
+    'start': (('scheduled', 'canceled'), 'live', 'actual_start_time'),
+    'end': (('live',), 'ended', 'actual_end_time'),
+    'cancel': (('scheduled',), 'canceled', None),
+    'expire': (('scheduled',), 'canceled', None),
+}
+
+
+class InvalidTransition(Exception):
+    """直播的当前状态不允许该操作"""
+
+
+def stream_endpoints():
+    """为新直播生成 (推流密钥, RTMP推流地址, 播放地址)"""
+    stream_key = str(uuid.uuid4())
+    # 这里假设使用RTMP协议
+    rtmp_url = f"rtmp://your-rtmp-server.com/live/{stream_key}"
+    play_url = f"https://your-video-server.com/live/{stream_key}/index.m3u8"
+    return stream_key, rtmp_url, play_url
+
+
+def _changes(action, now):
+    sources, target, time_field = TRANSITIONS[action]
+    changes = {'status': target, 'updated_at': now}
+    if time_field:
+        changes[time_field] = now
+    return sources, changes
+
+
+def transition_many(action, live_events, now=None):
+    """
+    对查询集 live_events 中状态允许的直播执行同一状态切换，返回实际切换的直播ID列表；
+    其余直播（状态已被其他请求改变）跳过
+    """
+    now = now or timezone.now()
+    sources, changes = _changes(action, now)
+    with transaction.atomic():
+        ids = list(live_events.filter(status__in=sources).select_for_update().values_list('id', flat=True))
+        if not ids:
+            return ids
+        # 观看人数由 live.presence 单独回写，这里只更新状态字段
+        LiveEvent.objects.filter(pk__in=ids, status__in=sources).update(**changes)
+        if action == 'end':
+            close_open_attendances(LiveAttendance.objects.filter(live_event_id__in=ids), now)
+            for live_event_id in ids:
+                summarize_session(live_event_id, now)
+    return ids
+
+
+def transition(live_event, action, now=None):
+    """执行状态切换并更新 live_event 上的对应字段，状态不允许时抛出 InvalidTransition"""
+    now = now or timezone.now()
+    if not transition_many(action, LiveEvent.objects.filter(pk=live_event.pk), now):
+        raise InvalidTransition(action)
+    for field, value in _changes(action, now)[1].items():
+        setattr(live_event, field, value)
+    return live_event
+
+
+def can_join(user, live_event):
+    """用户能否观看直播"""
+    if not user.is_authenticated:
+        return False
+    if user.is_staff or live_event.instructor_id == user.pk:
+        return True
+    if live_event.lesson_id is None:
+        return True
+    return live_event.course.is_free or is_enrolled(user, live_event.course_id)
+
+
+def join(live_event, user, now=None):
+    """记录用户加入直播并返回出席记录；已在线时不变，离开后重新加入时从 now 开始计时"""
+    now = now or timezone.now()
+    LiveEnrollment.objects.update_or_create(user=user, live_event=live_event, defaults={'attended': True})
+    attendance, created = LiveAttendance.objects.get_or_create(
+        user=user, live_event=live_event, defaults={'join_time': now},
+    )
+    if not created and attendance.leave_time is not None:
+        LiveAttendance.objects.filter(pk=attendance.pk).update(join_time=now, leave_time=None)
+        attendance.join_time, attendance.leave_time = now, None
+    # 出席记录不保留更早的在线区间，加入时记下当时的在线人数（不含讲师），供出席汇总计算最高同时在线人数
+    online = LiveAttendance.objects.filter(live_event=live_event, leave_time__isnull=True).exclude(
+        user_id=live_event.instructor_id,
+    ).count()
+    LiveEvent.objects.filter(pk=live_event.pk, max_viewer_count__lt=online).update(max_viewer_count=online)
+    return attendance
+
+
+def leave(live_event, user, now=None):
+    """记录用户离开直播并累加在线时长，返回出席记录；用户不在线时返回 None"""
+    attendances = LiveAttendance.objects.filter(user=user, live_event=live_event)
+    if not close_open_attendances(attendances, now):
+        return None
+    return attendances.get()
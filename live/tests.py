@@ -1,3 +1,728 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import shutil
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from comments.models import Notification
+from courses.models import Course, Enrollment, Lesson, Section
+from edu_platform.testing import QueryBudgetTestMixin, TEST_CHANNEL_LAYERS
+
+from . import chat_buffer, chat_writer
+from .archive import archive_event
+from .broadcast import RoomBroadcaster
+from .chat import room_group
+from .consumers import CLOSE_FORBIDDEN, CLOSE_TOO_SLOW
+from .limits import MAX_FRAME_BYTES, OutboundQueue, RateLimiter, chat_limiter, flush_counts, load_counts
+from .models import LiveAttendance, LiveChat, LiveChatArchive, LiveEnrollment, LiveEvent, LiveSessionSummary
+from .presence import CACHE_KEY as PRESENCE_CACHE_KEY, get_tracker, sync_viewers
+from .relay import get_relay
+from .routing import websocket_urlpatterns
+from .scheduler import END_GRACE, REMINDER_LEAD, LiveScheduler
+
+User = get_user_model()
+
+
+class LiveEventQueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    """直播列表的查询数不随直播和报名数量增长"""
+
+    def setUp(self):
+        self.student = User.objects.create_user('student', 'student@example.com')
+
+    def grow(self, size):
+        start = timezone.now() + datetime.timedelta(days=1)
+        for index in range(LiveEvent.objects.count(), size):
+            instructor = User.objects.create_user(f'teacher{index}', f'teacher{index}@example.com')
+            course = Course.objects.create(
+                title=f'课程 {index}', slug=f'course-{index}', instructor=instructor, description='简介',
+                price=0, is_free=True,
+            )
+            live_event = LiveEvent.objects.create(
+                title=f'直播 {index}', course=course, instructor=instructor, description='简介',
+                scheduled_start_time=start, scheduled_end_time=start + datetime.timedelta(hours=1),
+                status='scheduled',
+            )
+            LiveEnrollment.objects.create(user=self.student, live_event=live_event)
+
+    def test_list(self):
+        responses = self.assertQueryCountFlat('live-events-list', self.grow, lambda: self.client.get('/api/live/events/'))
+        self.assertEqual([response.data['count'] for response in responses], [2, 20])
+
+    def test_list_enrolled(self):
+        self.client.force_authenticate(self.student)
+        self.assertQueryCountFlat(
+            'live-events-list', self.grow, lambda: self.client.get('/api/live/events/', {'enrolled': 'true'}),
+        )
+
+
+@override_settings(CHANNEL_LAYERS=TEST_CHANNEL_LAYERS)
+class LiveChatConsumerTests(TransactionTestCase):
+    """直播间 WebSocket 连接"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user('teacher', 'teacher@example.com')
+        self.student = User.objects.create_user('student', 'student@example.com')
+        course = Course.objects.create(
+            title='付费课程', slug='paid', instructor=self.instructor, description='简介', price=99, is_free=False,
+        )
+        section = Section.objects.create(course=course, title='第一章')
+        lesson = Lesson.objects.create(section=section, title='直播课')
+        start = timezone.now()
+        self.live_event = LiveEvent.objects.create(
+            title='课时直播', course=course, lesson=lesson, instructor=self.instructor, description='简介',
+            scheduled_start_time=start, scheduled_end_time=start + datetime.timedelta(hours=1), status='live',
+        )
+        self.course = course
+
+    async def open(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/live/{self.live_event.pk}/')
+        communicator.scope['user'] = user
+        connected, code = await communicator.connect()
+        await communicator.disconnect()
+        return connected, code
+
+    def test_lesson_live_requires_course_enrollment(self):
+        connected, code = async_to_sync(self.open)(self.student)
+        self.assertFalse(connected)
+        self.assertEqual(code, CLOSE_FORBIDDEN)
+
+        Enrollment.objects.create(student=self.student, course=self.course)
+        connected, _ = async_to_sync(self.open)(self.student)
+        self.assertTrue(connected)
+
+    def test_instructor_can_join(self):
+        connected, _ = async_to_sync(self.open)(self.instructor)
+        self.assertTrue(connected)
+
+
+class ChatBufferTests(SimpleTestCase):
+    """最近消息缓冲只在所有进程共用缓存时启用"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_disabled_with_process_local_cache(self):
+        chat_buffer.append(1, {'id': 1})
+        self.assertIsNone(chat_buffer.recent(1))
+        self.assertIsNone(chat_buffer.messages_since(1, 0, 10))
+
+    @mock.patch('live.chat_buffer.is_shared', return_value=True)
+    def test_messages_since_with_shared_cache(self, is_shared):
+        for message_id in range(1, 6):
+            chat_buffer.append(1, {'id': message_id})
+        page, has_more = chat_buffer.messages_since(1, 2, 10)
+        self.assertEqual([message['id'] for message in page], [3, 4, 5])
+        self.assertFalse(has_more)
+        page, has_more = chat_buffer.messages_since(1, 2, 2)
+        self.assertEqual([message['id'] for message in page], [3, 4])
+        self.assertTrue(has_more)
+
+
+@override_settings(CHANNEL_LAYERS=TEST_CHANNEL_LAYERS)
+class LiveSocketTestCase(TransactionTestCase):
+    """
+    通过 WebsocketCommunicator 连接直播间的测试基类。每个测试的协程在同一个事件循环中运行，
+    进程内的写入队列、广播器、中继和在线状态表都绑定到这个事件循环，结束时取消它们的后台任务
+    """
+
+    def setUp(self):
+        # 之前的测试留在进程内、尚未写入缓存的计数
+        flush_counts()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        chat_limiter.buckets.clear()
+        self.instructor = User.objects.create_user('teacher', 'teacher@example.com')
+        course = Course.objects.create(
+            title='课程', slug='course', instructor=self.instructor, description='简介', is_free=True,
+        )
+        start = timezone.now()
+        self.live_event = LiveEvent.objects.create(
+            title='直播', course=course, instructor=self.instructor, description='简介',
+            scheduled_start_time=start, scheduled_end_time=start + datetime.timedelta(hours=1), status='live',
+        )
+
+    def student(self, name):
+        user = User.objects.create_user(name, f'{name}@example.com')
+        LiveEnrollment.objects.create(user=user, live_event=self.live_event)
+        return user
+
+    def run_async(self, test):
+        async def run():
+            try:
+                await test()
+            finally:
+                current = asyncio.current_task()
+                for task in asyncio.all_tasks():
+                    if task is not current:
+                        task.cancel()
+        async_to_sync(run)()
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/live/{self.live_event.pk}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive(self, communicator, key):
+        """跳过其他帧，返回下一个带有 key 的 batch 帧"""
+        while True:
+            frame = await communicator.receive_json_from(timeout=2)
+            if frame['type'] == 'batch' and key in frame:
+                return frame
+
+    async def send(self, communicator, text):
+        await communicator.send_json_to({'type': 'chat_message', 'message': text})
+
+
+class LiveChatWriteTests(LiveSocketTestCase):
+    """WebSocket 消息经写入队列批量保存后广播"""
+
+    def test_message_saved_and_broadcast(self):
+        users = self.student('alice'), self.student('bob')
+
+        async def test():
+            alice, bob = await self.connect(users[0]), await self.connect(users[1])
+            await self.send(alice, '大家好')
+            frame = await self.receive(bob, 'messages')
+            self.assertEqual([message['message'] for message in frame['messages']], ['大家好'])
+            self.assertEqual(frame['messages'][0]['user']['username'], 'alice')
+            await alice.disconnect()
+            await bob.disconnect()
+
+        self.run_async(test)
+        self.assertEqual(LiveChat.objects.filter(live_event=self.live_event).count(), 1)
+
+    def test_concurrent_messages_written_in_one_batch(self):
+        users = [self.student(f'student{index}') for index in range(3)]
+
+        async def test():
+            senders = [await self.connect(user) for user in users]
+            for index, sender in enumerate(senders):
+                await self.send(sender, f'消息 {index}')
+            received = []
+            while len(received) < 3:
+                frame = await self.receive(senders[0], 'messages')
+                received += [message['message'] for message in frame['messages']]
+            self.assertEqual(sorted(received), ['消息 0', '消息 1', '消息 2'])
+            for sender in senders:
+                await sender.disconnect()
+
+        with mock.patch.object(chat_writer, 'write_messages', wraps=chat_writer.write_messages) as write:
+            self.run_async(test)
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(LiveChat.objects.count(), 3)
+
+    def test_write_failure_reported_to_sender(self):
+        user = self.student('alice')
+
+        async def test():
+            alice = await self.connect(user)
+            await self.send(alice, '大家好')
+            frame = await alice.receive_json_from(timeout=2)
+            while frame['type'] != 'error':
+                frame = await alice.receive_json_from(timeout=2)
+            self.assertEqual(frame['detail'], '消息发送失败，请稍后重试')
+            await alice.disconnect()
+
+        with mock.patch.object(chat_writer, 'write_messages', side_effect=DatabaseError('database is locked')), \
+                self.assertLogs('live.chat_writer', 'ERROR'):
+            self.run_async(test)
+        self.assertFalse(LiveChat.objects.exists())
+
+    def test_write_fallback_isolates_rooms(self):
+        # 整批失败时按直播间重试，写不进去的直播间不影响其他直播间
+        other = LiveEvent.objects.create(
+            title='另一场', course=self.live_event.course, instructor=self.instructor,
+            scheduled_start_time=timezone.now(), scheduled_end_time=timezone.now(), status='live',
+        )
+        user = self.student('alice')
+        original = chat_writer.write_messages
+
+        def write(items):
+            if any(item[0] == other.pk for item in items):
+                raise DatabaseError('写入失败')
+            return original(items)
+
+        with mock.patch.object(chat_writer, 'write_messages', side_effect=write), \
+                self.assertLogs('live.chat_writer', 'ERROR'):
+            results = chat_writer.write_with_fallback([
+                (self.live_event.pk, user.pk, '一'), (other.pk, user.pk, '二'), (self.live_event.pk, user.pk, '三'),
+            ])
+        self.assertEqual([result['message'] for result in (results[0], results[2])], ['一', '三'])
+        self.assertIsInstance(results[1], chat_writer.ChatWriteFailed)
+
+    def test_chat_requires_enrollment(self):
+        user = User.objects.create_user('visitor', 'visitor@example.com')
+
+        async def test():
+            visitor = await self.connect(user)
+            await self.send(visitor, '大家好')
+            frame = await visitor.receive_json_from(timeout=2)
+            while frame['type'] != 'error':
+                frame = await visitor.receive_json_from(timeout=2)
+            self.assertEqual(frame['detail'], '请先报名参加直播后再发送消息')
+            await visitor.disconnect()
+
+        self.run_async(test)
+
+
+class BroadcastTickTests(LiveSocketTestCase):
+    """直播间按 tick 合并推送消息和进出变化"""
+
+    def test_join_and_leave_frames(self):
+        users = self.student('alice'), self.student('bob')
+
+        async def test():
+            alice = await self.connect(users[0])
+            bob = await self.connect(users[1])
+            # 两人的加入可能落在同一个 tick
+            joined = {}
+            while users[1].pk not in joined:
+                frame = await self.receive(alice, 'presence')
+                joined.update((card['id'], card) for card in frame['presence'].get('joined', []))
+            self.assertEqual(joined[users[1].pk]['username'], 'bob')
+
+            await bob.disconnect()
+            frame = await self.receive(alice, 'presence')
+            self.assertEqual(frame['presence'], {'left': [users[1].pk]})
+            await alice.disconnect()
+
+        self.run_async(test)
+
+    def test_messages_from_one_flush_share_a_frame(self):
+        users = self.student('alice'), self.student('bob'), self.student('carol')
+
+        async def test():
+            alice, bob, carol = [await self.connect(user) for user in users]
+            await self.send(alice, '一')
+            await self.send(bob, '二')
+            frame = await self.receive(carol, 'messages')
+            self.assertEqual(sorted(message['message'] for message in frame['messages']), ['一', '二'])
+            for communicator in (alice, bob, carol):
+                await communicator.disconnect()
+
+        self.run_async(test)
+
+
+class RoomBroadcasterTests(SimpleTestCase):
+    """同一 tick 内的进出变化按用户合并"""
+
+    def tick(self, actions):
+        """在一个 tick 内执行 actions(broadcaster)，返回发出的帧"""
+        layer = mock.Mock()
+        layer.group_send = mock.AsyncMock()
+
+        async def run():
+            broadcaster = RoomBroadcaster(asyncio.get_running_loop(), layer, interval=0)
+            actions(broadcaster)
+            if broadcaster.task is not None:
+                await broadcaster.task
+            return [call.args[1]['text'] for call in layer.group_send.call_args_list]
+
+        frames = async_to_sync(run)()
+        # 每个分片组各发送一次同样的帧
+        return sorted(set(frames))
+
+    def test_join_then_leave_cancels(self):
+        def actions(broadcaster):
+            broadcaster.join('room', {'id': 1})
+            broadcaster.leave('room', 1)
+        self.assertEqual(self.tick(actions), [])
+
+    def test_second_connection_not_announced(self):
+        def actions(broadcaster):
+            broadcaster.join('room', {'id': 1})
+            broadcaster.join('room', {'id': 1})
+            broadcaster.leave('room', 1)
+            broadcaster.add_message('room', {'id': 10})
+        self.assertEqual(self.tick(actions), ['{"type":"batch","messages":[{"id":10}],"presence":{"joined":[{"id":1}]}}'])
+
+
+class PresenceTests(LiveSocketTestCase):
+    """在线状态回写观看人数，讲师收到快照，无心跳的连接被关闭"""
+
+    def viewer_counts(self):
+        return database_sync_to_async(
+            lambda: tuple(LiveEvent.objects.values_list('viewer_count', 'max_viewer_count').get(pk=self.live_event.pk))
+        )()
+
+    def test_viewer_count_and_snapshot(self):
+        users = self.student('alice'), self.student('bob')
+
+        async def test():
+            instructor = await self.connect(self.instructor)
+            alice, bob = [await self.connect(user) for user in users]
+            await get_tracker().sweep()
+            # 讲师本人不计入
+            self.assertEqual(await self.viewer_counts(), (2, 2))
+            frame = await instructor.receive_json_from(timeout=2)
+            while frame['type'] != 'presence':
+                frame = await instructor.receive_json_from(timeout=2)
+            self.assertEqual(frame['viewer_count'], 2)
+            self.assertEqual(sorted(card['username'] for card in frame['viewers']), ['alice', 'bob'])
+
+            await bob.disconnect()
+            await get_tracker().sweep()
+            self.assertEqual(await self.viewer_counts(), (1, 2))
+            await alice.disconnect()
+            await instructor.disconnect()
+
+        self.run_async(test)
+
+    def test_silent_connection_closed(self):
+        user = self.student('alice')
+
+        async def test():
+            alice = await self.connect(user)
+            tracker = get_tracker()
+            for connection in tracker.rooms[self.live_event.pk].values():
+                connection.last_seen -= tracker.timeout + 1
+            await tracker.sweep()
+            output = await alice.receive_output(timeout=2)
+            while output['type'] != 'websocket.close':
+                output = await alice.receive_output(timeout=2)
+            self.assertEqual(await self.viewer_counts(), (0, 0))
+
+        self.run_async(test)
+
+
+class SyncViewersTests(TestCase):
+    """各进程的在线用户在缓存中合并去重"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        instructor = User.objects.create_user('teacher', 'teacher@example.com')
+        course = Course.objects.create(title='课程', slug='course', instructor=instructor, description='简介')
+        start = timezone.now()
+        self.live_event = LiveEvent.objects.create(
+            title='直播', course=course, instructor=instructor,
+            scheduled_start_time=start, scheduled_end_time=start + datetime.timedelta(hours=1), status='live',
+        )
+
+    def test_merge_other_processes(self):
+        now = time.time()
+        cache.set(PRESENCE_CACHE_KEY.format(live_event_id=self.live_event.pk), {
+            'other': (now + 60, [2, 3]),
+            'stopped': (now - 1, [4]),
+        })
+        counts = sync_viewers({self.live_event.pk: {1, 2}}, now=now)
+        self.assertEqual(counts[self.live_event.pk], (3, 3, [1, 2, 3]))
+        self.live_event.refresh_from_db()
+        self.assertEqual((self.live_event.viewer_count, self.live_event.max_viewer_count), (3, 3))
+
+        counts = sync_viewers({self.live_event.pk: set()}, now=now)
+        self.assertEqual(counts[self.live_event.pk], (2, 3, [2, 3]))
+
+
+class ChatLimitTests(LiveSocketTestCase):
+    """发言限流、单帧上限和计数"""
+
+    async def receive_error(self, communicator):
+        frame = await communicator.receive_json_from(timeout=2)
+        while frame['type'] != 'error':
+            frame = await communicator.receive_json_from(timeout=2)
+        return frame['detail']
+
+    def test_rate_limited(self):
+        user = self.student('alice')
+
+        async def test():
+            alice = await self.connect(user)
+            for index in range(3):
+                await self.send(alice, f'消息 {index}')
+            self.assertEqual(await self.receive_error(alice), '发言太频繁，请稍后再试')
+            await alice.disconnect()
+
+        with mock.patch('live.consumers.chat_limiter', RateLimiter(rate=0, burst=2)):
+            self.run_async(test)
+        self.assertEqual(LiveChat.objects.count(), 2)
+        flush_counts()
+        self.assertEqual(load_counts(room_group(self.live_event.pk))['rate_limited'], 1)
+
+    def test_oversize_frame(self):
+        user = self.student('alice')
+
+        async def test():
+            alice = await self.connect(user)
+            await alice.send_to(text_data='x' * (MAX_FRAME_BYTES + 1))
+            self.assertEqual(await self.receive_error(alice), '消息过大')
+            await alice.disconnect()
+
+        self.run_async(test)
+        flush_counts()
+        self.assertEqual(load_counts(room_group(self.live_event.pk))['oversize'], 1)
+
+    def test_slow_connection_disconnected(self):
+        user = self.student('alice')
+
+        async def test():
+            alice = await self.connect(user)
+            # 发送队列已满且策略为断开
+            with mock.patch.object(OutboundQueue, 'put', return_value='overflow'):
+                await get_relay().dispatch({'room': room_group(self.live_event.pk), 'text': '{}'})
+            output = await alice.receive_output(timeout=2)
+            while output['type'] != 'websocket.close':
+                output = await alice.receive_output(timeout=2)
+            self.assertEqual(output['code'], CLOSE_TOO_SLOW)
+
+        self.run_async(test)
+
+
+class OutboundQueueTests(SimpleTestCase):
+    """慢连接的发送队列"""
+
+    def fill(self, policy):
+        async def run():
+            sent, release = [], asyncio.Event()
+
+            async def send(text):
+                await release.wait()
+                sent.append(text)
+
+            queue = OutboundQueue(send, maxsize=2, policy=policy)
+            # 第一帧已被发送任务取出并阻塞在 send 中
+            results = [queue.put('0')]
+            await asyncio.sleep(0)
+            results += [queue.put(str(index)) for index in range(1, 5)]
+            release.set()
+            await asyncio.sleep(0.01)
+            queue.close()
+            return results, sent
+        return async_to_sync(run)()
+
+    def test_drop_oldest(self):
+        results, sent = self.fill('drop_oldest')
+        self.assertEqual(results, ['queued', 'queued', 'queued', 'dropped', 'dropped'])
+        self.assertEqual(sent, ['0', '3', '4'])
+
+    def test_disconnect(self):
+        results, sent = self.fill('disconnect')
+        self.assertEqual(results, ['queued', 'queued', 'queued', 'overflow', 'overflow'])
+        self.assertEqual(sent, ['0', '1', '2'])
+
+
+class RateLimiterTests(SimpleTestCase):
+
+    def test_refill(self):
+        limiter = RateLimiter(rate=1, burst=2)
+        with mock.patch('live.limits.time.monotonic', return_value=100.0):
+            self.assertEqual([limiter.allow('room', 1) for _ in range(3)], [True, True, False])
+            # 按用户和直播间分别计数
+            self.assertTrue(limiter.allow('room', 2))
+            self.assertTrue(limiter.allow('other', 1))
+        with mock.patch('live.limits.time.monotonic', return_value=101.0):
+            self.assertEqual([limiter.allow('room', 1) for _ in range(2)], [True, False])
+
+
+class LiveSchedulerTests(TestCase):
+    """定时任务的提醒和状态切换"""
+
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+        self.instructor = User.objects.create_user('teacher', 'teacher@example.com')
+        self.course = Course.objects.create(title='课程', slug='course', instructor=self.instructor, description='简介')
+
+    def create_event(self, start, duration=datetime.timedelta(hours=1), **kwargs):
+        return LiveEvent.objects.create(
+            title='直播', course=self.course, instructor=self.instructor,
+            scheduled_start_time=start, scheduled_end_time=start + duration, **kwargs,
+        )
+
+    def notified(self, live_event):
+        return sorted(
+            Notification.objects.filter(notification_type='live', object_id=live_event.pk)
+            .values_list('recipient__username', flat=True)
+        )
+
+    def test_remind_start_end(self):
+        start = self.now + datetime.timedelta(minutes=10)
+        live_event = self.create_event(start)
+        viewer = User.objects.create_user('viewer', 'viewer@example.com')
+        LiveEnrollment.objects.create(user=viewer, live_event=live_event)
+        LiveEnrollment.objects.create(user=self.instructor, live_event=live_event)
+        scheduler = LiveScheduler()
+
+        self.assertEqual(scheduler.run_pending(self.now), {'remind': [live_event.pk]})
+        self.assertEqual(self.notified(live_event), ['viewer'])
+        # 重新装入后不再重复提醒
+        self.assertEqual(scheduler.run_pending(self.now + datetime.timedelta(minutes=5)), {})
+        self.assertEqual(len(self.notified(live_event)), 1)
+
+        self.assertEqual(scheduler.run_pending(start), {'start': [live_event.pk]})
+        live_event.refresh_from_db()
+        self.assertEqual((live_event.status, live_event.actual_start_time), ('live', start))
+
+        LiveAttendance.objects.create(user=viewer, live_event=live_event, join_time=start)
+        end = live_event.scheduled_end_time + END_GRACE
+        self.assertEqual(scheduler.run_pending(end), {'end': [live_event.pk]})
+        live_event.refresh_from_db()
+        self.assertEqual((live_event.status, live_event.actual_end_time), ('ended', end))
+        self.assertIsNotNone(LiveAttendance.objects.get(live_event=live_event).leave_time)
+        self.assertEqual(LiveSessionSummary.objects.get(live_event=live_event).unique_attendees, 1)
+
+    def test_lesson_event_reminds_active_students(self):
+        lesson = Lesson.objects.create(section=Section.objects.create(course=self.course, title='第一章'), title='第一课')
+        live_event = self.create_event(self.now + REMINDER_LEAD, lesson=lesson)
+        for username, status in (('active', 'active'), ('expired', 'expired')):
+            student = User.objects.create_user(username, f'{username}@example.com')
+            Enrollment.objects.create(student=student, course=self.course, status=status)
+
+        LiveScheduler().run_pending(self.now)
+        self.assertEqual(self.notified(live_event), ['active'])
+
+    def test_expire_unstarted(self):
+        live_event = self.create_event(self.now - datetime.timedelta(hours=2))
+        self.assertEqual(LiveScheduler(auto_start=False).run_pending(self.now), {'expire': [live_event.pk]})
+        live_event.refresh_from_db()
+        self.assertEqual(live_event.status, 'canceled')
+
+    def test_missed_start_runs_after_restart(self):
+        # 停机期间错过了开始时间，装入后立即补做
+        live_event = self.create_event(self.now - datetime.timedelta(minutes=5), reminder_sent_at=self.now)
+        self.assertEqual(LiveScheduler().run_pending(self.now), {'start': [live_event.pk]})
+
+    def test_stale_entries_skipped(self):
+        start = self.now + 2 * REMINDER_LEAD
+        live_event = self.create_event(start)
+        LiveEnrollment.objects.create(user=User.objects.create_user('viewer', 'viewer@example.com'), live_event=live_event)
+        scheduler = LiveScheduler(refresh=datetime.timedelta(hours=1))
+        scheduler.load(self.now)
+
+        # 装入后改期，堆中的旧定时项到期时不再生效
+        LiveEvent.objects.filter(pk=live_event.pk).update(scheduled_start_time=start + datetime.timedelta(days=1),
+                                                          scheduled_end_time=start + datetime.timedelta(days=1, hours=1))
+        self.assertEqual(scheduler.run_pending(start), {'remind': [], 'start': []})
+        live_event.refresh_from_db()
+        self.assertEqual(live_event.status, 'scheduled')
+        self.assertEqual(self.notified(live_event), [])
+
+    def test_truncated_window_reloads_early(self):
+        first = self.create_event(self.now + 2 * REMINDER_LEAD)
+        second = self.create_event(self.now + 3 * REMINDER_LEAD)
+        scheduler = LiveScheduler(batch_size=1, refresh=datetime.timedelta(hours=1))
+        scheduler.load(self.now)
+        self.assertEqual([item[2] for item in scheduler.heap], [first.pk, first.pk])
+        self.assertEqual(scheduler.next_wakeup(), first.scheduled_start_time - REMINDER_LEAD)
+
+        # 每次只装入最近的一场，开始第一场后很快重新装入，接着开始第二场
+        now = second.scheduled_start_time
+        self.assertEqual(scheduler.run_pending(now), {'start': [first.pk]})
+        self.assertEqual(scheduler.next_wakeup(), now + datetime.timedelta(seconds=1))
+        self.assertEqual(scheduler.run_pending(scheduler.next_wakeup()), {'start': [second.pk]})
+
+
+@mock.patch('live.views.CATCHUP_LIMIT', 4)
+class LiveChatArchiveTests(APITestCase):
+    """归档后的聊天消息分页与归档前一致"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        instructor = User.objects.create_user('teacher', 'teacher@example.com')
+        course = Course.objects.create(title='课程', slug='course', instructor=instructor, description='简介')
+        start = timezone.now() - datetime.timedelta(days=30)
+        self.live_event = LiveEvent.objects.create(
+            title='直播', course=course, instructor=instructor, status='ended',
+            scheduled_start_time=start, scheduled_end_time=start + datetime.timedelta(hours=1),
+            actual_start_time=start, actual_end_time=start + datetime.timedelta(hours=1),
+        )
+        self.users = [instructor] + [
+            User.objects.create_user(f'student{index}', f'student{index}@example.com') for index in range(2)
+        ]
+        self.ids = [self.say(index) for index in range(13)]
+        self.client.force_authenticate(instructor)
+
+    def say(self, index):
+        return LiveChat.objects.create(
+            live_event=self.live_event, user=self.users[index % len(self.users)], message=f'消息 {index}',
+        ).pk
+
+    def page(self, **params):
+        response = self.client.get(f'/api/live/events/{self.live_event.pk}/chat_messages/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def queries(self):
+        ids = self.ids
+        return [{}] + [{'since_id': value} for value in (0, ids[2], ids[4], ids[7], ids[-2], ids[-1])] + [
+            {'before_id': value} for value in (ids[0], ids[1], ids[5], ids[9], ids[-1], ids[-1] + 1)
+        ]
+
+    def snapshot(self):
+        return [self.page(**params) for params in self.queries()]
+
+    def walk(self):
+        """从头 since_id 翻到尾、从尾 before_id 翻到头，返回两次得到的消息ID"""
+        forward, data = [], {'has_more': True, 'results': [{'id': 0}]}
+        while data['has_more']:
+            data = self.page(since_id=data['results'][-1]['id'])
+            forward += [message['id'] for message in data['results']]
+        data = self.page()
+        backward = [message['id'] for message in data['results']]
+        while data['has_more']:
+            data = self.page(before_id=backward[0])
+            backward = [message['id'] for message in data['results']] + backward
+        return forward, backward
+
+    def test_round_trip(self):
+        expected = self.snapshot()
+        archive = archive_event(self.live_event.pk, chunk_size=5)
+
+        self.assertFalse(LiveChat.objects.filter(live_event=self.live_event).exists())
+        self.assertEqual((archive.message_count, archive.first_id, archive.last_id), (13, self.ids[0], self.ids[-1]))
+        self.assertEqual([chunk[0] for chunk in archive.chunks], [self.ids[0], self.ids[5], self.ids[10]])
+        for params, page, before in zip(self.queries(), self.snapshot(), expected):
+            self.assertEqual(page, before, msg=params)
+        self.assertEqual(self.walk(), (self.ids, self.ids))
+
+    def test_messages_after_archive(self):
+        first = archive_event(self.live_event.pk, chunk_size=5)
+        # 归档后新增的消息接在归档之后
+        self.ids += [self.say(index) for index in range(13, 16)]
+        self.assertEqual(self.walk(), (self.ids, self.ids))
+        expected = self.snapshot()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = archive_event(self.live_event.pk, chunk_size=5)
+        self.assertEqual((second.message_count, second.last_id), (16, self.ids[-1]))
+        self.assertFalse(default_storage.exists(first.path))
+        self.assertEqual(self.snapshot(), expected)
+        self.assertIsNone(archive_event(self.live_event.pk, chunk_size=5))
+
+        # 已删除用户的消息不再返回
+        self.users[2].delete()
+        remaining = [pk for index, pk in enumerate(self.ids) if index % len(self.users) != 2]
+        self.assertEqual(self.walk(), (remaining, remaining))
+
+    def test_command_archives_ended_events(self):
+        recent = LiveEvent.objects.create(
+            title='刚结束的直播', course=self.live_event.course, instructor=self.users[0], status='ended',
+            scheduled_start_time=timezone.now(), scheduled_end_time=timezone.now(), actual_end_time=timezone.now(),
+        )
+        LiveChat.objects.create(live_event=recent, user=self.users[1], message='消息')
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_live_chat', stdout=io.StringIO())
+        self.assertEqual(list(LiveChatArchive.objects.values_list('live_event', flat=True)), [self.live_event.pk])
+        self.assertTrue(LiveChat.objects.filter(live_event=recent).exists())
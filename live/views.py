@@ -3,16 +3,23 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
-import uuid
 import datetime
 
-from .models import LiveEvent, LiveEnrollment, LiveChat
+from courses.ownership import is_owner
+from .models import LiveEvent, LiveEnrollment, LiveChat, LiveChatArchive, LiveAttendance, LiveSessionSummary
+from . import chat_buffer, sessions
+from .archive import history_page
+from .chat import CATCHUP_LIMIT, for_request, publish_message, room_group, serialize_message
+from .limits import load_counts
 from .serializers import (
     LiveEventSerializer, 
     LiveEventCreateSerializer, 
     LiveEnrollmentSerializer, 
-    LiveChatSerializer
+    LiveChatSerializer,
+    LiveAttendanceSerializer,
+    LiveSessionSummarySerializer
 )
 
 class IsInstructorOrReadOnly(permissions.BasePermission):
@@ -72,6 +79,8 @@ class LiveEventViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated]
         elif self.action in ['update', 'partial_update', 'destroy', 'start_live', 'end_live']:
             permission_classes = [IsInstructorOrReadOnly]
+        elif self.action in ['enroll', 'join', 'leave', 'attendances', 'summary', 'room_stats']:
+            permission_classes = [permissions.IsAuthenticated]
         else:
             permission_classes = [permissions.AllowAny]
         return [permission() for permission in permission_classes]
@@ -111,11 +120,8 @@ class LiveEventViewSet(viewsets.ModelViewSet):
         print("创建直播 - 请求数据:", self.request.data)
         print("创建直播 - 经过验证的数据:", serializer.validated_data)
         
-        # 生成唯一的推流密钥
-        stream_key = str(uuid.uuid4())
-        # 这里假设使用RTMP协议
-        rtmp_url = f"rtmp://your-rtmp-server.com/live/{stream_key}"
-        play_url = f"https://your-video-server.com/live/{stream_key}/index.m3u8"
+        # 生成唯一的推流密钥和推流、播放地址
+        stream_key, rtmp_url, play_url = sessions.stream_endpoints()
         
         try:
             live_event = serializer.save(
@@ -134,12 +140,10 @@ class LiveEventViewSet(viewsets.ModelViewSet):
         """开始直播"""
         live_event = self.get_object()
         
-        if live_event.status != 'scheduled':
-            return Response({"detail": "只有未开始的直播才能开始"}, status=status.HTTP_400_BAD_REQUEST)
-        
-        live_event.status = 'live'
-        live_event.actual_start_time = timezone.now()
-        live_event.save()
+        try:
+            sessions.transition(live_event, 'start')
+        except sessions.InvalidTransition:
+            return Response({"detail": "只有未开始或已取消的直播才能开始"}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(LiveEventSerializer(live_event, context={'request': request}).data)
     
@@ -148,15 +152,70 @@ class LiveEventViewSet(viewsets.ModelViewSet):
         """结束直播"""
         live_event = self.get_object()
         
-        if live_event.status != 'live':
+        # 同时关闭所有出席记录并生成出席汇总
+        try:
+            sessions.transition(live_event, 'end')
+        except sessions.InvalidTransition:
             return Response({"detail": "只有正在直播的活动才能结束"}, status=status.HTTP_400_BAD_REQUEST)
         
-        live_event.status = 'ended'
-        live_event.actual_end_time = timezone.now()
-        live_event.save()
-        
         return Response(LiveEventSerializer(live_event, context={'request': request}).data)
     
+    @action(detail=True, methods=['post'])
+    def join(self, request, pk=None):
+        """进入直播间：记录出席，未报名时自动报名"""
+        live_event = self.get_object()
+        
+        if not sessions.can_join(request.user, live_event):
+            return Response({"detail": "您需要先报名课程才能观看此直播"}, status=status.HTTP_403_FORBIDDEN)
+        if live_event.status != 'live':
+            return Response({"detail": "直播未开始或已结束"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        attendance = sessions.join(live_event, request.user)
+        return Response(LiveAttendanceSerializer(attendance, context={'request': request}).data)
+    
+    @action(detail=True, methods=['post'])
+    def leave(self, request, pk=None):
+        """离开直播间"""
+        attendance = sessions.leave(self.get_object(), request.user)
+        if attendance is None:
+            return Response({"detail": "您未加入此直播或已离开"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(LiveAttendanceSerializer(attendance, context={'request': request}).data)
+    
+    @action(detail=True, methods=['get'])
+    def attendances(self, request, pk=None):
+        """出席记录（仅讲师和管理员），在线人数见 room_stats 和 WebSocket 在线状态快照"""
+        live_event = self.get_object()
+        if not is_owner(request.user, live_event):
+            return Response({"detail": "只有讲师才能查看出席记录"}, status=status.HTTP_403_FORBIDDEN)
+        
+        attendances = LiveAttendance.objects.filter(live_event=live_event).order_by('join_time')
+        return Response(LiveAttendanceSerializer(attendances, many=True, context={'request': request}).data)
+    
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        """直播结束时生成的出席汇总（仅讲师和管理员）"""
+        live_event = self.get_object()
+        if not is_owner(request.user, live_event):
+            return Response({"detail": "只有讲师才能查看出席汇总"}, status=status.HTTP_403_FORBIDDEN)
+        
+        summary = LiveSessionSummary.objects.filter(live_event=live_event).first()
+        if summary is None:
+            return Response({"detail": "直播结束后才会生成出席汇总"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(LiveSessionSummarySerializer(summary).data)
+    
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def room_stats(self, request, pk=None):
+        """直播间的在线人数和限流、丢帧计数（仅讲师和管理员）"""
+        live_event = self.get_object()
+        if live_event.instructor_id != request.user.pk and not request.user.is_staff:
+            return Response({"detail": "只有讲师才能查看直播间统计"}, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response({
+            'viewer_count': live_event.viewer_count,
+            'max_viewer_count': live_event.max_viewer_count,
+            **load_counts(room_group(live_event.pk)),
+        })
+    
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def enroll(self, request, pk=None):
         """报名直播"""
@@ -181,18 +240,62 @@ class LiveEventViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def chat_messages(self, request, pk=None):
-        """获取直播聊天记录"""
-        live_event = self.get_object()
-        messages = live_event.chat_messages.all()
+        """
+        补齐聊天消息（实时消息通过 WebSocket 推送），按时间正序，单次最多 LIVE_CHAT_CATCHUP_LIMIT 条：
+        - since_id：该消息之后的消息，has_more 为 true 时以最后一条的 id 继续请求；
+        - before_id：该消息之前的历史消息，has_more 为 true 时以第一条的 id 继续向前翻页；
+        - 都不带时返回最近的消息。
+        活跃直播间的 since_id 和最近消息由缓冲返回，不查数据库；已归档的直播从归档文件分页读取（见 live.archive）
+        """
+        params = {}
+        for name in ('since_id', 'before_id'):
+            value = request.query_params.get(name)
+            if value is not None:
+                try:
+                    params[name] = int(value)
+                except ValueError:
+                    return Response({"detail": f"{name} 必须是整数"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(params) > 1:
+            return Response({"detail": "since_id 和 before_id 不能同时使用"}, status=status.HTTP_400_BAD_REQUEST)
         
-        # 分页
-        page = self.paginate_queryset(messages)
-        if page is not None:
-            serializer = LiveChatSerializer(page, many=True, context={'request': request})
-            return self.get_paginated_response(serializer.data)
+        # 缓冲按 URL 中的 ID 读取，命中时无需加载直播活动；直播不存在时缓冲必然为空
+        limit = CATCHUP_LIMIT
+        live_event_id = self.kwargs['pk']
+        if 'since_id' in params:
+            buffered = chat_buffer.messages_since(live_event_id, params['since_id'], limit)
+            if buffered is not None:
+                page, has_more = buffered
+                return Response({'results': for_request(page, request), 'has_more': has_more})
+        elif 'before_id' not in params:
+            page = chat_buffer.latest(live_event_id, limit)
+            if page is not None:
+                return Response({'results': for_request(page, request), 'has_more': True})
+        
+        live_event = self.get_object()
+        # 只有已结束的直播会被归档
+        chat_archive = None
+        if live_event.status == 'ended':
+            chat_archive = LiveChatArchive.objects.filter(live_event=live_event).first()
+        if chat_archive is not None:
+            page, has_more = history_page(
+                chat_archive, params.get('since_id'), params.get('before_id'), limit,
+            )
+            return Response({'results': for_request(page, request), 'has_more': has_more})
+
+        messages = LiveChat.objects.filter(live_event=live_event)
+        if 'since_id' in params:
+            page = list(messages.filter(id__gt=params['since_id']).order_by('id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+        else:
+            if 'before_id' in params:
+                messages = messages.filter(id__lt=params['before_id'])
+            page = list(messages.order_by('-id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit][::-1]
         
-        serializer = LiveChatSerializer(messages, many=True, context={'request': request})
-        return Response(serializer.data)
+        serializer = LiveChatSerializer(page, many=True, context={'request': request})
+        return Response({'results': serializer.data, 'has_more': has_more})
 
 class LiveChatViewSet(viewsets.ModelViewSet):
     """直播聊天视图集"""
@@ -203,5 +306,8 @@ class LiveChatViewSet(viewsets.ModelViewSet):
         return LiveChat.objects.filter(live_event=self.kwargs.get('live_event_pk'))
     
     def perform_create(self, serializer):
-        live_event_id = self.kwargs.get('live_event_pk')
-        serializer.save(user=self.request.user, live_event_id=live_event_id)
+        live_event_id = int(self.kwargs.get('live_event_pk'))
+        chat = serializer.save(user=self.request.user, live_event_id=live_event_id)
+        # 通过 REST 发送的消息同样推送给直播间的 WebSocket 连接
+        payload = serialize_message(chat)
+        transaction.on_commit(lambda: publish_message(live_event_id, payload))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Video, LiveStreaming, VideoWatchHistory, LiveStreamingAttendance
+from .models import Video, MediaJob, VideoWatchHistory, VideoHeatmap
 
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
@@ -8,12 +8,12 @@ class VideoAdmin(admin.ModelAdmin):
     search_fields = ('title', 'lesson__title', 'lesson__section__course__title')
     date_hierarchy = 'upload_date'
 
-@admin.register(LiveStreaming)
-class LiveStreamingAdmin(admin.ModelAdmin):
-    list_display = ('title', 'lesson', 'status', 'scheduled_start_time', 'actual_start_time', 'actual_end_time')
-    list_filter = ('status', 'scheduled_start_time')
-    search_fields = ('title', 'description', 'lesson__title', 'lesson__section__course__title')
-    date_hierarchy = 'scheduled_start_time'
+@admin.register(MediaJob)
+class MediaJobAdmin(admin.ModelAdmin):
+    list_display = ('video', 'status', 'attempts', 'run_after', 'locked_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('video__title',)
+    readonly_fields = ('timings', 'last_error')
 
 @admin.register(VideoWatchHistory)
 class VideoWatchHistoryAdmin(admin.ModelAdmin):
@@ -22,9 +22,8 @@ class VideoWatchHistoryAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'video__title')
     date_hierarchy = 'watch_date'
 
-@admin.register(LiveStreamingAttendance)
-class LiveStreamingAttendanceAdmin(admin.ModelAdmin):
-    list_display = ('user', 'live_streaming', 'join_time', 'leave_time', 'duration')
-    list_filter = ('join_time',)
-    search_fields = ('user__username', 'live_streaming__title')
-    date_hierarchy = 'join_time'
+@admin.register(VideoHeatmap)
+class VideoHeatmapAdmin(admin.ModelAdmin):
+    list_display = ('video', 'viewers', 'bucket_seconds', 'updated_at')
+    search_fields = ('video__title',)
+    readonly_fields = ('counts',)
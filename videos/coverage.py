@@ -0,0 +1,85 @@
+"""
+视频观看覆盖位图
+
+每个用户、每个视频保存一张位图，第 i 位表示 [i * BUCKET_SECONDS, (i + 1) * BUCKET_SECONDS) 这段是否看过，
+字节内高位在前。默认 10 秒一位，3 小时的视频只需 135 字节。
+
+播放器心跳上报本次播放过的区间 ranges=[[开始秒, 结束秒], ...]，合并（按位或）进位图；
+aggregate_video_heatmaps 命令定期把同一视频的所有位图逐段相加，得到每段的观看人数（VideoHeatmap）。
+"""
+from django.conf import settings
+
+BUCKET_SECONDS = getattr(settings, 'WATCH_COVERAGE_BUCKET_SECONDS', 10)
+# 单次心跳最多接受的区间数
+MAX_RANGES = 100
+# 区间结束点的上限（秒）：尚未探测出时长的视频也不能上报超过它的区间，位图最多 bucket_count(MAX_VIDEO_DURATION) 位
+MAX_VIDEO_DURATION = getattr(settings, 'MAX_VIDEO_DURATION', 24 * 3600)
+
+# 每个字节值中为 1 的位的序号（高位为 0），聚合时按字节查表
+_BYTE_BITS = [tuple(bit for bit in range(8) if value & (0x80 >> bit)) for value in range(256)]
+
+
+def bucket_count(duration, bucket_seconds=BUCKET_SECONDS):
+    return max(1, -(-int(duration) // bucket_seconds))
+
+
+def parse_ranges(value, duration=None):
+    """校验心跳中的区间，返回 [(开始, 结束)]；格式错误时抛出 ValueError"""
+    if not isinstance(value, list) or len(value) > MAX_RANGES:
+        raise ValueError(f'ranges 应为不超过 {MAX_RANGES} 个 [开始秒, 结束秒] 的列表')
+    ranges = []
+    for item in value:
+        if not isinstance(item, (list, tuple)) or len(item) != 2:
+            raise ValueError('区间格式应为 [开始秒, 结束秒]')
+        try:
+            start, end = float(item[0]), float(item[1])
+        except (TypeError, ValueError):
+            raise ValueError('区间的开始和结束应为数字')
+        if start < 0 or end < start:
+            raise ValueError('区间的结束不能早于开始')
+        if end > MAX_VIDEO_DURATION:
+            raise ValueError(f'区间的结束不能超过 {MAX_VIDEO_DURATION} 秒')
+        if duration:
+            end = min(end, duration)
+        if end > start:
+            ranges.append((start, end))
+    return ranges
+
+
+def mark_ranges(bitmap, ranges, bucket_seconds=BUCKET_SECONDS):
+    """把区间覆盖到的段置位，返回新的位图（按需加长）；超出 MAX_VIDEO_DURATION 对应的位数时抛出 ValueError"""
+    max_buckets = bucket_count(MAX_VIDEO_DURATION, bucket_seconds)
+    data = bytearray(bitmap or b'')
+    for start, end in ranges:
+        first = int(start // bucket_seconds)
+        # 结束点恰好落在段边界上时不计入下一段
+        last = int(-(-end // bucket_seconds)) - 1
+        if last >= max_buckets:
+            raise ValueError(f'区间的结束不能超过 {MAX_VIDEO_DURATION} 秒')
+        if last >= len(data) * 8:
+            data.extend(bytes(last // 8 + 1 - len(data)))
+        for index in range(first, last + 1):
+            data[index // 8] |= 0x80 >> (index % 8)
+    return bytes(data)
+
+
+def covered_buckets(bitmap):
+    return sum(len(_BYTE_BITS[value]) for value in bitmap or b'')
+
+
+def covered_seconds(bitmap, bucket_seconds=BUCKET_SECONDS):
+    return covered_buckets(bitmap) * bucket_seconds
+
+
+def add_to_histogram(counts, bitmap):
+    """把一张位图逐段加到 counts 上（counts 长度不足时自动加长）"""
+    for byte_index, value in enumerate(bitmap or b''):
+        if not value:
+            continue
+        base = byte_index * 8
+        for bit in _BYTE_BITS[value]:
+            index = base + bit
+            if index >= len(counts):
+                counts.extend([0] * (index + 1 - len(counts)))
+            counts[index] += 1
+    return counts
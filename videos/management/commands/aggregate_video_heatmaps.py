@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.utils import timezone
+
+from videos.coverage import BUCKET_SECONDS, add_to_histogram, bucket_count
+from videos.models import Video, VideoHeatmap, VideoWatchHistory
+
+
+class Command(BaseCommand):
+    help = '把观看覆盖位图汇总为各视频的观看热力图（建议每小时运行一次）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新汇总所有视频，默认只汇总上次之后有新观看记录的视频')
+        parser.add_argument('--video', type=int, action='append', help='只汇总指定视频（可重复）')
+
+    def handle(self, *args, **options):
+        if options['video']:
+            video_ids = options['video']
+        elif options['all']:
+            video_ids = VideoWatchHistory.objects.values_list('video_id', flat=True).distinct()
+        else:
+            video_ids = VideoWatchHistory.objects.filter(
+                Q(video__heatmap__isnull=True) | Q(watch_date__gt=F('video__heatmap__updated_at'))
+            ).values_list('video_id', flat=True).distinct()
+
+        count = 0
+        for video in Video.objects.filter(pk__in=list(video_ids)).only('id', 'duration'):
+            heatmap = self.aggregate(video)
+            count += 1
+            self.stdout.write(f'视频 {video.pk}：{heatmap.viewers} 人，{len(heatmap.counts)} 段')
+        self.stdout.write(self.style.SUCCESS(f'已汇总 {count} 个视频的观看热力图'))
+
+    def aggregate(self, video):
+        # 位图只能按位或合并，无法增量相减，每次对有变化的视频全量重算；
+        # 汇总时间取开始前的时刻，汇总期间的新心跳下次会被重新计入
+        started = timezone.now()
+        counts = [0] * bucket_count(video.duration) if video.duration else []
+        viewers = 0
+        bitmaps = VideoWatchHistory.objects.filter(video=video).exclude(coverage=b'').values_list('coverage', flat=True)
+        for bitmap in bitmaps.iterator(chunk_size=2000):
+            viewers += 1
+            add_to_histogram(counts, bytes(bitmap))
+        if video.duration:
+            del counts[bucket_count(video.duration):]
+
+        heatmap, created = VideoHeatmap.objects.update_or_create(
+            video=video,
+            defaults={'bucket_seconds': BUCKET_SECONDS, 'counts': counts, 'viewers': viewers, 'updated_at': started},
+        )
+        return heatmap
@@ -0,0 +1,128 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from edu_platform.upload import images
+from videos.models import MediaJob, Video
+from videos.pipeline import (
+    claim_jobs, drop_missing_job, enqueue_processing, fail_job, process_job, release_stale_jobs, worker_name,
+)
+
+
+class Command(BaseCommand):
+    help = '领取并执行媒体后台处理任务（视频：探测时长、缩略图、预览雪碧图、HLS 分片打包；图片：尺寸变体）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=getattr(settings, 'MEDIA_WORKER_CONCURRENCY', 2),
+                            help='并行处理的进程数，为 0 时在当前进程中逐个执行')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='没有任务时的轮询间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='处理完当前到期的任务后退出')
+        parser.add_argument('--backfill', action='store_true',
+                            help='先为尚未打包 HLS 的已就绪视频，以及停留在处理中却没有任务的视频提交处理任务')
+
+    def handle(self, *args, **options):
+        self.worker = worker_name()
+        released = release_stale_jobs()
+        # 图片变体生成很快且可重复执行，遗留的 running 状态直接放回队列
+        released += images.release_stale()
+        if released:
+            self.stdout.write(f'重新排队 {released} 个超时任务')
+        if options['backfill']:
+            self.backfill()
+
+        if options['concurrency'] <= 0:
+            self.run_inline(options)
+        else:
+            self.run_pool(options)
+
+    def backfill(self):
+        # 处理中的视频可能是引入任务表之前上传的，没有对应的任务，永远不会被处理
+        videos = Video.objects.filter(Q(status='ready', hls_manifest='') | Q(status='processing')).exclude(
+            media_jobs__status__in=('pending', 'running'),
+        )
+        video_ids = list(videos.values_list('id', flat=True).distinct())
+        for video_id in video_ids:
+            # 不改变视频状态，处理期间仍可按原文件播放
+            enqueue_processing(video_id, reset=False)
+        self.stdout.write(f'为 {len(video_ids)} 个视频提交了打包任务')
+
+    def report(self, result):
+        if result['status'] == 'succeeded':
+            timings = ', '.join(f'{stage} {seconds:.2f}s' for stage, seconds in result['timings'].items())
+            self.stdout.write(self.style.SUCCESS(f"任务 {result['job']} 完成：{timings}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"任务 {result['job']} {result['status']}：{result['error']}"))
+
+    def claim(self, limit):
+        """领取到期任务，返回 [(执行函数, 任务 id, 失败处理函数)]；图片变体耗时短，优先领取"""
+        tasks = [(images.process_blob, blob_id, images.fail_blob) for blob_id in images.claim_pending(limit)]
+        if len(tasks) < limit:
+            tasks += [(process_job, job_id, self.fail_video_job) for job_id in claim_jobs(self.worker, limit - len(tasks))]
+        return tasks
+
+    def fail_video_job(self, job_id, error):
+        job = MediaJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return drop_missing_job(job_id)
+        return fail_job(job, error)
+
+    def run_inline(self, options):
+        while True:
+            tasks = self.claim(1)
+            if not tasks:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            func, task_id, on_error = tasks[0]
+            self.report(func(task_id))
+
+    def new_pool(self, concurrency):
+        return ProcessPoolExecutor(
+            max_workers=concurrency,
+            mp_context=multiprocessing.get_context('spawn'),
+            # spawn 启动的子进程需要重新初始化 Django；初始化函数不能定义在本模块（导入时会加载模型）
+            initializer=django.setup,
+        )
+
+    def run_pool(self, options):
+        concurrency = options['concurrency']
+        pool = self.new_pool(concurrency)
+        running = {}
+        try:
+            while True:
+                free = concurrency - len(running)
+                if free > 0:
+                    for func, task_id, on_error in self.claim(free):
+                        running[pool.submit(func, task_id)] = (task_id, on_error)
+
+                if not running:
+                    if options['once']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    task_id, on_error = running.pop(future)
+                    try:
+                        self.report(future.result())
+                    except Exception as e:
+                        # 子进程崩溃等未在任务函数中处理的错误
+                        broken = broken or isinstance(e, BrokenProcessPool)
+                        self.report(on_error(task_id, e))
+                if broken:
+                    for future, (task_id, on_error) in running.items():
+                        self.report(on_error(task_id, BrokenProcessPool('工作进程异常退出')))
+                    running.clear()
+                    pool.shutdown(wait=False)
+                    pool = self.new_pool(concurrency)
+        finally:
+            pool.shutdown(wait=True)
@@ -0,0 +1,168 @@
+"""
+媒体处理工具
+
+后台处理流水线通过 get_media_tool() 取得工具实例，由 MEDIA_TOOL 设置选择实现：
+    videos.media_tools.FFmpegTool   调用 ffprobe / ffmpeg（生产环境）
+    videos.media_tools.FakeMediaTool 进程内的替身实现，不依赖 ffmpeg，用于开发和测试
+"""
+import json
+import math
+import os
+import subprocess
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from PIL import Image, ImageDraw
+
+
+class MediaToolError(Exception):
+    """媒体处理失败（文件损坏、工具执行失败或超时）"""
+
+
+class MediaTool:
+    """媒体处理工具接口"""
+
+    def probe(self, path):
+        """返回 {'duration': 秒, 'width': 像素, 'height': 像素}"""
+        raise NotImplementedError
+
+    def thumbnail(self, path, dest, at_seconds, width):
+        """截取 at_seconds 处的画面，保存为 JPEG"""
+        raise NotImplementedError
+
+    def sprite(self, path, dest, duration, interval, columns, tile_width):
+        """每隔 interval 秒截取一帧，按 columns 列拼成一张 JPEG 雪碧图，返回帧数"""
+        raise NotImplementedError
+
+    def package_hls(self, path, out_dir, renditions, segment_seconds):
+        """按 renditions 转码为 HLS，每个版本写入 out_dir/<名称>/index.m3u8 和分片"""
+        raise NotImplementedError
+
+
+class FFmpegTool(MediaTool):
+    """基于 ffprobe / ffmpeg 命令行的实现"""
+
+    def __init__(self):
+        self.ffmpeg = getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+        self.ffprobe = getattr(settings, 'FFPROBE_BINARY', 'ffprobe')
+        self.timeout = getattr(settings, 'MEDIA_TOOL_TIMEOUT', 600)
+        self.package_timeout = getattr(settings, 'MEDIA_PACKAGE_TIMEOUT', 3 * 3600)
+
+    def _run(self, args, timeout=None):
+        timeout = timeout or self.timeout
+        try:
+            result = subprocess.run(args, capture_output=True, timeout=timeout)
+        except FileNotFoundError:
+            raise MediaToolError(f"找不到 {args[0]}，请安装 ffmpeg 或调整 MEDIA_TOOL 设置")
+        except subprocess.TimeoutExpired:
+            raise MediaToolError(f"{args[0]} 执行超过 {timeout} 秒")
+        if result.returncode != 0:
+            message = result.stderr.decode(errors='replace').strip().splitlines()
+            raise MediaToolError(message[-1] if message else f"{args[0]} 退出码 {result.returncode}")
+        return result.stdout
+
+    def probe(self, path):
+        output = self._run([
+            self.ffprobe, '-v', 'error', '-print_format', 'json',
+            '-show_entries', 'format=duration:stream=codec_type,width,height', path,
+        ])
+        info = json.loads(output or b'{}')
+        video = next((s for s in info.get('streams', []) if s.get('codec_type') == 'video'), None)
+        duration = float(info.get('format', {}).get('duration') or 0)
+        if video is None or duration <= 0:
+            raise MediaToolError("文件中没有可用的视频流")
+        return {'duration': duration, 'width': video.get('width'), 'height': video.get('height')}
+
+    def thumbnail(self, path, dest, at_seconds, width):
+        self._run([
+            self.ffmpeg, '-v', 'error', '-y', '-ss', f'{at_seconds:.3f}', '-i', path,
+            '-frames:v', '1', '-vf', f'scale={width}:-2', '-q:v', '3', dest,
+        ])
+
+    def sprite(self, path, dest, duration, interval, columns, tile_width):
+        frames = max(1, math.ceil(duration / interval))
+        rows = math.ceil(frames / columns)
+        self._run([
+            self.ffmpeg, '-v', 'error', '-y', '-i', path,
+            '-vf', f'fps=1/{interval},scale={tile_width}:-2,tile={columns}x{rows}',
+            '-frames:v', '1', '-q:v', '5', dest,
+        ])
+        return frames
+
+    def package_hls(self, path, out_dir, renditions, segment_seconds):
+        for r in renditions:
+            rendition_dir = os.path.join(out_dir, r['name'])
+            os.makedirs(rendition_dir, exist_ok=True)
+            bitrate = r['video_bitrate']
+            self._run([
+                self.ffmpeg, '-v', 'error', '-y', '-i', path,
+                '-map', '0:v:0', '-map', '0:a:0?',
+                '-vf', f"scale=-2:{r['height']}",
+                '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main',
+                '-b:v', f'{bitrate}k', '-maxrate', f'{bitrate * 107 // 100}k', '-bufsize', f'{bitrate * 3 // 2}k',
+                # 各版本在相同时间点强制关键帧，分片边界对齐，便于播放器切换码率
+                '-force_key_frames', f'expr:gte(t,n_forced*{segment_seconds})', '-sc_threshold', '0',
+                '-c:a', 'aac', '-b:a', f"{r['audio_bitrate']}k", '-ac', '2',
+                '-f', 'hls', '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod',
+                '-hls_segment_filename', os.path.join(rendition_dir, 'seg_%05d.ts'),
+                os.path.join(rendition_dir, 'index.m3u8'),
+            ], timeout=self.package_timeout)
+
+
+class FakeMediaTool(MediaTool):
+    """不依赖 ffmpeg 的替身实现：按文件大小推算时长，用 Pillow 生成占位画面"""
+    # 按约 2Mbps 的码率推算时长
+    BYTES_PER_SECOND = 250000
+    FRAME_SIZE = (1280, 720)
+
+    def probe(self, path):
+        size = os.path.getsize(path)
+        if size == 0:
+            raise MediaToolError("文件为空")
+        width, height = self.FRAME_SIZE
+        return {'duration': max(1.0, size / self.BYTES_PER_SECOND), 'width': width, 'height': height}
+
+    def _frame(self, seconds, width):
+        height = round(width * self.FRAME_SIZE[1] / self.FRAME_SIZE[0])
+        image = Image.new('RGB', (width, height), (40, 44, 52))
+        ImageDraw.Draw(image).text((8, 8), f'{int(seconds) // 60:02d}:{int(seconds) % 60:02d}', fill=(255, 255, 255))
+        return image
+
+    def thumbnail(self, path, dest, at_seconds, width):
+        self.probe(path)
+        self._frame(at_seconds, width).save(dest, 'JPEG')
+
+    def sprite(self, path, dest, duration, interval, columns, tile_width):
+        self.probe(path)
+        frames = max(1, math.ceil(duration / interval))
+        rows = math.ceil(frames / columns)
+        tile = self._frame(0, tile_width)
+        sheet = Image.new('RGB', (tile.width * min(columns, frames), tile.height * rows))
+        for index in range(frames):
+            frame = self._frame(index * interval, tile_width)
+            sheet.paste(frame, ((index % columns) * tile.width, (index // columns) * tile.height))
+        sheet.save(dest, 'JPEG')
+        return frames
+
+    def package_hls(self, path, out_dir, renditions, segment_seconds):
+        duration = self.probe(path)['duration']
+        count = max(1, math.ceil(duration / segment_seconds))
+        for r in renditions:
+            rendition_dir = os.path.join(out_dir, r['name'])
+            os.makedirs(rendition_dir, exist_ok=True)
+            lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{segment_seconds}',
+                     '#EXT-X-MEDIA-SEQUENCE:0', '#EXT-X-PLAYLIST-TYPE:VOD']
+            for index in range(count):
+                length = min(segment_seconds, duration - index * segment_seconds)
+                filename = f'seg_{index:05d}.ts'
+                with open(os.path.join(rendition_dir, filename), 'wb') as f:
+                    f.write(f"{r['name']} {index}\n".encode())
+                lines += [f'#EXTINF:{length:.3f},', filename]
+            lines.append('#EXT-X-ENDLIST')
+            with open(os.path.join(rendition_dir, 'index.m3u8'), 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+
+
+def get_media_tool():
+    """按 MEDIA_TOOL 设置返回媒体处理工具实例"""
+    return import_string(getattr(settings, 'MEDIA_TOOL', 'videos.media_tools.FFmpegTool'))()
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_video_ownership(apps, schema_editor):
+    """根据课时回填视频的课程与讲师"""
+    Lesson = apps.get_model('courses', 'Lesson')
+    Video = apps.get_model('videos', 'Video')
+    lesson = Lesson.objects.filter(pk=OuterRef('lesson_id'))
+    Video.objects.update(
+        course_id=Subquery(lesson.values('course_id')[:1]),
+        owner_id=Subquery(lesson.values('owner_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_lesson_ownership'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('videos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='course',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='courses.course', verbose_name='所属课程'),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='owner',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='课程讲师'),
+        ),
+        migrations.RunPython(backfill_video_ownership, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0002_video_ownership'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='sprite',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='video_sprites/', verbose_name='预览雪碧图'),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='sprite_interval',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='雪碧图帧间隔(秒)'),
+        ),
+        migrations.CreateModel(
+            name='MediaJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '处理中'), ('succeeded', '已完成'), ('failed', '失败')], default='pending', max_length=15, verbose_name='状态')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='已尝试次数')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='最多尝试次数')),
+                ('run_after', models.DateTimeField(verbose_name='最早执行时间')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='执行进程')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='领取时间')),
+                ('timings', models.JSONField(blank=True, default=dict, verbose_name='阶段耗时')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近错误')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media_jobs', to='videos.video', verbose_name='视频')),
+            ],
+            options={
+                'verbose_name': '视频处理任务',
+                'verbose_name_plural': '视频处理任务',
+                'indexes': [models.Index(fields=['status', 'run_after'], name='videos_medi_status_8361ce_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0003_media_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='hls_manifest',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='HLS 播放列表'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.6 on 2026-10-19 10:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0004_video_hls_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoHeatmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_seconds', models.PositiveSmallIntegerField(verbose_name='每段时长(秒)')),
+                ('counts', models.JSONField(default=list, verbose_name='各段观看人数')),
+                ('viewers', models.PositiveIntegerField(default=0, verbose_name='观看人数')),
+                ('updated_at', models.DateTimeField(verbose_name='汇总时间')),
+            ],
+            options={
+                'verbose_name': '视频观看热力图',
+                'verbose_name_plural': '视频观看热力图',
+            },
+        ),
+        migrations.AddField(
+            model_name='videowatchhistory',
+            name='coverage',
+            field=models.BinaryField(blank=True, default=b'', verbose_name='观看覆盖位图'),
+        ),
+        migrations.AddIndex(
+            model_name='videowatchhistory',
+            index=models.Index(fields=['watch_date'], name='videos_vide_watch_d_d819d0_idx'),
+        ),
+        migrations.AddField(
+            model_name='videoheatmap',
+            name='video',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='heatmap', to='videos.video', verbose_name='视频'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.6 on 2026-10-19 10:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0005_watch_coverage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveSessionSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unique_attendees', models.PositiveIntegerField(default=0, verbose_name='出席人数')),
+                ('peak_attendees', models.PositiveIntegerField(default=0, verbose_name='最高同时在线人数')),
+                ('average_minutes', models.FloatField(default=0, verbose_name='平均在线时长(分钟)')),
+                ('total_minutes', models.PositiveIntegerField(default=0, verbose_name='总在线时长(分钟)')),
+                ('generated_at', models.DateTimeField(verbose_name='生成时间')),
+                ('live_streaming', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary', to='videos.livestreaming', verbose_name='直播课')),
+            ],
+            options={
+                'verbose_name': '直播出席汇总',
+                'verbose_name_plural': '直播出席汇总',
+            },
+        ),
+    ]
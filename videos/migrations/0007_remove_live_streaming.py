@@ -0,0 +1,36 @@
+# Generated by Django 4.2.6 on 2026-10-19 10:35
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0006_live_session_summary'),
+        # 数据已复制为 live.LiveEvent 后再删除
+        ('live', '0005_migrate_live_streaming'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='livestreaming',
+            name='lesson',
+        ),
+        migrations.RemoveField(
+            model_name='livestreamingattendance',
+            name='live_streaming',
+        ),
+        migrations.RemoveField(
+            model_name='livestreamingattendance',
+            name='user',
+        ),
+        migrations.DeleteModel(
+            name='LiveSessionSummary',
+        ),
+        migrations.DeleteModel(
+            name='LiveStreaming',
+        ),
+        migrations.DeleteModel(
+            name='LiveStreamingAttendance',
+        ),
+    ]
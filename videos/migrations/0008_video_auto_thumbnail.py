@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-19 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0007_remove_live_streaming'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='auto_thumbnail',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='自动生成的缩略图'),
+        ),
+    ]
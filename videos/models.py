@@ -1,8 +1,11 @@
-from django.db import models
-from courses.models import Lesson
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from courses.models import Course, Lesson
+from courses.ownership import OwnedContentMixin
 from accounts.models import User
 
-class Video(models.Model):
+class Video(OwnedContentMixin, models.Model):
     """视频资源"""
     STATUS_CHOICES = (
         ('processing', '处理中'),
@@ -14,44 +17,67 @@ class Video(models.Model):
     title = models.CharField(max_length=200, verbose_name='视频标题')
     file = models.FileField(upload_to='videos/', verbose_name='视频文件')
     thumbnail = models.ImageField(upload_to='video_thumbnails/', blank=True, null=True, verbose_name='缩略图')
+    # 处理流水线自动生成的缩略图路径；thumbnail 仍等于它时说明讲师没有换过，更换视频文件后重新生成
+    auto_thumbnail = models.CharField(max_length=255, blank=True, editable=False, verbose_name='自动生成的缩略图')
+    # 拖动进度条时的预览雪碧图，每隔 sprite_interval 秒一帧
+    sprite = models.ImageField(upload_to='video_sprites/', blank=True, null=True, editable=False, verbose_name='预览雪碧图')
+    sprite_interval = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='雪碧图帧间隔(秒)')
+    # HLS 主播放列表在存储中的路径，见 videos.packaging
+    hls_manifest = models.CharField(max_length=255, blank=True, editable=False, verbose_name='HLS 播放列表')
     duration = models.PositiveIntegerField(default=0, verbose_name='时长(秒)')
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='processing', verbose_name='状态')
     is_downloadable = models.BooleanField(default=False, verbose_name='是否可下载')
     upload_date = models.DateTimeField(auto_now_add=True, verbose_name='上传日期')
     
+    # 冗余字段，由 save() 自动维护，用于权限判断
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, editable=False, 
+                               related_name='+', verbose_name='所属课程')
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, editable=False, 
+                              related_name='+', verbose_name='课程讲师')
+    
+    ownership_source_fields = ('lesson',)
+    
     class Meta:
         verbose_name = '视频'
         verbose_name_plural = '视频'
     
     def __str__(self):
         return self.title
+    
+    def resolve_ownership(self):
+        """根据课时计算 (course_id, owner_id)"""
+        row = Lesson.objects.filter(pk=self.lesson_id).values_list('course_id', 'owner_id').first()
+        return row or (None, None)
 
-class LiveStreaming(models.Model):
-    """直播课程"""
+class MediaJob(models.Model):
+    """视频后台处理任务，由 run_media_worker 命令从表中领取执行"""
     STATUS_CHOICES = (
-        ('scheduled', '计划中'),
-        ('live', '正在直播'),
-        ('ended', '已结束'),
-        ('cancelled', '已取消'),
+        ('pending', '等待中'),
+        ('running', '处理中'),
+        ('succeeded', '已完成'),
+        ('failed', '失败'),
     )
     
-    lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, related_name='live_stream', verbose_name='关联课时')
-    title = models.CharField(max_length=200, verbose_name='直播标题')
-    description = models.TextField(blank=True, null=True, verbose_name='直播描述')
-    scheduled_start_time = models.DateTimeField(verbose_name='计划开始时间')
-    scheduled_end_time = models.DateTimeField(verbose_name='计划结束时间')
-    actual_start_time = models.DateTimeField(blank=True, null=True, verbose_name='实际开始时间')
-    actual_end_time = models.DateTimeField(blank=True, null=True, verbose_name='实际结束时间')
-    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='scheduled', verbose_name='状态')
-    stream_key = models.CharField(max_length=100, blank=True, null=True, verbose_name='流密钥')
-    stream_url = models.URLField(blank=True, null=True, verbose_name='流地址')
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='media_jobs', verbose_name='视频')
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='已尝试次数')
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name='最多尝试次数')
+    run_after = models.DateTimeField(verbose_name='最早执行时间')
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name='执行进程')
+    locked_at = models.DateTimeField(blank=True, null=True, verbose_name='领取时间')
+    # 各处理阶段的耗时（秒），如 {"probe": 0.12, "thumbnail": 0.8}
+    timings = models.JSONField(default=dict, blank=True, verbose_name='阶段耗时')
+    last_error = models.TextField(blank=True, verbose_name='最近错误')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name='完成时间')
     
     class Meta:
-        verbose_name = '直播课程'
-        verbose_name_plural = '直播课程'
+        verbose_name = '视频处理任务'
+        verbose_name_plural = '视频处理任务'
+        indexes = [models.Index(fields=['status', 'run_after'])]
     
     def __str__(self):
-        return self.title
+        return f"{self.video} ({self.get_status_display()})"
 
 class VideoWatchHistory(models.Model):
     """视频观看历史"""
@@ -61,26 +87,55 @@ class VideoWatchHistory(models.Model):
     last_position = models.PositiveIntegerField(default=0, verbose_name='上次位置(秒)')
     completed = models.BooleanField(default=False, verbose_name='是否完成')
     watch_date = models.DateTimeField(auto_now=True, verbose_name='观看日期')
+    # 观看覆盖位图，每位对应一段固定时长，见 videos.coverage
+    coverage = models.BinaryField(default=b'', blank=True, editable=False, verbose_name='观看覆盖位图')
     
     class Meta:
         verbose_name = '视频观看历史'
         verbose_name_plural = '视频观看历史'
         unique_together = ['user', 'video']
+        # 热力图聚合任务按观看时间找出有新数据的视频
+        indexes = [models.Index(fields=['watch_date'])]
     
     def __str__(self):
         return f"{self.user.username} - {self.video.title}"
 
-class LiveStreamingAttendance(models.Model):
-    """直播出席记录"""
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='live_attendances', verbose_name='用户')
-    live_streaming = models.ForeignKey(LiveStreaming, on_delete=models.CASCADE, related_name='attendances', verbose_name='直播课')
-    join_time = models.DateTimeField(auto_now_add=True, verbose_name='加入时间')
-    leave_time = models.DateTimeField(blank=True, null=True, verbose_name='离开时间')
-    duration = models.PositiveIntegerField(default=0, verbose_name='在线时长(分钟)')
+class VideoHeatmap(models.Model):
+    """视频观看热力图：每段被多少名学生看过，由 aggregate_video_heatmaps 命令定期汇总"""
+    video = models.OneToOneField(Video, on_delete=models.CASCADE, related_name='heatmap', verbose_name='视频')
+    bucket_seconds = models.PositiveSmallIntegerField(verbose_name='每段时长(秒)')
+    counts = models.JSONField(default=list, verbose_name='各段观看人数')
+    viewers = models.PositiveIntegerField(default=0, verbose_name='观看人数')
+    updated_at = models.DateTimeField(verbose_name='汇总时间')
     
     class Meta:
-        verbose_name = '直播出席记录'
-        verbose_name_plural = '直播出席记录'
+        verbose_name = '视频观看热力图'
+        verbose_name_plural = '视频观看热力图'
     
     def __str__(self):
-        return f"{self.user.username} - {self.live_streaming.title}"
+        return f"{self.video} 热力图"
+
+@receiver(post_init, sender=Video)
+def remember_video_file(sender, instance, **kwargs):
+    """记下加载时的视频文件，保存时据此判断是否换了文件"""
+    instance._loaded_file = instance.file.name
+
+@receiver(post_save, sender=Video)
+def enqueue_video_processing(sender, instance, created, update_fields=None, **kwargs):
+    """新上传或更换视频文件后，提交后台处理任务"""
+    if update_fields is not None and 'file' not in update_fields:
+        return
+    if not created and instance.file.name == instance._loaded_file:
+        return
+    instance._loaded_file = instance.file.name
+    if instance.file:
+        from .pipeline import enqueue_processing
+        video_id = instance.pk
+        transaction.on_commit(lambda: enqueue_processing(video_id))
+
+@receiver(post_delete, sender='upload.MediaBlob')
+def delete_video_package(sender, instance, **kwargs):
+    """源文件被回收后，删除以其 sha256 命名的 HLS 打包目录"""
+    if instance.content_type.startswith('video/') or not instance.content_type:
+        from .packaging import delete_package
+        delete_package(instance.sha256)
@@ -0,0 +1,109 @@
+"""
+HLS 分片打包
+
+后台处理流水线的 package 阶段把视频转码为多个码率的 HLS 版本：
+    hls/<源文件 sha256>/master.m3u8          主播放列表，列出各码率版本
+    hls/<源文件 sha256>/<版本>/index.m3u8     各版本的分片列表
+    hls/<源文件 sha256>/<版本>/seg_00001.ts   固定时长的分片
+
+目录以源文件内容的 SHA-256 命名，同一源文件的打包结果不会改变，分片可以长期缓存；
+更换视频文件后生成新的目录。源文件被 gc_media_blobs 删除时一并删除对应的打包目录。
+"""
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+HLS_PREFIX = 'hls/'
+MASTER_PLAYLIST = 'master.m3u8'
+SEGMENT_SECONDS = getattr(settings, 'HLS_SEGMENT_SECONDS', 6)
+AUDIO_BITRATE = 128
+
+# (名称, 高度, 视频码率 kbps)
+DEFAULT_RENDITIONS = (
+    ('360p', 360, 800),
+    ('720p', 720, 2800),
+    ('1080p', 1080, 5000),
+)
+
+
+def package_dir(sha256):
+    return f'{HLS_PREFIX}{sha256}/'
+
+
+def master_name(sha256):
+    return f'{package_dir(sha256)}{MASTER_PLAYLIST}'
+
+
+def select_renditions(width, height):
+    """选出不高于源视频分辨率的版本（至少保留最低的一个），返回带宽度和带宽的字典列表"""
+    renditions = getattr(settings, 'HLS_RENDITIONS', DEFAULT_RENDITIONS)
+    width = width or 16
+    height = height or 9
+    selected = [r for r in renditions if r[1] <= height] or [min(renditions, key=lambda r: r[1])]
+    return [
+        {
+            'name': name,
+            'width': round(rendition_height * width / height / 2) * 2,
+            'height': rendition_height,
+            'video_bitrate': bitrate,
+            'audio_bitrate': AUDIO_BITRATE,
+            'bandwidth': (bitrate + AUDIO_BITRATE) * 1000,
+        }
+        for name, rendition_height, bitrate in selected
+    ]
+
+
+def write_master_playlist(path, renditions):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for r in renditions:
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={r['bandwidth']},RESOLUTION={r['width']}x{r['height']}")
+        lines.append(f"{r['name']}/index.m3u8")
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def publish(local_dir, sha256, storage=None):
+    """把本地打包目录写入存储，主播放列表最后写入（存在即表示打包完整），返回主播放列表的存储路径"""
+    storage = storage or default_storage
+    prefix = package_dir(sha256)
+    files = []
+    for root, dirs, names in os.walk(local_dir):
+        for filename in names:
+            path = os.path.join(root, filename)
+            files.append((os.path.relpath(path, local_dir).replace(os.sep, '/'), path))
+    files.sort(key=lambda item: item[0] == MASTER_PLAYLIST)
+
+    for relative, path in files:
+        name = prefix + relative
+        # 内容由源文件决定，已存在的文件（上次中断前写入的）不必重写
+        if storage.exists(name):
+            continue
+        with open(path, 'rb') as f:
+            saved = storage.save(name, File(f))
+        if saved != name:
+            storage.delete(saved)
+            raise RuntimeError(f'无法写入 {name}')
+    return prefix + MASTER_PLAYLIST
+
+
+def delete_package(sha256, storage=None):
+    """删除源文件对应的打包目录，返回删除的文件数"""
+    storage = storage or default_storage
+    removed = 0
+
+    def walk(prefix):
+        nonlocal removed
+        try:
+            dirs, files = storage.listdir(prefix)
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        for name in files:
+            storage.delete(prefix + name)
+            removed += 1
+        for name in dirs:
+            walk(f'{prefix}{name}/')
+
+    walk(package_dir(sha256))
+    return removed
@@ -0,0 +1,249 @@
+"""
+视频后台处理流水线
+
+视频上传或更换文件后（videos.models 中的信号）写入一条 MediaJob；run_media_worker 命令从表中领取任务，
+在进程池中依次执行各阶段：探测时长 -> 截取缩略图 -> 生成预览雪碧图 -> HLS 分片打包，完成后把 Video.status 置为 ready。
+失败的任务按指数退避重试，超过最多尝试次数后置为 error。各阶段耗时记录在 MediaJob.timings 中。
+"""
+import logging
+import math
+import os
+import shutil
+import socket
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from edu_platform.upload.cas import is_blob_name, store_upload
+from edu_platform.upload.resumable import file_sha256
+from . import packaging
+from .media_tools import get_media_tool
+from .models import Video, MediaJob
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'MEDIA_JOB_MAX_ATTEMPTS', 3)
+RETRY_DELAY = getattr(settings, 'MEDIA_JOB_RETRY_DELAY', 30)
+# 需大于单个任务的最长处理时间（长视频的多码率打包可能耗时数小时）
+LOCK_TIMEOUT = getattr(settings, 'MEDIA_JOB_LOCK_TIMEOUT', 6 * 3600)
+THUMBNAIL_WIDTH = getattr(settings, 'MEDIA_THUMBNAIL_WIDTH', 640)
+SPRITE_INTERVAL = getattr(settings, 'MEDIA_SPRITE_INTERVAL', 10)
+SPRITE_MAX_FRAMES = getattr(settings, 'MEDIA_SPRITE_MAX_FRAMES', 100)
+SPRITE_COLUMNS = 10
+SPRITE_TILE_WIDTH = 160
+
+
+def enqueue_processing(video_id, reset=True):
+    """提交视频处理任务，已有等待中的任务时不重复提交；reset 时清除旧文件的处理结果"""
+    if reset:
+        reset_results(video_id)
+    if MediaJob.objects.filter(video_id=video_id, status='pending').exists():
+        return
+    MediaJob.objects.create(video_id=video_id, run_after=timezone.now(), max_attempts=MAX_ATTEMPTS)
+
+
+def reset_results(video_id):
+    """
+    清除旧文件的处理结果：HLS 播放列表、雪碧图和自动生成的缩略图，由新任务按新文件重新生成；
+    讲师上传的缩略图保留。逐个对象保存，媒体文件的引用次数随之更新
+    """
+    video = Video.objects.filter(pk=video_id).first()
+    if video is None:
+        return
+    video.status = 'processing'
+    video.hls_manifest = ''
+    fields = ['status', 'hls_manifest']
+    if video.sprite:
+        video.sprite = None
+        video.sprite_interval = 0
+        fields += ['sprite', 'sprite_interval']
+    if video.thumbnail and video.thumbnail.name == video.auto_thumbnail:
+        video.thumbnail = None
+        video.auto_thumbnail = ''
+        fields += ['thumbnail', 'auto_thumbnail']
+    video.save(update_fields=fields)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def release_stale_jobs():
+    """领取后超时未完成的任务（工作进程崩溃）重新放回队列"""
+    cutoff = timezone.now() - timedelta(seconds=LOCK_TIMEOUT)
+    return MediaJob.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='pending', locked_by='', run_after=timezone.now(),
+    )
+
+
+def claim_jobs(worker, limit):
+    """领取最多 limit 个到期任务，条件更新保证多个 worker 不会重复领取"""
+    now = timezone.now()
+    candidates = MediaJob.objects.filter(status='pending', run_after__lte=now).order_by('run_after', 'id')
+    claimed = []
+    for job_id in candidates.values_list('id', flat=True)[:limit * 2]:
+        updated = MediaJob.objects.filter(pk=job_id, status='pending').update(
+            status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(job_id)
+            if len(claimed) >= limit:
+                break
+    return claimed
+
+
+@contextmanager
+def local_copy(name):
+    """返回存储中文件的本地路径；非本地存储时先复制到临时文件"""
+    # 只捕获 path() 的异常：yield 放在 try 里时，with 块中抛出的 NotImplementedError 也会被吞掉
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        path = None
+    if path is not None:
+        yield path
+        return
+    suffix = os.path.splitext(name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as temp, default_storage.open(name, 'rb') as source:
+        shutil.copyfileobj(source, temp, 1024 * 1024)
+        temp.flush()
+        yield temp.name
+
+
+class VideoProcessor:
+    """依次执行各处理阶段，阶段方法把结果写到 self.video 上（最后统一保存）"""
+    stages = ('probe', 'thumbnail', 'sprite', 'package')
+
+    def __init__(self, video, path, work_dir, tool=None):
+        self.video = video
+        self.path = path
+        self.source_name = video.file.name
+        self.work_dir = work_dir
+        self.tool = tool or get_media_tool()
+        self.info = {}
+        self.changed_fields = set()
+        self.timings = {}
+
+    def run(self):
+        for stage in self.stages:
+            start = time.perf_counter()
+            getattr(self, stage)()
+            self.timings[stage] = round(time.perf_counter() - start, 3)
+        return self.timings
+
+    def store(self, path, name):
+        """把生成的文件按内容寻址存入存储，返回存储路径"""
+        with open(path, 'rb') as f:
+            blob, created = store_upload(File(f, name=name))
+        return blob.path
+
+    def probe(self):
+        self.info = self.tool.probe(self.path)
+        self.video.duration = int(round(self.info['duration']))
+        self.changed_fields.add('duration')
+
+    def thumbnail(self):
+        # 讲师上传了缩略图时保留
+        if self.video.thumbnail and self.video.thumbnail.name != self.video.auto_thumbnail:
+            return
+        dest = os.path.join(self.work_dir, 'thumbnail.jpg')
+        self.tool.thumbnail(self.path, dest, self.info['duration'] * 0.1, THUMBNAIL_WIDTH)
+        self.video.thumbnail.name = self.video.auto_thumbnail = self.store(dest, 'thumbnail.jpg')
+        self.changed_fields.update(['thumbnail', 'auto_thumbnail'])
+
+    def sprite(self):
+        duration = self.info['duration']
+        interval = max(SPRITE_INTERVAL, math.ceil(duration / SPRITE_MAX_FRAMES))
+        dest = os.path.join(self.work_dir, 'sprite.jpg')
+        self.tool.sprite(self.path, dest, duration, interval, SPRITE_COLUMNS, SPRITE_TILE_WIDTH)
+        self.video.sprite.name = self.store(dest, 'sprite.jpg')
+        self.video.sprite_interval = interval
+        self.changed_fields.update(['sprite', 'sprite_interval'])
+
+    def source_sha256(self):
+        # 按内容寻址保存的源文件，文件名即 sha256
+        if is_blob_name(self.source_name):
+            return os.path.splitext(os.path.basename(self.source_name))[0]
+        return file_sha256(self.path)
+
+    def package(self):
+        sha256 = self.source_sha256()
+        master = packaging.master_name(sha256)
+        # 同样内容的视频已打包过（重复上传或重新处理）
+        if not default_storage.exists(master):
+            out_dir = os.path.join(self.work_dir, 'hls')
+            renditions = packaging.select_renditions(self.info.get('width'), self.info.get('height'))
+            self.tool.package_hls(self.path, out_dir, renditions, packaging.SEGMENT_SECONDS)
+            packaging.write_master_playlist(os.path.join(out_dir, packaging.MASTER_PLAYLIST), renditions)
+            master = packaging.publish(out_dir, sha256)
+        self.video.hls_manifest = master
+        self.changed_fields.add('hls_manifest')
+
+
+def process_job(job_id):
+    """执行一个已领取的任务（在工作进程中调用），返回结果摘要"""
+    close_old_connections()
+    job = MediaJob.objects.select_related('video').filter(pk=job_id).first()
+    if job is None:
+        return drop_missing_job(job_id)
+    video = job.video
+    source_name = video.file.name
+    processor = None
+    try:
+        with local_copy(source_name) as path, tempfile.TemporaryDirectory() as work_dir:
+            processor = VideoProcessor(video, path, work_dir)
+            processor.run()
+    except Exception as e:
+        logger.exception('视频 %s 处理失败（第 %d 次）', video.pk, job.attempts)
+        return fail_job(job, e, processor.timings if processor else {})
+    finally:
+        close_old_connections()
+
+    job.timings = processor.timings
+    job.status = 'succeeded'
+    job.finished_at = timezone.now()
+    # 处理期间视频被删除时任务已随之删除
+    if not MediaJob.objects.filter(pk=job.pk).update(timings=job.timings, status=job.status, finished_at=job.finished_at):
+        return drop_missing_job(job.pk)
+
+    # 处理期间讲师更换了视频文件：结果已过期，交给新任务处理
+    if Video.objects.filter(pk=video.pk, file=source_name).exists():
+        video.status = 'ready'
+        video.save(update_fields=sorted(processor.changed_fields | {'status'}))
+    logger.info('视频 %s 处理完成：%s', video.pk, processor.timings)
+    return {'job': job.pk, 'status': job.status, 'timings': job.timings}
+
+
+def fail_job(job, error, timings=None):
+    """记录失败：未超过最多尝试次数时按指数退避重新排队，否则把视频置为 error"""
+    job.last_error = str(error) or error.__class__.__name__
+    job.timings = timings or {}
+    job.locked_by = ''
+    if job.attempts < job.max_attempts:
+        job.status = 'pending'
+        job.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (job.attempts - 1))
+    else:
+        job.status = 'failed'
+        job.finished_at = timezone.now()
+        Video.objects.filter(pk=job.video_id).update(status='error')
+    updated = MediaJob.objects.filter(pk=job.pk).update(
+        last_error=job.last_error, timings=job.timings, locked_by=job.locked_by, status=job.status,
+        run_after=job.run_after, finished_at=job.finished_at,
+    )
+    if not updated:
+        return drop_missing_job(job.pk)
+    return {'job': job.pk, 'status': job.status, 'error': job.last_error}
+
+
+def drop_missing_job(job_id):
+    """领取后任务已不存在（视频被删除，任务随之级联删除），不再处理"""
+    logger.info('任务 %s 已随视频删除，跳过', job_id)
+    return {'job': job_id, 'status': 'dropped', 'error': '视频已删除'}
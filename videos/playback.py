@@ -0,0 +1,76 @@
+"""
+视频播放授权
+
+<video> 标签和 HLS 播放器请求分片时无法携带 Authorization 头，因此播放地址中带有签名令牌：
+    /api/videos/media/<令牌>/source                 原始视频文件
+    /api/videos/media/<令牌>/hls/master.m3u8        HLS 主播放列表（其中的相对地址继承同一令牌）
+
+令牌在序列化视频时签发（此时检查报名情况，报名信息有缓存），记录视频、用户、文件路径和过期时间；
+媒体视图只校验签名，不查数据库。过期时间按小时取整，同一小时内签发的地址相同，浏览器缓存可以复用。
+"""
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+
+from courses.membership import is_enrolled
+from courses.ownership import is_owner
+from edu_platform.upload.cas import is_blob_name
+from . import packaging
+
+TOKEN_SALT = 'videos.playback'
+TOKEN_MAX_AGE = getattr(settings, 'PLAYBACK_TOKEN_MAX_AGE', 6 * 3600)
+
+
+def can_watch(user, video):
+    """免费课程、免费预览课时、已报名学生、课程讲师和管理员可以观看（需已 select_related 课时和课程）"""
+    if video.lesson.is_free_preview or (video.course and video.course.is_free):
+        return True
+    if not user.is_authenticated:
+        return False
+    return user.is_staff or is_owner(user, video) or is_enrolled(user, video.course_id)
+
+
+def make_token(video, user):
+    expires = (int(time.time()) + TOKEN_MAX_AGE) // 3600 * 3600 + 3600
+    payload = {'v': video.pk, 'u': user.pk, 'f': video.file.name, 'h': video.hls_manifest, 'e': expires}
+    return signing.Signer(salt=TOKEN_SALT).sign_object(payload, compress=True)
+
+
+def read_token(token):
+    """校验令牌，返回载荷；签名错误或已过期时返回 None"""
+    try:
+        payload = signing.Signer(salt=TOKEN_SALT).unsign_object(token)
+    except signing.BadSignature:
+        return None
+    if payload.get('e', 0) < time.time():
+        return None
+    return payload
+
+
+def resolve_name(payload, name):
+    """把媒体视图中的相对路径映射为存储路径，只允许访问令牌对应的文件；返回 (存储路径, 内容是否不变)"""
+    if name == 'source':
+        source = payload['f']
+        return source, is_blob_name(source)
+    if name.startswith('hls/') and payload.get('h'):
+        relative = name[len('hls/'):]
+        if not relative or '..' in relative.split('/'):
+            return None, False
+        return payload['h'].rsplit('/', 1)[0] + '/' + relative, True
+    return None, False
+
+
+def playback_urls(video, request):
+    """返回 (原始文件地址, HLS 主播放列表地址)；无权观看时均为 None"""
+    user = getattr(request, 'user', None)
+    if user is None or not video.file or not can_watch(user, video):
+        return None, None
+    token = make_token(video, user)
+
+    def url(name):
+        return request.build_absolute_uri(reverse('video-media', kwargs={'token': token, 'name': name}))
+
+    manifest = url(f'hls/{packaging.MASTER_PLAYLIST}') if video.hls_manifest else None
+    return url('source'), manifest
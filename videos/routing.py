@@ -1 +1,8 @@
- 
\ No newline at end of file
+from django.urls import path
+
+from live.consumers import LiveChatConsumer
+
+# 课时直播已并入直播活动，旧地址直接使用直播间的聊天和在线状态（ID 即直播活动 ID）
+websocket_urlpatterns = [
+    path('ws/livestreams/<int:live_event_id>/', LiveChatConsumer.as_asgi()),
+]
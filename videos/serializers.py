@@ -1,16 +1,47 @@
 from rest_framework import serializers
-from .models import Video, LiveStreaming, VideoWatchHistory, LiveStreamingAttendance
+from .models import Video, VideoWatchHistory, VideoHeatmap
+from .playback import playback_urls
+from courses.models import Lesson
 from courses.serializers import LessonSerializer
-from accounts.serializers import UserSerializer
+from accounts.serializers import UserCardSerializer
+from edu_platform.dataloader import BatchListSerializer
+from courses.ownership import is_owner
+from live.models import LiveEvent, LiveAttendance, LiveSessionSummary
 
 class VideoSerializer(serializers.ModelSerializer):
     lesson = LessonSerializer(read_only=True)
+    stream_url = serializers.SerializerMethodField()
+    manifest_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Video
-        fields = ['id', 'lesson', 'title', 'file', 'thumbnail', 'duration', 
-                 'status', 'is_downloadable', 'upload_date']
+        fields = ['id', 'lesson', 'title', 'file', 'thumbnail', 'sprite', 'sprite_interval', 'stream_url',
+                 'manifest_url', 'duration', 'status', 'is_downloadable', 'upload_date']
         read_only_fields = ['status', 'upload_date']
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # 原始文件地址只给课程讲师和管理员，其他人通过带令牌的 stream_url / manifest_url 播放
+        request = self.context.get('request')
+        if not is_owner(getattr(request, 'user', None), instance):
+            data.pop('file', None)
+        return data
+    
+    def _playback_urls(self, obj):
+        # 两个地址共用一个令牌，每个视频只签发一次
+        cache = self.__dict__.setdefault('_playback_cache', {})
+        if obj.pk not in cache:
+            request = self.context.get('request')
+            cache[obj.pk] = playback_urls(obj, request) if request else (None, None)
+        return cache[obj.pk]
+    
+    def get_stream_url(self, obj):
+        """带播放令牌的原始文件地址（支持 Range），无权观看时为 None"""
+        return self._playback_urls(obj)[0]
+    
+    def get_manifest_url(self, obj):
+        """带播放令牌的 HLS 主播放列表地址，尚未打包完成或无权观看时为 None"""
+        return self._playback_urls(obj)[1]
 
 class VideoCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -20,39 +51,77 @@ class VideoCreateUpdateSerializer(serializers.ModelSerializer):
     def validate_lesson(self, value):
         """确保用户是课程的创建者"""
         user = self.context['request'].user
-        if value.section.course.instructor != user and not user.is_staff:
+        if not is_owner(user, value):
             raise serializers.ValidationError("您没有权限为此课时添加视频")
         return value
 
+# 课时直播已并入 live.LiveEvent（关联了课时的直播活动），以下为 /api/videos/livestreams/ 的兼容格式。
+# 旧接口的“已取消”写作 cancelled
+LEGACY_STATUS_CHOICES = (
+    ('scheduled', '计划中'),
+    ('live', '正在直播'),
+    ('ended', '已结束'),
+    ('cancelled', '已取消'),
+)
+
+def to_legacy_status(status):
+    return 'cancelled' if status == 'canceled' else status
+
 class LiveStreamingSerializer(serializers.ModelSerializer):
     lesson = LessonSerializer(read_only=True)
+    status = serializers.SerializerMethodField()
+    stream_url = serializers.CharField(source='play_url', read_only=True)
     
     class Meta:
-        model = LiveStreaming
+        model = LiveEvent
         fields = ['id', 'lesson', 'title', 'description', 'scheduled_start_time', 
                  'scheduled_end_time', 'actual_start_time', 'actual_end_time', 
                  'status', 'stream_url']
-        read_only_fields = ['actual_start_time', 'actual_end_time', 'stream_key']
+        read_only_fields = ['actual_start_time', 'actual_end_time']
+    
+    def get_status(self, obj):
+        return to_legacy_status(obj.status)
 
 class LiveStreamingCreateUpdateSerializer(serializers.ModelSerializer):
+    lesson = serializers.PrimaryKeyRelatedField(queryset=Lesson.objects.all())
+    status = serializers.ChoiceField(choices=LEGACY_STATUS_CHOICES, required=False)
+    
     class Meta:
-        model = LiveStreaming
+        model = LiveEvent
         fields = ['lesson', 'title', 'description', 'scheduled_start_time', 
                  'scheduled_end_time', 'status']
                  
     def validate_lesson(self, value):
-        """确保用户是课程的创建者"""
+        """确保用户是课程的创建者，且课时还没有直播"""
         user = self.context['request'].user
-        if value.section.course.instructor != user and not user.is_staff:
+        if not is_owner(user, value):
             raise serializers.ValidationError("您没有权限为此课时创建直播")
+        if LiveEvent.objects.filter(lesson=value).exclude(pk=getattr(self.instance, 'pk', None)).exists():
+            raise serializers.ValidationError("此课时已有直播")
         return value
+    
+    def validate_status(self, value):
+        return 'canceled' if value == 'cancelled' else value
+    
+    def validate(self, data):
+        # 直播活动的课程和讲师随课时确定
+        lesson = data.get('lesson')
+        if lesson is not None:
+            course = lesson.section.course
+            data['course'] = course
+            data['instructor_id'] = course.instructor_id
+        return data
+    
+    def to_representation(self, instance):
+        return LiveStreamingSerializer(instance, context=self.context).data
 
 class VideoWatchHistorySerializer(serializers.ModelSerializer):
     video = VideoSerializer(read_only=True)
-    user = UserSerializer(read_only=True)
+    user = UserCardSerializer()
     
     class Meta:
         model = VideoWatchHistory
+        list_serializer_class = BatchListSerializer
         fields = ['id', 'user', 'video', 'watched_duration', 'last_position', 
                  'completed', 'watch_date']
         read_only_fields = ['watch_date']
@@ -62,11 +131,24 @@ class VideoWatchHistoryUpdateSerializer(serializers.ModelSerializer):
         model = VideoWatchHistory
         fields = ['watched_duration', 'last_position', 'completed']
 
+class VideoHeatmapSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = VideoHeatmap
+        fields = ['video', 'bucket_seconds', 'counts', 'viewers', 'updated_at']
+
 class LiveStreamingAttendanceSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
-    live_streaming = LiveStreamingSerializer(read_only=True)
+    user = UserCardSerializer()
+    live_streaming = LiveStreamingSerializer(source='live_event', read_only=True)
     
     class Meta:
-        model = LiveStreamingAttendance
+        model = LiveAttendance
+        list_serializer_class = BatchListSerializer
         fields = ['id', 'user', 'live_streaming', 'join_time', 'leave_time', 'duration']
-        read_only_fields = ['join_time'] 
\ No newline at end of file
+        read_only_fields = ['join_time'] 
+
+class LiveSessionSummarySerializer(serializers.ModelSerializer):
+    live_streaming = serializers.PrimaryKeyRelatedField(source='live_event', read_only=True)
+    
+    class Meta:
+        model = LiveSessionSummary
+        fields = ['live_streaming', 'unique_attendees', 'peak_attendees', 'average_minutes', 'total_minutes', 'generated_at']
@@ -1,3 +1,254 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from courses.models import Course, Enrollment, Lesson, Section
+from edu_platform.upload.cas import store_upload
+from edu_platform.upload.models import MediaBlob
+
+from .coverage import MAX_VIDEO_DURATION, add_to_histogram, covered_seconds, mark_ranges, parse_ranges
+from .media_tools import FakeMediaTool
+from .models import MediaJob, Video, VideoHeatmap, VideoWatchHistory
+from .pipeline import claim_jobs, process_job
+from .playback import make_token
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_TOOL='videos.media_tools.FakeMediaTool')
+class VideoPipelineTests(TransactionTestCase):
+    """用 FakeMediaTool 走完整的处理流水线"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        instructor = User.objects.create_user('teacher', 'teacher@example.com')
+        course = Course.objects.create(title='课程', slug='course', instructor=instructor, description='简介')
+        section = Section.objects.create(course=course, title='第一章')
+        self.lesson = Lesson.objects.create(section=section, title='第一课')
+
+    def upload(self, content, name='video.mp4', content_type='video/mp4'):
+        blob, _ = store_upload(SimpleUploadedFile(name, content, content_type=content_type))
+        return blob
+
+    def source(self, seconds):
+        return self.upload(b'\0' * int(FakeMediaTool.BYTES_PER_SECOND * seconds))
+
+    def run_jobs(self):
+        return [process_job(job_id) for job_id in claim_jobs('test', 10)]
+
+    def ref_count(self, path):
+        return MediaBlob.objects.get(path=path).ref_count
+
+    def test_process(self):
+        video = Video.objects.create(lesson=self.lesson, title='视频', file=self.source(2).path)
+        [result] = self.run_jobs()
+        self.assertEqual(result['status'], 'succeeded')
+        self.assertEqual(list(result['timings']), ['probe', 'thumbnail', 'sprite', 'package'])
+
+        video.refresh_from_db()
+        self.assertEqual(video.status, 'ready')
+        self.assertEqual(video.duration, 2)
+        self.assertEqual(video.thumbnail.name, video.auto_thumbnail)
+        self.assertEqual(self.ref_count(video.thumbnail.name), 1)
+        self.assertEqual(self.ref_count(video.sprite.name), 1)
+        self.assertTrue(default_storage.exists(video.hls_manifest))
+
+    def test_replacing_file_regenerates_thumbnail_and_sprite(self):
+        video = Video.objects.create(lesson=self.lesson, title='视频', file=self.source(2).path)
+        self.run_jobs()
+        video.refresh_from_db()
+        old_thumbnail, old_sprite = video.thumbnail.name, video.sprite.name
+
+        video.file.name = self.source(3).path
+        video.save()
+        video.refresh_from_db()
+        self.assertEqual(video.status, 'processing')
+        self.assertFalse(video.thumbnail)
+        self.assertFalse(video.sprite)
+        self.assertEqual(video.hls_manifest, '')
+        self.assertEqual(self.ref_count(old_thumbnail), 0)
+        self.assertEqual(self.ref_count(old_sprite), 0)
+
+        self.run_jobs()
+        video.refresh_from_db()
+        self.assertEqual(video.status, 'ready')
+        self.assertEqual(video.duration, 3)
+        self.assertTrue(video.thumbnail)
+        self.assertEqual(video.thumbnail.name, video.auto_thumbnail)
+        self.assertTrue(video.sprite)
+
+    def test_uploaded_thumbnail_kept(self):
+        thumbnail = self.upload(b'cover', name='cover.jpg', content_type='image/jpeg')
+        video = Video.objects.create(
+            lesson=self.lesson, title='视频', file=self.source(2).path, thumbnail=thumbnail.path,
+        )
+        self.run_jobs()
+        video.file.name = self.source(3).path
+        video.save()
+        self.run_jobs()
+
+        video.refresh_from_db()
+        self.assertEqual(video.thumbnail.name, thumbnail.path)
+        self.assertEqual(video.auto_thumbnail, '')
+        self.assertEqual(self.ref_count(thumbnail.path), 1)
+
+    def test_failed_job_retries_then_marks_error(self):
+        video = Video.objects.create(lesson=self.lesson, title='视频', file=self.upload(b'').path)
+        job = MediaJob.objects.get(video=video)
+        self.assertEqual(job.max_attempts, 3)
+
+        with self.assertLogs('videos.pipeline', 'ERROR'):
+            [result] = self.run_jobs()
+        self.assertEqual(result['status'], 'pending')
+        job.refresh_from_db()
+        self.assertGreater(job.run_after, job.locked_at)
+
+        for _ in range(job.max_attempts - 1):
+            MediaJob.objects.filter(pk=job.pk).update(run_after=job.locked_at)
+            with self.assertLogs('videos.pipeline', 'ERROR'):
+                [result] = self.run_jobs()
+        self.assertEqual(result['status'], 'failed')
+        video.refresh_from_db()
+        self.assertEqual(video.status, 'error')
+
+
+class VideoPlaybackTests(APITestCase):
+    """课时视频只能通过带播放令牌的地址访问，支持 Range"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.instructor = User.objects.create_user('teacher', 'teacher@example.com')
+        self.student = User.objects.create_user('student', 'student@example.com')
+        course = Course.objects.create(title='课程', slug='course', instructor=self.instructor, description='简介', price=99)
+        Enrollment.objects.create(student=self.student, course=course)
+        lesson = Lesson.objects.create(section=Section.objects.create(course=course, title='第一章'), title='第一课')
+        self.content = bytes(range(256)) * 4
+        blob, _ = store_upload(SimpleUploadedFile('lesson.mp4', self.content, content_type='video/mp4'))
+        self.video = Video.objects.create(lesson=lesson, title='视频', file=blob.path, status='ready')
+
+    def test_raw_file_not_public(self):
+        self.assertEqual(self.client.get(default_storage.url(self.video.file.name)).status_code, 404)
+
+    def test_file_hidden_from_students(self):
+        self.client.force_authenticate(self.student)
+        data = self.client.get(f'/api/videos/videos/{self.video.pk}/').data
+        self.assertNotIn('file', data)
+        self.assertTrue(data['stream_url'])
+
+        self.client.force_authenticate(self.instructor)
+        self.assertIn('file', self.client.get(f'/api/videos/videos/{self.video.pk}/').data)
+
+    def test_stream_range(self):
+        url = f'/api/videos/media/{make_token(self.video, self.student)}/source'
+        response = self.client.get(url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code, 200)
+
+    def test_invalid_token(self):
+        token = make_token(self.video, self.student)
+        self.assertEqual(self.client.get(f'/api/videos/media/{token}x/source').status_code, 403)
+        self.assertEqual(self.client.get(f'/api/videos/media/{token}/hls/master.m3u8').status_code, 404)
+
+
+class CoverageTests(SimpleTestCase):
+    """观看覆盖位图（默认 10 秒一位）"""
+
+    def test_mark_ranges(self):
+        bitmap = mark_ranges(b'', [(0, 10)])
+        self.assertEqual(bitmap, b'\x80')
+        # 结束点落在段边界上时不计入下一段；跨字节时自动加长
+        bitmap = mark_ranges(bitmap, [(15, 20), (75, 81)])
+        self.assertEqual(bitmap, bytes([0b11000001, 0b10000000]))
+
+    def test_merge_is_idempotent(self):
+        bitmap = mark_ranges(b'', [(0, 30)])
+        self.assertEqual(mark_ranges(bitmap, [(5, 25)]), bitmap)
+        self.assertEqual(covered_seconds(mark_ranges(bitmap, [(20, 50)])), 50)
+
+    def test_parse_ranges(self):
+        self.assertEqual(parse_ranges([[0, 5], [3, 3], [10, 90]], duration=60), [(0, 5), (10, 60)])
+        for value in ([[5, 1]], [[-1, 5]], [[0]], [['a', 'b']], [[0, MAX_VIDEO_DURATION + 1]], 'x', [[0, 1]] * 101):
+            with self.assertRaises(ValueError, msg=value):
+                parse_ranges(value)
+
+    def test_mark_ranges_limit(self):
+        with self.assertRaises(ValueError):
+            mark_ranges(b'', [(0, MAX_VIDEO_DURATION + 10)])
+
+    def test_add_to_histogram(self):
+        counts = []
+        add_to_histogram(counts, mark_ranges(b'', [(0, 20)]))
+        add_to_histogram(counts, mark_ranges(b'', [(10, 40)]))
+        self.assertEqual(counts, [1, 2, 1, 1])
+
+
+class WatchCoverageTests(APITestCase):
+    """观看心跳合并区间，汇总命令生成热力图"""
+
+    def setUp(self):
+        self.instructor = User.objects.create_user('teacher', 'teacher@example.com')
+        course = Course.objects.create(
+            title='课程', slug='course', instructor=self.instructor, description='简介', is_free=True,
+        )
+        lesson = Lesson.objects.create(section=Section.objects.create(course=course, title='第一章'), title='第一课')
+        self.video = Video.objects.create(lesson=lesson, title='视频', file='videos/lesson.mp4', duration=60)
+        self.url = f'/api/videos/videos/{self.video.pk}/watch/'
+
+    def watch(self, user, ranges):
+        self.client.force_authenticate(user)
+        return self.client.post(self.url, {'ranges': ranges}, format='json')
+
+    def test_heartbeats_merge(self):
+        student = User.objects.create_user('student', 'student@example.com')
+        self.assertEqual(self.watch(student, [[0, 20]]).status_code, 200)
+        # 与已看过的部分重叠，去重后的观看时长为 30 秒；超出时长的部分截掉
+        response = self.watch(student, [[10, 30]])
+        self.assertEqual(response.data['watched_duration'], 30)
+        response = self.watch(student, [[50, 100]])
+        self.assertEqual(response.data['watched_duration'], 40)
+        self.assertEqual(self.watch(student, [[20, 10]]).status_code, 400)
+
+    def test_aggregate_heatmap(self):
+        for index, ranges in enumerate(([[0, 20]], [[10, 30]], [[10, 15]])):
+            student = User.objects.create_user(f'student{index}', f'student{index}@example.com')
+            self.watch(student, ranges)
+        call_command('aggregate_video_heatmaps', stdout=io.StringIO())
+
+        heatmap = VideoHeatmap.objects.get(video=self.video)
+        self.assertEqual(heatmap.viewers, 3)
+        self.assertEqual(heatmap.counts, [1, 3, 1, 0, 0, 0])
+
+        self.client.force_authenticate(self.instructor)
+        self.assertEqual(self.client.get(f'/api/videos/videos/{self.video.pk}/heatmap/').data['counts'], heatmap.counts)
+        self.client.force_authenticate(User.objects.get(username='student0'))
+        self.assertEqual(self.client.get(f'/api/videos/videos/{self.video.pk}/heatmap/').status_code, 403)
+
+    def test_aggregate_only_changed_videos(self):
+        self.watch(User.objects.create_user('student', 'student@example.com'), [[0, 10]])
+        call_command('aggregate_video_heatmaps', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('aggregate_video_heatmaps', stdout=out)
+        self.assertIn('已汇总 0 个视频', out.getvalue())
+        self.assertTrue(VideoWatchHistory.objects.filter(video=self.video).exists())
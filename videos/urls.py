@@ -1,12 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import VideoViewSet, LiveStreamingViewSet, VideoWatchHistoryViewSet
+from .views import VideoViewSet, LiveStreamingViewSet, VideoWatchHistoryViewSet, video_media
 
 router = DefaultRouter()
 router.register(r'videos', VideoViewSet)
-router.register(r'livestreams', LiveStreamingViewSet)
+router.register(r'livestreams', LiveStreamingViewSet, basename='livestreaming')
 router.register(r'watch-history', VideoWatchHistoryViewSet, basename='watch-history')
 
 urlpatterns = [
+    path('media/<str:token>/<path:name>', video_media, name='video-media'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -1,11 +1,21 @@
 from django.shortcuts import render
+from django.http import Http404, HttpResponseForbidden
+from django.views.decorators.http import require_http_methods
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db import transaction
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from courses.views import IsInstructorOrReadOnly
-from .models import Video, LiveStreaming, VideoWatchHistory, LiveStreamingAttendance
+from courses.membership import is_enrolled
+from edu_platform.upload.serving import serve_file
+from courses.ownership import is_owner
+from live import sessions
+from live.models import LiveEvent, LiveAttendance, LiveSessionSummary
+from .models import Video, VideoWatchHistory, VideoHeatmap
+from .playback import can_watch, read_token, resolve_name
+from .coverage import BUCKET_SECONDS, covered_seconds, mark_ranges, parse_ranges
 from .serializers import (
     VideoSerializer,
     VideoCreateUpdateSerializer,
@@ -13,12 +23,26 @@ from .serializers import (
     LiveStreamingCreateUpdateSerializer,
     VideoWatchHistorySerializer,
     VideoWatchHistoryUpdateSerializer,
-    LiveStreamingAttendanceSerializer
+    VideoHeatmapSerializer,
+    LiveStreamingAttendanceSerializer,
+    LiveSessionSummarySerializer
 )
 
+@require_http_methods(['GET', 'HEAD'])
+def video_media(request, token, name):
+    """发送视频文件或 HLS 播放列表/分片；只校验播放令牌，不查数据库"""
+    payload = read_token(token)
+    if payload is None:
+        return HttpResponseForbidden('播放地址无效或已过期')
+    storage_name, immutable = resolve_name(payload, name)
+    if storage_name is None:
+        raise Http404
+    return serve_file(request, storage_name, immutable=immutable)
+
 class VideoViewSet(viewsets.ModelViewSet):
     """视频视图集"""
-    queryset = Video.objects.all()
+    # 权限判断需要课时和课程，联表一次取出
+    queryset = Video.objects.select_related('lesson', 'course')
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -41,9 +65,8 @@ class VideoViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # 检查用户是否有权限观看视频
-        if not video.lesson.is_free_preview and not video.lesson.section.course.is_free:
-            if not video.lesson.section.course.enrollments.filter(student=user).exists():
-                return Response({"detail": "您需要先报名课程才能观看此视频"}, status=status.HTTP_403_FORBIDDEN)
+        if not can_watch(user, video):
+            return Response({"detail": "您需要先报名课程才能观看此视频"}, status=status.HTTP_403_FORBIDDEN)
         
         # 获取或创建观看记录
         watch_history, created = VideoWatchHistory.objects.get_or_create(
@@ -57,21 +80,57 @@ class VideoViewSet(viewsets.ModelViewSet):
         )
         
         if request.method == 'POST':
-            # 更新观看记录
-            watched_duration = request.data.get('watched_duration', watch_history.watched_duration)
-            last_position = request.data.get('last_position', watch_history.last_position)
-            completed = request.data.get('completed', watch_history.completed)
+            # 心跳可携带本次播放过的区间 ranges=[[开始秒, 结束秒], ...]，合并进观看覆盖位图
+            try:
+                ranges = parse_ranges(request.data.get('ranges', []), video.duration or None)
+            except ValueError as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
-            watch_history.watched_duration = watched_duration
-            watch_history.last_position = last_position
-            watch_history.completed = completed
-            watch_history.save()
+            with transaction.atomic():
+                # 多个标签页同时上报时避免位图互相覆盖
+                watch_history = VideoWatchHistory.objects.select_for_update().get(pk=watch_history.pk)
+                if ranges:
+                    try:
+                        watch_history.coverage = mark_ranges(watch_history.coverage, ranges)
+                    except ValueError as e:
+                        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                
+                # 更新观看记录；上报了区间而未给出观看时长时，按位图计算去重后的观看时长
+                default_duration = watch_history.watched_duration
+                if ranges:
+                    default_duration = covered_seconds(watch_history.coverage)
+                    if video.duration:
+                        default_duration = min(default_duration, video.duration)
+                watched_duration = request.data.get('watched_duration', default_duration)
+                last_position = request.data.get('last_position', watch_history.last_position)
+                completed = request.data.get('completed', watch_history.completed)
+                
+                watch_history.watched_duration = watched_duration
+                watch_history.last_position = last_position
+                watch_history.completed = completed
+                watch_history.save()
         
         return Response(VideoWatchHistorySerializer(watch_history).data)
+    
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def heatmap(self, request, pk=None):
+        """视频观看热力图：各段被多少名学生看过（由 aggregate_video_heatmaps 定期汇总），仅课程讲师可见"""
+        video = self.get_object()
+        if not (request.user.is_staff or is_owner(request.user, video)):
+            return Response({"detail": "只有课程讲师才能查看观看热力图"}, status=status.HTTP_403_FORBIDDEN)
+        
+        heatmap = VideoHeatmap.objects.filter(video=video).first()
+        if heatmap is None:
+            # 尚未汇总
+            heatmap = VideoHeatmap(video=video, bucket_seconds=BUCKET_SECONDS, counts=[], viewers=0)
+        return Response(VideoHeatmapSerializer(heatmap).data)
 
 class LiveStreamingViewSet(viewsets.ModelViewSet):
-    """直播视图集"""
-    queryset = LiveStreaming.objects.all()
+    """
+    课时直播的兼容接口：数据、状态切换和出席记录都由 live 应用处理（见 live.sessions），
+    这里只保留原有的地址和返回格式；ID 即直播活动 ID，实时聊天和在线状态使用 ws/live/<ID>/
+    """
+    queryset = LiveEvent.objects.filter(lesson__isnull=False).select_related('lesson', 'course')
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -87,126 +146,91 @@ class LiveStreamingViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
     
+    def perform_create(self, serializer):
+        stream_key, rtmp_url, play_url = sessions.stream_endpoints()
+        serializer.save(stream_key=stream_key, rtmp_url=rtmp_url, play_url=play_url)
+    
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def start(self, request, pk=None):
         """开始直播"""
-        live_streaming = self.get_object()
-        user = request.user
+        live_event = self.get_object()
         
         # 检查是否是课程创建者
-        if live_streaming.lesson.section.course.instructor != user and not user.is_staff:
+        if not is_owner(request.user, live_event):
             return Response({"detail": "只有课程创建者才能开始直播"}, status=status.HTTP_403_FORBIDDEN)
         
-        # 更新直播状态
-        if live_streaming.status not in ['scheduled', 'cancelled']:
+        try:
+            sessions.transition(live_event, 'start')
+        except sessions.InvalidTransition:
             return Response({"detail": "当前状态无法开始直播"}, status=status.HTTP_400_BAD_REQUEST)
         
-        live_streaming.status = 'live'
-        live_streaming.actual_start_time = timezone.now()
-        live_streaming.save()
-        
-        return Response(LiveStreamingSerializer(live_streaming).data)
+        return Response(LiveStreamingSerializer(live_event).data)
     
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def end(self, request, pk=None):
-        """结束直播"""
-        live_streaming = self.get_object()
-        user = request.user
+        """结束直播，同时关闭所有出席记录并生成出席汇总"""
+        live_event = self.get_object()
         
         # 检查是否是课程创建者
-        if live_streaming.lesson.section.course.instructor != user and not user.is_staff:
+        if not is_owner(request.user, live_event):
             return Response({"detail": "只有课程创建者才能结束直播"}, status=status.HTTP_403_FORBIDDEN)
         
-        # 更新直播状态
-        if live_streaming.status != 'live':
+        try:
+            sessions.transition(live_event, 'end')
+        except sessions.InvalidTransition:
             return Response({"detail": "直播未开始"}, status=status.HTTP_400_BAD_REQUEST)
         
-        live_streaming.status = 'ended'
-        live_streaming.actual_end_time = timezone.now()
-        live_streaming.save()
-        
-        # 更新所有观看者的离开时间和观看时长
-        attendances = LiveStreamingAttendance.objects.filter(
-            live_streaming=live_streaming,
-            leave_time__isnull=True
-        )
-        for attendance in attendances:
-            attendance.leave_time = timezone.now()
-            if attendance.join_time:
-                duration_seconds = (attendance.leave_time - attendance.join_time).total_seconds()
-                attendance.duration = int(duration_seconds / 60)  # 转换为分钟
-            attendance.save()
-        
-        return Response(LiveStreamingSerializer(live_streaming).data)
+        return Response(LiveStreamingSerializer(live_event).data)
     
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def join(self, request, pk=None):
         """加入直播"""
-        live_streaming = self.get_object()
-        user = request.user
+        live_event = self.get_object()
         
         # 检查用户是否有权限观看直播
-        course = live_streaming.lesson.section.course
-        if not course.is_free and not course.enrollments.filter(student=user).exists():
+        if not sessions.can_join(request.user, live_event):
             return Response({"detail": "您需要先报名课程才能观看此直播"}, status=status.HTTP_403_FORBIDDEN)
         
         # 检查直播状态
-        if live_streaming.status != 'live':
+        if live_event.status != 'live':
             return Response({"detail": "直播未开始或已结束"}, status=status.HTTP_400_BAD_REQUEST)
         
-        # 记录观看者
-        attendance, created = LiveStreamingAttendance.objects.get_or_create(
-            user=user,
-            live_streaming=live_streaming,
-            defaults={
-                'join_time': timezone.now(),
-                'duration': 0
-            }
-        )
-        
-        # 如果已经有记录但已经离开，更新为重新加入
-        if not created and attendance.leave_time:
-            attendance.join_time = timezone.now()
-            attendance.leave_time = None
-            attendance.save()
-        
-        return Response(LiveStreamingAttendanceSerializer(attendance).data)
+        attendance = sessions.join(live_event, request.user)
+        return Response(LiveStreamingAttendanceSerializer(attendance, context={'request': request}).data)
     
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def leave(self, request, pk=None):
         """离开直播"""
-        live_streaming = self.get_object()
-        user = request.user
-        
-        try:
-            attendance = LiveStreamingAttendance.objects.get(
-                user=user,
-                live_streaming=live_streaming,
-                leave_time__isnull=True
-            )
-        except LiveStreamingAttendance.DoesNotExist:
+        attendance = sessions.leave(self.get_object(), request.user)
+        if attendance is None:
             return Response({"detail": "您未加入此直播或已离开"}, status=status.HTTP_400_BAD_REQUEST)
         
-        attendance.leave_time = timezone.now()
-        if attendance.join_time:
-            duration_seconds = (attendance.leave_time - attendance.join_time).total_seconds()
-            attendance.duration = int(duration_seconds / 60)  # 转换为分钟
-        attendance.save()
-        
-        return Response(LiveStreamingAttendanceSerializer(attendance).data)
+        return Response(LiveStreamingAttendanceSerializer(attendance, context={'request': request}).data)
     
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def attendances(self, request, pk=None):
         """获取直播出席记录"""
-        live_streaming = self.get_object()
-        user = request.user
+        live_event = self.get_object()
         
         # 只有课程创建者或管理员可以查看所有出席记录
-        if live_streaming.lesson.section.course.instructor != user and not user.is_staff:
+        if not is_owner(request.user, live_event):
             return Response({"detail": "只有课程创建者才能查看出席记录"}, status=status.HTTP_403_FORBIDDEN)
         
-        attendances = LiveStreamingAttendance.objects.filter(live_streaming=live_streaming)
-        return Response(LiveStreamingAttendanceSerializer(attendances, many=True).data)
+        attendances = LiveAttendance.objects.filter(live_event=live_event).select_related('live_event__lesson')
+        return Response(LiveStreamingAttendanceSerializer(attendances, many=True, context={'request': request}).data)
+    
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def summary(self, request, pk=None):
+        """获取直播结束时生成的出席汇总"""
+        live_event = self.get_object()
+        
+        if not is_owner(request.user, live_event):
+            return Response({"detail": "只有课程创建者才能查看出席汇总"}, status=status.HTTP_403_FORBIDDEN)
+        
+        summary = LiveSessionSummary.objects.filter(live_event=live_event).first()
+        if summary is None:
+            return Response({"detail": "直播结束后才会生成出席汇总"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(LiveSessionSummarySerializer(summary).data)
 
 class VideoWatchHistoryViewSet(viewsets.ModelViewSet):
     """视频观看历史视图集"""